@@ -22,8 +22,14 @@ from .extensions import babel, csrf, db, limiter, login_manager, mail
 from .helpers import clean_param_name_for_id, get_ordered_analytes_for_model
 from .logging_config import configure_logging
 from .performance import caching, compression
+from .utils.columnar import columnar_export_available
 from .security import init_security
 from .services.audit_service import register_audit_listeners
+from .services.measurement_store_service import register_measurement_store_listeners
+from .services.search_service import register_search_index_listeners
+from .performance.permission_matrix import register_permission_matrix_listeners
+from .performance.rbac_snapshot import register_rbac_snapshot_listeners
+from .performance.caching import register_query_cache_listeners
 
 # Initialize Flask-Session
 sess = Session()
@@ -96,6 +102,7 @@ def create_app(config_class=None):
     app.jinja_env.globals['clean_param_name_for_id'] = clean_param_name_for_id
     app.jinja_env.globals['sanitize_ckan_name'] = sanitize_ckan_name
     app.jinja_env.globals['get_ordered_analytes'] = get_ordered_analytes_for_model
+    app.jinja_env.globals['columnar_export_available'] = columnar_export_available
 
     csrf.init_app(app)
 
@@ -147,6 +154,11 @@ def create_app(config_class=None):
 
     # Register Audit Listeners (GLP)
     register_audit_listeners(app)
+    register_measurement_store_listeners(app)
+    register_permission_matrix_listeners(app)
+    register_rbac_snapshot_listeners(app)
+    register_query_cache_listeners(app)
+    register_search_index_listeners(app)
 
     # Removed ensure_mandatory_analytes_exist from factory
     # This should be handled by CLI commands during deployment.
@@ -452,6 +452,10 @@ def audit_logs():
         flash(_l("Access denied."), "danger")
         return redirect(url_for('main.index'))
     
-    from app.models.audit import AuditLog
-    logs = AuditLog.query.order_by(AuditLog.timestamp.desc()).limit(1000).all()
+    from app.services.audit_archive_service import AuditArchiveService
+    logs = AuditArchiveService().query(
+        resource_type=request.args.get('resource_type') or None,
+        resource_id=request.args.get('resource_id') or None,
+        limit=1000,
+    )
     return render_template('admin/audit_logs.html', logs=logs)
\ No newline at end of file
@@ -4,7 +4,7 @@ from flask_restx import Resource, fields
 
 from app.decorators import permission_required
 from app.extensions import db
-from app.models import (AuditLog, Permission, Role, Team, TeamMembership, User,
+from app.models import (Permission, Role, Team, TeamMembership, User,
                         UserTeamRoleLink, user_has_permission)
 
 from . import api
@@ -410,12 +410,40 @@ class TeamMemberRoleItem(Resource):
 
 # --- Audit Logs ---
 
+audit_log_parser = ns.parser()
+audit_log_parser.add_argument('resource_type', type=str, help='Filter by resource type', location='args')
+audit_log_parser.add_argument('resource_id', type=str, help='Filter by resource ID', location='args')
+audit_log_parser.add_argument('user_id', type=int, help='Filter by user ID', location='args')
+audit_log_parser.add_argument('start', type=str, help='ISO date/time lower bound (inclusive)', location='args')
+audit_log_parser.add_argument('end', type=str, help='ISO date/time upper bound (exclusive)', location='args')
+audit_log_parser.add_argument('limit', type=int, default=100, help='Page size (max 1000)', location='args')
+audit_log_parser.add_argument('offset', type=int, default=0, help='Entries to skip', location='args')
+
 @ns.route('/audit_logs')
 class AuditLogList(Resource):
     decorators = [token_required, permission_required('User', 'view')] # accessible to admins
 
     @ns.doc('list_audit_logs')
+    @ns.expect(audit_log_parser)
     @ns.marshal_list_with(audit_log_model)
     def get(self):
-        """List all audit logs"""
-        return AuditLog.query.order_by(AuditLog.timestamp.desc()).limit(100).all()
+        """List audit logs, newest first (live, rotated and archived months)"""
+        from datetime import datetime
+
+        from app.services.audit_archive_service import AuditArchiveService
+
+        args = audit_log_parser.parse_args()
+        try:
+            start = datetime.fromisoformat(args['start']) if args.get('start') else None
+            end = datetime.fromisoformat(args['end']) if args.get('end') else None
+        except ValueError:
+            ns.abort(400, "start and end must be ISO dates")
+        return AuditArchiveService().query(
+            resource_type=args.get('resource_type'),
+            resource_id=args.get('resource_id'),
+            user_id=args.get('user_id'),
+            start=start,
+            end=end,
+            limit=min(max(args.get('limit') or 100, 1), 1000),
+            offset=max(args.get('offset') or 0, 0),
+        )
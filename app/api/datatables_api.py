@@ -9,7 +9,9 @@ from app.models import DataTable, ExperimentalGroup, ExperimentDataRow, Protocol
 from app.permissions import (can_create_datatable_for_group,
                              check_datatable_permission,
                              check_group_permission)
+from app.performance.caching import cached, mark_tags_stale
 from app.services.datatable_service import DataTableService
+from app.services.measurement_store_service import MeasurementStoreService
 from app.services.tm_connector import TrainingManagerConnector
 from app.schemas.datatable import DataTableMoveSchema, DataTableReassignSchema
 
@@ -147,6 +149,10 @@ class DataTableItem(Resource):
                     row_data=row_data['row_data']
                 )
                 db.session.add(new_row)
+            db.session.flush()
+            # The bulk delete bypasses the flush hooks: re-project the whole table
+            MeasurementStoreService().sync_datatable(datatable.id)
+            mark_tags_stale(db.session, {f'datatable:{datatable.id}', 'measurements'})
             db.session.commit()
 
         return datatable
@@ -220,6 +226,11 @@ class ServerSideDataTableList(Resource):
     def get(self):
         """Return a paginated and filtered list of datatables for DataTables."""
         draw = int(request.args.get('draw', 1))
+        return dict(self._listing(), draw=draw)
+
+    @cached(tags=['datatables', 'access', 'user:{user_id}'], ignore_args=('_', 'draw'))
+    def _listing(self):
+        """Listing payload for the current request arguments (without the DataTables draw counter)."""
         start = int(request.args.get('start', 0))
         length = int(request.args.get('length', 10))
         search_value = request.args.get('search[value]', '')
@@ -263,7 +274,8 @@ class ServerSideDataTableList(Resource):
             page=page,
             per_page=per_page,
             sort_column=sort_column_name,
-            sort_direction=order_direction
+            sort_direction=order_direction,
+            cursor=request.args.get('cursor')
         )
 
         # Batch-fetch permissions for all unique projects (performance optimization)
@@ -290,10 +302,10 @@ class ServerSideDataTableList(Resource):
                 })
 
         return {
-            "draw": draw,
             "recordsTotal": result['total_records'],
             "recordsFiltered": result['filtered_records'],
-            "data": data
+            "data": data,
+            "next_cursor": result['next_cursor']
         }
 
 
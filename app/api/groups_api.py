@@ -12,6 +12,7 @@ from app.permissions import (
     check_project_permission,
     can_create_datatable_for_group
 )
+from app.performance.caching import cached
 from app.services.group_service import GroupService
 
 from . import api
@@ -262,6 +263,11 @@ class ServerSideGroupList(Resource):
     def get(self):
         """Return a paginated and filtered list of experimental groups for DataTables."""
         draw = int(request.args.get("draw", 1))
+        return dict(self._listing(), draw=draw)
+
+    @cached(tags=["groups", "access", "user:{user_id}"], ignore_args=("_", "draw"))
+    def _listing(self):
+        """Listing payload for the current request arguments (without the DataTables draw counter)."""
         start = int(request.args.get("start", 0))
         length = int(request.args.get("length", 10))
         search_value = request.args.get("search[value]", "")
@@ -289,9 +295,7 @@ class ServerSideGroupList(Resource):
             elif sort_column_name == "model_name":
                 sort_column_name = "model_name" 
             elif sort_column_name == "animal_count":
-                # Sorting by JSON array length in SQL is complex/db-specific. 
-                # Fallback to created_at or handle in service if critical.
-                sort_column_name = "created_at" 
+                sort_column_name = "animal_count" # Joined from the SQL animal counts
 
         # Parse is_archived filter
         is_archived_param = request.args.get("is_archived")
@@ -318,7 +322,8 @@ class ServerSideGroupList(Resource):
             page=page,
             per_page=per_page,
             sort_column=sort_column_name,
-            sort_direction=order_direction
+            sort_direction=order_direction,
+            cursor=request.args.get("cursor")
         )
 
         # Batch-fetch permissions for all unique projects (performance optimization)
@@ -328,28 +333,19 @@ class ServerSideGroupList(Resource):
         unique_projects = {group.project for group in result["items"] if group.project}
         project_permissions = perm_service.get_bulk_project_permissions(g.current_user, unique_projects)
 
+        animal_stats = group_service.get_animal_stats([group.id for group in result["items"]])
+
         data = []
         with current_app.test_request_context(): # Required for url_for to work outside of a request context
             for group in result["items"]:
                 # Get pre-computed permissions for this group's project
                 perms = project_permissions.get(group.project_id, {})
                 
-                # Calculate animal counts and serialize for tooltip
-                animals_list = [a.to_dict() for a in group.animals]
-                total_animals = len(animals_list)
-                alive_animals = 0
-                dead_animals = 0
-                euthanasia_summary = {}
-                
-                for a in animals_list:
-                    if a.get("status") == "dead":
-                        dead_animals += 1
-                        reason = a.get("euthanasia_reason", "Unknown")
-                        sev = a.get("severity", "Unknown")
-                        key = f"{reason} - {sev}"
-                        euthanasia_summary[key] = euthanasia_summary.get(key, 0) + 1
-                    else:
-                        alive_animals += 1
+                # Animal counts and dead-animal details aggregated in SQL
+                stats = animal_stats[group.id]
+                total_animals = stats["total"]
+                alive_animals = stats["alive"]
+                dead_animals = stats["dead"]
 
                 animal_count_display = f"{alive_animals} / {total_animals}"
 
@@ -357,11 +353,8 @@ class ServerSideGroupList(Resource):
                 tooltip_content = ""
                 if dead_animals > 0:
                     tooltip_parts = [f"Dead animals ({dead_animals}):"]
-                    for a in animals_list:
-                        if a.get("status") == "dead":
-                            reason = a.get("euthanasia_reason", "Unknown reason")
-                            animal_id = a.get("uid", "Unknown ID")
-                            tooltip_parts.append(f"• {animal_id}: {reason}")
+                    for animal_id, reason in stats["dead_animals"]:
+                        tooltip_parts.append(f"• {animal_id or 'Unknown ID'}: {reason or 'Unknown reason'}")
 
                     # Join with actual HTML line breaks
                     tooltip_content = "<br>".join(tooltip_parts)
@@ -378,6 +371,7 @@ class ServerSideGroupList(Resource):
                     "team_name": group.team.name if group.team else "",
                     "model_name": group.model.name if group.model else "N/A",
                     "animal_count": animal_count_display,
+                    "euthanasia_summary": stats["euthanasia_summary"],
                     "created_at": group.created_at.strftime("%Y-%m-%d %H:%M:%S") if getattr(group, "created_at", None) else "",
                     "updated_at": group.updated_at.strftime("%Y-%m-%d %H:%M:%S") if getattr(group, "updated_at", None) else "",
                     "is_archived": group.is_archived,
@@ -385,10 +379,10 @@ class ServerSideGroupList(Resource):
                 })
 
         return {
-            "draw": draw,
             "recordsTotal": result["total_records"],
             "recordsFiltered": result["filtered_records"],
-            "data": data
+            "data": data,
+            "next_cursor": result["next_cursor"]
         }
 
 
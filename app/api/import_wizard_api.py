@@ -1,5 +1,6 @@
 # app/api/import_wizard_api.py
 import os
+from celery.result import AsyncResult
 from flask import request, g, current_app
 from flask_restx import Resource, fields
 from werkzeug.utils import secure_filename
@@ -129,26 +130,60 @@ class ProcessImport(Resource):
 
     @ns.expect(import_request)
     def post(self):
-        """Finalize the import process."""
+        """
+        Finalize the import process. The import runs as a background task whose
+        progress is polled on ``status_url`` (202); it runs inline when the
+        task cannot be queued.
+        """
+        from app.tasks import process_import_task
+
         data = request.get_json()
+        import_args = {
+            'file_path': data['file_path'],
+            'data_table_id': data['data_table_id'],
+            'mapping': data['mapping'],
+            'animal_id_column': data['animal_id_column'],
+            'skip_rows': data.get('skip_rows', 0),
+            'anchor_text': data.get('anchor_text'),
+            'anchor_offset': data.get('anchor_offset', 0),
+            'row_interval': data.get('row_interval', 1),
+            'advanced_logic': data.get('advanced_logic'),
+            'pipeline_id': data.get('pipeline_id'),
+        }
+        try:
+            task = process_import_task.apply_async(args=[g.current_user.id, import_args])
+            return {'task_id': task.id, 'status_url': api.url_for(ImportStatus, task_id=task.id)}, 202
+        except Exception as e:
+            current_app.logger.error(f"Could not queue import, running it inline: {e}", exc_info=True)
+
         try:
-            count = import_wizard_service.process_import(
-                file_path=data['file_path'],
-                data_table_id=data['data_table_id'],
-                mapping=data['mapping'],
-                animal_id_column=data['animal_id_column'],
-                user_id=g.current_user.id,
-                skip_rows=data.get('skip_rows', 0),
-                anchor_text=data.get('anchor_text'),
-                anchor_offset=data.get('anchor_offset', 0),
-                row_interval=data.get('row_interval', 1),
-                advanced_logic=data.get('advanced_logic'),
-                pipeline_id=data.get('pipeline_id')
-            )
+            count = import_wizard_service.process_import(user_id=g.current_user.id, **import_args)
             return {'message': f'Successfully imported {count} rows', 'count': count}
         except Exception as e:
             ns.abort(500, str(e))
 
+@ns.route('/import/status/<string:task_id>')
+class ImportStatus(Resource):
+    decorators = [token_required]
+
+    def get(self, task_id):
+        """Progress of a background import: {state, done, total, current} then {state, count, message}."""
+        task = AsyncResult(task_id)
+        if task.state == 'PENDING':
+            return {'state': 'PENDING'}
+        if task.state == 'FAILURE':
+            return {'state': 'FAILURE', 'message': 'Import failed'}
+        info = task.info if isinstance(task.info, dict) else {}
+        if info.get('user_id') != g.current_user.id:
+            ns.abort(404, "Import not found")
+        if task.state == 'PROGRESS':
+            return {'state': 'PROGRESS', 'done': info.get('done', 0), 'total': info.get('total', 0),
+                    'current': info.get('current')}
+        if 'error' in info:
+            return {'state': 'FAILURE', 'message': info['error']}
+        return {'state': 'SUCCESS', 'count': info['count'],
+                'message': f"Successfully imported {info['count']} rows"}
+
 @ns.route('/templates/<int:protocol_model_id>')
 class TemplateList(Resource):
     decorators = [token_required]
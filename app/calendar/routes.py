@@ -1,5 +1,4 @@
 # app/calendar/routes.py
-import textwrap
 from collections import defaultdict
 from datetime import datetime, timedelta
 
@@ -16,15 +15,12 @@ from app.models import (DataTable, EthicalApproval, ExperimentalGroup, Project,
                         User, Workplan, WorkplanEvent, WorkplanStatus,
                         WorkplanVersion)
 from app.permissions import check_project_permission
+from app.services import calendar_feed_service as calendar_feeds
 from app.services.tm_connector import TrainingManagerConnector
 
 from . import calendar_bp
 
 
-def fold_line(line):
-    """Folds a long iCalendar line into multiple lines of max 75 chars."""
-    return textwrap.fill(line, width=75, subsequent_indent=' ', break_long_words=False, break_on_hyphens=False)
-
 @calendar_bp.route('/')
 @login_required
 def view_calendar():
@@ -190,138 +186,12 @@ def events_json():
 
     return jsonify(calendar_events)
 
-def generate_ics_feed(user, events, cal_name, cal_desc):
-    """Helper function to generate the .ics file content with maximum compatibility."""
-    current_app.logger.info(f"Generating ICS feed '{cal_name}' for user '{user.email}'. Found {len(events)} events.")
-    
-    ics_lines = [
-        "BEGIN:VCALENDAR",
-        "VERSION:2.0",
-        f"PRODID:-//Precliniset//NONSGML v1.0//EN",
-        fold_line(f"X-WR-CALNAME:{cal_name}"),
-        fold_line(f"X-WR-CALDESC:{cal_desc}"),
-    ]
-
-    for event_item in events:
-        if isinstance(event_item, WorkplanEvent):
-            wp = event_item.workplan
-            event = event_item
-            if not wp.study_start_date: continue
-            start_date = wp.study_start_date + timedelta(days=event.offset_days)
-            summary = f"[{wp.project.slug}] {event.protocol.name}"
-            if event.event_name:
-                summary += f" ({event.event_name})"
-            assignee_str = event.assignee.email if event.assignee else 'Unassigned'
-            project_url = url_for('projects.view_edit_project', project_slug=wp.project.slug, _external=True)
-            group_url = url_for('groups.edit_group', id=wp.generated_group.id, _external=True) if wp.generated_group else 'N/A'
-            protocol_url = url_for('core_models.edit_model', model_type='protocol', id=event.protocol.id, _external=True)
-            workplan_url = url_for('workplans.edit_workplan', workplan_id=wp.id, _external=True)
-
-            description = (
-                f"Project: {wp.project.name} ({project_url})\\n"
-                f"Group: {wp.generated_group.name if wp.generated_group else 'N/A'} ({group_url})\\n"
-                f"Protocol: {event.protocol.name} ({protocol_url})\\n"
-                f"Workplan: {wp.name} ({workplan_url})\\n"
-                f"Assigned To: {assignee_str}"
-            )
-
-            # Add datatable links to the description if available
-            if event.generated_datatables:
-                datatable_links = []
-                for dt in event.generated_datatables:
-                    datatable_links.append(url_for('datatables.view_data_table', datatable_id=dt.id, _external=True))
-                
-                if datatable_links:
-                    description += "\\n\\n"
-                    for i, link in enumerate(datatable_links):
-                        description += f"View DataTable {i+1}: \\n {link}\\n"
-
-            uid = f"precliniset-event-{event.id}-{wp.updated_at.strftime('%Y%m%d%H%M%S')}@precliniset.app"
-        
-        elif isinstance(event_item, DataTable):
-            dt = event_item
-            try:
-                start_date = datetime.strptime(dt.date, '%Y-%m-%d').date()
-            except (ValueError, TypeError):
-                continue
-            
-            summary = f"[{dt.group.project.slug}] {dt.protocol.name} (Ad-hoc)"
-            assignee_str = dt.assignee.email if dt.assignee else 'Unassigned'
-            project_url = url_for('projects.view_edit_project', project_slug=dt.group.project.slug, _external=True)
-            group_url = url_for('groups.edit_group', id=dt.group.id, _external=True)
-            protocol_url = url_for('core_models.edit_model', model_type='protocol', id=dt.protocol.id, _external=True)
-            datatable_url = url_for('datatables.view_data_table', datatable_id=dt.id, _external=True)
-
-            description = (
-                f"Project: {dt.group.project.name} ({project_url})\\n"
-                f"Group: {dt.group.name} ({group_url})\\n"
-                f"Protocol: {dt.protocol.name} ({protocol_url})\\n"
-                f"Assigned To: {assignee_str}\\n\\n"
-                f"View Datatable: {datatable_url}"
-            )
-            uid = f"precliniset-datatable-{dt.id}-{dt.group.project.updated_at.strftime('%Y%m%d%H%M%S')}@precliniset.app"
-        else:
-            continue
-
-        end_date = start_date + timedelta(days=1)
-        start_date_str = start_date.strftime('%Y%m%d')
-        end_date_str = end_date.strftime('%Y%m%d')
-        dtstamp = datetime.now(current_app.config['UTC_TZ']).strftime('%Y%m%dT%H%M%SZ')
-
-        ics_lines.extend([
-            "BEGIN:VEVENT",
-            f"UID:{uid}",
-            f"DTSTAMP:{dtstamp}",
-            f"DTSTART;VALUE=DATE:{start_date_str}",
-            f"DTEND;VALUE=DATE:{end_date_str}",
-            fold_line(f"SUMMARY:{summary}"),
-            fold_line(f"DESCRIPTION:{description}"),
-            "END:VEVENT",
-        ])
-
-    ics_lines.append("END:VCALENDAR")
-    
-    ics_content = "\r\n".join(ics_lines)
-    current_app.logger.info(f"--- BEGIN ICS CONTENT for {user.email} ---")
-    current_app.logger.info(ics_content)
-    current_app.logger.info(f"--- END ICS CONTENT for {user.email} ---")
-    return ics_content.encode('utf-8')
-
 @calendar_bp.route('/feed/<int:user_id>/<string:token>.ics')
 def personal_feed(user_id, token):
     user = db.session.get(User, user_id)
     if not user or not user.calendar_token or user.calendar_token != token:
         return Response("Forbidden", status=403)
-
-    wp_events = WorkplanEvent.query.join(Workplan).filter(
-        WorkplanEvent.assigned_to_id == user.id,
-        Workplan.status.in_([WorkplanStatus.PLANNED, WorkplanStatus.RUNNING, WorkplanStatus.COMPLETED]),
-        Workplan.study_start_date.isnot(None)
-    ).options(
-        joinedload(WorkplanEvent.workplan).joinedload(Workplan.project),
-        joinedload(WorkplanEvent.workplan).joinedload(Workplan.generated_group),
-        joinedload(WorkplanEvent.protocol)
-    ).all()
-
-    dt_events = DataTable.query.join(ExperimentalGroup).join(Project).filter(
-        DataTable.assigned_to_id == user.id,
-        DataTable.workplan_event_id.is_(None)
-    ).options(
-        joinedload(DataTable.group).joinedload(ExperimentalGroup.project),
-        joinedload(DataTable.protocol)
-    ).all()
-
-    events = wp_events + dt_events
-
-    cal_name = "Precliniset Assignments"
-    cal_desc = f"Your personal calendar for assigned tasks in Precliniset."
-    ics_content = generate_ics_feed(user, events, cal_name, cal_desc)
-    
-    return Response(
-        ics_content,
-        mimetype='text/calendar; charset=utf-8',
-        headers={'Content-Disposition': 'attachment; filename=personal_calendar.ics'}
-    )
+    return calendar_feeds.feed_response(calendar_feeds.personal_feed(user), 'personal_calendar.ics')
 
 @calendar_bp.route('/feed/teams/<int:user_id>/<string:token>.ics')
 def team_feed(user_id, token):
@@ -329,33 +199,10 @@ def team_feed(user_id, token):
     if not user or not user.team_calendar_token or user.team_calendar_token != token:
         return Response("Forbidden", status=403)
 
-    accessible_projects = user.get_accessible_projects(include_archived=False)
-    accessible_project_ids = [p.id for p in accessible_projects]
-    if not accessible_project_ids:
-        return Response("BEGIN:VCALENDAR\r\nVERSION:2.0\r\nEND:VCALENDAR", mimetype='text/calendar')
-
-    wp_events = WorkplanEvent.query.join(Workplan).filter(
-        Workplan.project_id.in_(accessible_project_ids),
-        Workplan.status.in_([WorkplanStatus.PLANNED, WorkplanStatus.RUNNING, WorkplanStatus.COMPLETED]),
-        Workplan.study_start_date.isnot(None)
-    ).all()
-
-    dt_events = DataTable.query.join(ExperimentalGroup).filter(
-        ExperimentalGroup.project_id.in_(accessible_project_ids),
-        DataTable.workplan_event_id.is_(None)
-    ).all()
-
-    all_events = wp_events + dt_events
-
-    cal_name = f"Precliniset Teams: {user.email}"
-    cal_desc = "All events from projects you have access to in Precliniset."
-    ics_content = generate_ics_feed(user, all_events, cal_name, cal_desc)
-    
-    return Response(
-        ics_content,
-        mimetype='text/calendar; charset=utf-8',
-        headers={'Content-Disposition': 'attachment; filename=team_calendar.ics'}
-    )
+    feed = calendar_feeds.team_feed(user)
+    if feed is None:
+        return Response(calendar_feeds.EMPTY_CALENDAR, mimetype='text/calendar')
+    return calendar_feeds.feed_response(feed, 'team_calendar.ics')
 
 @calendar_bp.route('/team_members.json')
 @login_required
@@ -1,20 +1,22 @@
 import os
 from datetime import datetime
-from io import StringIO
 
-import pandas as pd
 from flask import (current_app, flash, jsonify, redirect, render_template,
                    request, url_for)
 from flask_babel import lazy_gettext as _l
 from flask_login import current_user, login_required
 
-from app.models import Animal, Attachment, DataTable, ExperimentalGroup, Project
+from app.extensions import db
+from app.models import Attachment, CKANResourceTask, CKANUploadTask, DataTable, ExperimentalGroup, Project
+from app.permissions import check_project_permission
+from app.services.ckan_publish_service import CKANPublishService
 
-from ..helpers import get_ordered_column_names
 from . import ckan_bp
 from . import helpers as ckan_api
 from .helpers import sanitize_ckan_name
 
+publish_service = CKANPublishService()
+
 
 @ckan_bp.route('/<string:project_slug>/upload', methods=['GET'])
 @login_required
@@ -121,131 +123,65 @@ def create_dataset(project_slug):
     except Exception as e:
         return jsonify({'status': 'error', 'message': str(e)}), 500
 
+@ckan_bp.route('/<string:project_slug>/publish', methods=['POST'])
+@login_required
+def publish_project(project_slug):
+    """Starts (or resumes) the background publish of every project resource to ``dataset_id``."""
+    project = Project.query.filter_by(slug=project_slug).first_or_404()
+    # Publishing reads every resource of the project and stamps ckan_upload_date
+    if not check_project_permission(project, 'edit', allow_abort=False):
+        return jsonify({'status': 'error', 'message': 'Permission denied.'}), 403
+    data = request.get_json() or {}
+    dataset_id = data.get('dataset_id') or project.ckan_dataset_id
+    if not dataset_id:
+        return jsonify({'status': 'error', 'message': 'Dataset ID is required.'}), 400
+
+    try:
+        task, should_enqueue = publish_service.start(project, current_user, dataset_id)
+        if should_enqueue and not publish_service.enqueue(task):
+            # No broker: publish within the request, as before background jobs existed
+            publish_service.run(task.id)
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'status': 'error', 'message': str(e)}), 500
+
+    return jsonify({
+        'status': 'started',
+        'task_id': task.id,
+        'status_url': url_for('ckan.publish_status', project_slug=project.slug, task_id=task.id),
+    }), 202
+
+
+@ckan_bp.route('/<string:project_slug>/publish/<int:task_id>/status', methods=['GET'])
+@login_required
+def publish_status(project_slug, task_id):
+    project = Project.query.filter_by(slug=project_slug).first_or_404()
+    if not check_project_permission(project, 'read', allow_abort=False):
+        return jsonify({'status': 'error', 'message': 'Permission denied.'}), 403
+    task = db.session.get(CKANUploadTask, task_id)
+    if task is None or task.project_id != project.id:
+        return jsonify({'status': 'error', 'message': 'Upload task not found.'}), 404
+    return jsonify(task.to_dict())
+
+
 @ckan_bp.route('/<string:project_slug>/upload_resource/<int:datatable_id>', methods=['POST'])
 @login_required
 def upload_resource(project_slug, datatable_id):
+    """Publishes a single DataTable (and its protocol attachment); unchanged content is not re-sent."""
     project = Project.query.filter_by(slug=project_slug).first_or_404()
     datatable = DataTable.query.get_or_404(datatable_id)
     data = request.get_json()
     dataset_id = data.get('dataset_id')
 
-    # --- Convert DataTable to CSV in memory ---
-    column_names = get_ordered_column_names(datatable)
-    data_for_df = []
-    for row in datatable.experiment_rows.order_by('row_index'):
-        row_data = {}
-        animals = sorted(datatable.group.animals, key=lambda a: a.id)
-        if row.row_index < len(animals):
-            row_data.update(animals[row.row_index].to_dict())
-        row_data.update(row.row_data)
-
-        # Calculate age_days on the fly for the export
-        age_days = None
-        date_of_birth_str = row_data.get('date_of_birth')
-        if date_of_birth_str and datatable.date:
-            try:
-                dob = datetime.strptime(date_of_birth_str, '%Y-%m-%d').date()
-                dt_date = datetime.strptime(datatable.date, '%Y-%m-%d').date()
-                delta = dt_date - dob
-                age_days = delta.days
-            except (ValueError, TypeError):
-                current_app.logger.warning(
-                    f"Could not calculate age for animal index {row.row_index} in datatable {datatable.id} during CKAN upload due to invalid date format."
-                )
-        row_data['age_days'] = age_days
-
-        data_for_df.append(row_data)
-    
-    df = pd.DataFrame(data_for_df, columns=column_names)
-
-    # --- Add Housing Conditions Metadata ---
-    if datatable.housing_condition:
-        housing_conditions_data = {}
-        for item_assoc in datatable.housing_condition.item_associations:
-            column_name = item_assoc.item.name
-            housing_conditions_data[column_name] = item_assoc.default_value
-
-        for col_name, value in housing_conditions_data.items():
-            df[col_name] = value
-    # --- End Housing Conditions ---
-
-    # Sanitize DataFrame for CSV injection protection
-    from app.utils.files import _sanitize_for_excel
-    for col in df.select_dtypes(include=['object']).columns:
-        df[col] = df[col].apply(_sanitize_for_excel)
-    
-    csv_buffer = StringIO()
-    df.to_csv(csv_buffer, index=False)
-    csv_content = csv_buffer.getvalue().encode('utf-8')
-    # --- End CSV Conversion ---
-
-    # Create a standardized, unique name for the resource
-    sanitized_protocol_name = sanitize_ckan_name(datatable.protocol.name)
-    resource_name = f"datatable_{datatable.id}_{sanitized_protocol_name}_{datatable.date}.csv"
-    
-    # Enrich description with protocol details
-    description = f"Data from protocol '{datatable.protocol.name}' collected on {datatable.date} for group '{datatable.group.name}'."
-    if datatable.protocol.description:
-        description += f"\n\nProtocol Description: {datatable.protocol.description}"
-    if datatable.protocol.url:
-        description += f"\nProtocol URL: {datatable.protocol.url}"
-
+    resources = [CKANResourceTask(resource_type=CKANResourceTask.TYPE_DATATABLE, resource_id=datatable.id)]
+    protocol_attachment = datatable.protocol.attachments.first()
+    if protocol_attachment:
+        resources.append(CKANResourceTask(resource_type=CKANResourceTask.TYPE_PROTOCOL_ATTACHMENT,
+                                          resource_id=protocol_attachment.id))
 
     try:
-        # Check if a resource with this name already exists in the dataset
-        dataset_details = ckan_api.package_show(current_user.ckan_api_key, current_user.ckan_url, dataset_id)
-        existing_resource = next((res for res in dataset_details.get('resources', []) if res['name'] == resource_name), None)
-
-        if existing_resource:
-            # If it exists, update it
-            result = ckan_api.resource_update(
-                api_key=current_user.ckan_api_key,
-                ckan_url=current_user.ckan_url,
-                resource_id=existing_resource['id'],
-                file_content=csv_content,
-                name=resource_name,
-                description=description
-            )
-        else:
-            # If it doesn't exist, create it
-            result = ckan_api.resource_create(
-                api_key=current_user.ckan_api_key,
-                ckan_url=current_user.ckan_url,
-                package_id=dataset_id,
-                name=resource_name,
-                description=description,
-                file_content=csv_content
-            )
-
-        # Now, handle the protocol attachment
-        protocol_attachment = datatable.protocol.attachments.first()
-        if protocol_attachment:
-            attachment_resource_name = f"protocol_{datatable.protocol.id}_{protocol_attachment.filename}"
-            
-            # Check if this attachment has already been uploaded for this dataset
-            attachment_exists = any(res['name'] == attachment_resource_name for res in dataset_details.get('resources', []))
-
-            if not attachment_exists:
-                try:
-                    file_path = protocol_attachment.filepath
-                    with open(file_path, 'rb') as f:
-                        attachment_content = f.read()
-                    
-                    ckan_api.resource_create(
-                        api_key=current_user.ckan_api_key,
-                        ckan_url=current_user.ckan_url,
-                        package_id=dataset_id,
-                        name=attachment_resource_name,
-                        description=f"Attachment for protocol '{datatable.protocol.name}'.",
-                        file_content=attachment_content
-                    )
-                except FileNotFoundError:
-                    current_app.logger.error(f"Protocol attachment file not found at {protocol_attachment.filepath}")
-                except Exception as e:
-                    current_app.logger.error(f"Failed to upload protocol attachment {protocol_attachment.filename}: {e}")
-
-
-        return jsonify({'status': 'success', 'resource_name': result['name']})
+        results = publish_service.publish_now(current_user, dataset_id, resources)
+        return jsonify({'status': 'success', 'resource_name': results[0]['name']})
     except Exception as e:
         return jsonify({'status': 'error', 'message': str(e)}), 500
 
@@ -424,6 +424,59 @@ def init_admin_cmd():
 
     print("Initialization complete.")
 
+@setup_bp.cli.command("rebuild-measurement-store")
+@click.option('--chunk-size', default=1000, help='Rows processed per batch')
+def rebuild_measurement_store_cmd(chunk_size):
+    """Back-fill the columnar measurement store from the JSON columns."""
+    from app.services.measurement_store_service import MeasurementStoreService
+
+    written = MeasurementStoreService().rebuild(chunk_size=chunk_size)
+    print(f"Measurement store rebuilt: {written} values written.")
+
+@setup_bp.cli.command("rebuild-search-index")
+@click.option('--type', 'entity_types', multiple=True, help='Entity type to re-index (repeatable, default: all)')
+@click.option('--if-missing', is_flag=True, help='Only index the entity types that were never indexed')
+def rebuild_search_index_cmd(entity_types, if_missing):
+    """Re-create the global search index from the database."""
+    from app.services.search_service import SEARCH_ENTITIES, SearchIndexService, get_search_backend
+
+    service = SearchIndexService()
+    if if_missing:
+        entity_types = [entity.name for entity in SEARCH_ENTITIES
+                        if (not entity_types or entity.name in entity_types) and not service.index_ready(entity)]
+        if not entity_types:
+            print("Search index already built.")
+            return
+    counts = service.rebuild(entity_types=entity_types or None)
+    print(f"Search index rebuilt ({get_search_backend()}): " + ", ".join(f"{k}={v}" for k, v in counts.items()))
+
+@setup_bp.cli.command("archive-audit-logs")
+@click.option('--before', default=None, help='Archive months before YYYY-MM (default: AUDIT_ARCHIVE_AFTER_MONTHS ago)')
+@click.option('--format', 'fmt', type=click.Choice(['jsonl', 'parquet']), default=None, help='Archive file format')
+def archive_audit_logs_cmd(before, fmt):
+    """Rotate/partition the audit log and archive old months to hash-chained files."""
+    from app.services.audit_archive_service import AuditArchiveService
+
+    service = AuditArchiveService()
+    before_month = int(before.replace('-', '')) if before else None
+    service.ensure_partitions()
+    rotated = service.rotate()
+    archived = service.archive(before_month=before_month, fmt=fmt)
+    print(f"Audit log: {rotated} entries rotated, {len(archived)} months archived {archived}.")
+
+@setup_bp.cli.command("verify-audit-archives")
+def verify_audit_archives_cmd():
+    """Check the hash chain of the archived audit months."""
+    from app.services.audit_archive_service import AuditArchiveService
+
+    problems = AuditArchiveService().verify_archives()
+    if not problems:
+        print("Audit archives intact.")
+        return
+    for month, problem in problems:
+        print(f"  {month}: {problem}")
+    sys.exit(1)
+
 @setup_bp.cli.command("clean")
 @click.option('--email', prompt='Super Admin Email', help='Email for verification')
 @click.option('--password', prompt='Super Admin Password', hide_input=True, help='Password for verification')
@@ -122,6 +122,81 @@ class Config:
     ENABLE_AUDIT_LOG = os.environ.get('ENABLE_AUDIT_LOG', 'True').lower() == 'true'
     # Whether to log actions by super admins (can be disabled for performance during massive edits)
     AUDIT_LOG_SUPERADMIN = os.environ.get('AUDIT_LOG_SUPERADMIN', 'True').lower() == 'true'
+    # 'batch': one executemany per flush into audit_log; 'outbox': into audit_outbox, moved to
+    # audit_log by the drain_audit_outbox Celery task (keeps audit_log indexes off the write path)
+    AUDIT_LOG_MODE = os.environ.get('AUDIT_LOG_MODE', 'batch')
+    AUDIT_OUTBOX_DRAIN_BATCH = int(os.environ.get('AUDIT_OUTBOX_DRAIN_BATCH', 1000))
+    # Periodic drain (backstop for drains that could not be queued after commit) and the
+    # delay after which rows claimed by a crashed drain are claimed again
+    AUDIT_OUTBOX_DRAIN_INTERVAL = float(os.environ.get('AUDIT_OUTBOX_DRAIN_INTERVAL', 300))
+    AUDIT_OUTBOX_CLAIM_TIMEOUT = int(os.environ.get('AUDIT_OUTBOX_CLAIM_TIMEOUT', 600))
+    # Storage tiers: monthly partitions (MySQL) or rotated audit_log_<YYYYMM> tables (SQLite),
+    # then hash-chained archives ('jsonl' gzip or 'parquet') in AUDIT_ARCHIVE_DIR
+    AUDIT_LIVE_MONTHS = int(os.environ.get('AUDIT_LIVE_MONTHS', 3))
+    AUDIT_ARCHIVE_AFTER_MONTHS = int(os.environ.get('AUDIT_ARCHIVE_AFTER_MONTHS', 24))
+    AUDIT_ARCHIVE_DIR = os.environ.get('AUDIT_ARCHIVE_DIR')  # Defaults to <instance>/audit_archive
+    AUDIT_ARCHIVE_FORMAT = os.environ.get('AUDIT_ARCHIVE_FORMAT', 'jsonl')
+
+    # Columnar measurement store (write-through copy of row_data/measurements JSON)
+    # Run `flask setup rebuild-measurement-store` once after enabling it on existing data.
+    ENABLE_MEASUREMENT_STORE = os.environ.get('ENABLE_MEASUREMENT_STORE', 'False').lower() == 'true'
+
+    # Content-addressed cache of prepared analysis DataFrames ('disk' or 'redis' backend)
+    ENABLE_DATAFRAME_CACHE = os.environ.get('ENABLE_DATAFRAME_CACHE', 'False').lower() == 'true'
+    DATAFRAME_CACHE_BACKEND = os.environ.get('DATAFRAME_CACHE_BACKEND', 'disk')
+    DATAFRAME_CACHE_DIR = os.environ.get('DATAFRAME_CACHE_DIR')  # Defaults to <instance>/frame_cache
+    DATAFRAME_CACHE_REDIS_URL = os.environ.get('DATAFRAME_CACHE_REDIS_URL', os.environ.get('CACHE_REDIS_URL', 'redis://localhost:6379/0'))
+    DATAFRAME_CACHE_MAX_BYTES = int(os.environ.get('DATAFRAME_CACHE_MAX_BYTES', 256 * 1024 * 1024))
+    # Number of DataTables whose rows are loaded per query when merging large selections
+    MERGE_CHUNK_SIZE = int(os.environ.get('MERGE_CHUNK_SIZE', 25))
+    # Number of file rows written per transaction by the import wizard
+    IMPORT_CHUNK_SIZE = int(os.environ.get('IMPORT_CHUNK_SIZE', 1000))
+
+    # Async analysis results (kept out of the session; 'redis' or 'filesystem')
+    ANALYSIS_RESULTS_BACKEND = os.environ.get('ANALYSIS_RESULTS_BACKEND', 'redis')
+    ANALYSIS_RESULTS_REDIS_URL = os.environ.get('ANALYSIS_RESULTS_REDIS_URL', os.environ.get('CACHE_REDIS_URL', 'redis://localhost:6379/0'))
+    ANALYSIS_RESULTS_DIR = os.environ.get('ANALYSIS_RESULTS_DIR')  # Defaults to <instance>/analysis_results
+    ANALYSIS_RESULTS_TTL = int(os.environ.get('ANALYSIS_RESULTS_TTL', 6 * 3600))
+    # Parameter units analysed concurrently (thread pool; 1 runs them one after another)
+    ANALYSIS_MAX_WORKERS = int(os.environ.get('ANALYSIS_MAX_WORKERS', 4))
+
+    # Plots: figure cache (shares the DataFrame cache backend) and compact box/violin payloads
+    ENABLE_FIGURE_CACHE = os.environ.get('ENABLE_FIGURE_CACHE', 'False').lower() == 'true'
+    PLOT_COMPACT_MODE = os.environ.get('PLOT_COMPACT_MODE', 'auto')  # 'auto', 'always' or 'never'
+    PLOT_COMPACT_MIN_POINTS = int(os.environ.get('PLOT_COMPACT_MIN_POINTS', 1000))
+    PLOT_COMPACT_QUANTILES = int(os.environ.get('PLOT_COMPACT_QUANTILES', 200))
+
+    # Cross-request (user, project) permission matrix: 'none', 'memory', 'table' or 'redis'
+    PERMISSION_MATRIX_BACKEND = os.environ.get('PERMISSION_MATRIX_BACKEND', 'none')
+    PERMISSION_MATRIX_REDIS_URL = os.environ.get('PERMISSION_MATRIX_REDIS_URL', os.environ.get('CACHE_REDIS_URL', 'redis://localhost:6379/0'))
+    PERMISSION_MATRIX_TTL = int(os.environ.get('PERMISSION_MATRIX_TTL', 86400))
+    # Per-worker RBAC graph snapshot for user_has_permission: 'none', 'memory' or 'redis' (shared version stamp)
+    RBAC_SNAPSHOT_BACKEND = os.environ.get('RBAC_SNAPSHOT_BACKEND', 'none')
+    RBAC_SNAPSHOT_REDIS_URL = os.environ.get('RBAC_SNAPSHOT_REDIS_URL', os.environ.get('CACHE_REDIS_URL', 'redis://localhost:6379/0'))
+    # Tagged query result cache (@cached): 'none', 'memory' or 'redis'
+    QUERY_CACHE_BACKEND = os.environ.get('QUERY_CACHE_BACKEND', 'none')
+    QUERY_CACHE_REDIS_URL = os.environ.get('QUERY_CACHE_REDIS_URL', os.environ.get('CACHE_REDIS_URL', 'redis://localhost:6379/0'))
+    QUERY_CACHE_TTL = int(os.environ.get('QUERY_CACHE_TTL', 300))
+    # Rendered ICS feeds kept in the query cache backend; served while their ETag state holds
+    CALENDAR_FEED_CACHE_TTL = int(os.environ.get('CALENDAR_FEED_CACHE_TTL', 86400))
+    # Global search index: 'auto' (MySQL FULLTEXT / SQLite FTS5 / token index), 'fulltext', 'fts5' or 'token'
+    ENABLE_SEARCH_INDEX = os.environ.get('ENABLE_SEARCH_INDEX', 'True').lower() == 'true'
+    SEARCH_BACKEND = os.environ.get('SEARCH_BACKEND', 'auto')
+    # MySQL innodb_ft_min_token_size: shorter words are matched through search_token
+    SEARCH_FULLTEXT_MIN_TOKEN_SIZE = int(os.environ.get('SEARCH_FULLTEXT_MIN_TOKEN_SIZE', 3))
+    SEARCH_RESULTS_PER_TYPE = int(os.environ.get('SEARCH_RESULTS_PER_TYPE', 20))
+    # Background export jobs: merged downloads of a whole filter result (or of at least
+    # EXPORT_ASYNC_MIN_DATATABLES tables) are built by a worker into EXPORT_DIR
+    ENABLE_BACKGROUND_EXPORTS = os.environ.get('ENABLE_BACKGROUND_EXPORTS', 'True').lower() == 'true'
+    EXPORT_ASYNC_MIN_DATATABLES = int(os.environ.get('EXPORT_ASYNC_MIN_DATATABLES', 20))
+    EXPORT_DIR = os.environ.get('EXPORT_DIR')  # Defaults to <UPLOAD_FOLDER>/exports
+    EXPORT_JOB_TTL_HOURS = int(os.environ.get('EXPORT_JOB_TTL_HOURS', 24))
+    # CKAN publish jobs: uploads in flight, retries of transient failures (with exponential
+    # backoff, in seconds) and inactivity after which a running publish may be resumed
+    CKAN_PUBLISH_CONCURRENCY = int(os.environ.get('CKAN_PUBLISH_CONCURRENCY', 4))
+    CKAN_PUBLISH_RETRIES = int(os.environ.get('CKAN_PUBLISH_RETRIES', 3))
+    CKAN_PUBLISH_BACKOFF = float(os.environ.get('CKAN_PUBLISH_BACKOFF', 1.0))
+    CKAN_PUBLISH_STALE_MINUTES = int(os.environ.get('CKAN_PUBLISH_STALE_MINUTES', 30))
 
     # Training Manager Integration
     TM_API_URL = os.environ.get('TM_API_URL')
@@ -140,6 +215,21 @@ class Config:
     # Celery Configuration (using modern lowercase names for Celery 6+)
     broker_url = os.environ.get('CELERY_BROKER_URL', 'redis://localhost:6379/1')
     result_backend = os.environ.get('CELERY_RESULT_BACKEND', 'redis://localhost:6379/2')
+    # Periodic tasks (run `celery -A celery_worker.celery_app beat` next to the worker)
+    beat_schedule = {
+        'cleanup-export-jobs': {
+            'task': 'tasks.cleanup_export_jobs',
+            'schedule': float(os.environ.get('EXPORT_CLEANUP_INTERVAL', 3600)),
+        },
+        'drain-audit-outbox': {
+            'task': 'tasks.drain_audit_outbox',
+            'schedule': AUDIT_OUTBOX_DRAIN_INTERVAL,
+        },
+        'maintain-audit-log': {
+            'task': 'tasks.maintain_audit_log',
+            'schedule': float(os.environ.get('AUDIT_MAINTENANCE_INTERVAL', 24 * 3600)),
+        },
+    }
 
     @classmethod
     def check_configuration(cls):
@@ -188,6 +278,8 @@ class TestingConfig(Config):
     # Use a different secret key for testing
     SECRET_KEY = 'test-secret-key'
 
+    ANALYSIS_RESULTS_BACKEND = 'filesystem'
+
     broker_url = 'memory://'
     result_backend = 'memory://'
     task_always_eager = True # Run tasks synchronously for easier testing
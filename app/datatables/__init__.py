@@ -34,4 +34,4 @@ def configure_datatables_blueprint_logger():
 
 
 # Import routes from the new files to register them with the blueprint
-from . import routes_analysis, routes_crud
+from . import routes_analysis, routes_crud, routes_exports
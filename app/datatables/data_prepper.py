@@ -7,26 +7,31 @@ from scipy.stats import levene, shapiro
 from .analysis_utils import detect_outliers
 
 
-def perform_data_checks(df, grouping_params, numerical_params, is_repeated, subject_id_col='uid', exclude_outliers=False):
+def perform_data_checks(df, grouping_params, numerical_params, is_repeated, subject_id_col='uid', exclude_outliers=False, analysis_frame=None):
+    """
+    When an ``AnalysisFrame`` is given, repeated-measures checks reuse its long
+    format instead of melting ``df`` again.
+    """
     results_by_param = {}
     min_shapiro_size = 3
     min_levene_groups = 2
     min_levene_size_per_group = 2
     alpha = 0.05
 
-    df_temp_orig = df.copy()
-
     # --- START MODIFICATION: Handle Repeated Measures Separately and Robustly ---
     if is_repeated:
-        id_vars = [col for col in [subject_id_col] + grouping_params if col in df_temp_orig.columns]
+        id_vars = [col for col in [subject_id_col] + grouping_params if col in df.columns]
         if not id_vars or not numerical_params:
             results_by_param['rm_set_error'] = {'error': lazy_gettext("Could not prepare data for RM checks; ID or grouping columns missing.")}
             return results_by_param
 
         try:
-            df_long = pd.melt(df_temp_orig, id_vars=id_vars, value_vars=numerical_params,
-                              var_name='_WithinFactorLevel_', value_name='_MeasurementValue_')
-            df_long['_MeasurementValue_'] = pd.to_numeric(df_long['_MeasurementValue_'], errors='coerce')
+            if analysis_frame is not None:
+                df_long = analysis_frame.long_view()
+            else:
+                df_long = pd.melt(df, id_vars=id_vars, value_vars=numerical_params,
+                                  var_name='_WithinFactorLevel_', value_name='_MeasurementValue_')
+                df_long['_MeasurementValue_'] = pd.to_numeric(df_long['_MeasurementValue_'], errors='coerce')
         except Exception as e:
             results_by_param['rm_set_error'] = {'error': lazy_gettext("Failed to reshape data for RM checks: %(error)s", error=str(e))}
             return results_by_param
@@ -121,6 +126,8 @@ def perform_data_checks(df, grouping_params, numerical_params, is_repeated, subj
         return results_by_param
     # --- END MODIFICATION ---
 
+    df_temp_orig = df.copy()
+
     # Original logic for independent groups
     for col in grouping_params:
          if col in df_temp_orig.columns:
@@ -52,10 +52,46 @@ def get_custom_ordered_columns(animal_keys, protocol_keys):
     return final_order_unique
 
 
-def generate_plot(df, numerical_param_or_dv, grouping_params, graph_type, start_y_at_zero, is_repeated, subject_id_col='uid', numerical_params_selected=None, exclude_outliers=False, reference_range_summary=None, stats_results=None, outlier_method='iqr', outlier_threshold=1.5):
+def generate_plot(df, numerical_param_or_dv, grouping_params, graph_type, start_y_at_zero, is_repeated, subject_id_col='uid', numerical_params_selected=None, exclude_outliers=False, reference_range_summary=None, stats_results=None, outlier_method='iqr', outlier_threshold=1.5, outlier_mask=None, compact=None):
     """
     Generates Plotly figure data (JSON). Handles both independent and RM plots.
+    ``outlier_mask`` (aligned on ``df``) reuses outliers already detected by an AnalysisFrame.
+    ``compact`` (default: PLOT_COMPACT_MODE) sends box/violin summaries instead of raw points
+    for large groups. Figures are served from the figure cache when the same slice and
+    options were already plotted (ENABLE_FIGURE_CACHE).
     """
+    from app.performance.figure_cache import build_figure_key, get_cached_figure, set_cached_figure
+
+    if compact is None:
+        compact = current_app.config.get('PLOT_COMPACT_MODE', 'auto')
+    value_col = '_MeasurementValue_' if is_repeated else numerical_param_or_dv
+    plot_columns = [value_col, '_WithinFactorLevel_' if is_repeated else None, subject_id_col] + list(grouping_params or [])
+    stats_summary = None
+    if stats_results:
+        stats_summary = {k: stats_results.get(k) for k in ('error', 'groups_compared', 'p_value')}
+    cache_key = build_figure_key(df, plot_columns, {
+        'param': numerical_param_or_dv, 'grouping': grouping_params, 'graph_type': graph_type,
+        'start_y_at_zero': bool(start_y_at_zero), 'is_repeated': bool(is_repeated), 'subject_id': subject_id_col,
+        'numerical_params_selected': numerical_params_selected, 'exclude_outliers': bool(exclude_outliers),
+        'outlier_method': outlier_method, 'outlier_threshold': outlier_threshold,
+        'reference_range': reference_range_summary, 'stats': stats_summary, 'compact': compact,
+        'compact_min_points': current_app.config.get('PLOT_COMPACT_MIN_POINTS', 1000),
+    }, outlier_mask=outlier_mask)
+
+    cached = get_cached_figure(cache_key)
+    if cached is not None:
+        return cached
+
+    graph_json_data, notes = _build_plot(
+        df, numerical_param_or_dv, grouping_params, graph_type, start_y_at_zero, is_repeated, subject_id_col,
+        numerical_params_selected, exclude_outliers, reference_range_summary, stats_results,
+        outlier_method, outlier_threshold, outlier_mask, compact
+    )
+    set_cached_figure(cache_key, graph_json_data, notes)
+    return graph_json_data, notes
+
+
+def _build_plot(df, numerical_param_or_dv, grouping_params, graph_type, start_y_at_zero, is_repeated, subject_id_col, numerical_params_selected, exclude_outliers, reference_range_summary, stats_results, outlier_method, outlier_threshold, outlier_mask, compact):
     notes = []
     fig = None
     df_plot = df.copy()
@@ -68,7 +104,10 @@ def generate_plot(df, numerical_param_or_dv, grouping_params, graph_type, start_
         if param_to_check_for_outliers in df_plot.columns and pd.api.types.is_numeric_dtype(df_plot[param_to_check_for_outliers]):
             try:
                 from .analysis_utils import detect_outliers
-                outliers_mask, outlier_info = detect_outliers(df_plot[param_to_check_for_outliers], method=outlier_method, threshold=outlier_threshold)
+                if outlier_mask is not None:
+                    outliers_mask = outlier_mask
+                else:
+                    outliers_mask, outlier_info = detect_outliers(df_plot[param_to_check_for_outliers], method=outlier_method, threshold=outlier_threshold)
                 n_outliers_plot = outliers_mask.sum()
                 if n_outliers_plot > 0:
                     excluded_param_name_for_message = ""
@@ -293,7 +332,11 @@ def generate_plot(df, numerical_param_or_dv, grouping_params, graph_type, start_
                  elif graph_type in ['Box Plot', 'Violin Plot']: specific_call_args['points'] = "all"
                  if graph_type == 'Violin Plot': specific_call_args['box'] = True
                  
-                 if specific_call_args['y'] in plot_df_used.columns: fig = plot_func_map[graph_type](**specific_call_args)
+                 compact_points = _compact_group_size(plot_df_used, x_param_plot, color_param_plot, graph_type, compact)
+                 if compact_points:
+                     fig = _compact_distribution_figure(plot_df_used, x_param_plot, numerical_param_or_dv, color_param_plot, graph_type, title_plot)
+                     notes.append(_("Compact plot: distributions of '{param}' are summarized (largest group: {n} points); raw points are not shown.").format(param=numerical_param_or_dv, n=compact_points))
+                 elif specific_call_args['y'] in plot_df_used.columns: fig = plot_func_map[graph_type](**specific_call_args)
                  else: notes.append(_("Plotting error for '{param}': Required Y-axis column '{y_col}' not found in data.")).format(param=numerical_param_or_dv, y_col=specific_call_args['y']); fig = None
             elif fig is None and (plot_df_used is None or plot_df_used.empty) : notes.append(_("No data for plotting '{param}'.")).format(param=numerical_param_or_dv); fig = None
             elif fig is None: notes.append(_("Plotting error for '{param}'.")).format(param=numerical_param_or_dv); fig = None
@@ -458,3 +501,88 @@ def generate_survival_plot(df, time_col, event_col, grouping_params):
     except Exception as e:
          current_app.logger.error(f"KM Plot Error: {e}")
          return None, [str(e)]
+
+
+# --- Compact payloads for large groups ---
+
+def _compact_group_size(plot_df, x_col, color_col, graph_type, compact):
+    """
+    Returns the size of the largest group when a box/violin plot should be sent
+    as precomputed summaries (compact mode), otherwise 0.
+    """
+    if graph_type not in ('Box Plot', 'Violin Plot') or compact in (False, 'never'):
+        return 0
+    group_cols = [c for c in (x_col, color_col) if c and c in plot_df.columns]
+    largest = int(plot_df.groupby(group_cols, sort=False).size().max()) if group_cols else len(plot_df)
+    if compact in (True, 'always'):
+        return largest
+    return largest if largest >= current_app.config.get('PLOT_COMPACT_MIN_POINTS', 1000) else 0
+
+
+def _compact_distribution_figure(plot_df, x_col, y_col, color_col, graph_type, title):
+    """
+    Box plots use Plotly's precomputed statistics (q1/median/q3/fences/mean);
+    violins are drawn from a fixed-size quantile sketch of each group, so the
+    payload no longer grows with the number of animals.
+    """
+    import numpy as np
+
+    sketch_size = current_app.config.get('PLOT_COMPACT_QUANTILES', 200)
+    probabilities = np.linspace(0, 1, sketch_size)
+    fig = go.Figure()
+    color_groups = plot_df.groupby(color_col, sort=False) if color_col else [(None, plot_df)]
+
+    for color_value, color_df in color_groups:
+        name = str(color_value) if color_col else y_col
+        x_values, summaries = [], []
+        for x_value, values in color_df.groupby(x_col, sort=False)[y_col]:
+            values = values.dropna().to_numpy(dtype=float)
+            if values.size:
+                x_values.append(x_value)
+                summaries.append(values)
+
+        if graph_type == 'Box Plot':
+            q1, median, q3 = (np.array([np.quantile(v, q) for v in summaries]) for q in (0.25, 0.5, 0.75))
+            iqr = q3 - q1
+            lower = [v[v >= lo].min() for v, lo in zip(summaries, q1 - 1.5 * iqr)]
+            upper = [v[v <= hi].max() for v, hi in zip(summaries, q3 + 1.5 * iqr)]
+            fig.add_trace(go.Box(
+                x=x_values, q1=q1.tolist(), median=median.tolist(), q3=q3.tolist(), lowerfence=lower, upperfence=upper,
+                mean=[v.mean() for v in summaries], name=name, boxpoints=False, showlegend=bool(color_col),
+            ))
+        else:
+            for index, (x_value, values) in enumerate(zip(x_values, summaries)):
+                sketch = np.quantile(values, probabilities)
+                fig.add_trace(go.Violin(
+                    x0=x_value, y=sketch, name=name, legendgroup=name, box_visible=True,
+                    points=False, scalegroup=name, showlegend=bool(color_col) and index == 0,
+                ))
+
+    layout = {'title': title, 'xaxis_title': x_col, 'yaxis_title': y_col}
+    if color_col:
+        layout['legend_title_text'] = color_col
+        layout['boxmode' if graph_type == 'Box Plot' else 'violinmode'] = 'group'
+    fig.update_layout(**layout)
+    return fig
+
+
+# --- Static rendering for reports ---
+
+def render_figure_image(graph_json, image_format='svg', width=None, height=None):
+    """
+    Renders a figure JSON (as returned by generate_plot) to SVG/PNG bytes for reports.
+    Returns None when the static image engine (kaleido, pinned in requirements.txt
+    for x86_64/aarch64) is not installed or cannot start on this host.
+    """
+    import plotly.io as pio
+    try:
+        import kaleido  # noqa: F401
+    except ImportError:
+        current_app.logger.warning("Static figure export requires the 'kaleido' package.")
+        return None
+    fig = pio.from_json(graph_json)
+    try:
+        return pio.to_image(fig, format=image_format, width=width, height=height)
+    except (RuntimeError, ValueError, OSError) as e:
+        current_app.logger.warning(f"Static figure export failed: {e}")
+        return None
@@ -6,10 +6,11 @@ from flask_login import login_required, current_user
 from app.extensions import db
 from app.models import DataTable
 from app.permissions import check_datatable_permission
+from app.services.analysis_result_store import AnalysisResultStoreService
 from app.services.analysis_service import AnalysisService
 from app.tasks import perform_analysis_task
 from celery.result import AsyncResult
-from app.helpers import replace_undefined 
+from app.helpers import clean_param_name_for_id, replace_undefined
 
 from . import datatables_bp
 
@@ -30,7 +31,7 @@ def analyze_datatable(datatable_id):
     # OPTIMIZATION: On GET (initial load), do NOT load the full dataframe.
     # Use Schema Inspection instead.
     
-    if request.method == 'GET' and not 'latest_analysis_results' in session:
+    if request.method == 'GET' and not 'latest_analysis_result_ref' in session:
          # FAST PATH
          numerical_cols, categorical_cols, column_types = analysis_service.get_datatable_metadata(data_table)
          df = None # We don't need the DF for the form
@@ -62,10 +63,10 @@ def analyze_datatable(datatable_id):
     session_key = f'analysis_params_{datatable_id}'
 
     # CHECK FOR ASYNC RESULTS FIRST
-    if 'latest_analysis_results' in session:
-        # We found results from a just-finished background task
-        analysis_results = session.pop('latest_analysis_results')
-        analysis_stage = 'show_results'
+    if 'latest_analysis_result_ref' in session:
+        # We found results from a just-finished background task (panels are loaded lazily)
+        analysis_results = _load_stored_results(session.pop('latest_analysis_result_ref'))
+        analysis_stage = 'show_results' if analysis_results else 'initial_selection'
         
         # Restore form data for context
         if session_key in session:
@@ -168,10 +169,9 @@ def analyze_selected_datatables():
             pass
     elif request.method == 'GET':
         # Check for async results first
-        if 'latest_analysis_results' in session:
-            analysis_results = session.pop('latest_analysis_results')
-            analysis_stage = 'show_results'
-            current_app.logger.debug(f"Multi-datatable show_results: analysis_results keys: {list(analysis_results.keys())}")
+        if 'latest_analysis_result_ref' in session:
+            analysis_results = _load_stored_results(session.pop('latest_analysis_result_ref'))
+            analysis_stage = 'show_results' if analysis_results else 'initial_selection'
             
             # Try to find the matching session key for form data
             prefix = 'analysis_params_merged_'
@@ -278,11 +278,16 @@ def analysis_status(task_id):
     task = AsyncResult(task_id)
     if task.state == 'PENDING':
         response = {'state': 'PENDING', 'status': 'Analysis in progress...'}
+    elif task.state == 'PROGRESS':
+        progress = task.info or {}
+        response = {
+            'state': 'PROGRESS',
+            'status': _("Analyzing %(param)s (%(done)s/%(total)s)...",
+                        param=progress.get('current', ''), done=progress.get('done', 0), total=progress.get('total', 0)),
+            'done': progress.get('done', 0),
+            'total': progress.get('total', 0),
+        }
     elif task.state != 'FAILURE':
-        clean_results = replace_undefined(task.result)
-        session['latest_analysis_results'] = clean_results
-        current_app.logger.debug("Set latest_analysis_results in session for multi-datatable")
-        
         response = {
             'state': 'SUCCESS',
             # We don't need to send the full result JSON to the frontend, 
@@ -292,6 +297,12 @@ def analysis_status(task_id):
         if isinstance(task.result, dict) and 'error' in task.result:
              response['state'] = 'FAILURE'
              response['status'] = task.result['error']
+        else:
+            if not (isinstance(task.result, dict) and 'result_ref' in task.result):
+                # Result produced by a worker predating the result store
+                AnalysisResultStoreService().save(task_id, replace_undefined(task.result), user_id=current_user.id)
+            # Only the reference goes into the session; the blobs stay in the result store
+            session['latest_analysis_result_ref'] = task_id
     else:
         response = {
             'state': 'FAILURE',
@@ -299,6 +310,61 @@ def analysis_status(task_id):
         }
     return jsonify(response)
 
+@datatables_bp.route('/analysis/results/<task_id>/panels/<panel_id>')
+@login_required
+def analysis_result_panel(task_id, panel_id):
+    """Renders one parameter panel of a stored analysis result (lazy-loaded by the results page)."""
+    panel = AnalysisResultStoreService().load_panel(task_id, panel_id, user_id=current_user.id, is_super_admin=current_user.is_super_admin)
+    if panel is None:
+        return jsonify({'error': _("Analysis results expired or not found.")}), 404
+
+    html = render_template(
+        'datatables/analysis/_results_panel_body.html',
+        result_key=panel['result_key'],
+        results_data=panel['results_data'],
+        cleaned_result_key=clean_param_name_for_id(panel['result_key']),
+        suffix=panel_id,
+        lazy_panel=True,
+    )
+    return jsonify({'html': html})
+
+@datatables_bp.route('/analysis/results/<task_id>/panels/<panel_id>/figure.<any(svg, png):image_format>')
+@login_required
+def analysis_result_figure(task_id, panel_id, image_format):
+    """Pre-rendered SVG/PNG of a stored panel's figure (``?split=<n>`` for split analyses), for reports."""
+    from io import BytesIO
+    from flask import send_file
+    from .plot_utils import render_figure_image
+
+    panel = AnalysisResultStoreService().load_panel(task_id, panel_id, user_id=current_user.id, is_super_admin=current_user.is_super_admin)
+    if panel is None:
+        return jsonify({'error': _("Analysis results expired or not found.")}), 404
+
+    results_data = panel['results_data']
+    if results_data.get('is_split_analysis'):
+        splits = results_data.get('splits') or []
+        split_index = request.args.get('split', 0, type=int)
+        results_data = splits[split_index] if 0 <= split_index < len(splits) else {}
+    graph_json = results_data.get('graph_data')
+    if not graph_json:
+        return jsonify({'error': _("No figure for this panel.")}), 404
+
+    image = render_figure_image(graph_json, image_format)
+    if image is None:
+        return jsonify({'error': _("Static figure export is not available on this server.")}), 501
+    mimetype = 'image/svg+xml' if image_format == 'svg' else 'image/png'
+    return send_file(BytesIO(image), mimetype=mimetype, download_name=f"{clean_param_name_for_id(panel['result_key'])}.{image_format}")
+
+
+def _load_stored_results(task_id):
+    """Loads the summary of an async analysis from the result store (None if expired)."""
+    analysis_results = AnalysisResultStoreService().load_summary(task_id, user_id=current_user.id, is_super_admin=current_user.is_super_admin)
+    if analysis_results is None:
+        flash(_("Analysis results expired. Please run the analysis again."), "warning")
+        return {}
+    return analysis_results
+
+
 @datatables_bp.route('/api/group_levels/<int:datatable_id>', methods=['POST'])
 @login_required
 def api_get_group_levels(datatable_id):
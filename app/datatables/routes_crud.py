@@ -10,7 +10,6 @@ from flask import (
     current_app,
     flash,
     jsonify,
-    make_response,
     redirect,
     render_template,
     request,
@@ -32,9 +31,10 @@ from app.models import user_has_permission
 from app.permissions import (
     can_create_datatable_for_group,
     check_datatable_permission,
-    check_group_permission
+    check_group_permission,
+    filter_readable
 )
-from app.utils.files import dataframe_to_excel_bytes, read_excel_to_list
+from app.utils.files import dataframe_to_excel_bytes, read_excel_to_list, send_export
 from app.services.datatable_service import DataTableService
 from app.services.project_service import ProjectService
 from app.services.molecule_service import MoleculeService
@@ -55,6 +55,7 @@ from ..models import (
     DataTable,
     DataTableFile,
     ExperimentalGroup,
+    ExportJob,
     ExperimentDataRow,
     HousingConditionSet,
     Project,
@@ -75,6 +76,7 @@ from ..models import (
 from . import datatables_bp
 from .analysis_utils import identify_outliers_and_calc_stats, get_age_range_from_df_view_helper
 from .plot_utils import get_custom_ordered_columns
+from .routes_exports import export_job_service, start_background_export
 
 from app.services.datatable_service import DataTableService
 from app.services.project_service import ProjectService
@@ -96,7 +98,7 @@ def create_data_table(project_id=None):
         return redirect(url_for('main.index'))    
     
     # Fetch hierarchy for sidebar using ProjectService
-    sidebar_data = project_service.get_sidebar_hierarchy(current_user)
+    sidebar_data = project_service.get_cached_sidebar_hierarchy(current_user)
 
     include_archived = request.args.get('include_archived', 'false').lower() == 'true'
     group_id_prefill_str = request.args.get('group_id_prefill', None)
@@ -774,8 +776,8 @@ def list_group_datatables(group_id):
 
     if request.args.get('download_agg') == 'True':
         # Get all datatables for this group that the user can read
-        datatables = DataTable.query.filter_by(group_id=group_id).all()
-        accessible_dt_ids = [str(dt.id) for dt in datatables if check_datatable_permission(dt, 'read')]
+        datatables = filter_readable(current_user, DataTable, DataTable.query.filter_by(group_id=group_id)).all()
+        accessible_dt_ids = [str(dt.id) for dt in datatables]
         
         if not accessible_dt_ids:
             flash(_("No accessible datatables found to download."), "warning")
@@ -827,16 +829,8 @@ def batch_delete_datatables():
             'date_to': filters.get('date_to')
         }
         
-        # Retrieve all matching datatables using the service (ignoring pagination for batch ops)
-        all_matching_datatables_result = datatable_service.get_server_side_datatables(
-            user=current_user,
-            filters=service_filters,
-            page=1, # Get all results
-            per_page=9999999, # Large number to get all results
-            sort_column='created_at', # Dummy sort
-            sort_direction='asc' # Dummy sort
-        )
-        datatables_to_process_ids = [dt.id for dt in all_matching_datatables_result['items']]
+        # Stream the ids of all matching datatables (no pagination for batch ops)
+        datatables_to_process_ids = list(datatable_service.iter_server_side_datatable_ids(current_user, service_filters))
     else:
         datatables_to_process_ids = datatable_ids_from_payload
 
@@ -885,15 +879,7 @@ def get_batch_analysis_ids():
             'date_to': filters.get('date_to')
         }
         
-        all_matching_datatables_result = datatable_service.get_server_side_datatables(
-            user=current_user,
-            filters=service_filters,
-            page=1, 
-            per_page=9999999, 
-            sort_column='created_at',
-            sort_direction='asc'
-        )
-        datatables_to_process_ids = [dt.id for dt in all_matching_datatables_result['items']]
+        datatables_to_process_ids = list(datatable_service.iter_server_side_datatable_ids(current_user, service_filters))
     else:
         datatables_to_process_ids = [int(x) for x in datatable_ids_from_payload if isinstance(x, (int, str)) and str(x).isdigit()]
     
@@ -912,6 +898,7 @@ def download_merged_selected_datatables():
         datatable_ids_from_payload = data.get('datatable_ids', [])
         select_all_matching = data.get('select_all_matching', 'false') == 'true'
         filters = data.get('filters', {})
+        file_format = str(data.get('file_format', 'xlsx')).lower()
     else:
         # Fallback for standard form submission
         datatable_ids_from_payload = request.form.getlist('selected_datatable_ids[]')
@@ -920,6 +907,7 @@ def download_merged_selected_datatables():
         select_all_matching = request.form.get('select_all_matching') == 'true'
         # Filters might need to be passed as hidden fields if using select_all_matching with form submit
         filters = {} 
+        file_format = request.form.get('file_format', 'xlsx').lower()
 
     datatables_to_process_ids = []
 
@@ -931,15 +919,7 @@ def download_merged_selected_datatables():
             'date_from': filters.get('date_from'),
             'date_to': filters.get('date_to')
         }
-        all_matching_datatables_result = datatable_service.get_server_side_datatables(
-            user=current_user,
-            filters=service_filters,
-            page=1,
-            per_page=9999999,
-            sort_column='created_at',
-            sort_direction='asc'
-        )
-        datatables_to_process_ids = [dt.id for dt in all_matching_datatables_result['items']]
+        datatables_to_process_ids = list(datatable_service.iter_server_side_datatable_ids(current_user, service_filters))
     else:
         datatables_to_process_ids = datatable_ids_from_payload
 
@@ -949,6 +929,11 @@ def download_merged_selected_datatables():
         if request.is_json:
              return jsonify({'success': False, 'message': _('No DataTables selected or found for download.')}), 400
         return redirect(request.referrer or url_for('datatables.create_data_table'))
+
+    if export_job_service.should_run_in_background(datatables_to_process_ids, select_all_matching):
+        background_response = start_background_export(ExportJob.KIND_MERGED, datatables_to_process_ids, file_format)
+        if background_response is not None:
+            return background_response
     
     selected_ids_str_merged = [str(dt_id) for dt_id in datatables_to_process_ids]
 
@@ -964,21 +949,12 @@ def download_merged_selected_datatables():
             return jsonify({'success': False, 'message': _('No data available to download after merging.')}), 400
         return redirect(request.referrer or url_for('datatables.create_data_table'))
     
-    fname_part_merged = "merged_selection"
-    if source_identifiers_merged: 
-        # Create a safe filename from the first identifier or a generic one
-        safe_id = source_identifiers_merged[0].replace(" ", "_").replace("/", "-").replace(":", "-")
-        fname_part_merged = f"{safe_id}_plus_{len(source_identifiers_merged)-1}" if len(source_identifiers_merged) > 1 else safe_id
-
-    fname_merged = f'{fname_part_merged}_merged_data.xlsx'
-    mime_merged = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+    fname_merged = datatable_service.merged_download_name(source_identifiers_merged, 'merged_data')
     
     try:
-        output_merged = dataframe_to_excel_bytes(df_combined_merged)
-        response = make_response(output_merged)
-        response.headers["Content-Disposition"] = f"attachment; filename={fname_merged}"
-        response.headers["Content-Type"] = mime_merged
-        return response
+        column_types_merged, metadata_merged = datatable_service.describe_selection_for_export(selected_ids_str_merged)
+        return send_export(df_combined_merged, fname_merged, file_format=file_format,
+                           column_types=column_types_merged, metadata=metadata_merged)
     except Exception as e:
         current_app.logger.error(f"Merged Excel download error: {e}", exc_info=True)
         flash(_("Error generating merged file for download: {error_msg}").format(error_msg=str(e)), 'error')
@@ -995,12 +971,14 @@ def download_merged_transposed_selected_datatables():
         datatable_ids_from_payload = data.get('datatable_ids', [])
         select_all_matching = data.get('select_all_matching', 'false') == 'true'
         filters = data.get('filters', {})
+        file_format = str(data.get('file_format', 'xlsx')).lower()
     else:
         # Fallback for standard form submission
         datatable_ids_from_payload = request.form.getlist('selected_datatable_ids[]')
         datatable_ids_from_payload = [int(x) for x in datatable_ids_from_payload if x.isdigit()]
         select_all_matching = request.form.get('select_all_matching') == 'true'
         filters = {}
+        file_format = request.form.get('file_format', 'xlsx').lower()
 
     datatables_to_process_ids = []
 
@@ -1012,15 +990,7 @@ def download_merged_transposed_selected_datatables():
             'date_from': filters.get('date_from'),
             'date_to': filters.get('date_to')
         }
-        all_matching_datatables_result = datatable_service.get_server_side_datatables(
-            user=current_user,
-            filters=service_filters,
-            page=1,
-            per_page=9999999,
-            sort_column='created_at',
-            sort_direction='asc'
-        )
-        datatables_to_process_ids = [dt.id for dt in all_matching_datatables_result['items']]
+        datatables_to_process_ids = list(datatable_service.iter_server_side_datatable_ids(current_user, service_filters))
     else:
         datatables_to_process_ids = datatable_ids_from_payload
 
@@ -1029,6 +999,11 @@ def download_merged_transposed_selected_datatables():
         if request.is_json:
             return jsonify({'success': False, 'message': _('No DataTables selected or found for download.')}), 400
         return redirect(request.referrer or url_for('datatables.create_data_table'))
+
+    if export_job_service.should_run_in_background(datatables_to_process_ids, select_all_matching):
+        background_response = start_background_export(ExportJob.KIND_MERGED_TRANSPOSED, datatables_to_process_ids, file_format)
+        if background_response is not None:
+            return background_response
     
     selected_ids_str_trans_merged = [str(dt_id) for dt_id in datatables_to_process_ids]
 
@@ -1044,57 +1019,16 @@ def download_merged_transposed_selected_datatables():
             return jsonify({'success': False, 'message': _('No data available to download after merging.')}), 400
         return redirect(request.referrer or url_for('datatables.create_data_table'))
     
-    df_for_transpose_trans_merged = df_combined_trans_merged.copy(); original_subject_id_col_name_trans_merged = 'uid'
-    source_cols_trans_merged = ['_source_datatable_id', '_source_experimental_group_name', '_source_protocol_name', '_source_datatable_date']
-    
-    parameter_cols_trans_merged = [col for col in df_for_transpose_trans_merged.columns if col not in source_cols_trans_merged]
-    
-    df_for_transpose_trans_merged['_temp_row_identifier_'] = range(len(df_for_transpose_trans_merged))
-    
-    index_for_pivot_trans_merged = '_unique_subject_header_'
-    
-    if original_subject_id_col_name_trans_merged in df_for_transpose_trans_merged.columns:
-        df_for_transpose_trans_merged[original_subject_id_col_name_trans_merged] = df_for_transpose_trans_merged[original_subject_id_col_name_trans_merged].astype(str).fillna('UnknownID')
-        source_group_col = '_source_experimental_group_name'
-        if source_group_col in df_for_transpose_trans_merged.columns:
-             df_for_transpose_trans_merged[source_group_col] = df_for_transpose_trans_merged[source_group_col].astype(str).fillna('UnknownGroup')
-             df_for_transpose_trans_merged['_candidate_subject_header_'] = df_for_transpose_trans_merged.apply(lambda row: f"{row[source_group_col]}_{row[original_subject_id_col_name_trans_merged]}", axis=1)
-        else:
-             df_for_transpose_trans_merged['_candidate_subject_header_'] = df_for_transpose_trans_merged[original_subject_id_col_name_trans_merged]
-
-        if df_for_transpose_trans_merged['_candidate_subject_header_'].duplicated().any():
-            df_for_transpose_trans_merged['_unique_subject_header_'] = df_for_transpose_trans_merged.groupby('_candidate_subject_header_').cumcount().astype(str).radd('_v').radd(df_for_transpose_trans_merged['_candidate_subject_header_'])
-            flash(lazy_gettext("Warning: Some subjects from different original tables had identical Group_ID combinations. Counters appended to make transposed column headers unique."), "warning")
-        else: 
-            df_for_transpose_trans_merged['_unique_subject_header_'] = df_for_transpose_trans_merged['_candidate_subject_header_']
-    else:
-        flash(lazy_gettext("Original Subject ID column ('{col}') not found or not suitable for merged transposed headers. Using generic 'Subject_X' based on row order.").format(col=original_subject_id_col_name_trans_merged), "warning")
-        df_for_transpose_trans_merged['_unique_subject_header_'] = "Subject_" + (df_for_transpose_trans_merged['_temp_row_identifier_'] + 1).astype(str)
-    
-    try:
-        df_to_pivot_trans_merged = df_for_transpose_trans_merged[parameter_cols_trans_merged + [index_for_pivot_trans_merged]]
-        df_pivot_ready_trans_merged = df_to_pivot_trans_merged.set_index(index_for_pivot_trans_merged)
-        df_transposed_final_trans_merged = df_pivot_ready_trans_merged.transpose()
-    except Exception as e_pivot_trans_merged:
-        current_app.logger.error(f"Error during pivot/transpose for merged data: {e_pivot_trans_merged}. Falling back to basic transpose.", exc_info=True)
-        flash(lazy_gettext("Error creating transposed table structure: {error_msg}. Attempting basic transpose with generic headers.").format(error_msg=str(e_pivot_trans_merged)), "warning")
-        df_transposed_final_trans_merged = df_for_transpose_trans_merged[parameter_cols_trans_merged].transpose() 
-        df_transposed_final_trans_merged.columns = [f"Subject_{i_trans_merged_col+1}" for i_trans_merged_col in range(len(df_transposed_final_trans_merged.columns))]
-    
-    fname_part_trans_merged = "merged_selection"
-    if source_identifiers_trans_merged: 
-        safe_id = source_identifiers_trans_merged[0].replace(" ", "_").replace("/", "-").replace(":", "-")
-        fname_part_trans_merged = f"{safe_id}_plus_{len(source_identifiers_trans_merged)-1}" if len(source_identifiers_trans_merged) > 1 else safe_id
+    df_transposed_final_trans_merged, transpose_warnings = datatable_service.transpose_merged_for_prism(df_combined_trans_merged)
+    for warning_trans_merged in transpose_warnings:
+        flash(warning_trans_merged, "warning")
 
-    fname_trans_merged = f'{fname_part_trans_merged}_merged_transposed_prism.xlsx'
-    mime_trans_merged = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+    fname_trans_merged = datatable_service.merged_download_name(source_identifiers_trans_merged, 'merged_transposed_prism')
     
     try:
-        output_trans_merged = dataframe_to_excel_bytes(df_transposed_final_trans_merged, index=True, header=True)
-        response = make_response(output_trans_merged)
-        response.headers["Content-Disposition"] = f"attachment; filename={fname_trans_merged}"
-        response.headers["Content-Type"] = mime_trans_merged
-        return response
+        metadata_trans_merged = datatable_service.describe_selection_for_export(selected_ids_str_trans_merged)[1]
+        return send_export(df_transposed_final_trans_merged, fname_trans_merged, file_format=file_format,
+                           index=True, header=True, metadata=metadata_trans_merged)
     except Exception as e_trans_merged_excel:
         current_app.logger.error(f"Merged transposed Excel download error: {e_trans_merged_excel}", exc_info=True)
         flash(lazy_gettext("Error generating merged transposed file for download: {error_msg}").format(error_msg=str(e_trans_merged_excel)), 'error')
@@ -1157,7 +1091,7 @@ def calculate_reference_range(datatable_id):
         DataTable.protocol_id == ref_range.protocol_id
     )
     
-    all_matching_dts = datatables_query.all()
+    all_matching_dts = filter_readable(current_user, DataTable, datatables_query).all()
 
     reference_data = defaultdict(list)
     
@@ -1188,9 +1122,6 @@ def calculate_reference_range(datatable_id):
 
     reference_dt_ids = []
     for dt in all_matching_dts:
-        if not check_datatable_permission(dt, 'read'):
-            continue
-        
         reference_dt_ids.append(dt.id)
         
         if not dt.group or not dt.group.animals:
@@ -1357,6 +1288,7 @@ def download_data_table(id):
         return redirect(request.referrer or url_for('groups.manage_groups'))
     
     blinding_mode = request.args.get('blinding', 'default') 
+    file_format_dl = request.args.get('file_format', 'xlsx').lower()
     can_view_unblinded = user_has_permission(current_user, 'Project', 'view_unblinded_data', team_id=data_table_dl.group.project.team_id)
     
     # Sort animals by ID for consistent indexing
@@ -1462,11 +1394,16 @@ def download_data_table(id):
         for col_name, value in housing_conditions_data.items():
             df_dl[col_name] = value
 
-    # Use utility for download
-    output_dl = dataframe_to_excel_bytes(df_dl)
+    # Stream the file instead of building it in memory ('xlsx', 'csv', 'parquet' or 'arrow')
     fname_dl = f'{data_table_dl.group.name}_{data_table_dl.protocol.name}_{data_table_dl.date}'.replace(' ', '_').replace('/','-').replace(':','-') + '.xlsx'
-    mime_dl = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-    return send_file(output_dl, mimetype=mime_dl, as_attachment=True, download_name=fname_dl)
+    column_types_dl, metadata_dl = datatable_service.describe_for_export(
+        [data_table_dl], unblinded_view=is_blinded and can_view_unblinded_dl and blinding_mode == 'unblinded'
+    )
+    try:
+        return send_export(df_dl, fname_dl, file_format=file_format_dl, column_types=column_types_dl, metadata=metadata_dl)
+    except ValueError as e_dl:
+        flash(lazy_gettext("Error generating file for download: {error_msg}").format(error_msg=str(e_dl)), 'error')
+        return redirect(request.referrer or url_for('datatables.edit_data_table', id=id))
 
 
 @datatables_bp.route('/download_transposed/<int:id>')
@@ -1591,14 +1528,17 @@ def download_transposed_data_table(id):
     if not use_subject_id_as_header_trans: 
         df_transposed_final.columns = [f"Subject_{i_trans_col+1}" for i_trans_col in range(len(df_transposed_final.columns))]
     
-    # Use utility with index=True
+    # Stream with index=True (subject IDs / variable names as first column)
     base_fname_trans = f'{data_table_trans.group.name}_{data_table_trans.protocol.name}_{data_table_trans.date}'.replace(' ', '_').replace('/','-').replace(':','-')
     fname_trans = f'{base_fname_trans}_transposed_prism.xlsx'
-    mime_trans = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+    # Transposed columns mix parameters, so only the export metadata is kept for columnar formats
+    metadata_trans = datatable_service.describe_for_export(
+        [data_table_trans], unblinded_view=is_blinded and can_view_unblinded_trans
+    )[1]
     
     try:
-        output_trans = dataframe_to_excel_bytes(df_transposed_final, index=True, header=True)
-        return send_file(output_trans, mimetype=mime_trans, as_attachment=True, download_name=fname_trans)
+        return send_export(df_transposed_final, fname_trans, file_format=request.args.get('file_format', 'xlsx').lower(),
+                           index=True, header=True, metadata=metadata_trans)
     except Exception as e_trans_excel:
         current_app.logger.error(f"Transposed Excel download error for DataTable {id}: {e_trans_excel}", exc_info=True)
         flash(lazy_gettext("Error generating transposed file for download: {error_msg}").format(error_msg=str(e_trans_excel)), 'error')
@@ -0,0 +1,74 @@
+# app/datatables/routes_exports.py
+from celery.result import AsyncResult
+from flask import current_app, flash, jsonify, redirect, request, send_file, url_for
+from flask_babel import gettext as _
+from flask_login import current_user, login_required
+
+from app.services.export_job_service import ExportJobService
+from app.utils.columnar import COLUMNAR_FORMATS, is_columnar_format
+from app.utils.files import EXCEL_MIMETYPE
+
+from . import datatables_bp
+
+export_job_service = ExportJobService()
+
+
+def start_background_export(kind, datatable_ids, file_format='xlsx'):
+    """
+    Queues a background export of ``datatable_ids`` and answers the merged
+    download request. Returns None when the job could not be queued, so the
+    caller falls back to the synchronous download.
+    """
+    job = export_job_service.create(current_user, kind, datatable_ids, file_format)
+    if not export_job_service.enqueue(job):
+        return None
+
+    message = _("Your export is being prepared. You will be notified when it is ready to download.")
+    if request.is_json:
+        return jsonify({
+            'success': True,
+            'job_id': job.id,
+            'status_url': url_for('datatables.export_job_status', job_id=job.id),
+            'message': message,
+        }), 202
+    flash(message, 'info')
+    return redirect(request.referrer or url_for('datatables.create_data_table'))
+
+
+@datatables_bp.route('/exports/<string:job_id>/status')
+@login_required
+def export_job_status(job_id):
+    job = export_job_service.get_for_user(job_id, current_user)
+    if job is None:
+        return jsonify({'error': _("Export not found.")}), 404
+
+    response = job.to_dict()
+    if job.status == job.STATUS_RUNNING:
+        task = AsyncResult(job.id)
+        if task.state == 'PROGRESS':
+            progress = task.info or {}
+            response.update(done=progress.get('done', 0), total=progress.get('total', 0), stage=progress.get('current'))
+    elif export_job_service.is_downloadable(job):
+        response['download_url'] = url_for('datatables.download_export_job', job_id=job.id)
+    return jsonify(response)
+
+
+@datatables_bp.route('/exports/<string:job_id>/download')
+@login_required
+def download_export_job(job_id):
+    """Serves a finished export; conditional=True answers Range / If-Range requests (resumable)."""
+    job = export_job_service.get_for_user(job_id, current_user)
+    if job is None or not export_job_service.is_downloadable(job):
+        current_app.logger.info(f"Export {job_id} requested by user {current_user.id} is not available")
+        flash(_("This export is not available: it may still be running, have failed or have expired."), 'warning')
+        return redirect(url_for('datatables.create_data_table'))
+
+    return send_file(
+        export_job_service.file_path(job),
+        mimetype=COLUMNAR_FORMATS[job.file_format][1] if is_columnar_format(job.file_format) else EXCEL_MIMETYPE,
+        as_attachment=True,
+        download_name=job.filename,
+        conditional=True,
+        etag=True,
+        max_age=0,
+    )
@@ -26,7 +26,7 @@ from ..models import (Analyte, Animal, DataTable, EthicalApproval,
                       EthicalApprovalProcedure, ExperimentalGroup,
                       ExperimentDataRow, Project, ProtocolModel, Severity,
                       Team)
-from ..permissions import check_datatable_permission
+from ..permissions import filter_readable
 from . import ethical_approvals_bp
 
 
@@ -704,7 +704,10 @@ def list_datatables_for_ethical_approval(ethical_approval_id):
         flash(_l("Ethical Approval not found."), "danger")
         return redirect(url_for('ethical_approvals.list_ethical_approvals'))
 
-    base_datatables_query = DataTable.query.join(ExperimentalGroup).filter(ExperimentalGroup.ethical_approval_id == approval.id)
+    base_datatables_query = filter_readable(
+        current_user, DataTable,
+        DataTable.query.join(ExperimentalGroup).filter(ExperimentalGroup.ethical_approval_id == approval.id)
+    )
 
     year_tuples = base_datatables_query.with_entities(func.strftime('%Y', DataTable.date)).distinct().order_by(func.strftime('%Y', DataTable.date).desc()).all()
     available_years = [year[0] for year in year_tuples if year[0]]
@@ -715,12 +718,10 @@ def list_datatables_for_ethical_approval(ethical_approval_id):
     if selected_year:
         datatables_query = datatables_query.filter(func.strftime('%Y', DataTable.date) == selected_year)
 
-    all_related_datatables = datatables_query.options(
+    accessible_datatables = datatables_query.options(
         db.joinedload(DataTable.group).joinedload(ExperimentalGroup.project),
         db.joinedload(DataTable.protocol)
     ).order_by(DataTable.date.desc(), DataTable.id.desc()).all()
-
-    accessible_datatables = [dt for dt in all_related_datatables if check_datatable_permission(dt, 'read')]
     
     for dt in accessible_datatables:
         dt.animal_count = len(dt.group.animals) if dt.group else 0
@@ -40,6 +40,7 @@ from ..helpers import (generate_unique_name, generate_xlsx_template,
                        get_ordered_analytes_for_model, replace_undefined,
                        sort_analytes_list_by_name,
                        validate_and_convert)
+from app.utils.columnar import is_columnar_format, send_columnar
 from app.utils.files import dataframe_to_excel_bytes
 from ..models import (Analyte, AnalyteDataType, Animal, AnimalModel, AnimalModelAnalyteAssociation, DataTable,
                       DataTableMoleculeUsage, ControlledMolecule,
@@ -66,7 +67,7 @@ def get_group(group_id):
 @login_required
 def manage_groups():
     # Fetch hierarchy for sidebar
-    sidebar_data = project_service.get_sidebar_hierarchy(current_user)
+    sidebar_data = project_service.get_cached_sidebar_hierarchy(current_user)
     
     # Fetch all animal models for filter dropdown
     all_animal_models = AnimalModel.query.order_by(AnimalModel.name).all()
@@ -111,18 +112,8 @@ def batch_archive_groups():
             else:
                 service_filters['is_archived'] = None # Invalid value
 
-        # Retrieve all matching groups using the service (ignoring pagination for batch ops)
-        # Note: A dedicated service method that returns *all* matching IDs might be more efficient
-        # than calling get_server_side_groups with a very large per_page.
-        all_matching_groups_result = group_service.get_server_side_groups(
-            user=current_user,
-            filters=service_filters,
-            page=1, # Get all results
-            per_page=9999999, # Large number to get all results
-            sort_column='created_at', # Dummy sort
-            sort_direction='asc' # Dummy sort
-        )
-        groups_to_process_ids = [g.id for g in all_matching_groups_result['items']]
+        # Stream the ids of all matching groups (no pagination for batch ops)
+        groups_to_process_ids = list(group_service.iter_server_side_group_ids(current_user, service_filters))
     else:
         groups_to_process_ids = group_ids_from_payload
 
@@ -180,15 +171,7 @@ def batch_unarchive_groups():
             else:
                 service_filters['is_archived'] = None
         
-        all_matching_groups_result = group_service.get_server_side_groups(
-            user=current_user,
-            filters=service_filters,
-            page=1,
-            per_page=9999999,
-            sort_column='created_at',
-            sort_direction='asc'
-        )
-        groups_to_process_ids = [g.id for g in all_matching_groups_result['items']]
+        groups_to_process_ids = list(group_service.iter_server_side_group_ids(current_user, service_filters))
     else:
         groups_to_process_ids = group_ids_from_payload
 
@@ -246,15 +229,7 @@ def batch_delete_groups():
             else:
                 service_filters['is_archived'] = None
         
-        all_matching_groups_result = group_service.get_server_side_groups(
-            user=current_user,
-            filters=service_filters,
-            page=1,
-            per_page=9999999,
-            sort_column='created_at',
-            sort_direction='asc'
-        )
-        groups_to_process_ids = [g.id for g in all_matching_groups_result['items']]
+        groups_to_process_ids = list(group_service.iter_server_side_group_ids(current_user, service_filters))
     else:
         groups_to_process_ids = group_ids_from_payload
 
@@ -1713,6 +1688,18 @@ def export_concatenated_analytes(group_id):
     try:
         data = request.get_json()
         concatenated_data = data.get('concatenated_data', {})
+        file_format = str(data.get('file_format', 'xlsx')).lower()
+
+        if is_columnar_format(file_format):
+            # Typed export rebuilt server-side (permission-checked), restricted to the posted analytes
+            posted_analytes = {name for analyte_data in concatenated_data.get('animal_data', {}).values() for name in analyte_data}
+            df, column_types, metadata, errors = datatable_service.get_concatenated_analyte_frame(
+                group_id, current_user, analyte_names=posted_analytes or None
+            )
+            if errors:
+                return jsonify({'error': '; '.join(str(e) for e in errors)}), 400
+            return send_columnar(df, f'concatenated_analytes_{group_id}.xlsx', file_format,
+                                 column_types=column_types, metadata=metadata)
 
         # Convert to DataFrame-like structure for export
         rows = []
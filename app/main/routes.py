@@ -4,7 +4,7 @@ from flask_babel import Babel
 from flask_babel import gettext as _  # Import gettext and Babel
 from flask_login import (current_user, login_required,  # Added logout_user
                          logout_user)
-from sqlalchemy import distinct, func, or_
+from sqlalchemy import distinct, func
 
 from app.extensions import db  # Assuming db is initialized in extensions
 from app.forms import (ChangeEmailForm, ChangePasswordForm, CkanSettingsForm,
@@ -13,12 +13,12 @@ from app.forms import (ChangeEmailForm, ChangePasswordForm, CkanSettingsForm,
                        RegenerateTeamCalendarTokenForm, SmtpSettingsForm)
 from app.helpers import (confirm_token,  # Changed from app.utils
                          generate_confirmation_token, send_email)
-from app.models import (AnimalModel, APIToken, DataTable, EthicalApproval,
-                        ExperimentalGroup, Partner, Project, ProtocolModel,
+from app.models import (APIToken, DataTable, ExperimentalGroup, Project,
                         TeamMembership, User)
+from app.services.search_service import (ENTITIES_BY_NAME, SEARCH_ENTITIES,
+                                         SearchIndexService)
 
-from ..permissions import (check_datatable_permission, check_group_permission,
-                           check_project_permission)
+from ..permissions import check_datatable_permission, check_group_permission
 from . import main_bp  # Import the blueprint instance
 
 # Define routes using the blueprint instance
@@ -184,10 +184,14 @@ def search_results():
     current_app.logger.debug(f"SEARCH_DEBUG: Raw 'q' from request.args: '{request.args.get('q')}'")
     current_app.logger.debug(f"SEARCH_DEBUG: Stripped query_string for logic: '{query_string}'")
 
-    results = {
-        'projects': [], 'groups': [], 'ethical_approvals': [],
-        'protocols': [], 'animal_models': [], 'partners': [], 'datatables': []
-    }
+    search_type = request.args.get('type')
+    if search_type not in ENTITIES_BY_NAME:
+        search_type = None
+    page = max(request.args.get('page', 1, type=int), 1)
+    per_page = current_app.config.get('SEARCH_RESULTS_PER_TYPE', 20)
+
+    results = {entity.name: [] for entity in SEARCH_ENTITIES}
+    totals = {entity.name: 0 for entity in SEARCH_ENTITIES}
     search_performed = False
     
     if query_string:
@@ -196,76 +200,18 @@ def search_results():
             search_performed = True
         else:
             search_performed = True
-            term = f"%{query_string}%"
-            current_app.logger.info(f"Performing search with term: {term}")
-            user_teams_ids = [t.id for t in current_user.get_teams()]
-
-            # --- Search Projects ---
-            project_query = Project.query.filter(
-                or_(Project.name.ilike(term), Project.description.ilike(term), Project.slug.ilike(term))
-            )
-            all_found_projects_raw = project_query.all()
-            current_app.logger.debug(f"SEARCH_RAW_RESULTS: Found {len(all_found_projects_raw)} projects before permission check.")
-            # for p_debug in all_found_projects_raw: current_app.logger.debug(f"  - Raw Project: {p_debug.name}")
-            
-            results['projects'] = [p for p in all_found_projects_raw if check_project_permission(p, 'read')]
-            current_app.logger.debug(f"SEARCH_FILTERED_RESULTS: {len(results['projects'])} projects after permission check.")
+            current_app.logger.info(f"Performing search with term: {query_string}")
 
-            # --- Search Experimental Groups ---
-            group_query = ExperimentalGroup.query.filter(
-                or_(ExperimentalGroup.name.ilike(term), ExperimentalGroup.id.ilike(term))
-            )
-            all_found_groups_raw = group_query.all()
-            current_app.logger.debug(f"SEARCH_RAW_RESULTS: Found {len(all_found_groups_raw)} groups before permission check.")
-            
-            results['groups'] = [g for g in all_found_groups_raw if check_group_permission(g, 'read')]
-            current_app.logger.debug(f"SEARCH_FILTERED_RESULTS: {len(results['groups'])} groups after permission check.")
-            
-            # --- Search Ethical Approvals ---
-            ea_query = EthicalApproval.query.filter(
-                or_(EthicalApproval.title.ilike(term), EthicalApproval.reference_number.ilike(term), EthicalApproval.description.ilike(term))
+            # One ranked, permission-filtered and paginated index query per entity type
+            hits = SearchIndexService().search(
+                current_user, query_string,
+                entity_types=[search_type] if search_type else None,
+                page=page, per_page=per_page
             )
-            results['ethical_approvals'] = ea_query.all() # Assuming all logged-in users can see all EAs for now
-            current_app.logger.debug(f"SEARCH_RESULTS: Found {len(results['ethical_approvals'])} ethical approvals.")
-
-
-            # --- Search Protocol Models ---
-            results['protocols'] = ProtocolModel.query.filter(ProtocolModel.name.ilike(term)).all()
-            current_app.logger.debug(f"SEARCH_RESULTS: Found {len(results['protocols'])} protocol models.")
-            
-            # --- Search Animal Models ---
-            results['animal_models'] = AnimalModel.query.filter(AnimalModel.name.ilike(term)).all()
-            current_app.logger.debug(f"SEARCH_RESULTS: Found {len(results['animal_models'])} animal models.")
-
-            # --- Search Partners ---
-            partner_query_raw = Partner.query.filter(or_(Partner.company_name.ilike(term), Partner.contact_email.ilike(term)))
-            all_found_partners_raw = partner_query_raw.all()
-            current_app.logger.debug(f"SEARCH_RAW_RESULTS: Found {len(all_found_partners_raw)} partners before project access check.")
-
-            # Filter partners based on accessible projects
-            accessible_partners = []
-            if current_user.is_super_admin:
-                accessible_partners = all_found_partners_raw
-            else:
-                for partner_raw in all_found_partners_raw:
-                    # Check if this partner is linked to any project the user can access
-                    is_linked_to_accessible_project = partner_raw.projects.filter(
-                        Project.team_id.in_(user_teams_ids)
-                    ).first() is not None
-                    if is_linked_to_accessible_project:
-                        accessible_partners.append(partner_raw)
-            results['partners'] = accessible_partners
-            current_app.logger.debug(f"SEARCH_FILTERED_RESULTS: {len(results['partners'])} partners after project access check.")
-            
-            # --- Search DataTables ---
-            dt_query = DataTable.query.join(ExperimentalGroup, DataTable.group_id == ExperimentalGroup.id)\
-                                      .join(ProtocolModel, DataTable.protocol_id == ProtocolModel.id)\
-                                      .filter(or_(ProtocolModel.name.ilike(term), ExperimentalGroup.name.ilike(term), DataTable.date.ilike(term)))
-            all_found_datatables_raw = dt_query.all()
-            current_app.logger.debug(f"SEARCH_RAW_RESULTS: Found {len(all_found_datatables_raw)} datatables before permission check.")
-
-            results['datatables'] = [dt for dt in all_found_datatables_raw if check_datatable_permission(dt, 'read')]
-            current_app.logger.debug(f"SEARCH_FILTERED_RESULTS: {len(results['datatables'])} datatables after permission check.")
+            for name, hit in hits.items():
+                results[name] = hit['items']
+                totals[name] = hit['total']
+            current_app.logger.debug(f"SEARCH_RESULTS: {totals}")
 
     elif not query_string and request.method == 'GET' and 'q' in request.args:
         flash(_("Please enter a valid search term."), "warning")
@@ -275,6 +221,10 @@ def search_results():
                            title=_("Search Results"), 
                            query=query_string, 
                            results=results,
+                           totals=totals,
+                           search_type=search_type,
+                           page=page,
+                           per_page=per_page,
                            search_form=search_form, 
                            search_performed=search_performed)
 
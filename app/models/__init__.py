@@ -10,7 +10,7 @@ from .auth import (APIToken, Permission, Role, User, UserTeamRoleLink,
                    role_permissions, user_has_permission,
                    user_my_page_datatables, user_my_page_groups)
 # Import audit model
-from .audit import AuditLog
+from .audit import AuditLog, AuditOutbox
 # Import CKAN models
 from .import_template import ImportTemplate
 from .ckan import CKANResourceTask, CKANUploadTask
@@ -26,6 +26,12 @@ from .experiments import (DataTable, DataTableFile, ExperimentalGroup,
                           ExperimentDataRow)
 # Import animal model
 from .animal import Animal
+# Import columnar measurement store
+from .measurements import MeasurementValue
+# Import materialized permission matrix
+from .permission_matrix import PermissionMatrixEntry, PermissionMatrixVersion
+# Import global search index
+from .search import SearchDocument, SearchIndexState, SearchToken
 # Import project models
 from .projects import (Attachment, Partner, Project,
                        ProjectEthicalApprovalAssociation,
@@ -50,6 +56,7 @@ from .teams import (Team, TeamMembership, ethical_approval_team_share,
 from .workplans import Workplan, WorkplanEvent, WorkplanVersion
 # Import notification model
 from .notifications import Notification, NotificationType
+from .exports import ExportJob
 
 # Backward compatibility alias
 ProjectSharedTeamPermission = ProjectTeamShare
@@ -75,7 +82,13 @@ __all__ = [
     'user_my_page_groups',
     'user_my_page_datatables',
     'user_has_permission',
+    'PermissionMatrixEntry',
+    'PermissionMatrixVersion',
     'AuditLog',
+    'AuditOutbox',
+    'SearchDocument',
+    'SearchIndexState',
+    'SearchToken',
     
     # Teams
     'Team',
@@ -136,6 +149,8 @@ __all__ = [
     'DataTableFile',
     'ExperimentDataRow',
     'Animal',
+    'MeasurementValue',
+    'ExportJob',
     
     # CKAN
     'CKANUploadTask',
@@ -15,5 +15,39 @@ class AuditLog(db.Model):
     # Optional: Relationship to user if needed for display
     user = db.relationship('User')
 
+    # On MySQL the table is partitioned by month (see migration 7d2f4a9c6e13): the primary
+    # key becomes (id, timestamp) and the user foreign key is dropped.
+    __table_args__ = (
+        db.Index('ix_audit_log_resource', 'resource_type', 'resource_id', 'timestamp'),
+        db.Index('ix_audit_log_timestamp', 'timestamp'),
+    )
+
     def __repr__(self):
         return f"<AuditLog {self.action} {self.resource_type}:{self.resource_id} by {self.user_id}>"
+
+
+class AuditOutbox(db.Model):
+    """
+    Audit entries committed with the audited transaction when AUDIT_LOG_MODE is
+    'outbox', moved to audit_log in id order by the drain_audit_outbox task.
+    A drain first claims rows (``claimed_by``/``claimed_at``) with a conditional
+    UPDATE, so concurrent drains never copy the same row twice.
+    """
+    __tablename__ = 'audit_outbox'
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, nullable=True)
+    action = db.Column(db.String(50), nullable=False)
+    resource_type = db.Column(db.String(50), nullable=False)
+    resource_id = db.Column(db.String(50), nullable=True)
+    changes = db.Column(db.JSON, nullable=True)
+    timestamp = db.Column(db.DateTime, nullable=False)
+    claimed_by = db.Column(db.String(32), nullable=True)
+    claimed_at = db.Column(db.DateTime, nullable=True)
+
+    __table_args__ = (
+        db.Index('ix_audit_outbox_claimed_by', 'claimed_by'),
+    )
+
+    def __repr__(self):
+        return f"<AuditOutbox {self.id} {self.action} {self.resource_type}:{self.resource_id}>"
@@ -73,6 +73,7 @@ user_my_page_datatables = db.Table('user_my_page_datatables',
 def user_has_permission(user, resource, action, team_id=None, allow_any_team=False):
     """
     Checks if a user has a specific permission with request-level memoization.
+    Answered from the worker's RBAC snapshot when ``RBAC_SNAPSHOT_BACKEND`` is enabled.
 
     :param user: The user object to check.
     :param resource: The resource name (e.g., 'Project', 'CoreModel').
@@ -98,6 +99,14 @@ def user_has_permission(user, resource, action, team_id=None, allow_any_team=Fal
         return g._permission_cache[cache_key]
     # --- CACHING LOGIC END ---
 
+    from ..performance.rbac_snapshot import get_rbac_snapshot
+    snapshot = get_rbac_snapshot(db.session)
+    if snapshot is not None:
+        result = snapshot.has_permission(db.session, user.id, resource, action,
+                                         team_id=team_id, allow_any_team=allow_any_team)
+        g._permission_cache[cache_key] = result
+        return result
+
     query = db.session.query(Permission).join(role_permissions).join(Role).join(UserTeamRoleLink).filter(
         UserTeamRoleLink.user_id == user.id,
         Permission.resource == resource,
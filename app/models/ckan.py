@@ -1,6 +1,10 @@
 # app/models/ckan.py
 """
 CKAN upload and resource task models for the Precliniset application.
+
+A ``CKANUploadTask`` is one publish of a project to a CKAN dataset; its
+``CKANResourceTask`` rows record, per DataTable or attachment, what was
+sent (resource name, content hash) so an interrupted publish can resume.
 """
 from datetime import datetime, timezone
 
@@ -9,10 +13,18 @@ from ..extensions import db
 
 class CKANUploadTask(db.Model):
     """Model for CKAN upload tasks."""
+    STATUS_PENDING = 'pending'
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+
     id = db.Column(db.Integer, primary_key=True)
     project_id = db.Column(db.Integer, db.ForeignKey('project.id', ondelete='CASCADE'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='SET NULL'), nullable=True)
+    dataset_id = db.Column(db.String(255), nullable=True)
     status = db.Column(db.String(50), nullable=False, default='pending')
     created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+    updated_at = db.Column(db.DateTime, nullable=True)
     completed_at = db.Column(db.DateTime, nullable=True)
     error_message = db.Column(db.Text, nullable=True)
 
@@ -21,13 +33,38 @@ class CKANUploadTask(db.Model):
     def __repr__(self):
         return f'<CKANUploadTask Project:{self.project_id} Status:{self.status}>'
 
+    def to_dict(self):
+        counts = {}
+        for status, in self.resource_tasks.with_entities(CKANResourceTask.status):
+            counts[status] = counts.get(status, 0) + 1
+        return {
+            'id': self.id,
+            'status': self.status,
+            'dataset_id': self.dataset_id,
+            'total': sum(counts.values()),
+            'counts': counts,
+            'error': self.error_message,
+            'resources': [res.to_dict() for res in self.resource_tasks.order_by(CKANResourceTask.id)],
+        }
+
 
 class CKANResourceTask(db.Model):
     """Model for CKAN resource tasks."""
+    TYPE_DATATABLE = 'datatable'
+    TYPE_ATTACHMENT = 'attachment'
+    TYPE_PROTOCOL_ATTACHMENT = 'protocol_attachment'
+
+    STATUS_PENDING = 'pending'
+    STATUS_UPLOADED = 'uploaded'
+    STATUS_SKIPPED = 'skipped'  # Same content hash as the resource already on CKAN
+    STATUS_FAILED = 'failed'
+
     id = db.Column(db.Integer, primary_key=True)
-    upload_task_id = db.Column(db.Integer, db.ForeignKey('ckan_upload_task.id', ondelete='CASCADE'), nullable=False)
+    upload_task_id = db.Column(db.Integer, db.ForeignKey('ckan_upload_task.id', ondelete='CASCADE'), nullable=False, index=True)
     resource_type = db.Column(db.String(50), nullable=False)
     resource_id = db.Column(db.Integer, nullable=False)
+    resource_name = db.Column(db.String(255), nullable=True)
+    content_hash = db.Column(db.String(64), nullable=True)
     status = db.Column(db.String(50), nullable=False, default='pending')
     ckan_resource_id = db.Column(db.String(255), nullable=True)
     error_message = db.Column(db.Text, nullable=True)
@@ -36,3 +73,13 @@ class CKANResourceTask(db.Model):
 
     def __repr__(self):
         return f'<CKANResourceTask Type:{self.resource_type} ID:{self.resource_id} Status:{self.status}>'
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'type': self.resource_type,
+            'name': self.resource_name,
+            'status': self.status,
+            'ckan_resource_id': self.ckan_resource_id,
+            'error': self.error_message,
+        }
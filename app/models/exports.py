@@ -0,0 +1,69 @@
+# app/models/exports.py
+"""
+Background export jobs: large merged downloads are built by the
+``tasks.run_export_job`` Celery task into EXPORT_DIR and fetched later
+through a resumable (HTTP Range) download link.
+"""
+from datetime import datetime, timezone
+
+from ..extensions import db
+
+
+class ExportJob(db.Model):
+    """One background export; ``id`` doubles as the Celery task id."""
+    __tablename__ = 'export_job'
+
+    KIND_MERGED = 'merged'
+    KIND_MERGED_TRANSPOSED = 'merged_transposed'
+
+    STATUS_PENDING = 'pending'
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+
+    id = db.Column(db.String(32), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), nullable=False, index=True)
+    kind = db.Column(db.String(32), nullable=False)
+    status = db.Column(db.String(16), nullable=False, default=STATUS_PENDING)
+    params = db.Column(db.JSON, nullable=False, default=dict)
+    filename = db.Column(db.String(255), nullable=True)
+    file_size = db.Column(db.BigInteger, nullable=True)
+    row_count = db.Column(db.Integer, nullable=True)
+    error_message = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=lambda: datetime.now(timezone.utc))
+    completed_at = db.Column(db.DateTime, nullable=True)
+    expires_at = db.Column(db.DateTime, nullable=True)
+
+    user = db.relationship('User', backref=db.backref('export_jobs', lazy='dynamic', cascade='all, delete-orphan'))
+
+    __table_args__ = (
+        db.Index('ix_export_job_expires_at', 'expires_at'),
+    )
+
+    @property
+    def file_format(self):
+        """'xlsx', 'parquet' or 'arrow'."""
+        return (self.params or {}).get('format', 'xlsx')
+
+    @property
+    def storage_name(self):
+        """File name of the export inside EXPORT_DIR."""
+        return f'{self.id}.{self.file_format}'
+
+    def __repr__(self):
+        return f'<ExportJob {self.id} user={self.user_id} kind={self.kind} status={self.status}>'
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'format': self.file_format,
+            'status': self.status,
+            'filename': self.filename,
+            'file_size': self.file_size,
+            'row_count': self.row_count,
+            'error': self.error_message,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'completed_at': self.completed_at.isoformat() if self.completed_at else None,
+            'expires_at': self.expires_at.isoformat() if self.expires_at else None,
+        }
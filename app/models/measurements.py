@@ -0,0 +1,35 @@
+# app/models/measurements.py
+"""
+Columnar (narrow) measurement store.
+
+Mirrors the analyte values held in ``ExperimentDataRow.row_data`` and
+``Animal.measurements`` as one SQL row per (datatable, animal, analyte) so that
+hot read paths can fetch typed values with a single indexed query instead of
+decoding JSON row by row. The JSON columns remain the source of truth; this
+table is a write-through projection maintained by
+``app.services.measurement_store_service``.
+"""
+from ..extensions import db
+
+
+class MeasurementValue(db.Model):
+    """One analyte value for one animal, optionally scoped to a DataTable.
+
+    ``data_table_id`` is NULL for animal-level values (``Animal.measurements``).
+    """
+    __tablename__ = 'measurement_value'
+
+    id = db.Column(db.Integer, primary_key=True)
+    data_table_id = db.Column(db.Integer, db.ForeignKey('data_table.id', ondelete='CASCADE'), nullable=True)
+    animal_id = db.Column(db.Integer, db.ForeignKey('animal.id', ondelete='CASCADE'), nullable=False)
+    analyte_id = db.Column(db.Integer, db.ForeignKey('analyte.id', ondelete='CASCADE'), nullable=False)
+    numeric_value = db.Column(db.Float, nullable=True)
+    text_value = db.Column(db.Text, nullable=True)
+
+    __table_args__ = (
+        db.Index('ix_measurement_value_dt_analyte', 'data_table_id', 'analyte_id'),
+        db.Index('ix_measurement_value_animal_analyte', 'animal_id', 'analyte_id'),
+    )
+
+    def __repr__(self):
+        return f'<MeasurementValue DT:{self.data_table_id} Animal:{self.animal_id} Analyte:{self.analyte_id}>'
@@ -10,6 +10,7 @@ class NotificationType:
     WARNING = 'warning'
     ERROR = 'error'
     ANALYSIS_DONE = 'analysis_done'
+    EXPORT_READY = 'export_ready'
     WORKPLAN_UPDATE = 'workplan_update'
     EMAIL_FALLBACK = 'email_fallback'
 
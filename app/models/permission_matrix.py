@@ -0,0 +1,41 @@
+# app/models/permission_matrix.py
+"""
+Materialized project permission matrix (``PERMISSION_MATRIX_BACKEND = 'table'``).
+
+Stores the effective permissions of a user on a project as a bitmask, tagged
+with the user and project version counters that were current when it was
+computed. Bumping a counter invalidates every entry of that user/project
+without touching the entries themselves; maintained by
+``app.performance.permission_matrix``.
+"""
+from ..extensions import db
+
+
+class PermissionMatrixEntry(db.Model):
+    """Effective permission bitmask of one user on one project."""
+    __tablename__ = 'permission_matrix_entry'
+
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), primary_key=True)
+    project_id = db.Column(db.Integer, db.ForeignKey('project.id', ondelete='CASCADE'), primary_key=True)
+    mask = db.Column(db.Integer, nullable=False)
+    user_version = db.Column(db.Integer, nullable=False, default=0)
+    project_version = db.Column(db.Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        db.Index('ix_permission_matrix_entry_project', 'project_id'),
+    )
+
+    def __repr__(self):
+        return f'<PermissionMatrixEntry User:{self.user_id} Project:{self.project_id} Mask:{self.mask}>'
+
+
+class PermissionMatrixVersion(db.Model):
+    """Version counter of a user (``scope='user'``) or project (``scope='project'``)."""
+    __tablename__ = 'permission_matrix_version'
+
+    scope = db.Column(db.String(16), primary_key=True)
+    scope_id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<PermissionMatrixVersion {self.scope}:{self.scope_id} v{self.version}>'
@@ -0,0 +1,60 @@
+# app/models/search.py
+"""
+Global search index, maintained from session flushes by
+``app.services.search_service``.
+
+``SearchDocument`` holds the indexed text of one entity (one row per entity
+type and id); MySQL searches it through a FULLTEXT index and SQLite through
+the ``search_fts`` FTS5 table (both created by migration 9b3e6d1a4c72).
+``SearchToken`` is the portable inverted index used when neither is
+available: one row per (entity, token) with a field weight.
+``SearchIndexState`` records which entity types a full rebuild has indexed.
+"""
+from ..extensions import db
+
+
+class SearchDocument(db.Model):
+    """Indexed text of one searchable entity."""
+    __tablename__ = 'search_document'
+
+    id = db.Column(db.Integer, primary_key=True)
+    entity_type = db.Column(db.String(30), nullable=False)
+    entity_id = db.Column(db.String(40), nullable=False)
+    title = db.Column(db.String(255), nullable=True)
+    body = db.Column(db.Text, nullable=False, default='')
+
+    __table_args__ = (
+        db.UniqueConstraint('entity_type', 'entity_id', name='uq_search_document_entity'),
+    )
+
+    def __repr__(self):
+        return f'<SearchDocument {self.entity_type}:{self.entity_id}>'
+
+
+class SearchToken(db.Model):
+    """Posting of the pure-SQL inverted index: ``token`` occurs in an entity with ``weight``."""
+    __tablename__ = 'search_token'
+
+    entity_type = db.Column(db.String(30), primary_key=True)
+    entity_id = db.Column(db.String(40), primary_key=True)
+    token = db.Column(db.String(64), primary_key=True)
+    weight = db.Column(db.Integer, nullable=False, default=1)
+
+    __table_args__ = (
+        db.Index('ix_search_token_lookup', 'entity_type', 'token'),
+    )
+
+    def __repr__(self):
+        return f'<SearchToken {self.token} -> {self.entity_type}:{self.entity_id}>'
+
+
+class SearchIndexState(db.Model):
+    """Marker written by a full rebuild of one entity type (and the backend it was built for)."""
+    __tablename__ = 'search_index_state'
+
+    entity_type = db.Column(db.String(30), primary_key=True)
+    backend = db.Column(db.String(16), nullable=False)
+    built_at = db.Column(db.DateTime, nullable=False)
+
+    def __repr__(self):
+        return f'<SearchIndexState {self.entity_type} ({self.backend})>'
@@ -54,6 +54,7 @@ class WorkplanEvent(db.Model):
     offset_days = db.Column(db.Integer, nullable=False)
     event_name = db.Column(db.String(255), nullable=True)
     status = db.Column(SQLAlchemyEnum(WorkplanEventStatus), default=WorkplanEventStatus.PLANNED, nullable=False)
+    updated_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc))
 
     workplan = db.relationship('Workplan', back_populates='events')
     protocol = db.relationship('ProtocolModel')
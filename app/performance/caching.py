@@ -113,3 +113,345 @@ def init_app(app):
             request.cache_control = 'private'
         else:
             request.cache_control = 'public'
+
+
+# ---------------------------------------------------------------------------
+# Tagged query result cache
+# ---------------------------------------------------------------------------
+# ``@cached(tags=[...])`` stores the result of a view or service function under
+# a key built from the function, the current user, the request path/arguments
+# and the call arguments. Each tag ('project:{project_id}', 'groups', ...) has
+# a version counter; an entry is only served while the versions it was stored
+# with are current, so invalidating a tag is a single INCR. A session
+# ``after_flush`` hook derives the tags touched by ORM writes and bumps them
+# once the transaction commits; Core/bulk writes call ``mark_tags_stale``
+# themselves (QUERY_CACHE_BACKEND: 'none', 'memory', 'redis'). Redis entries are
+# HMAC-signed with SECRET_KEY and verified before being unpickled.
+
+import hashlib
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+from flask import Response, g, has_request_context
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.performance.signing import sign_blob, verify_blob
+
+STALE_TAGS_KEY = 'query_cache_stale_tags'
+SIGNING_PURPOSE = 'query_cache'
+_PRIMITIVES = (str, int, float, bool, type(None))
+
+_query_cache_listeners_registered = False
+
+
+class MemoryTagCacheBackend:
+    """Per-process LRU of entries plus tag versions (single worker, tests)."""
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._versions = {}
+        self._lock = threading.Lock()
+
+    def lookup(self, key, tags):
+        with self._lock:
+            versions = tuple(self._versions.get(tag, 0) for tag in tags)
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic() or entry[1] != versions:
+                return False, None, versions
+            self._entries.move_to_end(key)
+            return True, pickle.loads(entry[2]), versions
+
+    def store(self, key, versions, value, ttl):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, versions, pickle.dumps(value))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def bump(self, tags):
+        with self._lock:
+            for tag in tags:
+                self._versions[tag] = self._versions.get(tag, 0) + 1
+
+
+class RedisTagCacheBackend:
+    """
+    Entries and INCR tag counters in Redis; a lookup is a single MGET. Entries
+    whose signature does not match are treated as misses and never unpickled.
+    """
+
+    PREFIX = 'precliniset:qcache:'
+
+    def __init__(self, url):
+        import redis
+        self.client = redis.Redis.from_url(url)
+
+    def lookup(self, key, tags):
+        values = self.client.mget([f'{self.PREFIX}t:{tag}' for tag in tags] + [f'{self.PREFIX}e:{key}'])
+        versions = tuple(int(v or 0) for v in values[:-1])
+        blob = verify_blob(values[-1], SIGNING_PURPOSE)
+        if blob is None:
+            return False, None, versions
+        stored_versions, value = pickle.loads(blob)
+        if stored_versions != versions:
+            return False, None, versions
+        return True, value, versions
+
+    def store(self, key, versions, value, ttl):
+        blob = sign_blob(pickle.dumps((versions, value)), SIGNING_PURPOSE)
+        self.client.set(f'{self.PREFIX}e:{key}', blob, ex=ttl)
+
+    def bump(self, tags):
+        pipe = self.client.pipeline()
+        for tag in tags:
+            pipe.incr(f'{self.PREFIX}t:{tag}')
+        pipe.execute()
+
+
+def get_query_cache():
+    """Returns the configured tagged cache backend, or None when disabled."""
+    app = current_app._get_current_object()
+    backend_name = app.config.get('QUERY_CACHE_BACKEND', 'none')
+    if backend_name in (None, '', 'none'):
+        return None
+
+    backend = app.extensions.get('query_cache')
+    if backend is None:
+        if backend_name == 'redis':
+            backend = RedisTagCacheBackend(app.config['QUERY_CACHE_REDIS_URL'])
+        else:
+            backend = MemoryTagCacheBackend()
+        app.extensions['query_cache'] = backend
+    return backend
+
+
+def _cache_user_id():
+    """Id of the user the response is computed for (API token user first)."""
+    user = g.get('current_user') if has_request_context() else None
+    if user is None and has_request_context():
+        from flask_login import current_user
+        user = current_user
+    if user is not None and getattr(user, 'is_authenticated', False):
+        return user.id
+    return 'anonymous'
+
+
+def _key_part(value):
+    if isinstance(value, _PRIMITIVES):
+        return repr(value)
+    if hasattr(value, 'id') and not isinstance(value, (dict, list, tuple)):
+        return f'{type(value).__name__}:{value.id}'
+    return repr(value)
+
+
+def _freeze(value):
+    """Picklable form of a view/function result, or None when it must not be cached."""
+    if isinstance(value, Response):
+        if value.status_code != 200 or value.is_streamed or value.direct_passthrough:
+            return None
+        return ('__response__', value.get_data(), value.status_code, list(value.headers.items()))
+    if isinstance(value, tuple):
+        # (body, status[, headers]) results are usually errors
+        return None
+    return ('__value__', value)
+
+
+def _thaw(frozen):
+    if frozen[0] == '__response__':
+        _, data, status, headers = frozen
+        return Response(data, status=status, headers=headers)
+    return frozen[1]
+
+
+def cached(tags=(), ttl=None, per_user=True, ignore_args=('_',)):
+    """
+    Caches a view or function result under version-checked tags.
+
+    ``tags`` are format strings filled with the call arguments and ``user_id``
+    (e.g. ``'project:{project_id}'``, ``'user:{user_id}'``). ``ignore_args``
+    lists request arguments left out of the key (cache busters, DataTables'
+    ``draw`` counter...). Results are served only while no tag was invalidated
+    and never while the session holds uncommitted changes to tagged models.
+    Responses other than 200, streamed responses and ``(body, status)``
+    tuples are not cached.
+    """
+    import inspect as _inspect
+    from urllib.parse import urlencode
+
+    def decorator(f):
+        signature = _inspect.signature(f)
+
+        @wraps(f)
+        def wrapper(*args, **kwargs):
+            from app.extensions import db
+
+            backend = get_query_cache()
+            if backend is None or db.session.info.get(STALE_TAGS_KEY):
+                return f(*args, **kwargs)
+
+            bound = signature.bind_partial(*args, **kwargs)
+            bound.apply_defaults()
+            call_args = {k: v for k, v in bound.arguments.items() if k not in ('self', 'cls')}
+            user_id = _cache_user_id()
+            try:
+                resolved_tags = sorted({tag.format(user_id=user_id, **call_args) for tag in tags})
+            except (KeyError, AttributeError, IndexError) as e:
+                current_app.logger.warning(f"Query cache: cannot format tags of {f.__qualname__}: {e}")
+                return f(*args, **kwargs)
+
+            parts = [f.__module__, f.__qualname__, current_app.config.get('CACHE_VERSION', 'v1')]
+            if per_user:
+                parts.append(str(user_id))
+            if has_request_context():
+                parts.append(request.path)
+                parts.append(urlencode(sorted(
+                    (k, v) for k, v in request.args.items(multi=True) if k not in ignore_args
+                )))
+            parts.extend(f'{k}={_key_part(v)}' for k, v in sorted(call_args.items()))
+            key = hashlib.sha256('|'.join(parts).encode('utf-8')).hexdigest()
+
+            try:
+                hit, frozen, versions = backend.lookup(key, resolved_tags)
+            except Exception as e:
+                current_app.logger.warning(f"Query cache lookup failed: {e}")
+                return f(*args, **kwargs)
+            if hit:
+                return _thaw(frozen)
+
+            value = f(*args, **kwargs)
+            frozen = _freeze(value)
+            if frozen is not None:
+                try:
+                    backend.store(key, versions, frozen, ttl or current_app.config.get('QUERY_CACHE_TTL', 300))
+                except Exception as e:
+                    current_app.logger.warning(f"Query cache store failed: {e}")
+            return value
+        return wrapper
+    return decorator
+
+
+def cached_value(key_parts, tags, compute, ttl=None):
+    """
+    Memoises ``compute()`` under ``tags`` outside a decorated call, e.g. the
+    listing counts reused across DataTables draws. ``key_parts`` must identify
+    the value completely (user, filters...).
+    """
+    from app.extensions import db
+
+    backend = get_query_cache()
+    if backend is None or db.session.info.get(STALE_TAGS_KEY):
+        return compute()
+
+    resolved_tags = sorted(set(tags))
+    key = hashlib.sha256(repr(('value', current_app.config.get('CACHE_VERSION', 'v1')) + tuple(key_parts)).encode('utf-8')).hexdigest()
+    try:
+        hit, value, versions = backend.lookup(key, resolved_tags)
+    except Exception as e:
+        current_app.logger.warning(f"Query cache lookup failed: {e}")
+        return compute()
+    if hit:
+        return value
+
+    value = compute()
+    try:
+        backend.store(key, versions, value, ttl or current_app.config.get('QUERY_CACHE_TTL', 300))
+    except Exception as e:
+        current_app.logger.warning(f"Query cache store failed: {e}")
+    return value
+
+
+# ---------------------------------------------------------------------------
+# Invalidation
+# ---------------------------------------------------------------------------
+
+def mark_tags_stale(session, tags):
+    """
+    Records tags to invalidate when the session commits. Call explicitly around
+    Core/bulk writes that bypass the ORM.
+    """
+    session.info.setdefault(STALE_TAGS_KEY, set()).update(tags)
+
+
+def invalidate_tags(tags):
+    """Bumps the version of the given tags."""
+    try:
+        backend = get_query_cache()
+    except RuntimeError:
+        # Outside an application context (e.g. scripts): nothing is cached
+        return
+    if backend is None or not tags:
+        return
+    try:
+        backend.bump(sorted(tags))
+    except Exception as e:
+        current_app.logger.warning(f"Query cache invalidation failed: {e}")
+
+
+def _tags_for(obj):
+    """Tags touched by a write to ``obj``."""
+    from app.models import (Animal, DataTable, ExperimentalGroup, ExperimentDataRow,
+                            Project, ProjectTeamShare, ProjectUserShare, ReferenceRange,
+                            Role, Team, TeamMembership, User, UserTeamRoleLink)
+
+    if isinstance(obj, Project):
+        return {f'project:{obj.id}', f'team:{obj.team_id}', 'hierarchy', 'groups', 'datatables'}
+    if isinstance(obj, ExperimentalGroup):
+        return {f'group:{obj.id}', f'project:{obj.project_id}', 'groups', 'datatables'}
+    if isinstance(obj, DataTable):
+        return {f'datatable:{obj.id}', f'group:{obj.group_id}', 'datatables', 'measurements'}
+    if isinstance(obj, Animal):
+        return {f'animal:{obj.id}', f'group:{obj.group_id}', 'groups', 'measurements'}
+    if isinstance(obj, ExperimentDataRow):
+        return {f'datatable:{obj.data_table_id}', 'measurements'}
+    if isinstance(obj, ReferenceRange):
+        return {f'reference_range:{obj.id}', 'reference_ranges'}
+    if isinstance(obj, Team):
+        return {f'team:{obj.id}', 'hierarchy'}
+    if isinstance(obj, (ProjectTeamShare, ProjectUserShare)):
+        return {f'project:{obj.project_id}', 'access', 'hierarchy'}
+    if isinstance(obj, (TeamMembership, UserTeamRoleLink, Role)):
+        return {'access', 'hierarchy'}
+    if isinstance(obj, User):
+        return {f'user:{obj.id}', 'access'}
+    return set()
+
+
+def _collect_flush_tags(session):
+    tags = set()
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        tags |= _tags_for(obj)
+    return tags
+
+
+def register_query_cache_listeners(app):
+    """Collects touched tags on flush; bumps them on commit."""
+    global _query_cache_listeners_registered
+    if _query_cache_listeners_registered:
+        return
+    _query_cache_listeners_registered = True
+
+    @event.listens_for(Session, 'after_flush')
+    def _after_flush(session, flush_context):
+        try:
+            if get_query_cache() is None:
+                return
+        except RuntimeError:
+            return
+        tags = _collect_flush_tags(session)
+        if tags:
+            mark_tags_stale(session, tags)
+
+    @event.listens_for(Session, 'after_commit')
+    def _after_commit(session):
+        tags = session.info.pop(STALE_TAGS_KEY, None)
+        if tags:
+            invalidate_tags(tags)
+
+    @event.listens_for(Session, 'after_soft_rollback')
+    def _after_rollback(session, previous_transaction):
+        if previous_transaction.parent is None:
+            session.info.pop(STALE_TAGS_KEY, None)
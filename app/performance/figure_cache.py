@@ -0,0 +1,77 @@
+# app/performance/figure_cache.py
+"""
+Content-addressed cache for Plotly figures built by ``generate_plot``.
+
+The key hashes the rows/columns the plot actually reads (values and index,
+via ``pd.util.hash_pandas_object``) together with every plotting option and the
+current locale, so an unchanged slice is never re-plotted and any change in
+data or options simply addresses a new entry. Entries (figure JSON + notes) are
+zlib-compressed and share the size-bounded LRU backend of the DataFrame cache.
+"""
+import hashlib
+import json
+import zlib
+
+import pandas as pd
+from flask import current_app
+
+from app.performance.frame_cache import get_cache_backend
+
+# Bump when generate_plot's output changes for identical inputs
+FIGURE_CACHE_VERSION = 1
+
+
+def _hash_values(obj, salt=b''):
+    hashed = pd.util.hash_pandas_object(obj, index=True).to_numpy()
+    return hashlib.sha256(hashed.tobytes() + salt).hexdigest()
+
+
+def build_figure_key(df, columns, options, outlier_mask=None):
+    """
+    Key for a plot of ``df[columns]`` with ``options`` (any JSON-serializable dict),
+    or None when the figure cache is disabled.
+    """
+    if not current_app.config.get('ENABLE_FIGURE_CACHE', False):
+        return None
+    try:
+        from flask_babel import get_locale
+        present = [c for c in dict.fromkeys(columns) if c and c in df.columns]
+        material = {
+            'data': _hash_values(df[present], json.dumps(present, default=str).encode('utf-8')),
+            'mask': _hash_values(outlier_mask) if outlier_mask is not None else None,
+            'options': options,
+            'locale': str(get_locale()),
+            'version': FIGURE_CACHE_VERSION,
+            'cache_version': current_app.config.get('CACHE_VERSION', 'v1'),
+        }
+        encoded = json.dumps(material, default=str, sort_keys=True).encode('utf-8')
+        return f'figure-{hashlib.sha256(encoded).hexdigest()}'
+    except Exception as e:
+        current_app.logger.warning(f"Figure cache key could not be built: {e}")
+        return None
+
+
+def get_cached_figure(key):
+    """Returns ``(graph_json, notes)`` for a key, or None on a miss."""
+    if key is None:
+        return None
+    try:
+        blob = get_cache_backend().get(key)
+        if blob is None:
+            return None
+        payload = json.loads(zlib.decompress(blob).decode('utf-8'))
+        return payload['graph'], payload['notes']
+    except Exception as e:
+        current_app.logger.warning(f"Figure cache read failed for {key}: {e}")
+        return None
+
+
+def set_cached_figure(key, graph_json, notes):
+    """Stores a figure under a key returned by ``build_figure_key``."""
+    if key is None or graph_json is None:
+        return
+    try:
+        payload = json.dumps({'graph': graph_json, 'notes': [str(note) for note in notes]})
+        get_cache_backend().set(key, zlib.compress(payload.encode('utf-8'), 6))
+    except Exception as e:
+        current_app.logger.warning(f"Figure cache write failed for {key}: {e}")
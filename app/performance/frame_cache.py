@@ -0,0 +1,387 @@
+# app/performance/frame_cache.py
+"""
+Content-addressed cache for prepared analysis DataFrames.
+
+Entries are keyed by a hash of the DataTable ids, the latest ``updated_at`` of
+the involved tables/groups/animals, row counts, the groups' blinding mode and a
+per-DataTable generation counter. The audit listeners mark DataTables as stale
+whenever one of their rows changes (``ExperimentDataRow`` has no ``updated_at``)
+and the generation is bumped once the transaction commits, so stale entries are
+simply never addressed again and age out of the LRU.
+
+Frames are stored as Parquet bytes when pyarrow is available, otherwise as a
+zlib-compressed pickle. Entries are HMAC-signed with SECRET_KEY and verified
+before being decoded (see ``app.performance.signing``). Two size-bounded LRU
+backends are provided: local disk (default) and Redis.
+"""
+import hashlib
+import io
+import json
+import logging
+import os
+import pickle
+import struct
+import tempfile
+import time
+import zlib
+
+import pandas as pd
+from flask import current_app
+from sqlalchemy import event, func
+from sqlalchemy.orm import Session, object_session
+
+from app.performance.signing import sign_blob, verify_blob
+
+logger = logging.getLogger(__name__)
+
+PARQUET_MAGIC = b'PAR1'
+PICKLE_MAGIC = b'PKZ1'
+STALE_DATATABLES_KEY = 'frame_cache_stale_datatables'
+SIGNING_PURPOSE = 'frame_cache'
+
+_listeners_registered = False
+
+
+# ---------------------------------------------------------------------------
+# Serialization
+# ---------------------------------------------------------------------------
+
+def serialize_frame(df, meta=None):
+    """Packs a DataFrame and a small JSON-serializable meta dict into bytes."""
+    payload = None
+    try:
+        buffer = io.BytesIO()
+        df.to_parquet(buffer, index=True)
+        payload = buffer.getvalue()
+    except Exception:
+        # pyarrow missing or mixed-type object columns: fall back to pickle
+        payload = PICKLE_MAGIC + zlib.compress(pickle.dumps(df, protocol=pickle.HIGHEST_PROTOCOL), 1)
+
+    header = json.dumps(meta or {}, default=str).encode('utf-8')
+    return struct.pack('>I', len(header)) + header + payload
+
+
+def deserialize_frame(blob):
+    """Inverse of ``serialize_frame``; returns ``(df, meta)``."""
+    (header_len,) = struct.unpack('>I', blob[:4])
+    meta = json.loads(blob[4:4 + header_len].decode('utf-8'))
+    payload = blob[4 + header_len:]
+    if payload.startswith(PICKLE_MAGIC):
+        df = pickle.loads(zlib.decompress(payload[len(PICKLE_MAGIC):]))
+    else:
+        df = pd.read_parquet(io.BytesIO(payload))
+    return df, meta
+
+
+# ---------------------------------------------------------------------------
+# Backends
+# ---------------------------------------------------------------------------
+
+class DiskFrameCacheBackend:
+    """Stores entries as files; LRU order is tracked through file mtimes."""
+
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.generations_dir = os.path.join(directory, 'generations')
+        self.max_bytes = max_bytes
+        os.makedirs(self.generations_dir, exist_ok=True)
+
+    def _entry_path(self, key):
+        return os.path.join(self.directory, f'{key}.frame')
+
+    def get(self, key):
+        path = self._entry_path(key)
+        try:
+            with open(path, 'rb') as fh:
+                blob = fh.read()
+        except FileNotFoundError:
+            return None
+        try:
+            os.utime(path, None)
+        except OSError:
+            pass
+        return blob
+
+    def set(self, key, blob):
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as fh:
+            fh.write(blob)
+        os.replace(tmp_path, self._entry_path(key))
+        self._evict()
+
+    def _evict(self):
+        entries = []
+        total = 0
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if not entry.name.endswith('.frame'):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                total += stat.st_size
+        if total <= self.max_bytes:
+            return
+        for _, size, path in sorted(entries):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+    def get_generations(self, data_table_ids):
+        generations = []
+        for dt_id in data_table_ids:
+            try:
+                with open(os.path.join(self.generations_dir, str(dt_id))) as fh:
+                    generations.append(int(fh.read() or 0))
+            except (FileNotFoundError, ValueError):
+                generations.append(0)
+        return generations
+
+    def bump_generations(self, data_table_ids):
+        # A fresh token rather than a counter: no read-modify-write race between workers
+        token = str(time.time_ns())
+        for dt_id in data_table_ids:
+            with open(os.path.join(self.generations_dir, str(dt_id)), 'w') as fh:
+                fh.write(token)
+
+
+class RedisFrameCacheBackend:
+    """Stores entries in Redis; LRU order is tracked in a sorted set."""
+
+    PREFIX = 'precliniset:frame_cache:'
+
+    def __init__(self, url, max_bytes):
+        import redis
+        self.client = redis.Redis.from_url(url)
+        self.max_bytes = max_bytes
+        self.lru_key = self.PREFIX + 'lru'
+        self.sizes_key = self.PREFIX + 'sizes'
+
+    def get(self, key):
+        blob = self.client.get(self.PREFIX + key)
+        if blob is not None:
+            self.client.zadd(self.lru_key, {key: time.time()})
+        return blob
+
+    def set(self, key, blob):
+        pipe = self.client.pipeline()
+        pipe.set(self.PREFIX + key, blob)
+        pipe.zadd(self.lru_key, {key: time.time()})
+        pipe.hset(self.sizes_key, key, len(blob))
+        pipe.execute()
+        self._evict()
+
+    def _evict(self):
+        total = sum(int(size) for size in self.client.hvals(self.sizes_key))
+        while total > self.max_bytes:
+            oldest = self.client.zrange(self.lru_key, 0, 0)
+            if not oldest:
+                break
+            key = oldest[0].decode('utf-8')
+            size = int(self.client.hget(self.sizes_key, key) or 0)
+            pipe = self.client.pipeline()
+            pipe.delete(self.PREFIX + key)
+            pipe.zrem(self.lru_key, key)
+            pipe.hdel(self.sizes_key, key)
+            pipe.execute()
+            total -= size
+
+    def get_generations(self, data_table_ids):
+        if not data_table_ids:
+            return []
+        values = self.client.mget([f'{self.PREFIX}gen:{dt_id}' for dt_id in data_table_ids])
+        return [int(v) if v is not None else 0 for v in values]
+
+    def bump_generations(self, data_table_ids):
+        pipe = self.client.pipeline()
+        for dt_id in data_table_ids:
+            pipe.incr(f'{self.PREFIX}gen:{dt_id}')
+        pipe.execute()
+
+
+def get_frame_cache_backend():
+    """Returns the configured backend for the current app, or None when disabled."""
+    if not current_app.config.get('ENABLE_DATAFRAME_CACHE', False):
+        return None
+    return get_cache_backend()
+
+
+def get_cache_backend():
+    """
+    Returns the size-bounded LRU backend of the current app, regardless of
+    ENABLE_DATAFRAME_CACHE (also used by the figure cache).
+    """
+    app = current_app._get_current_object()
+    backend = app.extensions.get('frame_cache')
+    if backend is None:
+        max_bytes = app.config.get('DATAFRAME_CACHE_MAX_BYTES', 256 * 1024 * 1024)
+        if app.config.get('DATAFRAME_CACHE_BACKEND', 'disk') == 'redis':
+            backend = RedisFrameCacheBackend(app.config['DATAFRAME_CACHE_REDIS_URL'], max_bytes)
+        else:
+            directory = app.config.get('DATAFRAME_CACHE_DIR') or os.path.join(app.instance_path, 'frame_cache')
+            backend = DiskFrameCacheBackend(directory, max_bytes)
+        app.extensions['frame_cache'] = backend
+    return backend
+
+
+# ---------------------------------------------------------------------------
+# Keys
+# ---------------------------------------------------------------------------
+
+def _datatable_fingerprint(data_table_ids):
+    """Latest updated_at / counts / blinding mode of everything a frame is built from."""
+    from app.extensions import db
+    from app.models import Animal, DataTable, ExperimentalGroup, ExperimentDataRow
+
+    tables = db.session.query(DataTable.id, DataTable.group_id, DataTable.updated_at)\
+        .filter(DataTable.id.in_(data_table_ids)).all()
+    group_ids = sorted({t.group_id for t in tables})
+
+    row_counts = dict(
+        db.session.query(ExperimentDataRow.data_table_id, func.count(ExperimentDataRow.id))
+        .filter(ExperimentDataRow.data_table_id.in_(data_table_ids))
+        .group_by(ExperimentDataRow.data_table_id).all()
+    )
+    groups = db.session.query(
+        ExperimentalGroup.id, ExperimentalGroup.updated_at, ExperimentalGroup.randomization_details
+    ).filter(ExperimentalGroup.id.in_(group_ids)).all()
+    animals = db.session.query(Animal.group_id, func.max(Animal.updated_at), func.count(Animal.id))\
+        .filter(Animal.group_id.in_(group_ids)).group_by(Animal.group_id).all()
+
+    return {
+        'tables': sorted((t.id, t.updated_at, row_counts.get(t.id, 0)) for t in tables),
+        'groups': sorted(
+            (g.id, g.updated_at, bool((g.randomization_details or {}).get('use_blinding')))
+            for g in groups
+        ),
+        'animals': sorted(tuple(a) for a in animals),
+    }
+
+
+def build_frame_key(kind, data_table_ids, extra=None):
+    """
+    Builds the content address of a frame, or returns None when the cache is disabled
+    or one of the DataTables has uncommitted changes in the current session.
+    """
+    backend = get_frame_cache_backend()
+    if backend is None:
+        return None
+
+    from app.extensions import db
+    stale = db.session.info.get(STALE_DATATABLES_KEY)
+    if stale and stale.intersection(data_table_ids):
+        return None
+
+    try:
+        generations = backend.get_generations(sorted(set(data_table_ids)))
+    except Exception as e:
+        current_app.logger.warning(f"DataFrame cache unavailable: {e}")
+        return None
+
+    material = {
+        'kind': kind,
+        'ids': list(data_table_ids),
+        'fingerprint': _datatable_fingerprint(data_table_ids),
+        'generations': generations,
+        'extra': extra,
+        'version': current_app.config.get('CACHE_VERSION', 'v1'),
+    }
+    encoded = json.dumps(material, default=str, sort_keys=True).encode('utf-8')
+    return f'{kind}-{hashlib.sha256(encoded).hexdigest()}'
+
+
+def get_cached_frame(key):
+    """Returns ``(df, meta)`` for a key, or None on a miss."""
+    if key is None:
+        return None
+    backend = get_frame_cache_backend()
+    if backend is None:
+        return None
+    try:
+        signed = backend.get(key)
+        if signed is None:
+            return None
+        blob = verify_blob(signed, SIGNING_PURPOSE)
+        if blob is None:
+            current_app.logger.warning(f"DataFrame cache entry {key} has an invalid signature, ignored.")
+            return None
+        return deserialize_frame(blob)
+    except Exception as e:
+        current_app.logger.warning(f"DataFrame cache read failed for {key}: {e}")
+        return None
+
+
+def set_cached_frame(key, df, meta=None):
+    """Stores a frame under a key returned by ``build_frame_key``."""
+    if key is None or df is None:
+        return
+    backend = get_frame_cache_backend()
+    if backend is None:
+        return
+    try:
+        backend.set(key, sign_blob(serialize_frame(df, meta), SIGNING_PURPOSE))
+    except Exception as e:
+        current_app.logger.warning(f"DataFrame cache write failed for {key}: {e}")
+
+
+# ---------------------------------------------------------------------------
+# Invalidation
+# ---------------------------------------------------------------------------
+
+def mark_datatable_stale(target):
+    """
+    Called from the audit mapper listeners: records which DataTable a changed
+    DataTable/ExperimentDataRow belongs to. Generations are bumped on commit.
+    """
+    data_table_id = getattr(target, 'data_table_id', None)
+    if data_table_id is None and target.__class__.__name__ == 'DataTable':
+        data_table_id = target.id
+    if data_table_id is None:
+        return
+    session = object_session(target)
+    if session is not None:
+        mark_datatables_stale(session, [data_table_id])
+
+
+def mark_datatables_stale(session, data_table_ids):
+    """
+    Records DataTables whose frames must be invalidated when the session commits.
+    Call explicitly around Core/bulk writes that bypass the mapper listeners.
+    """
+    session.info.setdefault(STALE_DATATABLES_KEY, set()).update(data_table_ids)
+
+
+def invalidate_datatables(data_table_ids):
+    """Bumps the generation of the given DataTables so their cached frames are no longer addressed."""
+    backend = get_frame_cache_backend()
+    if backend is None or not data_table_ids:
+        return
+    try:
+        backend.bump_generations(sorted(data_table_ids))
+    except Exception as e:
+        current_app.logger.warning(f"DataFrame cache invalidation failed: {e}")
+
+
+def register_frame_cache_listeners():
+    """Flushes the stale DataTable marks on commit; discards them on rollback."""
+    global _listeners_registered
+    if _listeners_registered:
+        return
+    _listeners_registered = True
+
+    @event.listens_for(Session, 'after_commit')
+    def _after_commit(session):
+        stale = session.info.pop(STALE_DATATABLES_KEY, None)
+        if stale:
+            invalidate_datatables(stale)
+
+    @event.listens_for(Session, 'after_soft_rollback')
+    def _after_rollback(session, previous_transaction):
+        if previous_transaction.parent is None:
+            session.info.pop(STALE_DATATABLES_KEY, None)
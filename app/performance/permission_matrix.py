@@ -0,0 +1,347 @@
+# app/performance/permission_matrix.py
+"""
+Materialized (user, project) -> permission bitmask matrix shared across requests.
+
+``PermissionService`` stores the 13 effective project flags of a user as one
+integer and reads them back in O(1) instead of re-resolving teams, roles and
+shares on every request. Each entry is tagged with the version counters of its
+user and project at computation time; a session ``after_flush`` hook records
+which users/projects are affected by changes to memberships, role links, roles,
+shares or project ownership, and their counters are bumped once the
+transaction commits. Entries whose versions no longer match are simply
+recomputed on the next read, so the matrix is rebuilt incrementally.
+
+Backends (``PERMISSION_MATRIX_BACKEND``): ``'memory'`` (per process, for
+single-worker deployments and tests), ``'table'`` (``permission_matrix_entry``
+/ ``permission_matrix_version``) and ``'redis'``. ``'none'`` disables the matrix.
+"""
+import threading
+
+from flask import current_app
+from sqlalchemy import and_, delete, event, insert, inspect, or_, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+PERMISSION_FLAGS = (
+    'can_view_project',
+    'can_view_exp_groups',
+    'can_view_datatables',
+    'can_view_samples',
+    'can_create_exp_groups',
+    'can_edit_exp_groups',
+    'can_delete_exp_groups',
+    'can_create_datatables',
+    'can_edit_datatables',
+    'can_delete_datatables',
+    'can_view_unblinded_data',
+    'is_owner_team_member',
+    'is_admin',
+)
+STALE_PERMISSIONS_KEY = 'permission_matrix_stale'
+
+_listeners_registered = False
+
+
+def encode_permissions(perms):
+    """Packs a permissions dict into a bitmask (bit i = PERMISSION_FLAGS[i])."""
+    mask = 0
+    for bit, flag in enumerate(PERMISSION_FLAGS):
+        if perms.get(flag):
+            mask |= 1 << bit
+    return mask
+
+
+def decode_permissions(mask):
+    """Unpacks a bitmask into the permissions dict returned by PermissionService."""
+    return {flag: bool(mask & (1 << bit)) for bit, flag in enumerate(PERMISSION_FLAGS)}
+
+
+# ---------------------------------------------------------------------------
+# Backends
+# ---------------------------------------------------------------------------
+# lookup(user_id, project_ids) -> {project_id: (mask or None, token)}
+# store(user_id, entries)      -> entries: iterable of (project_id, mask, token)
+# bump(user_ids, project_ids)  -> invalidates every entry of these users/projects
+# The token holds the (user_version, project_version) read by lookup; storing
+# with a token that is already outdated yields an entry that is never served.
+
+class MemoryPermissionMatrixBackend:
+    """Per-process dictionaries guarded by a lock."""
+
+    def __init__(self):
+        self._entries = {}
+        self._versions = {}
+        self._lock = threading.Lock()
+
+    def lookup(self, user_id, project_ids):
+        results = {}
+        with self._lock:
+            user_version = self._versions.get(('user', user_id), 0)
+            for project_id in project_ids:
+                token = (user_version, self._versions.get(('project', project_id), 0))
+                entry = self._entries.get((user_id, project_id))
+                mask = entry[0] if entry is not None and entry[1] == token else None
+                results[project_id] = (mask, token)
+        return results
+
+    def store(self, user_id, entries):
+        with self._lock:
+            for project_id, mask, token in entries:
+                self._entries[(user_id, project_id)] = (mask, token)
+
+    def bump(self, user_ids=(), project_ids=()):
+        with self._lock:
+            for key in [('user', u) for u in user_ids] + [('project', p) for p in project_ids]:
+                self._versions[key] = self._versions.get(key, 0) + 1
+
+
+class TablePermissionMatrixBackend:
+    """
+    Stores entries and counters in SQL tables. Entries are written in their own
+    transaction so that matrices computed by read-only requests are kept.
+    """
+
+    BUMP_ATTEMPTS = 3
+
+    def lookup(self, user_id, project_ids):
+        from app.extensions import db
+        from app.models import PermissionMatrixEntry, PermissionMatrixVersion
+
+        project_ids = list(project_ids)
+        if not project_ids:
+            return {}
+        versions = {
+            (scope, scope_id): version
+            for scope, scope_id, version in db.session.execute(
+                select(PermissionMatrixVersion.scope, PermissionMatrixVersion.scope_id, PermissionMatrixVersion.version)
+                .where(or_(
+                    and_(PermissionMatrixVersion.scope == 'user', PermissionMatrixVersion.scope_id == user_id),
+                    and_(PermissionMatrixVersion.scope == 'project', PermissionMatrixVersion.scope_id.in_(project_ids)),
+                ))
+            )
+        }
+        entries = {
+            row.project_id: row
+            for row in db.session.execute(
+                select(PermissionMatrixEntry.project_id, PermissionMatrixEntry.mask,
+                       PermissionMatrixEntry.user_version, PermissionMatrixEntry.project_version)
+                .where(PermissionMatrixEntry.user_id == user_id, PermissionMatrixEntry.project_id.in_(project_ids))
+            )
+        }
+
+        user_version = versions.get(('user', user_id), 0)
+        results = {}
+        for project_id in project_ids:
+            token = (user_version, versions.get(('project', project_id), 0))
+            row = entries.get(project_id)
+            mask = row.mask if row is not None and (row.user_version, row.project_version) == token else None
+            results[project_id] = (mask, token)
+        return results
+
+    def store(self, user_id, entries):
+        from app.extensions import db
+        from app.models import PermissionMatrixEntry
+
+        rows = [{'user_id': user_id, 'project_id': project_id, 'mask': mask,
+                 'user_version': token[0], 'project_version': token[1]}
+                for project_id, mask, token in entries]
+        if not rows:
+            return
+        table = PermissionMatrixEntry.__table__
+        try:
+            with db.engine.begin() as connection:
+                connection.execute(delete(table).where(
+                    table.c.user_id == user_id, table.c.project_id.in_([r['project_id'] for r in rows])
+                ))
+                connection.execute(insert(table), rows)
+        except IntegrityError:
+            # A concurrent request stored the same entries first
+            pass
+
+    def bump(self, user_ids=(), project_ids=()):
+        from app.extensions import db
+        from app.models import PermissionMatrixVersion
+
+        table = PermissionMatrixVersion.__table__
+        scopes = [(scope, ids) for scope, ids in (('user', set(user_ids)), ('project', set(project_ids))) if ids]
+        for attempt in range(self.BUMP_ATTEMPTS):
+            try:
+                with db.engine.begin() as connection:
+                    for scope, ids in scopes:
+                        connection.execute(update(table).where(table.c.scope == scope, table.c.scope_id.in_(ids))
+                                           .values(version=table.c.version + 1))
+                        existing = set(connection.execute(
+                            select(table.c.scope_id).where(table.c.scope == scope, table.c.scope_id.in_(ids))
+                        ).scalars())
+                        missing = [{'scope': scope, 'scope_id': i, 'version': 1} for i in ids - existing]
+                        if missing:
+                            connection.execute(insert(table), missing)
+                return
+            except IntegrityError:
+                # A concurrent first bump inserted the same counter: the whole bump was
+                # rolled back, and the retry increments the now existing row
+                if attempt == self.BUMP_ATTEMPTS - 1:
+                    raise
+
+
+class RedisPermissionMatrixBackend:
+    """Stores entries as ``mask:user_version:project_version`` strings next to INCR counters."""
+
+    PREFIX = 'precliniset:perm_matrix:'
+
+    def __init__(self, url, ttl):
+        import redis
+        self.client = redis.Redis.from_url(url)
+        self.ttl = ttl
+
+    def _version_key(self, scope, scope_id):
+        return f'{self.PREFIX}v:{scope}:{scope_id}'
+
+    def _entry_key(self, user_id, project_id):
+        return f'{self.PREFIX}e:{user_id}:{project_id}'
+
+    def lookup(self, user_id, project_ids):
+        project_ids = list(project_ids)
+        if not project_ids:
+            return {}
+        keys = [self._version_key('user', user_id)]
+        keys += [self._version_key('project', p) for p in project_ids]
+        keys += [self._entry_key(user_id, p) for p in project_ids]
+        values = self.client.mget(keys)
+
+        user_version = int(values[0] or 0)
+        project_versions = values[1:1 + len(project_ids)]
+        raw_entries = values[1 + len(project_ids):]
+        results = {}
+        for project_id, project_version, raw in zip(project_ids, project_versions, raw_entries):
+            token = (user_version, int(project_version or 0))
+            mask = None
+            if raw is not None:
+                stored_mask, stored_uv, stored_pv = (int(part) for part in raw.decode('utf-8').split(':'))
+                if (stored_uv, stored_pv) == token:
+                    mask = stored_mask
+            results[project_id] = (mask, token)
+        return results
+
+    def store(self, user_id, entries):
+        pipe = self.client.pipeline()
+        for project_id, mask, token in entries:
+            pipe.set(self._entry_key(user_id, project_id), f'{mask}:{token[0]}:{token[1]}', ex=self.ttl)
+        pipe.execute()
+
+    def bump(self, user_ids=(), project_ids=()):
+        pipe = self.client.pipeline()
+        for user_id in set(user_ids):
+            pipe.incr(self._version_key('user', user_id))
+        for project_id in set(project_ids):
+            pipe.incr(self._version_key('project', project_id))
+        pipe.execute()
+
+
+def get_permission_matrix():
+    """Returns the configured backend for the current app, or None when disabled."""
+    app = current_app._get_current_object()
+    backend_name = app.config.get('PERMISSION_MATRIX_BACKEND', 'none')
+    if backend_name in (None, '', 'none'):
+        return None
+
+    backend = app.extensions.get('permission_matrix')
+    if backend is None:
+        if backend_name == 'redis':
+            backend = RedisPermissionMatrixBackend(
+                app.config['PERMISSION_MATRIX_REDIS_URL'], app.config.get('PERMISSION_MATRIX_TTL', 86400)
+            )
+        elif backend_name == 'table':
+            backend = TablePermissionMatrixBackend()
+        else:
+            backend = MemoryPermissionMatrixBackend()
+        app.extensions['permission_matrix'] = backend
+    return backend
+
+
+# ---------------------------------------------------------------------------
+# Invalidation
+# ---------------------------------------------------------------------------
+
+def mark_permissions_stale(session, user_ids=(), project_ids=()):
+    """
+    Records users/projects whose matrix entries must be invalidated when the
+    session commits. Call explicitly around Core/bulk writes that bypass the ORM
+    (e.g. ``Query.delete()`` on memberships or role links).
+    """
+    stale = session.info.setdefault(STALE_PERMISSIONS_KEY, {'users': set(), 'projects': set()})
+    stale['users'].update(u for u in user_ids if u is not None)
+    stale['projects'].update(p for p in project_ids if p is not None)
+
+
+def invalidate_permissions(user_ids=(), project_ids=()):
+    """Bumps the version counters of the given users/projects."""
+    try:
+        backend = get_permission_matrix()
+    except RuntimeError:
+        # Outside an application context (e.g. scripts): nothing is cached
+        return
+    if backend is None or not (user_ids or project_ids):
+        return
+    try:
+        backend.bump(user_ids=sorted(user_ids), project_ids=sorted(project_ids))
+    except Exception as e:
+        current_app.logger.warning(f"Permission matrix invalidation failed: {e}")
+
+
+def _collect_flush_changes(session):
+    """Resolves the users/projects affected by the objects of a flush."""
+    from app.models import (Project, ProjectTeamShare, ProjectUserShare, Role,
+                            TeamMembership, User, UserTeamRoleLink)
+
+    user_ids, project_ids, role_ids = set(), set(), set()
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, (TeamMembership, UserTeamRoleLink)):
+            user_ids.add(obj.user_id)
+        elif isinstance(obj, (ProjectUserShare, ProjectTeamShare)):
+            project_ids.add(obj.project_id)
+        elif isinstance(obj, Project):
+            if obj in session.deleted or inspect(obj).attrs.team_id.history.has_changes():
+                project_ids.add(obj.id)
+        elif isinstance(obj, User):
+            if obj in session.deleted or inspect(obj).attrs.is_super_admin.history.has_changes():
+                user_ids.add(obj.id)
+        elif isinstance(obj, Role) and obj not in session.new:
+            role_ids.add(obj.id)
+
+    if role_ids:
+        # Role permissions changed: every user holding the role is affected
+        user_ids.update(session.execute(
+            select(UserTeamRoleLink.user_id).where(UserTeamRoleLink.role_id.in_(role_ids))
+        ).scalars())
+    return user_ids, project_ids
+
+
+def register_permission_matrix_listeners(app):
+    """Collects affected users/projects on flush; bumps their versions on commit."""
+    global _listeners_registered
+    if _listeners_registered:
+        return
+    _listeners_registered = True
+
+    @event.listens_for(Session, 'after_flush')
+    def _after_flush(session, flush_context):
+        try:
+            if get_permission_matrix() is None:
+                return
+        except RuntimeError:
+            return
+        user_ids, project_ids = _collect_flush_changes(session)
+        if user_ids or project_ids:
+            mark_permissions_stale(session, user_ids, project_ids)
+
+    @event.listens_for(Session, 'after_commit')
+    def _after_commit(session):
+        stale = session.info.pop(STALE_PERMISSIONS_KEY, None)
+        if stale:
+            invalidate_permissions(stale['users'], stale['projects'])
+
+    @event.listens_for(Session, 'after_soft_rollback')
+    def _after_rollback(session, previous_transaction):
+        if previous_transaction.parent is None:
+            session.info.pop(STALE_PERMISSIONS_KEY, None)
@@ -0,0 +1,265 @@
+# app/performance/rbac_snapshot.py
+"""
+In-process snapshot of the RBAC graph used by ``user_has_permission``.
+
+Each worker loads the role -> permission sets and role scopes once, and the
+user -> team -> roles links of a user the first time that user is checked. A
+permission check then becomes a set lookup instead of a four-table join.
+
+The snapshot is tagged with a global version stamp (``'memory'``: per process,
+``'redis'``: shared INCR counter). Each application context checks the stamp
+once and rebuilds the snapshot when it moved. A session ``after_flush`` hook
+detects changes to roles, role permissions, role links and users, and the
+stamp is bumped once the transaction commits. While a session holds
+uncommitted RBAC changes, checks made through it bypass the snapshot so they
+see their own writes. Snapshots are loaded on a fresh connection: under MySQL
+REPEATABLE READ the request's own transaction may predate the stamp it just
+read, and would cache old links under the new version.
+"""
+import threading
+from contextlib import contextmanager
+
+from flask import current_app, g
+from sqlalchemy import event, inspect, select
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+STALE_RBAC_KEY = 'rbac_snapshot_stale'
+
+_listeners_registered = False
+
+
+class MemoryVersionStamp:
+    """Per-process counter (single-worker deployments and tests)."""
+
+    def __init__(self):
+        self._version = 0
+        self._lock = threading.Lock()
+
+    def get(self):
+        return self._version
+
+    def bump(self):
+        with self._lock:
+            self._version += 1
+
+
+class RedisVersionStamp:
+    """Counter shared by every worker through Redis."""
+
+    KEY = 'precliniset:rbac_snapshot:version'
+
+    def __init__(self, url):
+        import redis
+        self.client = redis.Redis.from_url(url)
+
+    def get(self):
+        return int(self.client.get(self.KEY) or 0)
+
+    def bump(self):
+        self.client.incr(self.KEY)
+
+
+@contextmanager
+def _snapshot_reader(session):
+    """
+    Yields what to run the snapshot queries on: a new connection (new
+    transaction) from the session's engine. A session bound to an explicit
+    connection shares that connection's transaction by design and keeps it.
+    """
+    bind = session.get_bind()
+    if isinstance(bind, Connection):
+        yield session
+        return
+    with bind.connect() as connection:
+        yield connection
+
+
+class RBACSnapshot:
+    """Role permission sets, role scopes and per-user role links at one version."""
+
+    def __init__(self, version, role_permissions, role_teams):
+        self.version = version
+        self.role_permissions = role_permissions  # {role_id: frozenset((resource, action))}
+        self.role_teams = role_teams              # {role_id: team_id or None}
+        self.user_links = {}                      # {user_id: ((team_id, role_id), ...)}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, session, version):
+        from app.models import Permission, Role, role_permissions
+
+        with _snapshot_reader(session) as reader:
+            role_teams = dict(reader.execute(select(Role.id, Role.team_id)).all())
+            grants = {}
+            for role_id, resource, action in reader.execute(
+                select(role_permissions.c.role_id, Permission.resource, Permission.action)
+                .join(Permission, Permission.id == role_permissions.c.permission_id)
+            ):
+                grants.setdefault(role_id, set()).add((resource, action))
+        return cls(version, {role_id: frozenset(perms) for role_id, perms in grants.items()}, role_teams)
+
+    def links_for(self, session, user_id):
+        """Returns the (team_id, role_id) links of a user, loading them on first use."""
+        from app.models import UserTeamRoleLink
+
+        links = self.user_links.get(user_id)
+        if links is not None:
+            _stats['hits'] += 1
+            return links
+        _stats['misses'] += 1
+        with _snapshot_reader(session) as reader:
+            links = tuple(reader.execute(
+                select(UserTeamRoleLink.team_id, UserTeamRoleLink.role_id).where(UserTeamRoleLink.user_id == user_id)
+            ).all())
+        with self._lock:
+            self.user_links[user_id] = links
+        return links
+
+    def has_permission(self, session, user_id, resource, action, team_id=None, allow_any_team=False):
+        """Same semantics as the SQL check of ``user_has_permission``."""
+        wanted = (resource, action)
+        for link_team_id, role_id in self.links_for(session, user_id):
+            if wanted not in self.role_permissions.get(role_id, ()):
+                continue
+            role_team_id = self.role_teams.get(role_id)
+            if team_id:
+                if link_team_id == team_id and role_team_id in (team_id, None):
+                    return True
+            elif allow_any_team or role_team_id is None:
+                return True
+        return False
+
+
+_stats = {'hits': 0, 'misses': 0, 'rebuilds': 0, 'bypasses': 0}
+_build_lock = threading.Lock()
+
+
+def rbac_snapshot_stats():
+    """Hit/miss counters of this worker (hits/misses count per-user link lookups)."""
+    return dict(_stats)
+
+
+def reset_rbac_snapshot_stats():
+    for key in _stats:
+        _stats[key] = 0
+
+
+def get_version_stamp():
+    """Returns the configured version stamp for the current app, or None when disabled."""
+    app = current_app._get_current_object()
+    backend_name = app.config.get('RBAC_SNAPSHOT_BACKEND', 'none')
+    if backend_name in (None, '', 'none'):
+        return None
+
+    stamp = app.extensions.get('rbac_version_stamp')
+    if stamp is None:
+        if backend_name == 'redis':
+            stamp = RedisVersionStamp(app.config['RBAC_SNAPSHOT_REDIS_URL'])
+        else:
+            stamp = MemoryVersionStamp()
+        app.extensions['rbac_version_stamp'] = stamp
+    return stamp
+
+
+def get_rbac_snapshot(session):
+    """
+    Returns the snapshot to answer checks made through ``session``, or None when
+    the snapshot is disabled or the session has uncommitted RBAC changes.
+    """
+    if session.info.get(STALE_RBAC_KEY):
+        _stats['bypasses'] += 1
+        return None
+    stamp = get_version_stamp()
+    if stamp is None:
+        return None
+
+    app = current_app._get_current_object()
+    snapshot = app.extensions.get('rbac_snapshot')
+    if snapshot is not None and g.get('_rbac_snapshot_checked'):
+        return snapshot
+
+    try:
+        version = stamp.get()
+    except Exception as e:
+        current_app.logger.warning(f"RBAC snapshot version check failed: {e}")
+        return None
+    if snapshot is None or snapshot.version != version:
+        with _build_lock:
+            snapshot = app.extensions.get('rbac_snapshot')
+            if snapshot is None or snapshot.version != version:
+                snapshot = RBACSnapshot.load(session, version)
+                app.extensions['rbac_snapshot'] = snapshot
+                _stats['rebuilds'] += 1
+    g._rbac_snapshot_checked = True
+    return snapshot
+
+
+# ---------------------------------------------------------------------------
+# Invalidation
+# ---------------------------------------------------------------------------
+
+def mark_rbac_stale(session):
+    """
+    Flags the session as holding RBAC changes; the version stamp is bumped when
+    it commits. Call explicitly around Core/bulk writes that bypass the ORM
+    (e.g. ``Query.delete()`` on role links or roles).
+    """
+    session.info[STALE_RBAC_KEY] = True
+
+
+def invalidate_rbac_snapshot():
+    """Bumps the version stamp and drops this worker's snapshot."""
+    try:
+        stamp = get_version_stamp()
+    except RuntimeError:
+        # Outside an application context (e.g. scripts): nothing is cached
+        return
+    if stamp is None:
+        return
+    current_app.extensions.pop('rbac_snapshot', None)
+    g.pop('_rbac_snapshot_checked', None)
+    try:
+        stamp.bump()
+    except Exception as e:
+        current_app.logger.warning(f"RBAC snapshot invalidation failed: {e}")
+
+
+def _has_rbac_changes(session):
+    from app.models import Permission, Role, User, UserTeamRoleLink
+
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, (Role, UserTeamRoleLink, Permission)):
+            return True
+        if isinstance(obj, User) and obj not in session.new:
+            if obj in session.deleted or inspect(obj).attrs.is_super_admin.history.has_changes():
+                return True
+    return False
+
+
+def register_rbac_snapshot_listeners(app):
+    """Flags RBAC changes on flush; bumps the version stamp on commit."""
+    global _listeners_registered
+    if _listeners_registered:
+        return
+    _listeners_registered = True
+
+    @event.listens_for(Session, 'after_flush')
+    def _after_flush(session, flush_context):
+        try:
+            if get_version_stamp() is None:
+                return
+        except RuntimeError:
+            return
+        if _has_rbac_changes(session):
+            mark_rbac_stale(session)
+
+    @event.listens_for(Session, 'after_commit')
+    def _after_commit(session):
+        if session.info.pop(STALE_RBAC_KEY, None):
+            invalidate_rbac_snapshot()
+
+    @event.listens_for(Session, 'after_soft_rollback')
+    def _after_rollback(session, previous_transaction):
+        if previous_transaction.parent is None:
+            session.info.pop(STALE_RBAC_KEY, None)
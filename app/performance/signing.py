@@ -0,0 +1,41 @@
+# app/performance/signing.py
+"""
+HMAC signing of cache entries.
+
+The DataFrame and query caches may live in a shared Redis or on a shared disk
+and can hold pickled payloads. Every entry is prefixed with an HMAC-SHA256
+keyed by the application's SECRET_KEY (and a per-cache purpose), and is only
+decoded once the signature has been verified, so a process that can write to
+the cache store but does not know SECRET_KEY cannot get code executed.
+"""
+import hashlib
+import hmac
+
+from flask import current_app
+
+SIGNATURE_SIZE = hashlib.sha256().digest_size
+
+
+def _signing_key(purpose):
+    secret = current_app.config.get('SECRET_KEY')
+    if not secret:
+        raise RuntimeError('SECRET_KEY is required to sign cache entries.')
+    if isinstance(secret, str):
+        secret = secret.encode('utf-8')
+    return hmac.new(secret, purpose.encode('utf-8'), hashlib.sha256).digest()
+
+
+def sign_blob(blob, purpose):
+    """Returns ``blob`` prefixed with its signature."""
+    return hmac.new(_signing_key(purpose), blob, hashlib.sha256).digest() + blob
+
+
+def verify_blob(signed, purpose):
+    """Returns the payload of a signed blob, or None when the signature does not match."""
+    if signed is None or len(signed) < SIGNATURE_SIZE:
+        return None
+    signature, blob = signed[:SIGNATURE_SIZE], signed[SIGNATURE_SIZE:]
+    expected = hmac.new(_signing_key(purpose), blob, hashlib.sha256).digest()
+    if not hmac.compare_digest(signature, expected):
+        return None
+    return blob
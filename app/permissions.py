@@ -9,9 +9,13 @@ from flask_login import current_user
 
 from app.services.permission_service import PermissionService
 
+from sqlalchemy import or_
+
 from .extensions import db
-from .models import (DataTable, ExperimentalGroup, Project, ReferenceRange,
-                     user_has_permission, User)
+from .models import (DataTable, ExperimentalGroup, Permission, Project,
+                     ReferenceRange, Role, Sample, Team, User,
+                     UserTeamRoleLink, role_permissions, user_has_permission)
+from .queries import readable_project_ids
 
 perm_service = PermissionService()
 
@@ -138,6 +142,84 @@ def check_datatable_permission(datatable_or_id, action, allow_abort=True, user_i
     if allow_abort: abort(403)
     return False
 
+# --- Set-based read authorization ---
+
+# Share flag granting read access to each project-scoped model (see PermissionService)
+READ_SHARE_FLAGS = {
+    Project: 'can_view_project',
+    ExperimentalGroup: 'can_view_exp_groups',
+    DataTable: 'can_view_datatables',
+    Sample: 'can_view_samples',
+}
+
+
+def readable_criterion(user, model):
+    """
+    Returns a SQL criterion restricting ``model`` rows to those ``user`` can read,
+    or None when no restriction applies (super admin).
+    Supports Project, ExperimentalGroup, DataTable, Sample and ReferenceRange.
+    """
+    if model is ReferenceRange:
+        return _readable_reference_range_criterion(user)
+    if model not in READ_SHARE_FLAGS:
+        raise ValueError(f"Read authorization is not defined for {model.__name__}")
+
+    project_ids = readable_project_ids(user, READ_SHARE_FLAGS[model])
+    if project_ids is None:
+        return None
+    if model is Project:
+        return Project.id.in_(project_ids)
+    if model is ExperimentalGroup:
+        return ExperimentalGroup.project_id.in_(project_ids)
+
+    group_ids = db.session.query(ExperimentalGroup.id).filter(ExperimentalGroup.project_id.in_(project_ids)).correlate(None)
+    if model is DataTable:
+        return DataTable.group_id.in_(group_ids)
+    return Sample.experimental_group_id.in_(group_ids)
+
+
+def _readable_reference_range_criterion(user):
+    """Globally shared ranges, ranges of teams where the user has 'ReferenceRange:view', and ranges shared with their teams."""
+    if not user or not user.is_authenticated:
+        return db.literal(False)
+    if user.is_super_admin:
+        return None
+
+    viewable_team_ids = db.session.query(UserTeamRoleLink.team_id).join(Role).join(role_permissions).join(Permission).filter(
+        UserTeamRoleLink.user_id == user.id,
+        Permission.resource == 'ReferenceRange',
+        Permission.action == 'view',
+        or_(Role.team_id == UserTeamRoleLink.team_id, Role.team_id.is_(None))
+    ).correlate(None)
+    user_team_ids = [t.id for t in user.get_teams()]
+    return or_(
+        ReferenceRange.is_globally_shared == True,
+        ReferenceRange.team_id.in_(viewable_team_ids),
+        ReferenceRange.shared_with_teams.any(Team.id.in_(user_team_ids)),
+    )
+
+
+def filter_readable(user, model, ids_or_query):
+    """
+    Restricts ``ids_or_query`` to the ``model`` rows ``user`` can read, in a single
+    SQL query, instead of calling check_*_permission per row.
+
+    :param ids_or_query: a query selecting ``model`` rows (returns the filtered query)
+                         or an iterable of primary keys (returns the set of readable ids).
+    """
+    criterion = readable_criterion(user, model)
+    if hasattr(ids_or_query, 'filter'):
+        return ids_or_query if criterion is None else ids_or_query.filter(criterion)
+
+    ids = list(ids_or_query)
+    if not ids:
+        return set()
+    query = db.session.query(model.id).filter(model.id.in_(ids))
+    if criterion is not None:
+        query = query.filter(criterion)
+    return {row_id for (row_id,) in query}
+
+
 def can_create_datatable_for_group(group_or_id):
     """Checks if the current user can create a datatable for a group."""
     try:
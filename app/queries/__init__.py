@@ -2,6 +2,6 @@
 """
 Query objects for reusable database query logic.
 """
-from .project_query import ProjectQuery
+from .project_query import ProjectQuery, readable_project_ids
 
-__all__ = ['ProjectQuery']
+__all__ = ['ProjectQuery', 'readable_project_ids']
@@ -0,0 +1,128 @@
+# app/queries/keyset.py
+"""
+Keyset (seek) pagination helpers for the server-side listings.
+
+A page is read with ``WHERE (sort_col, id) > (last_value, last_id)`` instead
+of ``OFFSET``, so deep pages cost the same as the first one. The position is
+carried by an opaque cursor returned with each page; it is only honoured for
+the same sort/filter signature and the ``start`` offset it was issued for,
+otherwise the listing falls back to ``OFFSET``.
+"""
+import base64
+import hashlib
+import json
+from datetime import date, datetime
+
+from sqlalchemy import and_, func, or_
+
+
+def listing_signature(*parts):
+    """Short hash identifying a sort/filter combination."""
+    return hashlib.sha1(repr(parts).encode('utf-8')).hexdigest()[:16]
+
+
+def _encode_value(value):
+    if isinstance(value, datetime):
+        return {'dt': value.isoformat()}
+    if isinstance(value, date):
+        return {'d': value.isoformat()}
+    return value
+
+
+def _decode_value(value):
+    if isinstance(value, dict):
+        if 'dt' in value:
+            return datetime.fromisoformat(value['dt'])
+        if 'd' in value:
+            return date.fromisoformat(value['d'])
+    return value
+
+
+def encode_cursor(signature, start, sort_value, last_id):
+    payload = json.dumps([signature, start, _encode_value(sort_value), last_id], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(cursor, signature, start):
+    """
+    Returns (sort_value, last_id) when ``cursor`` was issued for this signature
+    and page start, None otherwise (including malformed cursors).
+    """
+    if not cursor:
+        return None
+    try:
+        cur_signature, cur_start, sort_value, last_id = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+    except (ValueError, TypeError):
+        return None
+    if cur_signature != signature or cur_start != start:
+        return None
+    return _decode_value(sort_value), last_id
+
+
+def is_seekable(column):
+    """Keyset needs a total order; NULL placement differs between databases."""
+    expression = getattr(column, 'expression', column)
+    return not getattr(expression, 'nullable', True)
+
+
+def order_with_tiebreaker(query, sort_column, id_column, direction):
+    if direction == 'desc':
+        return query.order_by(sort_column.desc(), id_column.desc())
+    return query.order_by(sort_column.asc(), id_column.asc())
+
+
+def apply_seek(query, sort_column, id_column, direction, position):
+    """Filters ``query`` to the rows after ``position`` = (sort_value, last_id)."""
+    sort_value, last_id = position
+    if direction == 'desc':
+        return query.filter(or_(sort_column < sort_value, and_(sort_column == sort_value, id_column < last_id)))
+    return query.filter(or_(sort_column > sort_value, and_(sort_column == sort_value, id_column > last_id)))
+
+
+def paginate(query, sort_column, id_column, direction, start, per_page, signature, cursor=None):
+    """
+    Returns (items, next_cursor) for one page of ``query``, seeking from
+    ``cursor`` when it is valid for ``start`` and OFFSET-ing otherwise.
+    ``next_cursor`` is None for non-seekable sort columns and on the last page.
+    """
+    seekable = is_seekable(sort_column)
+    query = order_with_tiebreaker(query, sort_column, id_column, direction)
+
+    if not seekable:
+        return query.offset(start).limit(per_page).all(), None
+
+    # The sort value may live on a joined entity: select it next to each row
+    query = query.add_columns(sort_column)
+    position = decode_cursor(cursor, signature, start)
+    if position is not None:
+        rows = apply_seek(query, sort_column, id_column, direction, position).limit(per_page).all()
+    else:
+        rows = query.offset(start).limit(per_page).all()
+
+    next_cursor = None
+    if len(rows) == per_page:
+        last, sort_value = rows[-1]
+        next_cursor = encode_cursor(signature, start + per_page, sort_value, last.id)
+    return [row[0] for row in rows], next_cursor
+
+
+def count_rows(query, id_column):
+    """COUNT over the filtered query without eager loads, ORDER BY or a wrapping subquery."""
+    return query.enable_eagerloads(False).order_by(None).with_entities(func.count(id_column)).scalar() or 0
+
+
+def iter_ids(query, id_column, batch_size=1000):
+    """Yields the ids matched by ``query`` in id order, one keyset batch at a time."""
+    id_query = query.enable_eagerloads(False).order_by(None).with_entities(id_column)
+    last_id = None
+    while True:
+        batch = id_query
+        if last_id is not None:
+            batch = batch.filter(id_column > last_id)
+        ids = [row[0] for row in batch.order_by(id_column.asc()).limit(batch_size).all()]
+        if not ids:
+            return
+        yield from ids
+        if len(ids) < batch_size:
+            return
+        last_id = ids[-1]
@@ -8,6 +8,69 @@ from sqlalchemy import or_
 from app.extensions import db
 
 
+def readable_project_ids(user, share_flag='can_view_project'):
+    """
+    Subquery of the ids of the projects on which ``user`` has ``share_flag``
+    (a ProjectShareMixin flag), following the rules of PermissionService:
+
+    1. Projects owned by the user's teams, if the user has 'Project:read' for that team
+    2. Projects shared with the user's teams with ``share_flag``
+    3. Projects shared directly with the user with ``share_flag``
+
+    Returns None for super admins (no restriction) and an empty subquery for
+    unauthenticated users.
+    :param user: User object
+    :param share_flag: Share column granting the access (e.g. 'can_view_datatables')
+    """
+    from app.models import (
+        Project, ProjectTeamShare, ProjectUserShare,
+        UserTeamRoleLink, Role, role_permissions, Permission
+    )
+
+    if not user or not user.is_authenticated:
+        return db.session.query(Project.id).filter(db.literal(False))
+
+    if user.is_super_admin:
+        return None
+
+    user_team_ids = [team.id for team in user.get_teams()]
+
+    # A project is "owned" by a user if:
+    # - The user is a member of the team that owns the project
+    # - AND the user has 'Project:read' permission for that team
+    has_project_read_permission = db.session.query(db.literal(1)).select_from(
+        UserTeamRoleLink
+    ).join(Role).join(role_permissions).join(Permission).filter(
+        UserTeamRoleLink.user_id == user.id,
+        Permission.resource == 'Project',
+        Permission.action == 'read',
+        UserTeamRoleLink.team_id == Project.team_id,
+        or_(Role.team_id == Project.team_id, Role.team_id.is_(None))
+    ).exists()
+
+    # correlate(None): the subquery is embedded in queries that may already select
+    # from these tables (e.g. Project, or Samples joined to their Project)
+    # Projects shared directly with the user
+    readable = db.session.query(ProjectUserShare.project_id).filter(
+        ProjectUserShare.user_id == user.id,
+        getattr(ProjectUserShare, share_flag) == True
+    ).correlate(None)
+    if user_team_ids:
+        readable = readable.union(
+            # Projects owned by user's teams WITH read permission
+            db.session.query(Project.id).filter(
+                Project.team_id.in_(user_team_ids),
+                has_project_read_permission
+            ).correlate(None),
+            # Projects shared with user's teams
+            db.session.query(ProjectTeamShare.project_id).filter(
+                ProjectTeamShare.team_id.in_(user_team_ids),
+                getattr(ProjectTeamShare, share_flag) == True
+            ).correlate(None)
+        )
+    return readable
+
+
 class ProjectQuery(db.Query):
     """
     Custom query class for Project model.
@@ -50,73 +113,14 @@ class ProjectQuery(db.Query):
         
         :param user: User object
         """
-        from app.models import (
-            Project, ProjectTeamShare, ProjectUserShare,
-            UserTeamRoleLink, Role, role_permissions, Permission
-        )
-        
-        if not user or not user.is_authenticated:
-            # Return empty query for unauthenticated users
-            return self.filter(db.literal(False))
-        
-        if user.is_super_admin:
+        from app.models import Project
+
+        readable_ids = readable_project_ids(user)
+        if readable_ids is None:
             # Super admin sees everything
             return self
-        
-        # Get user's team IDs
-        user_teams = user.get_teams()
-        user_team_ids = [team.id for team in user_teams]
-        
-        if not user_team_ids:
-            # User has no teams, check for direct shares only
-            return self._filter_by_direct_shares(user.id)
-        
-        # Check for Project:read permission on owned teams
-        # A project is "owned" by a user if:
-        # - The user is a member of the team that owns the project
-        # - AND the user has 'Project:read' permission for that team
-        
-        has_project_read_permission = db.session.query(db.literal(1)).select_from(
-            UserTeamRoleLink
-        ).join(Role).join(role_permissions).join(Permission).filter(
-            UserTeamRoleLink.user_id == user.id,
-            Permission.resource == 'Project',
-            Permission.action == 'read',
-            UserTeamRoleLink.team_id == Project.team_id,
-            or_(Role.team_id == Project.team_id, Role.team_id.is_(None))
-        ).exists()
-        
-        # Subquery for projects owned by user's teams WITH read permission
-        owned_projects_subq = db.session.query(Project.id).filter(
-            Project.team_id.in_(user_team_ids),
-            has_project_read_permission
-        ).union(
-            # Subquery for projects shared with user's teams
-            db.session.query(ProjectTeamShare.project_id).filter(
-                ProjectTeamShare.team_id.in_(user_team_ids),
-                ProjectTeamShare.can_view_project == True
-            ),
-            # Subquery for projects shared directly with user
-            db.session.query(ProjectUserShare.project_id).filter(
-                ProjectUserShare.user_id == user.id,
-                ProjectUserShare.can_view_project == True
-            )
-        )
-        
-        return self.filter(Project.id.in_(owned_projects_subq))
-    
-    def _filter_by_direct_shares(self, user_id):
-        """
-        Internal: Filter only by direct user shares (no team membership).
-        """
-        from app.models import ProjectUserShare
-        return self.join(
-            ProjectUserShare,
-            (ProjectUserShare.project_id == Project.id) & (ProjectUserShare.user_id == user_id)
-        ).filter(
-            ProjectUserShare.can_view_project == True
-        )
-    
+        return self.filter(Project.id.in_(readable_ids))
+
     def with_relations(self):
         """
         Eagerly load common relations to prevent N+1 queries.
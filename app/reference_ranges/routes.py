@@ -17,10 +17,11 @@ from app.models import \
 from app.models import (Analyte, AnimalModel, DataTable, ExperimentalGroup,
                         ExperimentDataRow, Project, ProtocolModel,
                         ReferenceRange, Team)
+from app.performance.caching import cached
 from app.permissions import (can_edit_reference_range,
                              can_view_reference_range,
                              check_datatable_permission,
-                             check_group_permission)
+                             check_group_permission, filter_readable)
 
 from . import reference_ranges_bp
 
@@ -34,7 +35,7 @@ def list_reference_ranges():
     protocol_id = request.args.get('protocol_id', type=int)
 
     # Query logic to get accessible reference ranges
-    query = ReferenceRange.query
+    query = filter_readable(current_user, ReferenceRange, ReferenceRange.query)
     
     if analyte_id:
         query = query.filter(ReferenceRange.analyte_id == analyte_id)
@@ -543,9 +544,10 @@ def get_protocols_for_analyte():
 
 @reference_ranges_bp.route('/api/reference_ranges_stats')
 @login_required
+@cached(tags=['reference_ranges', 'measurements', 'access', 'user:{user_id}'])
 def reference_ranges_stats():
     # Get global stats and data for charts
-    ranges = ReferenceRange.query.order_by(ReferenceRange.name).all()
+    ranges = filter_readable(current_user, ReferenceRange, ReferenceRange.query).order_by(ReferenceRange.name).all()
 
     total_ranges = len(ranges)
     total_animals = 0
@@ -22,7 +22,7 @@ from app.sampling import sampling_bp
 from app.services.sampling_service import SamplingService
 
 from ..helpers import generate_display_id
-from ..permissions import check_group_permission
+from ..permissions import check_group_permission, filter_readable
 from .forms import BatchCommonSampleDetailsForm, SingleSampleForm
 
 sampling_service = SamplingService()
@@ -228,12 +228,7 @@ def samples_server_side():
     show_archived = request.args.get('show_archived') == 'true'
 
     # 3. Base Query
-    query = Sample.query.join(ExperimentalGroup).join(Project)
-    
-    if not current_user.is_super_admin:
-        user_teams = current_user.get_teams()
-        user_team_ids = [t.id for t in user_teams] if user_teams else []
-        query = query.filter(Project.team_id.in_(user_team_ids))
+    query = filter_readable(current_user, Sample, Sample.query.join(ExperimentalGroup).join(Project))
 
     # 4. Apply Filters
     
@@ -402,7 +397,7 @@ def all_samples_list():
     # 1. Fetch Sidebar Data (Hierarchy)
     from app.services.project_service import ProjectService
     project_service = ProjectService()
-    sidebar_data = project_service.get_sidebar_hierarchy(current_user)
+    sidebar_data = project_service.get_cached_sidebar_hierarchy(current_user)
     
     # 2. Apply Storage Context Filter (if applicable)
     if storage_id:
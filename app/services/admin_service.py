@@ -10,6 +10,9 @@ from app.extensions import db
 from app.helpers import generate_confirmation_token, send_email
 from app.models import (Permission, Project, ProjectUserShare, Role, Team,
                         TeamMembership, User, UserTeamRoleLink)
+from app.performance.caching import mark_tags_stale
+from app.performance.permission_matrix import mark_permissions_stale
+from app.performance.rbac_snapshot import mark_rbac_stale
 from app.services.base import BaseService
 
 
@@ -28,6 +31,11 @@ class AdminService(BaseService):
         """Deletes a team and cleans up associations."""
         # Manual cleanup of relationships if cascade doesn't cover everything
         # (Though SQLAlchemy cascade usually handles this, explicit is safe)
+        # Bulk deletes bypass the flush hooks of the permission matrix and RBAC snapshot
+        member_ids = [m.user_id for m in TeamMembership.query.filter_by(team_id=team.id)]
+        mark_permissions_stale(db.session, user_ids=member_ids)
+        mark_rbac_stale(db.session)
+        mark_tags_stale(db.session, {'access', 'hierarchy'})
         UserTeamRoleLink.query.filter_by(team_id=team.id).delete()
         TeamMembership.query.filter_by(team_id=team.id).delete()
         Role.query.filter_by(team_id=team.id).delete()
@@ -129,6 +137,9 @@ class AdminService(BaseService):
             return False
 
         # Remove roles and membership
+        mark_permissions_stale(db.session, user_ids=[user.id])
+        mark_rbac_stale(db.session)
+        mark_tags_stale(db.session, {'access', 'hierarchy'})
         UserTeamRoleLink.query.filter_by(user_id=user.id, team_id=team.id).delete()
         db.session.delete(membership)
         db.session.commit()
@@ -136,6 +147,8 @@ class AdminService(BaseService):
 
     def delete_user_fully(self, user):
         """Permanently deletes a user and their shares."""
+        shared_project_ids = [share.project_id for share in ProjectUserShare.query.filter_by(user_id=user.id)]
+        mark_tags_stale(db.session, {'access', 'hierarchy'} | {f'project:{pid}' for pid in shared_project_ids})
         ProjectUserShare.query.filter_by(user_id=user.id).delete()
         db.session.delete(user)
         db.session.commit()
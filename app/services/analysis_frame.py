@@ -0,0 +1,89 @@
+# app/services/analysis_frame.py
+"""
+Shared, read-only view of the DataFrame being analysed.
+
+Checks, statistics and plots used to start from their own ``df.copy()`` of the
+whole wide frame, and the repeated-measures path melted it once per stage.
+An ``AnalysisFrame`` materializes the long format once and caches narrow
+per-parameter views and outlier masks, so each stage copies (at most) the few
+columns it actually uses.
+"""
+import pandas as pd
+
+LONG_VAR_NAME = '_WithinFactorLevel_'
+LONG_VALUE_NAME = '_MeasurementValue_'
+
+
+class AnalysisFrame:
+    """
+    Wraps the wide analysis frame. Views returned by this class are shared
+    between stages and must be treated as read-only (stages copy before mutating).
+    """
+
+    def __init__(self, df, subject_id_col, grouping_cols, numerical_cols, extra_cols=None):
+        self.wide = df
+        self.subject_id_col = subject_id_col
+        self.grouping_cols = [c for c in grouping_cols if c in df.columns]
+        self.numerical_cols = list(numerical_cols)
+        # Columns some tests need besides DV and grouping (split, covariate, random effect...)
+        self.extra_cols = [c for c in dict.fromkeys(extra_cols or []) if c and c in df.columns]
+        self._views = {}
+        self._long = {}
+        self._outlier_masks = {}
+
+    def _id_cols(self):
+        cols = [self.subject_id_col] + self.grouping_cols + self.extra_cols
+        return [c for c in dict.fromkeys(cols) if c in self.wide.columns]
+
+    def _split_rows(self, frame, split_param, split_value):
+        if split_param is None:
+            return frame
+        return frame[frame[split_param] == split_value]
+
+    def checks_view(self):
+        """Identifier, grouping and numerical columns only (input of perform_data_checks)."""
+        if 'checks' not in self._views:
+            cols = self._id_cols() + [c for c in self.numerical_cols if c in self.wide.columns]
+            self._views['checks'] = self.wide.loc[:, list(dict.fromkeys(cols))]
+        return self._views['checks']
+
+    def parameter_view(self, param, split_param=None, split_value=None):
+        """Rows of one split level (or all rows) restricted to the columns needed for ``param``."""
+        key = ('param', param, split_param, split_value)
+        if key not in self._views:
+            cols = list(dict.fromkeys(self._id_cols() + [param]))
+            self._views[key] = self._split_rows(self.wide, split_param, split_value).loc[:, cols]
+        return self._views[key]
+
+    def long_view(self, split_param=None, split_value=None):
+        """
+        Long format (one row per subject x numerical column) with numeric values.
+        The full melt is computed once; split levels are row filters of it.
+        """
+        if None not in self._long:
+            # Extra columns that are also measured stay values (melt would drop them otherwise)
+            id_vars = [c for c in self._id_cols() if c not in self.extra_cols or c not in self.numerical_cols]
+            long_df = pd.melt(
+                self.wide, id_vars=id_vars, value_vars=self.numerical_cols,
+                var_name=LONG_VAR_NAME, value_name=LONG_VALUE_NAME,
+            )
+            long_df[LONG_VALUE_NAME] = pd.to_numeric(long_df[LONG_VALUE_NAME], errors='coerce')
+            self._long[None] = long_df
+        if split_param is None:
+            return self._long[None]
+        key = (split_param, split_value)
+        if key not in self._long:
+            self._long[key] = self._split_rows(self._long[None], split_param, split_value)
+        return self._long[key]
+
+    def outlier_mask(self, view, column, method='iqr', threshold=1.5):
+        """
+        Outlier mask of ``view[column]`` (a view returned by this object), computed
+        once and shared by the statistics and plotting stages.
+        """
+        from app.datatables.analysis_utils import detect_outliers
+        key = (id(view), column, method, threshold)
+        if key not in self._outlier_masks:
+            values = pd.to_numeric(view[column], errors='coerce')
+            self._outlier_masks[key] = detect_outliers(values, method=method, threshold=threshold)[0]
+        return self._outlier_masks[key]
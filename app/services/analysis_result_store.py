@@ -0,0 +1,132 @@
+# app/services/analysis_result_store.py
+"""
+Result store for asynchronous analyses.
+
+Analysis results (Plotly figures, HTML tables) can weigh several megabytes.
+Instead of copying them into the server-side Flask session, the Celery task
+writes them here keyed by task id, as zlib-compressed JSON blobs with a TTL.
+Each parameter panel is stored separately so the results page only embeds a
+light summary and fetches panels lazily; the session carries the task id only.
+"""
+import json
+import os
+import zlib
+
+from cachelib import FileSystemCache, RedisCache
+from flask import current_app
+
+SUMMARY_SUFFIX = 'summary'
+PANEL_STUB_FIELDS = ('error_message', 'is_split_analysis')
+
+
+def _encode(payload):
+    return zlib.compress(json.dumps(payload, default=str).encode('utf-8'), 6)
+
+
+def _decode(blob):
+    return json.loads(zlib.decompress(blob).decode('utf-8'))
+
+
+def _panel_stub(panel_id, results_data):
+    """Keeps only what the accordion header needs (status badge) in the summary."""
+    stub = {'panel_id': panel_id}
+    for field in PANEL_STUB_FIELDS:
+        if field in results_data:
+            stub[field] = results_data[field]
+    stats = results_data.get('statistical_results')
+    if isinstance(stats, dict):
+        stub['statistical_results'] = {'test': stats.get('test'), 'error': stats.get('error')}
+    return stub
+
+
+class AnalysisResultStoreService:
+    """Stores analysis results as per-panel compressed blobs keyed by task id."""
+
+    def __init__(self):
+        self.ttl = current_app.config.get('ANALYSIS_RESULTS_TTL', 6 * 3600)
+        self.backend = self._get_backend()
+
+    def _get_backend(self):
+        app = current_app._get_current_object()
+        backend = app.extensions.get('analysis_result_store')
+        if backend is None:
+            if app.config.get('ANALYSIS_RESULTS_BACKEND', 'redis') == 'redis':
+                import redis
+                backend = RedisCache(
+                    host=redis.from_url(app.config['ANALYSIS_RESULTS_REDIS_URL']),
+                    default_timeout=self.ttl,
+                    key_prefix='precliniset:analysis_results:',
+                )
+            else:
+                directory = app.config.get('ANALYSIS_RESULTS_DIR') or os.path.join(app.instance_path, 'analysis_results')
+                backend = FileSystemCache(directory, threshold=1000, default_timeout=self.ttl)
+            app.extensions['analysis_result_store'] = backend
+        return backend
+
+    @staticmethod
+    def _key(task_id, suffix):
+        return f'{task_id}:{suffix}'
+
+    def save(self, task_id, results, user_id=None):
+        """
+        Splits ``results`` into a summary and one blob per parameter panel.
+        Returns the summary (what the results page renders before lazy loading).
+        """
+        summary = dict(results)
+        panels = {}
+
+        def _extract(results_by_parameter, prefix):
+            stubs = {}
+            for index, (result_key, results_data) in enumerate(results_by_parameter.items()):
+                panel_id = f'{prefix}p{index}'
+                if isinstance(results_data, dict):
+                    panels[panel_id] = {'result_key': result_key, 'results_data': results_data}
+                    stubs[result_key] = _panel_stub(panel_id, results_data)
+                else:
+                    stubs[result_key] = results_data
+            return stubs
+
+        if isinstance(summary.get('results_by_parameter'), dict):
+            summary['results_by_parameter'] = _extract(summary['results_by_parameter'], '')
+
+        if isinstance(summary.get('results_by_split'), dict):
+            splits = {}
+            for split_index, (split_value, split_results) in enumerate(summary['results_by_split'].items()):
+                split_results = dict(split_results)
+                if isinstance(split_results.get('results_by_parameter'), dict):
+                    split_results['results_by_parameter'] = _extract(
+                        split_results['results_by_parameter'], f's{split_index}'
+                    )
+                splits[split_value] = split_results
+            summary['results_by_split'] = splits
+
+        summary['result_ref'] = task_id
+        summary['owner_id'] = user_id
+
+        for panel_id, panel in panels.items():
+            self.backend.set(self._key(task_id, panel_id), _encode(panel), timeout=self.ttl)
+        self.backend.set(self._key(task_id, SUMMARY_SUFFIX), _encode(summary), timeout=self.ttl)
+        return summary
+
+    def load_summary(self, task_id, user_id=None, is_super_admin=False):
+        """
+        Returns the summary, or None if it expired or the reader may not see it.
+        Results are readable by the user who ran the analysis; results without
+        a recorded owner are only readable by super admins.
+        """
+        blob = self.backend.get(self._key(task_id, SUMMARY_SUFFIX))
+        if blob is None:
+            return None
+        summary = _decode(blob)
+        owner_id = summary.get('owner_id')
+        if not is_super_admin and (owner_id is None or owner_id != user_id):
+            return None
+        return summary
+
+    def load_panel(self, task_id, panel_id, user_id=None, is_super_admin=False):
+        """Returns ``{'result_key', 'results_data'}`` for one panel, or None."""
+        if self.load_summary(task_id, user_id=user_id, is_super_admin=is_super_admin) is None:
+            return None
+        blob = self.backend.get(self._key(task_id, panel_id))
+        return _decode(blob) if blob is not None else None
+
@@ -1,4 +1,7 @@
 # app/services/analysis_service.py
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
 import pandas as pd
 from scipy import stats
 from sqlalchemy import func
@@ -7,9 +10,28 @@ from flask import current_app
 from flask_babel import lazy_gettext as _l
 
 from app.extensions import db
-from app.models import DataTable, ExperimentDataRow, ExperimentalGroup, Animal
+from app.models import DataTable, ExperimentDataRow, ExperimentalGroup, Animal, User
 from app.helpers import replace_undefined
-from app.permissions import check_datatable_permission
+from app.performance.frame_cache import build_frame_key, get_cached_frame, set_cached_frame
+from app.services.analysis_frame import AnalysisFrame
+from app.permissions import filter_readable
+from app.services.measurement_store_service import MeasurementStoreService, is_measurement_store_enabled
+from app.services.merge_service import DataTableMergeService
+
+NUMERIC_ANALYTE_TYPES = ('int', 'float')
+
+
+def json_value(column, key):
+    """
+    SQL expression extracting a top-level key from a JSON column as a scalar.
+    MySQL's JSON_EXTRACT returns JSON-encoded values, so they are unquoted there.
+    """
+    path = '$."{}"'.format(key.replace('"', '\\"'))
+    extracted = func.json_extract(column, path)
+    if db.engine.dialect.name == 'mysql':
+        return func.nullif(func.json_unquote(extracted), 'null')
+    return extracted
+
 
 class AnalysisService:
     def __init__(self):
@@ -18,14 +40,83 @@ class AnalysisService:
 
     def prepare_dataframe(self, data_table):
         """
-        Extracts data from SQL and JSON columns.
+        Extracts data from SQL and JSON columns in a single query.
+        JSON paths are extracted in SQL (or read from the columnar measurement store
+        when enabled), the frame is built from column arrays and analyte columns are
+        typed from Analyte.data_type.
         Compatible with all database engines.
+
+        Returns:
+            Tuple of (df, numerical_columns, categorical_columns)
         """
         # 1. Identify all columns we need
         # We need core columns + Protocol Analytes + Animal Model Analytes
-        
+        json_paths = self._get_analyte_json_paths(data_table)
+
+        # Content-addressed cache: the same table is prepared for the form, the
+        # async task and the group-level API
+        cache_key = build_frame_key(
+            'prepared', [data_table.id],
+            extra={'fields': json_paths, 'store': is_measurement_store_enabled()}
+        )
+        cached = get_cached_frame(cache_key)
+        if cached is not None:
+            df, meta = cached
+            return df, meta['numerical'], meta['categorical']
+
+        # 2. Fetch data from database
+        if is_measurement_store_enabled():
+            # Columnar store: one indexed query, no per-row JSON decoding
+            df = self._fetch_dataframe_from_store(data_table, json_paths)
+        else:
+            df = self._fetch_dataframe_from_json(data_table, json_paths)
+
+        if df.empty:
+            return None, [], []
+
+        # 3. Post-Processing (Python side)
+        # Handle Date of Birth age calculation
+        if data_table.date and 'date_of_birth' in df.columns:
+            # Convert string dates to datetime objects
+            df['date_of_birth'] = pd.to_datetime(df['date_of_birth'], errors='coerce')
+            dt_date = pd.to_datetime(data_table.date)
+            
+            # Vectorized calculation
+            df['age_days'] = (dt_date - df['date_of_birth']).dt.days
+
+        # 4. Type Casting from the analyte definitions (JSON values may be strings)
+        numerical_cols = []
+        categorical_cols = []
+
+        column_types = {}
+        for field in json_paths:
+            column_types.setdefault(field['name'], field['type'])
+        if 'age_days' in df.columns:
+            column_types['age_days'] = 'int'
+
+        for col, data_type in column_types.items():
+            if col not in df.columns:
+                continue
+            if data_type in NUMERIC_ANALYTE_TYPES:
+                df[col] = pd.to_numeric(df[col], errors='coerce')
+                numerical_cols.append(col)
+            else:
+                categorical_cols.append(col)
+
+        # 5. Metadata cleanup
+        # Ensure ID columns are not treated as numerical data for analysis
+        if 'id' in numerical_cols:
+            numerical_cols.remove('id')
+        if 'animal_id' in numerical_cols:
+            numerical_cols.remove('animal_id')
+
+        set_cached_frame(cache_key, df, {'numerical': numerical_cols, 'categorical': categorical_cols})
+        return df, numerical_cols, categorical_cols
+
+    def _get_analyte_json_paths(self, data_table):
+        """Lists the analytes of a DataTable with the JSON column they are stored in."""
         json_paths = []
-        
+
         # A. Animal Model Fields (e.g., 'Genotype', 'Cage')
         if data_table.group.model:
             for analyte in data_table.group.model.analytes:
@@ -37,7 +128,7 @@ class AnalysisService:
 
         # B. Protocol Fields (e.g., 'Weight', 'Tumor Size')
         if data_table.protocol:
-             for assoc in data_table.protocol.analyte_associations:
+            for assoc in data_table.protocol.analyte_associations:
                 analyte = assoc.analyte
                 json_paths.append({
                     'name': analyte.name,
@@ -45,93 +136,73 @@ class AnalysisService:
                     'type': analyte.data_type.value
                 })
 
-        # 2. Fetch data from database
-        query = db.session.query(
+        return json_paths
+
+    def _fetch_dataframe_from_json(self, data_table, json_paths):
+        """
+        Builds the prepare_dataframe input with JSON path extraction pushed into SQL.
+        Protocol values override animal values when an analyte is in both sources.
+        """
+        labelled = [(f'f{i}', field) for i, field in enumerate(json_paths)]
+        extracted = [
+            json_value(
+                Animal.measurements if field['source'] == 'animal' else ExperimentDataRow.row_data,
+                field['name']
+            ).label(label)
+            for label, field in labelled
+        ]
+
+        rows = db.session.query(
             Animal.id,
             Animal.uid,
             Animal.display_id,
             Animal.sex,
             Animal.status,
             Animal.date_of_birth,
-            Animal.measurements,
-            ExperimentDataRow.row_data
+            *extracted
         ).outerjoin(
             ExperimentDataRow,
             (ExperimentDataRow.animal_id == Animal.id) & (ExperimentDataRow.data_table_id == data_table.id)
         ).filter(
             Animal.group_id == data_table.group_id
-        )
-
-        results = query.all()
-
-        # 3. Convert to list of dictionaries
-        data = []
-        for row in results:
-            row_dict = {
-                'id': row.id,
-                'uid': row.uid,
-                'display_id': row.display_id,
-                'sex': row.sex,
-                'status': row.status,
-                'date_of_birth': row.date_of_birth
-            }
-
-            # Extract animal measurements
-            if row.measurements:
-                for field in [f for f in json_paths if f['source'] == 'animal']:
-                    if field['name'] in row.measurements:
-                        row_dict[field['name']] = row.measurements[field['name']]
-
-            # Extract experiment data
-            if row.row_data:
-                for field in [f for f in json_paths if f['source'] == 'experiment']:
-                    if field['name'] in row.row_data:
-                        row_dict[field['name']] = row.row_data[field['name']]
-
-            data.append(row_dict)
+        ).order_by(Animal.id).all()
 
-        # 4. Convert to DataFrame
-        df = pd.DataFrame(data)
+        if not rows:
+            return pd.DataFrame()
 
-        if df.empty:
-            return None, [], []
+        # Build the frame from column arrays rather than per-row dicts
+        columns = list(zip(*rows))
+        core_names = ['id', 'uid', 'display_id', 'sex', 'status', 'date_of_birth']
+        df = pd.DataFrame(dict(zip(core_names, columns[:len(core_names)])))
 
-        # 5. Post-Processing (Python side)
-        # Handle Date of Birth age calculation
-        if data_table.date and 'date_of_birth' in df.columns:
-            # Convert string dates to datetime objects
-            df['date_of_birth'] = pd.to_datetime(df['date_of_birth'], errors='coerce')
-            dt_date = pd.to_datetime(data_table.date)
-            
-            # Vectorized calculation
-            df['age_days'] = (dt_date - df['date_of_birth']).dt.days
-
-        # 6. Type Casting (Numeric columns might come back as strings from JSON)
-        numerical_cols = []
-        categorical_cols = []
-        
-        all_analyte_names = [f['name'] for f in json_paths]
-        # Add Age
-        if 'age_days' in df.columns:
-            all_analyte_names.append('age_days')
-
-        for col in all_analyte_names:
-            if col in df.columns:
-                # Try to convert to numeric, if fail, keep as is
-                try:
-                    df[col] = pd.to_numeric(df[col])
-                    numerical_cols.append(col)
-                except (ValueError, TypeError):
-                    categorical_cols.append(col)
-
-        # 7. Metadata cleanup
-        # Ensure ID columns are not treated as numerical data for analysis
-        if 'id' in numerical_cols:
-            numerical_cols.remove('id')
-        if 'animal_id' in numerical_cols:
-            numerical_cols.remove('animal_id')
-            
-        return df, numerical_cols, categorical_cols
+        for (label, field), values in zip(labelled, columns[len(core_names):]):
+            series = pd.Series(values, dtype=object)
+            if series.isna().all():
+                # Key absent from every row: leave the column out
+                continue
+            name = field['name']
+            if name not in df.columns:
+                df[name] = series
+            elif field['source'] == 'experiment':
+                df[name] = series.where(series.notna(), df[name])
+
+        return df
+
+    def _fetch_dataframe_from_store(self, data_table, json_paths):
+        """Builds the prepare_dataframe input from the columnar measurement store."""
+        core_rows = db.session.query(
+            Animal.id, Animal.uid, Animal.display_id, Animal.sex, Animal.status, Animal.date_of_birth
+        ).filter(Animal.group_id == data_table.group_id).order_by(Animal.id).all()
+        if not core_rows:
+            return pd.DataFrame()
+
+        core_df = pd.DataFrame(core_rows, columns=['id', 'uid', 'display_id', 'sex', 'status', 'date_of_birth'])
+        values_df = MeasurementStoreService().get_datatable_frame(
+            data_table,
+            animal_fields=[f['name'] for f in json_paths if f['source'] == 'animal'],
+            experiment_fields=[f['name'] for f in json_paths if f['source'] == 'experiment'],
+        )
+        return core_df.join(values_df, on='id')
 
     def _get_flattened_animal_data(self, group_ids, json_fields):
         """Helper to fetch animal data in bulk with JSON extraction.
@@ -150,7 +221,7 @@ class AnalysisService:
             Animal.date_of_birth,
             Animal.sex,
             Animal.status,
-            *[func.json_extract(Animal.measurements, f'$."{field}"').label(field) for field in json_fields]
+            *[json_value(Animal.measurements, field).label(field) for field in json_fields]
         ).filter(Animal.group_id.in_(group_ids)).order_by(Animal.group_id, Animal.id)
         
         results = query.all()
@@ -293,11 +364,18 @@ class AnalysisService:
         datatables_query = DataTable.query.filter(DataTable.id.in_(selected_datatable_ids))\
             .options(
                 joinedload(DataTable.group),
-                joinedload(DataTable.protocol),
-                joinedload(DataTable.group).joinedload(ExperimentalGroup.animals)
+                joinedload(DataTable.protocol)
             )
         
         found_dts = {dt.id: dt for dt in datatables_query.all()}
+
+        # One set-based permission query for the whole selection
+        if user_id:
+            user = db.session.get(User, user_id)
+        else:
+            from flask_login import current_user
+            user = current_user
+        readable_ids = filter_readable(user, DataTable, found_dts.keys())
         
         # Maintain order and check permissions
         for dt_id in selected_datatable_ids:
@@ -305,7 +383,7 @@ class AnalysisService:
             if not dt or not dt.group:
                 errors.append(_l("DataTable with ID {dt_id} not found or group missing.").format(dt_id=dt_id))
                 continue
-            if not check_datatable_permission(dt, 'read', user_id=user_id):
+            if dt.id not in readable_ids:
                 errors.append(_l("Permission denied for DataTable {dt_id}.").format(dt_id=dt_id))
                 continue
             datatables_to_process.append(dt)
@@ -314,81 +392,34 @@ class AnalysisService:
         if not datatables_to_process:
             return None, errors, source_identifiers
 
-        # 2. Batch Load ExperimentDataRows
+        # 2. Cache lookup (after the permission checks above)
         all_dt_ids = [dt.id for dt in datatables_to_process]
-        all_rows = ExperimentDataRow.query.filter(ExperimentDataRow.data_table_id.in_(all_dt_ids)).all()
-        rows_by_dt_and_animal = {} # dt_id -> {animal_id: row_data}
-        for r in all_rows:
-            if r.data_table_id not in rows_by_dt_and_animal:
-                rows_by_dt_and_animal[r.data_table_id] = {}
-            rows_by_dt_and_animal[r.data_table_id][r.animal_id] = r.row_data
-
-        # 3. Process Data In-Memory
-        all_long_data = []
-        all_animals = []
-        seen_animal_uids = set()
-
-        for dt in datatables_to_process:
-            exp_rows_dict = rows_by_dt_and_animal.get(dt.id, {})
-            for animal in dt.group.animals:
-                if animal.uid not in seen_animal_uids:
-                    all_animals.append(animal.to_dict())
-                    seen_animal_uids.add(animal.uid)
-
-                animal_id = animal.id
-                if not animal_id: continue
-
-                merged_data = {**animal.to_dict(), **exp_rows_dict.get(animal_id, {})}
-                
-                if dt.protocol and dt.protocol.analytes:
-                    for analyte in dt.protocol.analytes:
-                        if analyte.name in merged_data:
-                            all_long_data.append({
-                                'uid': animal.uid,
-                                'analyte_name': analyte.name,
-                                'analyte_value': merged_data[analyte.name],
-                                'protocol_name': dt.protocol.name,
-                                'datatable_date': dt.date,
-                                '_source_datatable_id': dt.id,
-                                '_source_experimental_group_name': dt.group.name,
-                            })
-
-        if not all_long_data:
+        cache_key = build_frame_key('aggregated', all_dt_ids)
+        cached = get_cached_frame(cache_key)
+        if cached is not None:
+            return cached[0], errors, source_identifiers
+
+        # 3. Set-based merge shared with DataTableService.aggregate_selected_datatables
+        # Repeated measures are told apart by appending the date: "Analyte Name (YYYY-MM-DD)"
+        merge_service = DataTableMergeService(current_app.config.get('MERGE_CHUNK_SIZE'))
+        animals_by_group = merge_service.load_animals(datatables_to_process)
+        long_df = merge_service.build_long_frame(
+            datatables_to_process, lambda dt, name: f"{name} ({dt.date})", animals_by_group
+        )
+        if long_df.empty:
             return pd.DataFrame(), errors, source_identifiers
 
-        long_df = pd.DataFrame(all_long_data)
-
         # Filter to analytes present in all datatables
-        dt_count = len(datatables_to_process)
-        analyte_counts = long_df.groupby('analyte_name')['_source_datatable_id'].nunique()
-        common_analytes = analyte_counts[analyte_counts == dt_count].index
-        long_df = long_df[long_df['analyte_name'].isin(common_analytes)]
-
+        long_df = merge_service.restrict_to_common_analytes(long_df, len(datatables_to_process))
         if long_df.empty:
             return pd.DataFrame(), [_l("No common analytes found across all selected datatables.")], source_identifiers
-        
-        # Custom Labeling for Repeated Measures (Merged Analysis)
-        # We append the date to the analyte name to distinguish repeated measurements for the same animal.
-        # Format: "Analyte Name (YYYY-MM-DD)"
-        long_df['measurement_label'] = long_df['analyte_name'] + ' (' + long_df['datatable_date'].astype(str) + ')'
-        
-        # Base animal data (unique animals)
-        animal_df = pd.DataFrame(all_animals)
-        if 'uid' not in animal_df.columns:
+
+        animal_df = merge_service.build_animal_frame(datatables_to_process, animals_by_group)
+        if animal_df is None:
             return pd.DataFrame(), [_l("Could not find 'uid' column in animal data.")], source_identifiers
-        
-        animal_df = animal_df.drop_duplicates(subset=['uid']).set_index('uid')
-        
-        # Pivot measurements
-        pivoted_df = long_df.pivot_table(
-            index='uid',
-            columns='measurement_label',
-            values='analyte_value',
-            aggfunc='first'
-        )
-        
+
         # 4. Join & Post-Process
-        final_df = animal_df.join(pivoted_df, how='left')
+        final_df = animal_df.join(merge_service.pivot_long_frame(long_df), how='left')
 
         # Add Housing Conditions (Take from first DataTable as they should be consistent)
         first_dt = datatables_to_process[0]
@@ -406,12 +437,15 @@ class AnalysisService:
              elif not details.get('use_blinding') and 'Treatment Group' not in final_df.columns:
                  animal_groups = details.get('animal_groups', {})
                  final_df['Treatment Group'] = final_df.index.to_series().map(animal_groups)
-        
-        return final_df.reset_index(), errors, source_identifiers
 
-    def perform_analysis(self, df, form_data, subject_id_col, subject_id_col_present, available_numerical, available_categorical):
+        final_df = final_df.reset_index()
+        set_cached_frame(cache_key, final_df)
+        return final_df, errors, source_identifiers
+
+    def perform_analysis(self, df, form_data, subject_id_col, subject_id_col_present, available_numerical, available_categorical, progress_callback=None):
         """
         Orchestrates the entire analysis pipeline: Checks -> Suggestions -> Execution -> Plotting.
+        ``progress_callback(done, total, label)`` is called as each parameter completes.
         """
         results = {
             'checks_by_parameter': {},
@@ -430,9 +464,15 @@ class AnalysisService:
         graph_type = form_data.get('graph_type', 'Box Plot')
         start_y_at_zero = form_data.get('start_y_at_zero', False)
 
+        # Shared view of df: the long format, per-parameter views and outlier masks are built once
+        frame = AnalysisFrame(df, subject_id_col, grouping_params, numerical_params, extra_cols=[
+            form_data.get('splitting_param'), form_data.get('covariate_param'),
+            form_data.get('random_effect_param'), form_data.get('survival_event_col'),
+        ])
+
         # 1. Data Checks & Suggestions
         from app.datatables.data_prepper import perform_data_checks
-        checks = perform_data_checks(df.copy(), grouping_params, numerical_params, is_repeated, subject_id_col, exclude_outliers)
+        checks = perform_data_checks(frame.checks_view(), grouping_params, numerical_params, is_repeated, subject_id_col, exclude_outliers, analysis_frame=frame)
         results['checks_by_parameter'] = checks
         
         # 1.5 Suggest Tests
@@ -486,9 +526,9 @@ class AnalysisService:
              self._analyze_survival(df, grouping_params, form_data, results)
 
         if is_repeated:
-            self._analyze_repeated(df, grouping_params, numerical_params, chosen_tests, graph_type, start_y_at_zero, subject_id_col, exclude_outliers, results, form_data, reference_range_summary=ref_range_summary, suggestions=suggestions)
+            self._analyze_repeated(df, grouping_params, numerical_params, chosen_tests, graph_type, start_y_at_zero, subject_id_col, exclude_outliers, results, form_data, reference_range_summary=ref_range_summary, suggestions=suggestions, analysis_frame=frame)
         else:
-            self._analyze_independent(df, grouping_params, numerical_params, chosen_tests, graph_type, start_y_at_zero, subject_id_col, exclude_outliers, results, form_data, reference_range_summary=ref_range_summary, suggestions=suggestions)
+            self._analyze_independent(df, grouping_params, numerical_params, chosen_tests, graph_type, start_y_at_zero, subject_id_col, exclude_outliers, results, form_data, reference_range_summary=ref_range_summary, suggestions=suggestions, progress_callback=progress_callback, analysis_frame=frame)
 
         return replace_undefined(results)
 
@@ -608,7 +648,7 @@ class AnalysisService:
             'splits': {val: calc_stats(p_dict) for val, p_dict in values_split.items()}
         }
 
-    def _analyze_repeated(self, df, grouping, numerical, tests, graph_type, start_y_zero, subject_id, exclude_outliers, results, form_data, reference_range_summary=None, suggestions=None):
+    def _analyze_repeated(self, df, grouping, numerical, tests, graph_type, start_y_zero, subject_id, exclude_outliers, results, form_data, reference_range_summary=None, suggestions=None, analysis_frame=None):
         from app.datatables.plot_utils import generate_plot
         # Handle Splitting (Must be done before id_vars def)
         splitting_param = form_data.get('splitting_param')
@@ -616,6 +656,7 @@ class AnalysisService:
         # Determine graph type (form overrides argument)
         chosen_graph_type = form_data.get('graph_type_rm_set', graph_type)
         test_key = tests.get('rm_set', 'none')
+        frame = analysis_frame or AnalysisFrame(df, subject_id, grouping, numerical, extra_cols=[splitting_param])
 
         if splitting_param and splitting_param in df.columns:
             # --- FULL SPLIT ANALYSIS (RM) ---
@@ -626,13 +667,9 @@ class AnalysisService:
             split_results_list = []
             
             for split_val in unique_splits:
-                # Filter Data
-                sub_df = df[df[splitting_param] == split_val].copy()
-                if sub_df.empty: continue
-                
-                # Reshape
-                id_vars = [subject_id] + grouping
-                df_long = pd.melt(sub_df, id_vars=[c for c in id_vars if c in sub_df.columns], value_vars=numerical, var_name='_WithinFactorLevel_', value_name='_MeasurementValue_')
+                # Reshape: rows of this split level in the shared long format
+                df_long = frame.long_view(splitting_param, split_val)
+                if df_long.empty: continue
 
                 # Stats
                 outlier_method = form_data.get('outlier_method', 'iqr')
@@ -643,7 +680,8 @@ class AnalysisService:
                     'control_group': form_data.get('control_group_param'),
                     'covariate': form_data.get('covariate_param')
                 }
-                sub_stats = self.stats_service.execute_test(df_long, test_key, '_MeasurementValue_', grouping, True, subject_id, exclude_outliers, extra_params=extra_params)
+                outlier_mask = frame.outlier_mask(df_long, '_MeasurementValue_', outlier_method, outlier_threshold) if exclude_outliers else None
+                sub_stats = self.stats_service.execute_test(df_long, test_key, '_MeasurementValue_', grouping, True, subject_id, exclude_outliers, extra_params=extra_params, outlier_mask=outlier_mask)
 
                 # Plot - Use split-specific ref range if available
                 split_ref_range = reference_range_summary.get('splits', {}).get(str(split_val)) if reference_range_summary else None
@@ -653,7 +691,7 @@ class AnalysisService:
                 sub_graph, sub_notes = generate_plot(
                     df_long, '_MeasurementValue_', grouping, chosen_graph_type, start_y_zero, True, subject_id, numerical, 
                     exclude_outliers=exclude_outliers, stats_results=sub_stats, reference_range_summary=split_ref_range,
-                    outlier_method=outlier_method, outlier_threshold=outlier_threshold
+                    outlier_method=outlier_method, outlier_threshold=outlier_threshold, outlier_mask=outlier_mask
                 )
 
                 results['overall_notes'].extend(sub_notes)
@@ -682,9 +720,8 @@ class AnalysisService:
              # If we want consistent behavior, "Split By" should ALWAYS separate results?
              # Yes, based on user input.
         
-             # Reshape for RM
-             id_vars = [subject_id] + grouping
-             df_long = pd.melt(df, id_vars=[c for c in id_vars if c in df.columns], value_vars=numerical, var_name='_WithinFactorLevel_', value_name='_MeasurementValue_')
+             # Reshape for RM (shared with the data checks)
+             df_long = frame.long_view()
             
              # Stats
              outlier_method = form_data.get('outlier_method', 'iqr')
@@ -695,7 +732,8 @@ class AnalysisService:
                  'control_group': form_data.get('control_group_param'),
                  'covariate': form_data.get('covariate_param')
              }
-             stats_res = self.stats_service.execute_test(df_long, test_key, '_MeasurementValue_', grouping, True, subject_id, exclude_outliers, extra_params=extra_params)
+             outlier_mask = frame.outlier_mask(df_long, '_MeasurementValue_', outlier_method, outlier_threshold) if exclude_outliers else None
+             stats_res = self.stats_service.execute_test(df_long, test_key, '_MeasurementValue_', grouping, True, subject_id, exclude_outliers, extra_params=extra_params, outlier_mask=outlier_mask)
              
              # Inject Rationale
              if suggestions:
@@ -710,7 +748,7 @@ class AnalysisService:
              graph_data, notes = generate_plot(
                  df_long, '_MeasurementValue_', grouping, chosen_graph_type, start_y_zero, True, subject_id, numerical, 
                  exclude_outliers=exclude_outliers, stats_results=stats_res, reference_range_summary=global_ref_range,
-                 outlier_method=outlier_method, outlier_threshold=outlier_threshold
+                 outlier_method=outlier_method, outlier_threshold=outlier_threshold, outlier_mask=outlier_mask
              )
 
              results['overall_notes'].extend(notes)
@@ -727,8 +765,7 @@ class AnalysisService:
              # Checking overall cage effect is a good start.
              self._check_cage_effect(df_long, '_MeasurementValue_', results)
 
-    def _analyze_independent(self, df, grouping, numerical, tests, graph_type, start_y_zero, subject_id, exclude_outliers, results, form_data, reference_range_summary=None, suggestions=None):
-        from app.datatables.plot_utils import generate_plot
+    def _analyze_independent(self, df, grouping, numerical, tests, graph_type, start_y_zero, subject_id, exclude_outliers, results, form_data, reference_range_summary=None, suggestions=None, progress_callback=None, analysis_frame=None):
         # Handle Splitting
         splitting_param = form_data.get('splitting_param')
         random_effect = form_data.get('random_effect_param')
@@ -745,11 +782,24 @@ class AnalysisService:
         # We use the combined grouping so we get descriptive stats for all subgroups (e.g. KO/M, KO/F)
         group_summary_html = self._generate_group_summary_table(df, grouping_for_plots, numerical)
         results['group_summary_html'] = group_summary_html
-        
+
+        # Prepare extra params for advanced tests
+        outlier_method = form_data.get('outlier_method', 'iqr')
+        outlier_threshold = float(form_data.get('outlier_threshold', 1.5))
+        extra_params = {
+            'control_group': form_data.get('control_group_param'),
+            'covariate': form_data.get('covariate_param'),
+            'random_effect': random_effect,
+            'event_col': form_data.get('survival_event_col'),
+            'outlier_method': outlier_method,
+            'outlier_threshold': outlier_threshold
+        }
+        is_split = bool(splitting_param and splitting_param in df.columns)
+        unique_splits = sorted(df[splitting_param].dropna().unique()) if is_split else [None]
+
+        # 1. Plan: one independent unit of work per (parameter, split level)
+        units = []
         for param in numerical:
-            # Determine graph type for this parameter
-            chosen_graph_type = form_data.get(f'chosen_graph_{param}', graph_type)
-            
             # Stats (Run first to pass to plot)
             test_key = tests.get(param, 'none')
             
@@ -762,97 +812,77 @@ class AnalysisService:
                     if t['key'] == test_key and t.get('reason'):
                         rationale = t['reason']
                         break
-            
-            # Check for Cage Effect
-            self._check_cage_effect(df, param, results)
-            
-            # Prepare extra params for advanced tests
-            outlier_method = form_data.get('outlier_method', 'iqr')
-            outlier_threshold = float(form_data.get('outlier_threshold', 1.5))
-            extra_params = {
-                'control_group': form_data.get('control_group_param'),
-                'covariate': form_data.get('covariate_param'),
-                'random_effect': random_effect,
-                'event_col': form_data.get('survival_event_col'),
-                'outlier_method': outlier_method,
-                'outlier_threshold': outlier_threshold
-            }
 
             # FORCE LMM if Random Effect is selected
             if random_effect and random_effect in df.columns:
                  # Override test selection to LMM if a blocking factor is explicitly chosen
                  test_key = 'lmm_blocking'
 
-            stats_res = {'p_value': None, 'results_data': None, 'error': None}
-
-            if splitting_param and splitting_param in df.columns:
-                # --- FULL SPLIT ANALYSIS ---
-                unique_splits = sorted(df[splitting_param].dropna().unique())
-                split_results_list = []
-                
-                for split_val in unique_splits:
-                    # Filter Data
-                    sub_df = df[df[splitting_param] == split_val].copy()
-                    if sub_df.empty: continue
-
-                    # 1. Stats
-                    sub_stats = self.stats_service.execute_test(
-                        sub_df, test_key, param, grouping_for_stats, False, subject_id, exclude_outliers, extra_params=extra_params
-                    )
-                    
-                    # 2. Graph - Use split-specific ref range if available
-                    split_ref_range = reference_range_summary.get('splits', {}).get(str(split_val)) if reference_range_summary else None
-                    if not split_ref_range and reference_range_summary:
-                        split_ref_range = reference_range_summary.get('global')
-
-                    sub_graph, sub_notes = generate_plot(
-                        sub_df, param, grouping_for_stats, chosen_graph_type, start_y_zero, False, subject_id, None, 
-                        exclude_outliers=exclude_outliers, stats_results=sub_stats, reference_range_summary=split_ref_range,
-                        outlier_method=outlier_method, outlier_threshold=outlier_threshold
-                    )
+            for index, split_val in enumerate(unique_splits):
+                if split_val is None:
+                    ref_range = reference_range_summary.get('global') if reference_range_summary else None
+                else:
+                    # Use split-specific ref range if available
+                    ref_range = reference_range_summary.get('splits', {}).get(str(split_val)) if reference_range_summary else None
+                    if not ref_range and reference_range_summary:
+                        ref_range = reference_range_summary.get('global')
+                units.append({
+                    'param': param,
+                    'split_param': splitting_param if is_split else None,
+                    'split_value': split_val,
+                    'check_cage': index == 0,
+                    'test_key': test_key,
+                    'rationale': None if is_split else rationale,
+                    'grouping': grouping_for_stats if is_split else grouping_for_plots,
+                    'graph_type': form_data.get(f'chosen_graph_{param}', graph_type),
+                    'reference_range': ref_range,
+                })
 
-                    results['overall_notes'].extend(sub_notes)
+        shared = {
+            'start_y_zero': start_y_zero,
+            'subject_id': subject_id,
+            'exclude_outliers': exclude_outliers,
+            'extra_params': extra_params,
+        }
 
-                    # 3. Summary
-                    sub_summary = self._generate_parameter_summary_table(sub_df, grouping_for_stats, param)
-                    
-                    split_results_list.append({
-                        'split_label': f"{splitting_param}: {split_val}",
-                        'graph_data': sub_graph,
-                        'statistical_results': sub_stats,
-                        'summary_table_html': sub_summary,
-                        'notes': sub_notes
-                    })
+        # 2. Execute (tests sharing a grouping are batched)
+        frame = analysis_frame or AnalysisFrame(df, subject_id, grouping_for_plots, numerical, extra_cols=[random_effect, extra_params['covariate'], extra_params['event_col']])
+        self._batch_unit_statistics(df, units, shared)
+        unit_results = self._run_parameter_units(frame, units, shared, progress_callback)
 
+        # 3. Reassemble in the original (parameter, split) order
+        if is_split:
+            for param in numerical:
                 results['results_by_parameter'][param] = {
                     'is_split_analysis': True,
                     'splitting_param': splitting_param,
-                    'splits': split_results_list
+                    'splits': []
                 }
-            
-            else:
-                # --- STANDARD ANALYSIS (No Split) ---
-                stats_res = self.stats_service.execute_test(
-                    df, test_key, param, grouping_for_plots, False, subject_id, exclude_outliers, extra_params=extra_params
-                )
-                if rationale: stats_res['rationale'] = rationale
-                
-                global_ref_range = reference_range_summary.get('global') if reference_range_summary else None
-                graph_data, notes = generate_plot(
-                    df, param, grouping_for_plots, chosen_graph_type, start_y_zero, False, subject_id, None, 
-                    exclude_outliers=exclude_outliers, stats_results=stats_res, reference_range_summary=global_ref_range,
-                    outlier_method=outlier_method, outlier_threshold=outlier_threshold
-                )
 
-                results['overall_notes'].extend(notes)
-                
-                param_summary_html = self._generate_parameter_summary_table(df, grouping_for_plots, param)
-                
+        for unit, unit_result in zip(units, unit_results):
+            param = unit['param']
+            if unit_result.get('cage_note'):
+                results['overall_notes'].append(unit_result['cage_note'])
+                results.setdefault('cage_effect_p_values', {})[param] = unit_result['cage_p_value']
+
+            if unit['split_param']:
+                if unit_result.get('skipped'):
+                    continue
+                results['overall_notes'].extend(unit_result['notes'])
+                results['results_by_parameter'][param]['splits'].append({
+                    'split_label': f"{unit['split_param']}: {unit['split_value']}",
+                    'graph_data': unit_result['graph_data'],
+                    'statistical_results': unit_result['statistical_results'],
+                    'summary_table_html': unit_result['summary_table_html'],
+                    'notes': unit_result['notes']
+                })
+            else:
+                results['overall_notes'].extend(unit_result['notes'])
                 results['results_by_parameter'][param] = {
-                    'graph_data': graph_data,
-                    'statistical_results': stats_res,
-                    'summary_table_html': param_summary_html,
-                    'notes': notes
+                    'graph_data': unit_result['graph_data'],
+                    'statistical_results': unit_result['statistical_results'],
+                    'summary_table_html': unit_result['summary_table_html'],
+                    'notes': unit_result['notes']
                 }
 
         # 3. Overall Analysis (Correlation Matrix)
@@ -1034,6 +1064,116 @@ class AnalysisService:
         
         return df, dates
 
+    def _analyze_parameter_unit(self, frame, unit, shared):
+        """
+        Runs one (parameter, split level) unit: cage-effect check, statistical test,
+        plot and per-parameter summary table. Self-contained so units can run in
+        any order or process; results are reassembled by _analyze_independent.
+        """
+        from app.datatables.plot_utils import generate_plot
+        param = unit['param']
+        extra_params = shared['extra_params']
+        unit_result = {'cage_note': None, 'cage_p_value': None}
+
+        if unit['check_cage']:
+            cage_results = {'overall_notes': []}
+            self._check_cage_effect(frame.wide, param, cage_results)
+            if cage_results['overall_notes']:
+                unit_result['cage_note'] = cage_results['overall_notes'][0]
+                unit_result['cage_p_value'] = cage_results['cage_effect_p_values'][param]
+
+        # Narrow view of the columns this parameter needs; stages copy it, not the wide frame
+        unit_df = frame.parameter_view(param, unit['split_param'], unit['split_value'])
+        if unit['split_param'] and unit_df.empty:
+            unit_result['skipped'] = True
+            return unit_result
+
+        outlier_mask = None
+        if shared['exclude_outliers']:
+            outlier_mask = frame.outlier_mask(unit_df, param, extra_params['outlier_method'], extra_params['outlier_threshold'])
+
+        stats_res = unit.get('statistical_results') or self.stats_service.execute_test(
+            unit_df, unit['test_key'], param, unit['grouping'], False, shared['subject_id'],
+            shared['exclude_outliers'], extra_params=extra_params, outlier_mask=outlier_mask
+        )
+        if unit['rationale']: stats_res['rationale'] = unit['rationale']
+
+        graph_data, notes = generate_plot(
+            unit_df, param, unit['grouping'], unit['graph_type'], shared['start_y_zero'], False, shared['subject_id'], None,
+            exclude_outliers=shared['exclude_outliers'], stats_results=stats_res, reference_range_summary=unit['reference_range'],
+            outlier_method=extra_params['outlier_method'], outlier_threshold=extra_params['outlier_threshold'],
+            outlier_mask=outlier_mask
+        )
+
+        unit_result.update({
+            'graph_data': graph_data,
+            'statistical_results': stats_res,
+            'summary_table_html': self._generate_parameter_summary_table(unit_df, unit['grouping'], param),
+            'notes': notes,
+        })
+        return unit_result
+
+    def _batch_unit_statistics(self, df, units, shared):
+        """
+        Pre-computes the tests of units sharing a vectorizable test (same split level
+        and grouping) with a single execute_test_batch call.
+        """
+        from app.services.statistics_service import BATCH_TEST_KEYS
+        batches = {}
+        for unit in units:
+            if unit['test_key'] in BATCH_TEST_KEYS:
+                batch_key = (unit['test_key'], unit['split_value'], tuple(unit['grouping']))
+                batches.setdefault(batch_key, []).append(unit)
+
+        for (test_key, split_value, grouping), batch_units in batches.items():
+            if len(batch_units) < 2:
+                continue
+            split_param = batch_units[0]['split_param']
+            batch_df = df[df[split_param] == split_value] if split_param else df
+            if batch_df.empty:
+                continue
+            batch_results = self.stats_service.execute_test_batch(
+                batch_df, test_key, [unit['param'] for unit in batch_units], list(grouping),
+                shared['subject_id'], shared['exclude_outliers'], extra_params=shared['extra_params']
+            )
+            for unit in batch_units:
+                unit['statistical_results'] = batch_results[unit['param']]
+
+    def _run_parameter_units(self, frame, units, shared, progress_callback=None):
+        """
+        Executes the units and returns their results in the same order.
+
+        Units are fanned out to a thread pool capped at ANALYSIS_MAX_WORKERS (1 runs
+        them inline): analyses run inside Celery prefork workers, whose daemonic
+        processes cannot fork a pool of their own, while the SciPy / NumPy kernels
+        release the GIL. Each unit runs in a copy of the caller's Flask context and
+        must not use db.session. Progress is reported as units complete.
+        """
+        def _report(done, unit):
+            if progress_callback:
+                label = unit['param'] if not unit['split_param'] else f"{unit['param']} ({unit['split_param']}: {unit['split_value']})"
+                progress_callback(done, len(units), label)
+
+        max_workers = min(current_app.config.get('ANALYSIS_MAX_WORKERS', 4) or 1, len(units))
+        if max_workers <= 1:
+            unit_results = []
+            for index, unit in enumerate(units):
+                unit_results.append(self._analyze_parameter_unit(frame, unit, shared))
+                _report(index + 1, unit)
+            return unit_results
+
+        unit_results = [None] * len(units)
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='analysis-unit') as pool:
+            futures = {
+                pool.submit(contextvars.copy_context().run, self._analyze_parameter_unit, frame, unit, shared): index
+                for index, unit in enumerate(units)
+            }
+            for done, future in enumerate(as_completed(futures), start=1):
+                index = futures[future]
+                unit_results[index] = future.result()
+                _report(done, units[index])
+        return unit_results
+
     def _check_cage_effect(self, df, param, results):
         """
         Heuristic check for Cage effects using Kruskal-Wallis.
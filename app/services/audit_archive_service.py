@@ -0,0 +1,457 @@
+# app/services/audit_archive_service.py
+"""
+Monthly storage tiers of the audit trail.
+
+- live: ``audit_log``. On MySQL it is natively partitioned by month
+  (``RANGE COLUMNS(timestamp)``, partitions ``p<YYYYMM>`` + ``pmax``); on other
+  databases (SQLite) it only keeps the last ``AUDIT_LIVE_MONTHS`` months.
+- shards (non-MySQL): closed months rotated out of ``audit_log`` into
+  ``audit_log_<YYYYMM>`` tables.
+- archives: months older than ``AUDIT_ARCHIVE_AFTER_MONTHS`` exported to
+  ``AUDIT_ARCHIVE_DIR`` as gzipped JSONL (or Parquet) next to a JSON manifest,
+  then dropped from the database.
+
+Archived entries form a hash chain, ``h_i = sha256(h_{i-1} + canonical_json(entry_i))``,
+continued from the final hash of the previous archived month: editing, removing
+or reordering an entry or a whole month breaks :meth:`verify_archives`.
+
+:meth:`AuditArchiveService.query` reads the tiers newest-first and stops as soon
+as enough entries are found, so recent pages never touch the archives.
+"""
+import gzip
+import hashlib
+import json
+import os
+import re
+from datetime import date, datetime, timezone
+
+from flask import current_app
+from sqlalchemy import (JSON, Column, DateTime, Index, Integer, MetaData,
+                        String, Table, delete, func, inspect, insert, select,
+                        text)
+
+from app.extensions import db
+from app.models import AuditLog, User
+
+GENESIS_HASH = '0' * 64
+ENTRY_COLUMNS = ('id', 'user_id', 'action', 'resource_type', 'resource_id', 'changes', 'timestamp')
+SHARD_PATTERN = re.compile(r'^audit_log_(\d{6})$')
+
+_shard_metadata = MetaData()
+
+
+# ---------------------------------------------------------------------------
+# Months are handled as YYYYMM integers
+# ---------------------------------------------------------------------------
+
+def month_key(value):
+    return value.year * 100 + value.month
+
+
+def to_naive_utc(value):
+    """Audit timestamps are stored as naive UTC; converts aware datetimes to match."""
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def month_start(month):
+    return datetime(month // 100, month % 100, 1)
+
+
+def add_months(month, count):
+    index = (month // 100) * 12 + (month % 100 - 1) + count
+    return (index // 12) * 100 + index % 12 + 1
+
+
+def _current_month():
+    return month_key(datetime.now(timezone.utc))
+
+
+def _shard_table(month):
+    """Table holding one rotated month (same columns as audit_log, no foreign key)."""
+    name = f'audit_log_{month}'
+    table = _shard_metadata.tables.get(name)
+    if table is None:
+        table = Table(
+            name, _shard_metadata,
+            Column('id', Integer, primary_key=True),
+            Column('user_id', Integer, nullable=True),
+            Column('action', String(50), nullable=False),
+            Column('resource_type', String(50), nullable=False),
+            Column('resource_id', String(50), nullable=True),
+            Column('changes', JSON, nullable=True),
+            Column('timestamp', DateTime, nullable=False),
+            Index(f'ix_{name}_resource', 'resource_type', 'resource_id', 'timestamp'),
+        )
+    return table
+
+
+def canonical_entry(entry):
+    """Stable JSON text of an entry dict; the unit hashed in the archive chain."""
+    return json.dumps(entry, sort_keys=True, separators=(',', ':'), ensure_ascii=False, default=str)
+
+
+def chain_hash(previous_hash, canonical):
+    return hashlib.sha256((previous_hash + canonical).encode('utf-8')).hexdigest()
+
+
+class AuditRecord:
+    """Audit entry read from any tier; exposes the attributes of AuditLog."""
+
+    __slots__ = ENTRY_COLUMNS + ('user',)
+
+    def __init__(self, id, user_id, action, resource_type, resource_id, changes, timestamp, user=None):
+        self.id = id
+        self.user_id = user_id
+        self.action = action
+        self.resource_type = resource_type
+        self.resource_id = resource_id
+        self.changes = changes
+        self.timestamp = timestamp
+        self.user = user
+
+    @classmethod
+    def from_entry(cls, entry):
+        values = dict(entry)
+        if isinstance(values['timestamp'], str):
+            values['timestamp'] = datetime.fromisoformat(values['timestamp'])
+        values['timestamp'] = to_naive_utc(values['timestamp'])
+        return cls(**{column: values.get(column) for column in ENTRY_COLUMNS})
+
+    def to_entry(self):
+        """Plain dict as stored in archives (timestamp as ISO text)."""
+        entry = {column: getattr(self, column) for column in ENTRY_COLUMNS}
+        if isinstance(entry['timestamp'], (datetime, date)):
+            entry['timestamp'] = entry['timestamp'].isoformat()
+        return entry
+
+    def __repr__(self):
+        return f"<AuditRecord {self.action} {self.resource_type}:{self.resource_id} by {self.user_id}>"
+
+
+class AuditArchiveService:
+    """Partitions, rotates, archives and queries the audit trail."""
+
+    def __init__(self, archive_dir=None):
+        self.archive_dir = (archive_dir or current_app.config.get('AUDIT_ARCHIVE_DIR')
+                            or os.path.join(current_app.instance_path, 'audit_archive'))
+
+    @property
+    def uses_native_partitions(self):
+        return db.engine.dialect.name == 'mysql'
+
+    # --- Database tiers ---
+
+    def shard_months(self):
+        """Months held in rotated shard tables, oldest first."""
+        names = inspect(db.session.connection()).get_table_names()
+        return sorted(int(m.group(1)) for m in map(SHARD_PATTERN.match, names) if m)
+
+    def live_months(self):
+        """Months present in audit_log, oldest first."""
+        table = AuditLog.__table__
+        first, last = db.session.execute(select(func.min(table.c.timestamp), func.max(table.c.timestamp))).one()
+        if first is None:
+            return []
+        months, month, last_month = [], month_key(first), month_key(last)
+        while month <= last_month:
+            months.append(month)
+            month = add_months(month, 1)
+        return months
+
+    def _mysql_partitions(self):
+        return set(db.session.execute(text(
+            "SELECT PARTITION_NAME FROM information_schema.PARTITIONS "
+            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'audit_log' AND PARTITION_NAME IS NOT NULL"
+        )).scalars())
+
+    def ensure_partitions(self, months_ahead=2):
+        """MySQL: splits ``pmax`` so that the coming months get their own partition."""
+        if not self.uses_native_partitions:
+            return []
+        existing = self._mysql_partitions()
+        if 'pmax' not in existing:
+            # Table not partitioned (migration skipped): nothing to maintain
+            return []
+        monthly = [int(name[1:]) for name in existing if re.fullmatch(r'p\d{6}', name)]
+        month = add_months(max(monthly), 1) if monthly else _current_month()
+        target = add_months(_current_month(), months_ahead)
+        created = []
+        while month <= target:
+            created.append(month)
+            month = add_months(month, 1)
+        if created:
+            definitions = ', '.join(
+                f"PARTITION p{m} VALUES LESS THAN ('{month_start(add_months(m, 1)):%Y-%m-%d}')" for m in created
+            )
+            db.session.execute(text(
+                f"ALTER TABLE audit_log REORGANIZE PARTITION pmax INTO ({definitions}, "
+                f"PARTITION pmax VALUES LESS THAN (MAXVALUE))"
+            ))
+            db.session.commit()
+        return created
+
+    def rotate(self, live_months=None):
+        """
+        Non-MySQL: moves months older than the last ``live_months`` out of
+        audit_log into shard tables. Returns the number of entries moved.
+        """
+        if self.uses_native_partitions:
+            return 0
+        live_months = live_months or current_app.config.get('AUDIT_LIVE_MONTHS', 3)
+        cutoff = add_months(_current_month(), -(live_months - 1))
+        live = AuditLog.__table__
+        connection = db.session.connection()
+        moved = 0
+        for month in [m for m in self.live_months() if m < cutoff]:
+            shard = _shard_table(month)
+            shard.create(connection, checkfirst=True)
+            in_month = (live.c.timestamp >= month_start(month)) & (live.c.timestamp < month_start(add_months(month, 1)))
+            columns = [live.c[column] for column in ENTRY_COLUMNS]
+            result = connection.execute(insert(shard).from_select(list(ENTRY_COLUMNS), select(*columns).where(in_month)))
+            connection.execute(delete(live).where(in_month))
+            db.session.commit()
+            connection = db.session.connection()
+            moved += max(result.rowcount or 0, 0)
+        return moved
+
+    def _month_entries(self, month):
+        """All database entries of a month (live table and shard), in id order."""
+        live = AuditLog.__table__
+        entries = [dict(row._mapping) for row in db.session.execute(
+            select(*[live.c[column] for column in ENTRY_COLUMNS]).where(
+                live.c.timestamp >= month_start(month), live.c.timestamp < month_start(add_months(month, 1))
+            )
+        )]
+        if month in self.shard_months():
+            shard = _shard_table(month)
+            entries += [dict(row._mapping) for row in db.session.execute(select(shard))]
+        entries.sort(key=lambda entry: entry['id'])
+        return [AuditRecord.from_entry(entry).to_entry() for entry in entries]
+
+    def _drop_month(self, month):
+        live = AuditLog.__table__
+        if self.uses_native_partitions and f'p{month}' in self._mysql_partitions():
+            db.session.execute(text(f"ALTER TABLE audit_log DROP PARTITION p{month}"))
+            return
+        db.session.execute(delete(live).where(
+            live.c.timestamp >= month_start(month), live.c.timestamp < month_start(add_months(month, 1))
+        ))
+        if month in self.shard_months():
+            _shard_table(month).drop(db.session.connection())
+
+    # --- Archives ---
+
+    def _manifest_path(self, month):
+        return os.path.join(self.archive_dir, f'audit_{month}.manifest.json')
+
+    def archived_months(self):
+        """Months exported to the archive directory, oldest first."""
+        if not os.path.isdir(self.archive_dir):
+            return []
+        pattern = re.compile(r'^audit_(\d{6})\.manifest\.json$')
+        return sorted(int(m.group(1)) for m in map(pattern.match, os.listdir(self.archive_dir)) if m)
+
+    def read_manifest(self, month):
+        with open(self._manifest_path(month), encoding='utf-8') as f:
+            return json.load(f)
+
+    def _write_archive_file(self, path, entries, fmt):
+        if fmt == 'parquet':
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            rows = [dict(entry, changes=json.dumps(entry['changes'], sort_keys=True, default=str)) for entry in entries]
+            pq.write_table(pa.Table.from_pylist(rows), path, compression='zstd')
+        else:
+            with gzip.open(path, 'wt', encoding='utf-8') as f:
+                for entry in entries:
+                    f.write(canonical_entry(entry) + '\n')
+
+    def _read_archive_file(self, manifest):
+        path = os.path.join(self.archive_dir, manifest['file'])
+        if manifest['format'] == 'parquet':
+            import pyarrow.parquet as pq
+            return [dict(row, changes=json.loads(row['changes'])) for row in pq.read_table(path).to_pylist()]
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            return [json.loads(line) for line in f if line.strip()]
+
+    @staticmethod
+    def _file_sha256(path):
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+        return digest.hexdigest()
+
+    def archive(self, before_month=None, fmt=None):
+        """
+        Exports every database month older than ``before_month`` (default: the
+        last ``AUDIT_ARCHIVE_AFTER_MONTHS`` months stay in the database), oldest
+        first, then removes them from the database. Returns the archived months.
+        """
+        if before_month is None:
+            before_month = add_months(_current_month(), -current_app.config.get('AUDIT_ARCHIVE_AFTER_MONTHS', 24))
+        fmt = fmt or current_app.config.get('AUDIT_ARCHIVE_FORMAT', 'jsonl')
+        os.makedirs(self.archive_dir, exist_ok=True)
+
+        archived = self.archived_months()
+        months = sorted(m for m in set(self.live_months()) | set(self.shard_months()) if m < before_month)
+        done = []
+        for month in months:
+            if archived and month <= archived[-1]:
+                # The chain is append-only: late entries of an archived month stay in the database
+                current_app.logger.warning(f"Audit month {month} is older than the last archive; left in the database")
+                continue
+            if self._archive_month(month, fmt, archived[-1] if archived else None):
+                archived.append(month)
+                done.append(month)
+        return done
+
+    def _archive_month(self, month, fmt, previous_month):
+        entries = self._month_entries(month)
+        if not entries:
+            return False
+
+        previous_hash = self.read_manifest(previous_month)['final_hash'] if previous_month else GENESIS_HASH
+        final_hash = previous_hash
+        for entry in entries:
+            final_hash = chain_hash(final_hash, canonical_entry(entry))
+
+        extension = 'parquet' if fmt == 'parquet' else 'jsonl.gz'
+        filename = f'audit_{month}.{extension}'
+        path = os.path.join(self.archive_dir, filename)
+        self._write_archive_file(path + '.tmp', entries, fmt)
+        os.replace(path + '.tmp', path)
+
+        manifest = {
+            'month': month,
+            'format': fmt,
+            'file': filename,
+            'file_sha256': self._file_sha256(path),
+            'count': len(entries),
+            'first_id': entries[0]['id'],
+            'last_id': entries[-1]['id'],
+            'first_timestamp': entries[0]['timestamp'],
+            'last_timestamp': entries[-1]['timestamp'],
+            'previous_month': previous_month,
+            'previous_hash': previous_hash,
+            'final_hash': final_hash,
+            'archived_at': datetime.now(timezone.utc).isoformat(),
+        }
+        manifest_path = self._manifest_path(month)
+        with open(manifest_path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(manifest_path + '.tmp', manifest_path)
+
+        # Entries leave the database only once their archive is durable
+        self._drop_month(month)
+        db.session.commit()
+        current_app.logger.info(f"Archived {len(entries)} audit entries of {month} to {filename}")
+        return True
+
+    def verify_archives(self):
+        """
+        Re-hashes every archive and checks that each manifest continues the
+        previous one. Returns a list of (month, problem); empty when intact.
+        """
+        problems = []
+        expected_previous = GENESIS_HASH
+        previous_month = None
+        for month in self.archived_months():
+            manifest = self.read_manifest(month)
+            if manifest['previous_hash'] != expected_previous or manifest['previous_month'] != previous_month:
+                problems.append((month, 'chain broken: previous archive missing or replaced'))
+            path = os.path.join(self.archive_dir, manifest['file'])
+            if not os.path.exists(path):
+                problems.append((month, 'archive file missing'))
+            else:
+                if self._file_sha256(path) != manifest['file_sha256']:
+                    problems.append((month, 'file checksum mismatch'))
+                entries = self._read_archive_file(manifest)
+                running = manifest['previous_hash']
+                for entry in entries:
+                    running = chain_hash(running, canonical_entry(entry))
+                if len(entries) != manifest['count'] or running != manifest['final_hash']:
+                    problems.append((month, 'entry hash chain mismatch'))
+            expected_previous = manifest['final_hash']
+            previous_month = month
+        return problems
+
+    # --- Query API ---
+
+    def query(self, resource_type=None, resource_id=None, user_id=None, action=None,
+              start=None, end=None, limit=100, offset=0):
+        """
+        Audit entries matching the filters, newest first, across the live
+        table, shards and archives. ``start``/``end`` bound ``timestamp``
+        (inclusive/exclusive); aware values are converted to naive UTC.
+        Returns AuditRecord objects with ``user`` loaded.
+        """
+        start, end = to_naive_utc(start), to_naive_utc(end)
+        wanted = offset + limit
+        records = self._query_table(AuditLog.__table__, resource_type, resource_id, user_id, action, start, end, wanted)
+
+        start_month = month_key(start) if start else None
+        end_month = month_key(end) if end else None
+
+        def _in_range(month):
+            return (start_month is None or month >= start_month) and (end_month is None or month <= end_month)
+
+        for month in reversed(self.shard_months()):
+            if len(records) >= wanted:
+                break
+            if _in_range(month):
+                records += self._query_table(_shard_table(month), resource_type, resource_id, user_id,
+                                             action, start, end, wanted - len(records))
+
+        for month in reversed(self.archived_months()):
+            if len(records) >= wanted:
+                break
+            if _in_range(month):
+                records += self._query_archive(month, resource_type, resource_id, user_id,
+                                               action, start, end, wanted - len(records))
+
+        records = records[offset:offset + limit]
+        user_ids = {r.user_id for r in records if r.user_id is not None}
+        users = {u.id: u for u in User.query.filter(User.id.in_(user_ids))} if user_ids else {}
+        for record in records:
+            record.user = users.get(record.user_id)
+        return records
+
+    def _query_table(self, table, resource_type, resource_id, user_id, action, start, end, limit):
+        stmt = select(*[table.c[column] for column in ENTRY_COLUMNS])
+        if resource_type is not None:
+            stmt = stmt.where(table.c.resource_type == resource_type)
+        if resource_id is not None:
+            stmt = stmt.where(table.c.resource_id == str(resource_id))
+        if user_id is not None:
+            stmt = stmt.where(table.c.user_id == user_id)
+        if action is not None:
+            stmt = stmt.where(table.c.action == action)
+        if start is not None:
+            stmt = stmt.where(table.c.timestamp >= start)
+        if end is not None:
+            stmt = stmt.where(table.c.timestamp < end)
+        stmt = stmt.order_by(table.c.timestamp.desc(), table.c.id.desc()).limit(limit)
+        return [AuditRecord.from_entry(row._mapping) for row in db.session.execute(stmt)]
+
+    def _query_archive(self, month, resource_type, resource_id, user_id, action, start, end, limit):
+        matches = []
+        for entry in self._read_archive_file(self.read_manifest(month)):
+            if resource_type is not None and entry['resource_type'] != resource_type:
+                continue
+            if resource_id is not None and entry['resource_id'] != str(resource_id):
+                continue
+            if user_id is not None and entry['user_id'] != user_id:
+                continue
+            if action is not None and entry['action'] != action:
+                continue
+            record = AuditRecord.from_entry(entry)
+            if start is not None and record.timestamp < start:
+                continue
+            if end is not None and record.timestamp >= end:
+                continue
+            matches.append(record)
+        matches.sort(key=lambda r: (r.timestamp, r.id), reverse=True)
+        return matches[:limit]
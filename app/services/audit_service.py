@@ -1,20 +1,24 @@
 import json
 import threading
-from datetime import date, datetime, timezone
+import uuid
+from datetime import date, datetime, timedelta, timezone
 from contextlib import contextmanager
 
 from flask import has_request_context, current_app
 from flask_login import current_user
-from sqlalchemy import event, inspect
-from sqlalchemy.orm.attributes import get_history, NO_VALUE
+from sqlalchemy import delete, event, inspect, or_, select, update
+from sqlalchemy.orm import Session, object_session
+from sqlalchemy.orm.attributes import NO_VALUE
 try:
     from deepdiff import DeepDiff
 except ImportError:
     DeepDiff = None
 
 from app.extensions import db
-from app.models import (AuditLog, DataTable, EthicalApproval, ExperimentalGroup,
-                        ExperimentDataRow, Project, Sample, Team, User)
+from app.performance.frame_cache import mark_datatable_stale, register_frame_cache_listeners
+from app.models import (AuditLog, AuditOutbox, DataTable, EthicalApproval,
+                        ExperimentalGroup, ExperimentDataRow, Project, Sample,
+                        Team, User)
 
 AUDITABLE_MODELS = [
     Project,
@@ -27,6 +31,13 @@ AUDITABLE_MODELS = [
     Team
 ]
 
+JSON_AUDIT_COLUMNS = ('measurements', 'row_data', 'randomization_details')
+# Entries built during a flush, written in event order by the session after_flush hook
+PENDING_AUDIT_KEY = 'audit_pending_entries'
+OUTBOX_DIRTY_KEY = 'audit_outbox_dirty'
+
+_listeners_registered = False
+
 # Thread-local storage for audit suppression
 _audit_context = threading.local()
 
@@ -67,10 +78,56 @@ def _json_serializer(obj):
     # Handle other types if necessary
     return str(obj)
 
+def _is_container(value):
+    return isinstance(value, (dict, list))
+
+
+def _same_value(old, new):
+    """Equality without DeepDiff's type noise: 1 == 1.0, but True != 1."""
+    if isinstance(old, bool) or isinstance(new, bool):
+        return type(old) is type(new) and old == new
+    return old == new
+
+
+def _flat_json_diff(old_value, new_value):
+    """
+    Diff of two flat dicts (e.g. analyte name -> value) in DeepDiff's JSON layout
+    (``values_changed``, ``type_changes``, ``dictionary_item_added`` and
+    ``dictionary_item_removed``), so the audit trail viewer renders it the same
+    way. Added/removed entries carry their value. Returns None when a changed
+    key holds a list or dict on both sides: nested changes go to DeepDiff.
+    """
+    diff = {}
+    for key, old in old_value.items():
+        path = f"root[{key!r}]"
+        if key not in new_value:
+            diff.setdefault('dictionary_item_removed', {})[path] = old
+            continue
+        new = new_value[key]
+        if _same_value(old, new):
+            continue
+        if _is_container(old) and _is_container(new):
+            return None
+        numbers = (int, float)
+        if type(old) is type(new) or (isinstance(old, numbers) and isinstance(new, numbers)
+                                      and not isinstance(old, bool) and not isinstance(new, bool)):
+            diff.setdefault('values_changed', {})[path] = {'new_value': new, 'old_value': old}
+        else:
+            diff.setdefault('type_changes', {})[path] = {
+                'old_type': type(old).__name__, 'new_type': type(new).__name__,
+                'old_value': old, 'new_value': new,
+            }
+    for key, new in new_value.items():
+        if key not in old_value:
+            diff.setdefault('dictionary_item_added', {})[f"root[{key!r}]"] = new
+    return diff
+
+
 def _calculate_json_diff(old_value, new_value):
     """
-    Calculates the difference between two JSON-like objects using DeepDiff.
-    Returns a serializable dictionary.
+    Calculates the difference between two JSON-like objects.
+    Flat dicts (row_data, measurements) use _flat_json_diff; nested structures
+    fall back to DeepDiff. Returns a serializable dictionary.
     """
     if old_value == new_value:
         return None
@@ -91,6 +148,11 @@ def _calculate_json_diff(old_value, new_value):
     if old_value is None or new_value is None:
         return {'old': old_value, 'new': new_value}
 
+    if isinstance(old_value, dict) and isinstance(new_value, dict):
+        diff = _flat_json_diff(old_value, new_value)
+        if diff is not None:
+            return diff or None
+
     try:
         # Use DeepDiff with ignore_order=True to get the delta
         if DeepDiff:
@@ -104,46 +166,68 @@ def _calculate_json_diff(old_value, new_value):
     # Fallback to simple structure
     return {'old': old_value, 'new': new_value}
 
-def _create_log_entry(connection, action, target, changes=None):
+
+def _serialize_changes(changes):
+    """Ensures changes is a JSON-serializable dict (dates become ISO strings)."""
+    if not changes:
+        return None
+    try:
+        return json.loads(json.dumps(changes, default=_json_serializer))
+    except Exception:
+        # Fallback if serialization fails
+        return str(changes)
+
+
+def _write_entries(connection, entries):
     """
-    Inserts an AuditLog entry using Core SQL to avoid session conflicts.
+    Writes audit rows with a single executemany, in the given order. In
+    'outbox' mode they go to audit_outbox and are moved to audit_log by
+    drain_audit_outbox; either way they commit or roll back with the audited
+    transaction (GLP).
     """
-    if not current_app.config.get('ENABLE_AUDIT_LOG', True) or is_audit_suppressed():
+    if not entries:
         return
+    table = AuditOutbox.__table__ if current_app.config.get('AUDIT_LOG_MODE', 'batch') == 'outbox' else AuditLog.__table__
+    connection.execute(table.insert(), entries)
+
+
+def _should_audit():
+    """False when audit is disabled, suppressed, or skipped for the current super admin."""
+    if not current_app.config.get('ENABLE_AUDIT_LOG', True) or is_audit_suppressed():
+        return False
 
-    user_id = _get_current_user_id()
-    
     # Check if we should skip superadmin logging
     if not current_app.config.get('AUDIT_LOG_SUPERADMIN', True):
         # We need current_user to check if is_super_admin
         if has_request_context() and current_user and hasattr(current_user, 'is_authenticated') and current_user.is_authenticated:
             if current_user.is_super_admin:
-                return
+                return False
+    return True
+
+
+def _create_log_entry(connection, action, target, changes=None):
+    """
+    Builds an AuditLog row and buffers it on the target's session; the buffer is
+    written by the after_flush hook. Falls back to an immediate insert on
+    ``connection`` when the target is not attached to a session.
+    """
+    if not _should_audit():
+        return
 
-    resource_type = target.__class__.__name__
-    resource_id = str(target.id)
-    
-    # Ensure changes is a JSON-serializable dict (convert dates to strings)
-    # This avoids TypeError: Object of type datetime is not JSON serializable
-    serializable_changes = None
-    if changes:
-        try:
-            # We already have a dict, but it might contain datetime etc.
-            serializable_changes = json.loads(json.dumps(changes, default=_json_serializer))
-        except Exception:
-            # Fallback if serialization fails
-            serializable_changes = str(changes)
-    
     audit_values = {
-        'user_id': user_id,
+        'user_id': _get_current_user_id(),
         'action': action,
-        'resource_type': resource_type,
-        'resource_id': resource_id,
-        'changes': serializable_changes,
+        'resource_type': target.__class__.__name__,
+        'resource_id': str(target.id),
+        'changes': _serialize_changes(changes),
         'timestamp': datetime.now(timezone.utc)
     }
-    
-    connection.execute(AuditLog.__table__.insert().values(**audit_values))
+
+    session = object_session(target)
+    if session is None:
+        _write_entries(connection, [audit_values])
+        return
+    session.info.setdefault(PENDING_AUDIT_KEY, []).append(audit_values)
 
 
 def log_action(resource_type, resource_id, action, details=None, old_value=None, new_value=None):
@@ -161,48 +245,243 @@ def log_action(resource_type, resource_id, action, details=None, old_value=None,
         if old_value is not None or new_value is not None:
             changes = {'old': old_value, 'new': new_value}
             
-        # We need a connection object. Accessing via db.session.connection()
-        connection = db.session.connection()
-        
         # Check suppression
         if current_app.config.get('ENABLE_AUDIT_LOG', True) and not is_audit_suppressed():
-            user_id = _get_current_user_id()
-            
-            serializable_changes = None
-            if changes:
-                try:
-                    serializable_changes = json.loads(json.dumps(changes, default=_json_serializer))
-                except Exception:
-                    serializable_changes = str(changes)
+            # Put details in changes since AuditLog has changes column
+            if details:
+                if not changes:
+                    changes = {}
+                changes['details'] = details
 
             audit_values = {
-                'user_id': user_id,
+                'user_id': _get_current_user_id(),
                 'action': action.upper(),
                 'resource_type': resource_type,
                 'resource_id': str(resource_id),
-                'changes': serializable_changes,
+                'changes': _serialize_changes(changes),
                 'timestamp': datetime.now(timezone.utc)
             }
 
-            # Put details in changes since AuditLog has changes column
-            if details:
-                if not changes:
-                    changes = {}
-                changes['details'] = details
-                audit_values['changes'] = json.loads(json.dumps(changes, default=_json_serializer))
-            
-            connection.execute(AuditLog.__table__.insert().values(**audit_values))
+            # Entries buffered by earlier flushes of this session are already written,
+            # so the manual entry keeps its place in the sequence
+            _write_entries(db.session.connection(), [audit_values])
             
     except Exception as e:
         current_app.logger.error(f"Manual audit log failed: {e}")
 
 
+def log_bulk_changes(resource_type, entries):
+    """
+    Audits rows written with Core ``insert()``/``update()`` batches, which bypass
+    the mapper listeners. ``entries`` are ``(action, resource_id, changes)`` tuples:
+    the inserted state for 'INSERT', ``{column: (old, new)}`` for 'UPDATE' (diffed
+    like the before_update listener). They are written on the session's
+    connection so they commit or roll back with the bulk write.
+    """
+    if not entries or not _should_audit():
+        return
+    user_id = _get_current_user_id()
+    now = datetime.now(timezone.utc)
+    values = []
+    for action, resource_id, changes in entries:
+        if action == 'UPDATE':
+            changes = {
+                column: (_calculate_json_diff(old, new) or {'old': old, 'new': new})
+                if column in JSON_AUDIT_COLUMNS else {'old': old, 'new': new}
+                for column, (old, new) in changes.items() if old != new
+            }
+            if not changes:
+                continue
+        values.append({
+            'user_id': user_id,
+            'action': action,
+            'resource_type': resource_type,
+            'resource_id': str(resource_id),
+            'changes': _serialize_changes(changes),
+            'timestamp': now,
+        })
+    if not values:
+        return
+    _write_entries(db.session.connection(), values)
+    if current_app.config.get('AUDIT_LOG_MODE', 'batch') == 'outbox':
+        db.session.info[OUTBOX_DIRTY_KEY] = True
+
+
+def _is_json_column(column):
+    if column.key in JSON_AUDIT_COLUMNS:
+        return True
+    try:
+        return hasattr(column.type, 'python_type') and column.type.python_type in (dict, list)
+    except (NotImplementedError, AttributeError):
+        return False
+
+
+def _compute_update_changes(mapper, connection, target):
+    """
+    Diffs an updated object from its attribute history. The original row is
+    SELECTed (only the columns concerned) when history does not hold the old
+    value: expired/unloaded attributes, or JSON values mutated in place and
+    flagged with ``flag_modified`` (their committed value is the mutated object).
+    """
+    state = inspect(target)
+    candidates = {}
+    needs_db = []
+    for column in mapper.columns:
+        prop_name = column.key
+        # LOGISTICAL NOISE FIX: Skip updated_at and created_at 
+        # These are updated automatically and clog the audit trail.
+        if prop_name in ('updated_at', 'created_at'):
+            continue
+        attr_state = state.attrs.get(prop_name)
+        if attr_state is None:
+            continue
+        hist = attr_state.history
+        if not hist.has_changes():
+            continue
+        old_val = hist.deleted[0] if hist.deleted else NO_VALUE
+        if old_val is NO_VALUE or (_is_json_column(column) and old_val is getattr(target, prop_name)):
+            needs_db.append(column)
+        candidates[prop_name] = (column, old_val)
+
+    if needs_db:
+        try:
+            pk_column = mapper.primary_key[0]
+            stmt = select(*[mapper.local_table.c[c.name] for c in needs_db]).where(
+                pk_column == getattr(target, mapper.get_property_by_column(pk_column).key)
+            )
+            res = connection.execute(stmt).fetchone()
+            db_original = res._mapping if res is not None else {}
+            for column in needs_db:
+                candidates[column.key] = (column, db_original.get(column.name))
+        except Exception as e:
+            current_app.logger.error(f"Audit: Failed to fetch original record: {e}")
+            for column in needs_db:
+                candidates[column.key] = (column, state.committed_state.get(column.key))
+
+    changes = {}
+    for prop_name, (column, old_val) in candidates.items():
+        if old_val is NO_VALUE:
+            old_val = None
+        new_val = getattr(target, prop_name)
+        if old_val == new_val:
+            continue
+        if _is_json_column(column):
+            # Normalize old_val if it's a string (common in SQLite core select)
+            parsed_old = old_val
+            if isinstance(old_val, str):
+                try:
+                    parsed_old = json.loads(old_val)
+                except (ValueError, TypeError):
+                    pass
+            # Compare content after normalization
+            if parsed_old == new_val:
+                continue
+            # Structural JSON delta; fall back to old/new when it finds nothing
+            diff = _calculate_json_diff(parsed_old, new_val)
+            changes[prop_name] = diff or {'old': parsed_old, 'new': new_val}
+        else:
+            # Standard column: record old and new values
+            changes[prop_name] = {'old': old_val, 'new': new_val}
+    return changes
+
+
+def drain_audit_outbox(batch_size=None):
+    """
+    Moves audit_outbox rows to audit_log in id order, one transaction per batch.
+
+    Only one drain moves rows at a time, so audit_log ids follow the outbox
+    order (GLP). A drain claims the head of the outbox (its lowest ids) with a
+    conditional UPDATE and commits the claim before copying and deleting the
+    claimed rows together. A drain that finds part of the head claimed by
+    another live drain, or loses part of its claim to one, stops and leaves the
+    rest to it. Claims older than AUDIT_OUTBOX_CLAIM_TIMEOUT (crashed drain) are
+    taken over. Row locks are not relied upon (SQLite has no FOR UPDATE).
+    Returns the number of entries moved.
+    """
+    batch_size = batch_size or current_app.config.get('AUDIT_OUTBOX_DRAIN_BATCH', 1000)
+    claim_timeout = timedelta(seconds=current_app.config.get('AUDIT_OUTBOX_CLAIM_TIMEOUT', 600))
+    outbox = AuditOutbox.__table__
+    columns = ('user_id', 'action', 'resource_type', 'resource_id', 'changes', 'timestamp')
+    token = uuid.uuid4().hex
+    moved = 0
+    while True:
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        expired = now - claim_timeout
+        head = db.session.execute(
+            select(outbox.c.id, outbox.c.claimed_by, outbox.c.claimed_at).order_by(outbox.c.id).limit(batch_size)
+        ).all()
+        if not head or any(row.claimed_by is not None and row.claimed_at >= expired for row in head):
+            # Empty, or another drain is moving the head: it keeps the order by draining the rest
+            db.session.commit()
+            return moved
+        head_ids = [row.id for row in head]
+        claimable = or_(outbox.c.claimed_by.is_(None), outbox.c.claimed_at < expired)
+        claimed = db.session.execute(
+            update(outbox).where(outbox.c.id.in_(head_ids), claimable).values(claimed_by=token, claimed_at=now)
+        ).rowcount
+        if claimed != len(head_ids):
+            # A concurrent drain claimed part of the head first
+            db.session.rollback()
+            return moved
+        db.session.commit()
+
+        rows = db.session.execute(
+            select(outbox).where(outbox.c.claimed_by == token).order_by(outbox.c.id)
+        ).all()
+        db.session.execute(AuditLog.__table__.insert(), [{c: row._mapping[c] for c in columns} for row in rows])
+        deleted = db.session.execute(
+            delete(outbox).where(outbox.c.id.in_([row.id for row in rows]), outbox.c.claimed_by == token)
+        ).rowcount
+        if deleted != len(rows):
+            # Our claim expired and was taken over: leave these rows to the other drain
+            db.session.rollback()
+            return moved
+        db.session.commit()
+        moved += len(rows)
+
+
+def _register_session_listeners(app):
+    """Writes the entries buffered during a flush; schedules the outbox drain on commit."""
+    global _listeners_registered
+    if _listeners_registered:
+        return
+    _listeners_registered = True
+
+    @event.listens_for(Session, 'after_flush')
+    def _after_flush(session, flush_context):
+        entries = session.info.pop(PENDING_AUDIT_KEY, None)
+        if not entries:
+            return
+        _write_entries(session.connection(), entries)
+        if current_app.config.get('AUDIT_LOG_MODE', 'batch') == 'outbox':
+            session.info[OUTBOX_DIRTY_KEY] = True
+
+    @event.listens_for(Session, 'after_commit')
+    def _after_commit(session):
+        if not session.info.pop(OUTBOX_DIRTY_KEY, None):
+            return
+        try:
+            from app.tasks import drain_audit_outbox_task
+            drain_audit_outbox_task.delay()
+        except Exception as e:
+            # Undrained entries stay in the outbox until the next drain
+            current_app.logger.warning(f"Audit outbox drain could not be scheduled: {e}")
+
+    @event.listens_for(Session, 'after_soft_rollback')
+    def _after_rollback(session, previous_transaction):
+        if previous_transaction.parent is None:
+            session.info.pop(PENDING_AUDIT_KEY, None)
+            session.info.pop(OUTBOX_DIRTY_KEY, None)
+
+
 def register_audit_listeners(app):
     """
     Registers SQLAlchemy event listeners for all AUDITABLE_MODELS.
     This should be called during app initialization.
     """
-    
+    register_frame_cache_listeners()
+    _register_session_listeners(app)
+
     for model_cls in AUDITABLE_MODELS:
         
         @event.listens_for(model_cls, 'after_insert')
@@ -216,6 +495,7 @@ def register_audit_listeners(app):
                     state[column.key] = val
                     
             _create_log_entry(connection, 'INSERT', target, changes=state)
+            mark_datatable_stale(target)
 
         @event.listens_for(model_cls, 'after_delete')
         def after_delete_listener(mapper, connection, target):
@@ -223,90 +503,13 @@ def register_audit_listeners(app):
             # In after_delete, the row is gone from DB, but target object still has data.
             # We log that it was deleted.
             _create_log_entry(connection, 'DELETE', target)
+            mark_datatable_stale(target)
 
         @event.listens_for(model_cls, 'before_update')
         def before_update_listener(mapper, connection, target):
-            changes = {}
-            has_changes = False
-            state = inspect(target)
-            
-            # Fetch the current record from the DB to be absolute sure about 'old' values
-            # ( SQLAlchemy history can be unreliable for JSON/Mutable types )
-            db_original = None
-            try:
-                table = mapper.local_table
-                pk_column = mapper.primary_key[0]
-                stmt = table.select().where(pk_column == getattr(target, pk_column.key))
-                res = connection.execute(stmt).fetchone()
-                if res:
-                    # Row mapping access is more compatible (SQLAlchemy 1.4+)
-                    db_original = res._asdict() if hasattr(res, '_asdict') else res._mapping
-            except Exception as e:
-                current_app.logger.error(f"Audit: Failed to fetch original record: {e}")
-
-            for column in mapper.columns:
-                prop_name = column.key
-                
-                # LOGISTICAL NOISE FIX: Skip updated_at and created_at 
-                # These are updated automatically and clog the audit trail.
-                if prop_name in ('updated_at', 'created_at'):
-                    continue
-
-                old_val = db_original.get(prop_name) if db_original else None
-                
-                # FALLBACK: If raw DB fetch returned None or failed, try SQLAlchemy history
-                if old_val is None:
-                    attr_state = state.attrs.get(prop_name)
-                    hist = attr_state.history
-                    if hist.deleted:
-                        old_val = hist.deleted[0]
-                    if old_val is NO_VALUE:
-                        old_val = state.committed_state.get(prop_name, None)
-
-                new_val = getattr(target, prop_name)
-                
-                is_json = False
-                if prop_name in ('measurements', 'row_data', 'randomization_details'):
-                    is_json = True
-                else:
-                    try:
-                        if hasattr(column.type, 'python_type') and column.type.python_type in (dict, list):
-                            is_json = True
-                    except (NotImplementedError, AttributeError):
-                        pass
-
-                if old_val != new_val:
-                    if is_json:
-                        # Normalize old_val if it's a string (common in SQLite core select)
-                        parsed_old = old_val
-                        if isinstance(old_val, str):
-                            try:
-                                parsed_old = json.loads(old_val)
-                            except (ValueError, TypeError):
-                                pass
-                        
-                        # Compare content after normalization
-                        if parsed_old == new_val:
-                             continue
-
-                        # Use DeepDiff for JSON delta
-                        diff = _calculate_json_diff(parsed_old, new_val)
-                        
-                        # SAFETY: If DeepDiff failed to find actual changes or returned empty
-                        # but we know they differ, fall back to old/new
-                        if not diff and parsed_old != new_val:
-                            changes[prop_name] = {'old': parsed_old, 'new': new_val}
-                            has_changes = True
-                        elif diff:
-                            changes[prop_name] = diff
-                            has_changes = True
-                    else:
-                        # Standard column: record old and new values
-                        changes[prop_name] = {
-                            'old': old_val, 
-                            'new': new_val
-                        }
-                        has_changes = True
-            
-            if has_changes:
+            mark_datatable_stale(target)
+            if not current_app.config.get('ENABLE_AUDIT_LOG', True) or is_audit_suppressed():
+                return
+            changes = _compute_update_changes(mapper, connection, target)
+            if changes:
                 _create_log_entry(connection, 'UPDATE', target, changes=changes)
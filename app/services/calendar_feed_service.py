@@ -0,0 +1,334 @@
+# app/services/calendar_feed_service.py
+"""
+Personal and team ICS calendar feeds.
+
+Calendar clients poll the feeds every few minutes, so each poll starts with
+the feed *state*: counts and latest ``updated_at`` of the WorkplanEvents,
+Workplans (and their generated groups), DataTables, groups and projects in
+the feed, read with aggregate queries only. The state gives the ETag and
+Last-Modified headers, and an unchanged feed answers 304 without loading a
+single event.
+
+When the query cache is enabled (QUERY_CACHE_BACKEND), the rendered feed is
+kept per user and served as long as its state holds. A write only changes
+the state of the feeds that contain it, so only those users' feeds are
+rebuilt, and a rebuild re-renders only the events whose own stamp changed.
+Names that carry no timestamp (protocols, assignees) are refreshed by the
+daily component of the state.
+"""
+import hashlib
+import textwrap
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+
+from flask import Response, current_app, request, url_for
+from sqlalchemy import func
+from sqlalchemy.orm import joinedload
+
+from app.extensions import db
+from app.models import DataTable, ExperimentalGroup, Project, Workplan, WorkplanEvent, WorkplanStatus
+from app.performance.caching import get_query_cache
+
+FEED_STATUSES = (WorkplanStatus.PLANNED, WorkplanStatus.RUNNING, WorkplanStatus.COMPLETED)
+FEED_FORMAT_VERSION = 3  # Bump when the rendered VEVENTs change
+EMPTY_CALENDAR = "BEGIN:VCALENDAR\r\nVERSION:2.0\r\nEND:VCALENDAR"
+ICS_MIMETYPE = 'text/calendar; charset=utf-8'
+
+
+def fold_line(line):
+    """Folds a long iCalendar line into multiple lines of max 75 chars."""
+    return textwrap.fill(line, width=75, subsequent_indent=' ', break_long_words=False, break_on_hyphens=False)
+
+
+def _as_http_date(value):
+    """Naive UTC column value -> aware datetime without microseconds (HTTP date precision)."""
+    if value is None:
+        return None
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.replace(microsecond=0)
+
+
+def _dtstamp(*values):
+    latest = max((v for v in values if v is not None), default=None)
+    return latest.strftime('%Y%m%dT%H%M%SZ') if latest else '19700101T000000Z'
+
+
+class CalendarFeed:
+    """
+    One ICS feed of one user: the WorkplanEvents and standalone DataTables
+    selected by ``wp_query`` / ``dt_query``. ``scope`` (e.g. the accessible
+    project ids) is part of the state.
+    """
+
+    def __init__(self, kind, user, wp_query, dt_query, cal_name, cal_desc, scope=()):
+        self.kind = kind
+        self.user = user
+        self.wp_query = wp_query
+        self.dt_query = dt_query
+        self.cal_name = cal_name
+        self.cal_desc = cal_desc
+        self.scope = tuple(scope)
+        self.fingerprint = None
+        self.last_modified = None
+
+    @property
+    def cache_key(self):
+        return f'ics:{self.kind}:{self.user.id}'
+
+    def compute_state(self):
+        """Sets ``fingerprint`` (the ETag) and ``last_modified`` from aggregate queries."""
+        wp_state = tuple(self.wp_query.outerjoin(
+            ExperimentalGroup, ExperimentalGroup.created_from_workplan_id == Workplan.id
+        ).with_entities(
+            func.count(func.distinct(WorkplanEvent.id)), func.max(WorkplanEvent.updated_at),
+            func.max(Workplan.updated_at), func.max(Project.updated_at), func.max(ExperimentalGroup.updated_at),
+        ).one())
+        linked_state = tuple(db.session.query(func.count(DataTable.id), func.max(DataTable.updated_at)).filter(
+            DataTable.workplan_event_id.in_(self.wp_query.with_entities(WorkplanEvent.id).statement)
+        ).one())
+        dt_state = tuple(self.dt_query.with_entities(
+            func.count(DataTable.id), func.max(DataTable.updated_at),
+            func.max(ExperimentalGroup.updated_at), func.max(Project.updated_at),
+        ).one())
+
+        today = datetime.now(timezone.utc).date().isoformat()
+        state = (FEED_FORMAT_VERSION, self.kind, self.user.id, self.user.email, self.scope, today,
+                 wp_state, linked_state, dt_state)
+        self.fingerprint = hashlib.sha256(repr(state).encode('utf-8')).hexdigest()
+        timestamps = [v for v in wp_state[1:] + linked_state[1:] + dt_state[1:] if v is not None]
+        self.last_modified = _as_http_date(max(timestamps)) if timestamps else None
+        return self.fingerprint
+
+    def _load_events(self):
+        wp_events = self.wp_query.options(
+            joinedload(WorkplanEvent.workplan).joinedload(Workplan.project),
+            joinedload(WorkplanEvent.workplan).joinedload(Workplan.generated_group),
+            joinedload(WorkplanEvent.protocol),
+            joinedload(WorkplanEvent.assignee),
+        ).order_by(WorkplanEvent.id).all()
+
+        # Generated DataTables of all events in one query instead of one per event
+        linked_datatables = defaultdict(list)
+        if wp_events:
+            rows = db.session.query(DataTable.workplan_event_id, DataTable.id).filter(
+                DataTable.workplan_event_id.in_([event.id for event in wp_events])
+            ).order_by(DataTable.id)
+            for event_id, datatable_id in rows:
+                linked_datatables[event_id].append(datatable_id)
+
+        dt_events = self.dt_query.options(
+            joinedload(DataTable.group).joinedload(ExperimentalGroup.project),
+            joinedload(DataTable.protocol),
+            joinedload(DataTable.assignee),
+        ).order_by(DataTable.id).all()
+        return wp_events, linked_datatables, dt_events
+
+    def render(self, previous=None):
+        """
+        Returns ``(ics_bytes, rendered_events)``. ``previous`` is the
+        ``rendered_events`` of an earlier render: events whose stamp did not
+        change are reused instead of being rendered again.
+        """
+        previous = previous or {}
+        wp_events, linked_datatables, dt_events = self._load_events()
+        rendered = {}
+        vevents = []
+
+        for event in wp_events:
+            wp = event.workplan
+            datatable_ids = tuple(linked_datatables.get(event.id, ()))
+            key = ('event', event.id)
+            group_updated_at = wp.generated_group.updated_at if wp.generated_group else None
+            stamp = (event.updated_at, wp.updated_at, wp.project.updated_at, group_updated_at, datatable_ids)
+            if key in previous and previous[key][0] == stamp:
+                text = previous[key][1]
+            else:
+                text = _render_workplan_event(event, datatable_ids)
+            rendered[key] = (stamp, text)
+            if text:
+                vevents.append(text)
+
+        for dt in dt_events:
+            key = ('datatable', dt.id)
+            stamp = (dt.updated_at, dt.group.updated_at, dt.group.project.updated_at)
+            if key in previous and previous[key][0] == stamp:
+                text = previous[key][1]
+            else:
+                text = _render_datatable(dt)
+            rendered[key] = (stamp, text)
+            if text:
+                vevents.append(text)
+
+        current_app.logger.info(
+            f"Generated ICS feed '{self.cal_name}' for user '{self.user.email}': {len(vevents)} events, "
+            f"{sum(1 for key in rendered if key in previous and previous[key] == rendered[key])} reused."
+        )
+        ics_lines = [
+            "BEGIN:VCALENDAR",
+            "VERSION:2.0",
+            "PRODID:-//Precliniset//NONSGML v1.0//EN",
+            fold_line(f"X-WR-CALNAME:{self.cal_name}"),
+            fold_line(f"X-WR-CALDESC:{self.cal_desc}"),
+            *vevents,
+            "END:VCALENDAR",
+        ]
+        return "\r\n".join(ics_lines).encode('utf-8'), rendered
+
+    def content(self):
+        """ICS bytes for the current state, from the cache when possible (call ``compute_state`` first)."""
+        backend = get_query_cache()
+        entry = None
+        if backend is not None:
+            try:
+                _hit, entry, _versions = backend.lookup(self.cache_key, ())
+            except Exception as e:
+                current_app.logger.warning(f"Calendar feed cache lookup failed: {e}")
+        if entry and entry['fingerprint'] == self.fingerprint:
+            return entry['body']
+
+        # Rendered events are reused within the same day only, so that
+        # protocol or assignee renames reach the feeds at least daily
+        day = datetime.now(timezone.utc).date().isoformat()
+        previous = entry['events'] if entry and entry.get('day') == day else None
+        body, rendered = self.render(previous)
+        if backend is not None:
+            try:
+                backend.store(self.cache_key, (), {'fingerprint': self.fingerprint, 'day': day,
+                                                   'body': body, 'events': rendered},
+                              current_app.config.get('CALENDAR_FEED_CACHE_TTL', 86400))
+            except Exception as e:
+                current_app.logger.warning(f"Calendar feed cache store failed: {e}")
+        return body
+
+
+def _render_workplan_event(event, datatable_ids):
+    wp = event.workplan
+    if not wp.study_start_date:
+        return None
+    start_date = wp.study_start_date + timedelta(days=event.offset_days)
+    summary = f"[{wp.project.slug}] {event.protocol.name}"
+    if event.event_name:
+        summary += f" ({event.event_name})"
+    assignee_str = event.assignee.email if event.assignee else 'Unassigned'
+    project_url = url_for('projects.view_edit_project', project_slug=wp.project.slug, _external=True)
+    group_url = url_for('groups.edit_group', id=wp.generated_group.id, _external=True) if wp.generated_group else 'N/A'
+    protocol_url = url_for('core_models.edit_model', model_type='protocol', id=event.protocol.id, _external=True)
+    workplan_url = url_for('workplans.edit_workplan', workplan_id=wp.id, _external=True)
+
+    description = (
+        f"Project: {wp.project.name} ({project_url})\\n"
+        f"Group: {wp.generated_group.name if wp.generated_group else 'N/A'} ({group_url})\\n"
+        f"Protocol: {event.protocol.name} ({protocol_url})\\n"
+        f"Workplan: {wp.name} ({workplan_url})\\n"
+        f"Assigned To: {assignee_str}"
+    )
+    if datatable_ids:
+        description += "\\n\\n"
+        for i, datatable_id in enumerate(datatable_ids):
+            link = url_for('datatables.view_data_table', datatable_id=datatable_id, _external=True)
+            description += f"View DataTable {i+1}: \\n {link}\\n"
+
+    uid = f"precliniset-event-{event.id}-{wp.updated_at.strftime('%Y%m%d%H%M%S')}@precliniset.app"
+    group_updated_at = wp.generated_group.updated_at if wp.generated_group else None
+    return _vevent(uid, _dtstamp(event.updated_at, wp.updated_at, group_updated_at), start_date, summary, description)
+
+
+def _render_datatable(dt):
+    try:
+        start_date = datetime.strptime(dt.date, '%Y-%m-%d').date()
+    except (ValueError, TypeError):
+        return None
+
+    summary = f"[{dt.group.project.slug}] {dt.protocol.name} (Ad-hoc)"
+    assignee_str = dt.assignee.email if dt.assignee else 'Unassigned'
+    project_url = url_for('projects.view_edit_project', project_slug=dt.group.project.slug, _external=True)
+    group_url = url_for('groups.edit_group', id=dt.group.id, _external=True)
+    protocol_url = url_for('core_models.edit_model', model_type='protocol', id=dt.protocol.id, _external=True)
+    datatable_url = url_for('datatables.view_data_table', datatable_id=dt.id, _external=True)
+
+    description = (
+        f"Project: {dt.group.project.name} ({project_url})\\n"
+        f"Group: {dt.group.name} ({group_url})\\n"
+        f"Protocol: {dt.protocol.name} ({protocol_url})\\n"
+        f"Assigned To: {assignee_str}\\n\\n"
+        f"View Datatable: {datatable_url}"
+    )
+    uid = f"precliniset-datatable-{dt.id}-{dt.group.project.updated_at.strftime('%Y%m%d%H%M%S')}@precliniset.app"
+    return _vevent(uid, _dtstamp(dt.updated_at), start_date, summary, description)
+
+
+def _vevent(uid, dtstamp, start_date, summary, description):
+    # DTSTAMP is the revision time of the event, so an unchanged event renders identically
+    end_date = start_date + timedelta(days=1)
+    return "\r\n".join([
+        "BEGIN:VEVENT",
+        f"UID:{uid}",
+        f"DTSTAMP:{dtstamp}",
+        f"DTSTART;VALUE=DATE:{start_date.strftime('%Y%m%d')}",
+        f"DTEND;VALUE=DATE:{end_date.strftime('%Y%m%d')}",
+        fold_line(f"SUMMARY:{summary}"),
+        fold_line(f"DESCRIPTION:{description}"),
+        "END:VEVENT",
+    ])
+
+
+def personal_feed(user):
+    """Events assigned to ``user``."""
+    wp_query = WorkplanEvent.query.join(Workplan).join(Project, Workplan.project_id == Project.id).filter(
+        WorkplanEvent.assigned_to_id == user.id,
+        Workplan.status.in_(FEED_STATUSES),
+        Workplan.study_start_date.isnot(None),
+    )
+    dt_query = DataTable.query.join(ExperimentalGroup).join(Project, ExperimentalGroup.project_id == Project.id).filter(
+        DataTable.assigned_to_id == user.id,
+        DataTable.workplan_event_id.is_(None),
+    )
+    return CalendarFeed('personal', user, wp_query, dt_query,
+                        "Precliniset Assignments",
+                        "Your personal calendar for assigned tasks in Precliniset.")
+
+
+def team_feed(user):
+    """Events of every project ``user`` can access; None when there is none."""
+    project_ids = sorted(p.id for p in user.get_accessible_projects(include_archived=False))
+    if not project_ids:
+        return None
+    wp_query = WorkplanEvent.query.join(Workplan).join(Project, Workplan.project_id == Project.id).filter(
+        Workplan.project_id.in_(project_ids),
+        Workplan.status.in_(FEED_STATUSES),
+        Workplan.study_start_date.isnot(None),
+    )
+    dt_query = DataTable.query.join(ExperimentalGroup).join(Project, ExperimentalGroup.project_id == Project.id).filter(
+        ExperimentalGroup.project_id.in_(project_ids),
+        DataTable.workplan_event_id.is_(None),
+    )
+    return CalendarFeed('team', user, wp_query, dt_query,
+                        f"Precliniset Teams: {user.email}",
+                        "All events from projects you have access to in Precliniset.",
+                        scope=project_ids)
+
+
+def feed_response(feed, filename):
+    """
+    Conditional response for ``feed``: 304 when the client's ETag (or
+    Last-Modified date) is still current, the ICS file otherwise.
+    """
+    etag = feed.compute_state()
+    if request.if_none_match:
+        not_modified = request.if_none_match.contains(etag)
+    else:
+        not_modified = bool(feed.last_modified and request.if_modified_since
+                            and feed.last_modified <= request.if_modified_since)
+
+    if not_modified:
+        response = Response(status=304)
+    else:
+        response = Response(feed.content(), mimetype=ICS_MIMETYPE,
+                            headers={'Content-Disposition': f'attachment; filename={filename}'})
+    response.set_etag(etag)
+    response.last_modified = feed.last_modified
+    # Clients may keep the file but must revalidate it on every poll
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response
@@ -0,0 +1,528 @@
+# app/services/ckan_publish_service.py
+"""
+CKAN publish jobs.
+
+Publishing a project records a ``CKANUploadTask`` with one
+``CKANResourceTask`` per DataTable / attachment and queues
+``tasks.publish_ckan_project``. The worker fetches the dataset manifest once
+(a single ``package_show``), skips every resource whose content hash matches
+the ``hash`` field already stored on CKAN, and uploads the others through one
+pooled ``requests.Session`` with at most ``CKAN_PUBLISH_CONCURRENCY``
+uploads in flight, retrying transient failures. Each resource outcome is
+committed as soon as it is known, so a failed or interrupted publish resumes
+with the resources that are still pending.
+"""
+import hashlib
+import os
+import tempfile
+import time
+import uuid
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime, timedelta, timezone
+from urllib.parse import quote, urlparse
+
+import pandas as pd
+import requests
+from flask import current_app, url_for
+from flask_babel import gettext as _
+from requests.adapters import HTTPAdapter
+
+from app.ckan.helpers import sanitize_ckan_name, validate_external_url
+from app.extensions import db
+from app.helpers import get_ordered_column_names
+from app.models import (
+    Attachment, CKANResourceTask, CKANUploadTask, DataTable, ExperimentalGroup,
+    ExperimentDataRow, ProtocolAttachment, User,
+)
+from app.models.notifications import Notification, NotificationType
+from app.utils.files import iter_dataframe_csv
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+UPLOAD_TIMEOUT = 300
+UPLOAD_CHUNK_SIZE = 64 * 1024
+SPOOL_MAX_BYTES = 8 * 1024 * 1024  # Larger generated CSVs spill to disk
+
+
+class CKANPublishError(Exception):
+    """Raised when a publish cannot start or a resource cannot be prepared."""
+
+
+def _utcnow():
+    # Naive UTC, like the other DateTime columns once read back from the database
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+class _MultipartBody:
+    """
+    ``multipart/form-data`` body that streams its file part from disk in
+    ``UPLOAD_CHUNK_SIZE`` blocks. Its length is known up front, so requests
+    sends a Content-Length instead of a chunked body (which many CKAN
+    front-ends reject). A new instance is built for every attempt.
+    """
+
+    def __init__(self, fields, filename, fileobj, size):
+        boundary = uuid.uuid4().hex
+        self.content_type = f'multipart/form-data; boundary={boundary}'
+        parts = [
+            f'--{boundary}\r\nContent-Disposition: form-data; name="{key}"\r\n\r\n{value}\r\n'.encode('utf-8')
+            for key, value in fields.items() if value is not None
+        ]
+        parts.append((
+            f'--{boundary}\r\nContent-Disposition: form-data; name="upload"; filename="{quote(filename)}"\r\n'
+            f'Content-Type: application/octet-stream\r\n\r\n'
+        ).encode('utf-8'))
+        self._head = b''.join(parts)
+        self._tail = f'\r\n--{boundary}--\r\n'.encode('utf-8')
+        self._fileobj = fileobj
+        self._size = size
+
+    def __len__(self):
+        return len(self._head) + self._size + len(self._tail)
+
+    def __iter__(self):
+        yield self._head
+        self._fileobj.seek(0)
+        while True:
+            chunk = self._fileobj.read(UPLOAD_CHUNK_SIZE)
+            if not chunk:
+                break
+            yield chunk
+        yield self._tail
+
+
+class CKANClient:
+    """
+    CKAN action API over one pooled ``requests.Session``.
+
+    The portal URL is validated and resolved once, and every request goes to
+    that IP with the original Host header (the SSRF / DNS-rebinding protection
+    of ``app.ckan.helpers.ckan_request``); redirects are never followed.
+    Connection errors and ``RETRY_STATUSES`` answers are retried ``retries``
+    times with exponential backoff (``Retry-After`` is honoured).
+    """
+
+    def __init__(self, ckan_url, api_key, pool_size=4, retries=3, backoff=1.0):
+        base_url = ckan_url.rstrip('/')
+        hostname = urlparse(base_url).hostname
+        resolved_ip = validate_external_url(base_url)
+        self.api_url = f"{base_url.replace(hostname, resolved_ip, 1)}/api/3/action"
+        self.retries = retries
+        self.backoff = backoff
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.session.headers.update({'Authorization': api_key, 'Host': hostname})
+
+    def close(self):
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _wait_before_retry(self, attempt, retry_after=None):
+        delay = self.backoff * (2 ** attempt)
+        if retry_after and retry_after.isdigit():
+            delay = max(delay, int(retry_after))
+        time.sleep(delay)
+
+    def _request(self, method, action, params=None, fields=None, upload=None):
+        """``upload`` is ``(filename, fileobj, size)``; returns the response of the last attempt."""
+        for attempt in range(self.retries + 1):
+            kwargs = {'params': params, 'timeout': UPLOAD_TIMEOUT if upload else 20, 'allow_redirects': False}
+            if upload:
+                body = _MultipartBody(fields or {}, *upload)
+                kwargs.update(data=body, headers={'Content-Type': body.content_type})
+            elif fields is not None:
+                kwargs['json'] = fields
+            try:
+                response = self.session.request(method, f'{self.api_url}/{action}', **kwargs)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+                if attempt == self.retries:
+                    raise
+                self._wait_before_retry(attempt)
+                continue
+            if response.status_code in RETRY_STATUSES and attempt < self.retries:
+                self._wait_before_retry(attempt, response.headers.get('Retry-After'))
+                continue
+            return response
+
+    @staticmethod
+    def _result(action, response):
+        try:
+            payload = response.json()
+        except ValueError:
+            payload = None
+        if response.status_code >= 400 or not payload or not payload.get('success'):
+            error_message = f"CKAN {action} failed with status {response.status_code}."
+            if payload:
+                error_message += f" Details: {(payload.get('error') or {}).get('message', 'No specific message in JSON.')}"
+            else:
+                error_message += " Server returned a non-JSON response."
+            raise requests.exceptions.HTTPError(error_message, response=response)
+        return payload.get('result')
+
+    def package_show(self, dataset_name_or_id):
+        """Returns the dataset with its resources, or None if it does not exist."""
+        response = self._request('GET', 'package_show', params={'id': dataset_name_or_id})
+        if response.status_code == 404:
+            return None
+        return self._result('package_show', response)
+
+    def resource_create(self, package_id, name, description, content_hash, fileobj, size):
+        fields = {'package_id': package_id, 'name': name, 'description': description, 'hash': content_hash}
+        return self._result('resource_create', self._request('POST', 'resource_create', fields=fields,
+                                                               upload=(name, fileobj, size)))
+
+    def resource_update(self, resource_id, name, description, content_hash, fileobj, size):
+        fields = {'id': resource_id, 'name': name, 'description': description, 'hash': content_hash}
+        return self._result('resource_update', self._request('POST', 'resource_update', fields=fields,
+                                                               upload=(name, fileobj, size)))
+
+
+class PublishPayload:
+    """A resource ready to upload: its name, description, content (file object) and sha256."""
+
+    def __init__(self, name, description, fileobj, size, content_hash):
+        self.name = name
+        self.description = description
+        self.fileobj = fileobj
+        self.size = size
+        self.content_hash = content_hash
+
+    def close(self):
+        self.fileobj.close()
+
+
+def build_datatable_frame(datatable):
+    """DataFrame published for ``datatable``: animal fields, measurements, age_days and housing conditions."""
+    column_names = get_ordered_column_names(datatable)
+    animals = {animal.id: animal for animal in datatable.group.animals}
+    dt_date = None
+    try:
+        dt_date = datetime.strptime(datatable.date, '%Y-%m-%d').date() if datatable.date else None
+    except (ValueError, TypeError):
+        pass
+
+    data_for_df = []
+    for row in datatable.experiment_rows.order_by(ExperimentDataRow.animal_id):
+        row_data = {}
+        if row.animal_id in animals:
+            row_data.update(animals[row.animal_id].to_dict())
+        row_data.update(row.row_data or {})
+
+        age_days = None
+        date_of_birth_str = row_data.get('date_of_birth')
+        if date_of_birth_str and dt_date:
+            try:
+                age_days = (dt_date - datetime.strptime(date_of_birth_str, '%Y-%m-%d').date()).days
+            except (ValueError, TypeError):
+                current_app.logger.warning(
+                    f"Could not calculate age for animal {row.animal_id} in datatable {datatable.id} during CKAN upload due to invalid date format."
+                )
+        row_data['age_days'] = age_days
+        data_for_df.append(row_data)
+
+    df = pd.DataFrame(data_for_df, columns=column_names)
+    if datatable.housing_condition:
+        for item_assoc in datatable.housing_condition.item_associations:
+            df[item_assoc.item.name] = item_assoc.default_value
+    return df
+
+
+def _spool_chunks(chunks):
+    """Writes ``chunks`` (bytes) to a spooled temporary file; returns (file, size, sha256)."""
+    digest = hashlib.sha256()
+    spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES)
+    size = 0
+    for chunk in chunks:
+        digest.update(chunk)
+        spool.write(chunk)
+        size += len(chunk)
+    spool.seek(0)
+    return spool, size, digest.hexdigest()
+
+
+def _hash_file(path):
+    """Opens ``path`` for upload; returns (file, size, sha256) without loading it in memory."""
+    digest = hashlib.sha256()
+    fh = open(path, 'rb')
+    for chunk in iter(lambda: fh.read(UPLOAD_CHUNK_SIZE), b''):
+        digest.update(chunk)
+    size = fh.tell()
+    fh.seek(0)
+    return fh, size, digest.hexdigest()
+
+
+def _upload(client, dataset_id, existing, payload):
+    """Runs in a worker thread: no database or application context access here."""
+    if existing:
+        return client.resource_update(existing['id'], payload.name, payload.description,
+                                      payload.content_hash, payload.fileobj, payload.size)
+    return client.resource_create(dataset_id, payload.name, payload.description,
+                                  payload.content_hash, payload.fileobj, payload.size)
+
+
+class CKANPublishService:
+    """Creates, resumes and runs CKAN publish jobs."""
+
+    def collect_resources(self, project):
+        """(resource_type, id) of everything a publish of ``project`` uploads, in upload order."""
+        datatables = db.session.query(DataTable).join(ExperimentalGroup).filter(
+            ExperimentalGroup.project_id == project.id
+        ).order_by(DataTable.date.asc(), DataTable.id.asc()).all()
+
+        resources = [(CKANResourceTask.TYPE_DATATABLE, dt.id) for dt in datatables]
+        seen_protocols = set()
+        for dt in datatables:
+            if dt.protocol_id in seen_protocols:
+                continue
+            seen_protocols.add(dt.protocol_id)
+            attachment = dt.protocol.attachments.first()
+            if attachment:
+                resources.append((CKANResourceTask.TYPE_PROTOCOL_ATTACHMENT, attachment.id))
+        resources.extend((CKANResourceTask.TYPE_ATTACHMENT, att.id)
+                         for att in project.attachments.order_by(Attachment.id))
+        return resources
+
+    def start(self, project, user, dataset_id):
+        """
+        Returns ``(task, should_enqueue)``. An unfinished publish of the same
+        dataset is resumed (its failed resources are retried, new ones added);
+        one still running and recently active is returned as is.
+        """
+        task = CKANUploadTask.query.filter(
+            CKANUploadTask.project_id == project.id,
+            CKANUploadTask.dataset_id == dataset_id,
+            CKANUploadTask.status != CKANUploadTask.STATUS_DONE,
+        ).order_by(CKANUploadTask.id.desc()).first()
+
+        if task is not None and task.status == CKANUploadTask.STATUS_RUNNING:
+            stale_after = timedelta(minutes=current_app.config.get('CKAN_PUBLISH_STALE_MINUTES', 30))
+            if task.updated_at and task.updated_at > _utcnow() - stale_after:
+                return task, False
+            current_app.logger.warning(f"Resuming interrupted CKAN publish {task.id} of project {project.id}")
+
+        if task is None:
+            task = CKANUploadTask(project_id=project.id, dataset_id=dataset_id)
+            db.session.add(task)
+            db.session.flush()
+
+        known = {(res.resource_type, res.resource_id) for res in task.resource_tasks}
+        for resource_type, resource_id in self.collect_resources(project):
+            if (resource_type, resource_id) not in known:
+                db.session.add(CKANResourceTask(upload_task_id=task.id, resource_type=resource_type,
+                                                resource_id=resource_id, status=CKANResourceTask.STATUS_PENDING))
+        task.resource_tasks.filter_by(status=CKANResourceTask.STATUS_FAILED).update(
+            {'status': CKANResourceTask.STATUS_PENDING, 'error_message': None}, synchronize_session='fetch'
+        )
+        task.user_id = user.id
+        task.status = CKANUploadTask.STATUS_PENDING
+        task.error_message = None
+        task.completed_at = None
+        task.updated_at = _utcnow()
+        db.session.commit()
+        return task, True
+
+    def enqueue(self, task):
+        """Queues the publish; returns False if the broker is unreachable (the caller then runs it inline)."""
+        from app.tasks import publish_ckan_project_task
+        try:
+            publish_ckan_project_task.apply_async(args=[task.id], task_id=f'ckan-publish-{task.id}')
+            return True
+        except Exception as e:
+            current_app.logger.error(f"Could not queue CKAN publish {task.id}: {e}", exc_info=True)
+            return False
+
+    def build_payload(self, resource_task):
+        """Prepares the content of one resource. Raises CKANPublishError if its source is gone."""
+        if resource_task.resource_type == CKANResourceTask.TYPE_DATATABLE:
+            datatable = db.session.get(DataTable, resource_task.resource_id)
+            if datatable is None:
+                raise CKANPublishError(f"DataTable {resource_task.resource_id} no longer exists.")
+            protocol = datatable.protocol
+            name = f"datatable_{datatable.id}_{sanitize_ckan_name(protocol.name)}_{datatable.date}.csv"
+            description = f"Data from protocol '{protocol.name}' collected on {datatable.date} for group '{datatable.group.name}'."
+            if protocol.description:
+                description += f"\n\nProtocol Description: {protocol.description}"
+            if protocol.url:
+                description += f"\nProtocol URL: {protocol.url}"
+            fileobj, size, content_hash = _spool_chunks(iter_dataframe_csv(build_datatable_frame(datatable)))
+            return PublishPayload(name, description, fileobj, size, content_hash)
+
+        if resource_task.resource_type == CKANResourceTask.TYPE_PROTOCOL_ATTACHMENT:
+            attachment = db.session.get(ProtocolAttachment, resource_task.resource_id)
+            if attachment is None:
+                raise CKANPublishError(f"Protocol attachment {resource_task.resource_id} no longer exists.")
+            name = f"protocol_{attachment.protocol_id}_{attachment.filename}"
+            description = f"Attachment for protocol '{attachment.protocol.name}'."
+        else:
+            attachment = db.session.get(Attachment, resource_task.resource_id)
+            if attachment is None:
+                raise CKANPublishError(f"Attachment {resource_task.resource_id} no longer exists.")
+            name = attachment.filename
+            description = attachment.description or f"Project attachment uploaded on {attachment.uploaded_at.strftime('%Y-%m-%d')}."
+
+        path = os.path.join(current_app.config['UPLOAD_FOLDER'], attachment.filepath)
+        try:
+            fileobj, size, content_hash = _hash_file(path)
+        except FileNotFoundError:
+            raise CKANPublishError(f"Attachment file not found on server: {attachment.filename}")
+        return PublishPayload(name, description, fileobj, size, content_hash)
+
+    def publish_now(self, user, dataset_id, resource_tasks):
+        """
+        Uploads ``resource_tasks`` (unsaved CKANResourceTask) within the request,
+        with the same manifest / content hash check as a publish job.
+        Returns ``[{'name': ..., 'status': ...}]``; raises on the first error.
+        """
+        results = []
+        with CKANClient(user.ckan_url, user.ckan_api_key, pool_size=1,
+                        retries=current_app.config.get('CKAN_PUBLISH_RETRIES', 3),
+                        backoff=current_app.config.get('CKAN_PUBLISH_BACKOFF', 1.0)) as client:
+            dataset = client.package_show(dataset_id)
+            if dataset is None:
+                raise CKANPublishError(f"CKAN dataset '{dataset_id}' does not exist.")
+            manifest = {res['name']: res for res in dataset.get('resources', [])}
+            for resource_task in resource_tasks:
+                payload = self.build_payload(resource_task)
+                try:
+                    existing = manifest.get(payload.name)
+                    if existing and existing.get('hash') == payload.content_hash:
+                        status = CKANResourceTask.STATUS_SKIPPED
+                    else:
+                        _upload(client, dataset['id'], existing, payload)
+                        status = CKANResourceTask.STATUS_UPLOADED
+                finally:
+                    payload.close()
+                results.append({'name': payload.name, 'status': status})
+        return results
+
+    def _record(self, task, resource_task, status, ckan_resource_id=None, error=None):
+        resource_task.status = status
+        resource_task.ckan_resource_id = ckan_resource_id or resource_task.ckan_resource_id
+        resource_task.error_message = error
+        task.updated_at = _utcnow()
+        db.session.commit()
+
+    def run(self, task_id, progress_callback=None):
+        """
+        Publishes the pending resources of ``task_id`` (called by the worker).
+        ``progress_callback(done, total, name)`` is called after each resource.
+        """
+        task = db.session.get(CKANUploadTask, task_id)
+        if task is None or task.status == CKANUploadTask.STATUS_DONE:
+            return {'error': 'CKAN publish not found or already finished'}
+        user = db.session.get(User, task.user_id) if task.user_id else None
+
+        task.status = CKANUploadTask.STATUS_RUNNING
+        task.updated_at = _utcnow()
+        db.session.commit()
+
+        pending = task.resource_tasks.filter(CKANResourceTask.status.in_(
+            [CKANResourceTask.STATUS_PENDING, CKANResourceTask.STATUS_FAILED]
+        )).order_by(CKANResourceTask.id).all()
+        total = task.resource_tasks.count()
+        done = total - len(pending)
+        concurrency = max(1, current_app.config.get('CKAN_PUBLISH_CONCURRENCY', 4))
+
+        def _progress(resource_task):
+            nonlocal done
+            done += 1
+            if progress_callback:
+                progress_callback(done, total, resource_task.resource_name)
+
+        def _collect(finished, in_flight):
+            for future in finished:
+                resource_task, payload = in_flight.pop(future)
+                payload.close()
+                try:
+                    result = future.result()
+                    self._record(task, resource_task, CKANResourceTask.STATUS_UPLOADED, ckan_resource_id=result['id'])
+                except Exception as e:
+                    current_app.logger.error(f"CKAN upload of '{resource_task.resource_name}' failed: {e}")
+                    self._record(task, resource_task, CKANResourceTask.STATUS_FAILED, error=str(e))
+                _progress(resource_task)
+
+        try:
+            if user is None or not user.ckan_url or not user.ckan_api_key:
+                raise CKANPublishError(_('Please set your CKAN URL and API Key in your settings before uploading.'))
+
+            with CKANClient(user.ckan_url, user.ckan_api_key, pool_size=concurrency,
+                            retries=current_app.config.get('CKAN_PUBLISH_RETRIES', 3),
+                            backoff=current_app.config.get('CKAN_PUBLISH_BACKOFF', 1.0)) as client:
+                dataset = client.package_show(task.dataset_id)
+                if dataset is None:
+                    raise CKANPublishError(f"CKAN dataset '{task.dataset_id}' does not exist.")
+                manifest = {res['name']: res for res in dataset.get('resources', [])}
+
+                with ThreadPoolExecutor(max_workers=concurrency) as pool:
+                    in_flight = {}
+                    for resource_task in pending:
+                        # Bounded in-flight payloads keep memory and open files proportional to the concurrency
+                        while len(in_flight) >= concurrency:
+                            finished, _pending = wait(in_flight, return_when=FIRST_COMPLETED)
+                            _collect(finished, in_flight)
+                        try:
+                            payload = self.build_payload(resource_task)
+                        except Exception as e:
+                            current_app.logger.error(f"Could not prepare CKAN resource {resource_task}: {e}")
+                            self._record(task, resource_task, CKANResourceTask.STATUS_FAILED, error=str(e))
+                            _progress(resource_task)
+                            continue
+
+                        resource_task.resource_name = payload.name
+                        resource_task.content_hash = payload.content_hash
+                        existing = manifest.get(payload.name)
+                        if existing and existing.get('hash') == payload.content_hash:
+                            payload.close()
+                            self._record(task, resource_task, CKANResourceTask.STATUS_SKIPPED, ckan_resource_id=existing['id'])
+                            _progress(resource_task)
+                            continue
+                        in_flight[pool.submit(_upload, client, dataset['id'], existing, payload)] = (resource_task, payload)
+
+                    while in_flight:
+                        finished, _pending = wait(in_flight, return_when=FIRST_COMPLETED)
+                        _collect(finished, in_flight)
+
+        except Exception as e:
+            db.session.rollback()
+            current_app.logger.error(f"CKAN publish {task_id} failed: {e}", exc_info=not isinstance(e, CKANPublishError))
+            task = db.session.get(CKANUploadTask, task_id)
+            task.status = CKANUploadTask.STATUS_FAILED
+            task.error_message = str(e)
+            task.updated_at = task.completed_at = _utcnow()
+            self._notify(task, _("CKAN upload of project '%(name)s' failed: %(error)s", name=task.project.name, error=str(e)),
+                         NotificationType.ERROR)
+            db.session.commit()
+            return {'task_id': task.id, 'status': task.status, 'error': str(e)}
+
+        failed = task.resource_tasks.filter_by(status=CKANResourceTask.STATUS_FAILED).count()
+        task.updated_at = task.completed_at = _utcnow()
+        if failed:
+            task.status = CKANUploadTask.STATUS_FAILED
+            task.error_message = _('%(count)s resource(s) could not be uploaded.', count=failed)
+            self._notify(task, _("CKAN upload of project '%(name)s' finished with errors: %(error)s",
+                                 name=task.project.name, error=task.error_message), NotificationType.WARNING)
+        else:
+            task.status = CKANUploadTask.STATUS_DONE
+            task.project.ckan_upload_date = datetime.now(current_app.config['UTC_TZ'])
+            self._notify(task, _("Project '%(name)s' has been uploaded to CKAN.", name=task.project.name),
+                         NotificationType.SUCCESS)
+        db.session.commit()
+        current_app.logger.info(f"CKAN publish {task.id} finished: {total - failed}/{total} resources published or unchanged")
+        return {'task_id': task.id, 'status': task.status}
+
+    def _notify(self, task, message, notif_type):
+        if not task.user_id:
+            return
+        db.session.add(Notification(
+            user_id=task.user_id,
+            message=message,
+            type=notif_type,
+            link=url_for('ckan.upload_project', project_slug=task.project.slug),
+        ))
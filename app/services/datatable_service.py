@@ -1,6 +1,7 @@
 # app/services/datatable_service.py
 from datetime import datetime, timedelta, timezone
 import pandas as pd
+from flask import current_app
 from flask_babel import lazy_gettext as _l, gettext as _
 
 from sqlalchemy import or_
@@ -9,7 +10,8 @@ from app.extensions import db
 from app.models import DataTable, ExperimentalGroup, ProtocolModel, Project, Animal, ExperimentDataRow, User, AnimalModel
 from app.services.base import BaseService
 from app.services.calculation_service import CalculationService # Added
-from app.permissions import check_datatable_permission, can_create_datatable_for_group
+from app.services.merge_service import DataTableMergeService
+from app.permissions import filter_readable, can_create_datatable_for_group
 from app.decorators import transactional
 from app.tasks import declare_tm_practice_task
 from app.services.tm_connector import TrainingManagerConnector
@@ -21,8 +23,11 @@ class DataTableService(BaseService):
     def __init__(self):
         super().__init__()
 
-    def get_server_side_datatables(self, user, filters, page, per_page, sort_column, sort_direction):
-        from sqlalchemy import or_ # Ensure import is available locally if not at top
+    def _server_side_datatables_query(self, user, filters):
+        """
+        Returns (visible_query, filtered_query) for the server-side listing:
+        the datatables of the projects ``user`` can see, then with ``filters``.
+        """
         from sqlalchemy.orm import joinedload
         from app.services.permission_service import PermissionService
 
@@ -42,7 +47,7 @@ class DataTableService(BaseService):
             accessible_project_ids = [p.id for p in visible_projects_query.with_entities(Project.id).all()]
             query = query.filter(ExperimentalGroup.project_id.in_(accessible_project_ids))
 
-        total_records = query.count()
+        visible_query = query
 
         if 'project_id' in filters and filters['project_id']:
             # Ensure we filter by the Project ID joined via ExperimentalGroup
@@ -90,7 +95,18 @@ class DataTableService(BaseService):
                 (Project.name.ilike(search_pattern))
             )
 
-        filtered_records = query.count()
+        return visible_query, query
+
+    def get_server_side_datatables(self, user, filters, page, per_page, sort_column, sort_direction, cursor=None):
+        """
+        One page of the server-side listing. Pages are read by keyset from
+        ``cursor`` (the ``next_cursor`` of the previous page) when possible,
+        and both counts are cached under the listing tags between writes.
+        """
+        from app.performance.caching import cached_value
+        from app.queries.keyset import count_rows, listing_signature, paginate
+
+        visible_query, query = self._server_side_datatables_query(user, filters)
 
         # Apply sorting
         sort_column_map = {
@@ -101,26 +117,45 @@ class DataTableService(BaseService):
             'created_at': DataTable.id, # Fallback
             'updated_at': DataTable.id
         }
-        
         column_to_sort = sort_column_map.get(sort_column, DataTable.date) # Default sort
-        if sort_direction == 'desc':
-            query = query.order_by(column_to_sort.desc())
+        sort_direction = 'desc' if sort_direction == 'desc' else 'asc'
+
+        filter_items = tuple(sorted((k, str(v)) for k, v in filters.items() if v not in (None, '')))
+        signature = listing_signature('datatables', filter_items, sort_column, sort_direction)
+        tags = ['datatables', 'access', f'user:{user.id}']
+
+        total_records = cached_value(('datatables_total', user.id), tags,
+                                     lambda: count_rows(visible_query, DataTable.id))
+        if filter_items:
+            filtered_records = cached_value(('datatables_filtered', user.id, filter_items), tags,
+                                            lambda: count_rows(query, DataTable.id))
         else:
-            query = query.order_by(column_to_sort.asc())
+            filtered_records = total_records
 
         # Apply pagination
         offset = (page - 1) * per_page
-        items = query.offset(offset).limit(per_page).all()
+        items, next_cursor = paginate(query, column_to_sort, DataTable.id, sort_direction,
+                                      offset, per_page, signature, cursor)
 
         return {
             'total_records': total_records,
             'filtered_records': filtered_records,
-            'items': items
+            'items': items,
+            'next_cursor': next_cursor
         }
 
-    def aggregate_selected_datatables(self, selected_datatable_ids_str_list):
+    def iter_server_side_datatable_ids(self, user, filters, batch_size=1000):
+        """Streams the ids of every datatable matching ``filters`` ("select all matching")."""
+        from app.queries.keyset import iter_ids
+
+        _, query = self._server_side_datatables_query(user, filters)
+        return iter_ids(query, DataTable.id, batch_size)
+
+    def aggregate_selected_datatables(self, selected_datatable_ids_str_list, user_id=None, progress_callback=None):
         """
         Aggregates data from multiple datatables into a single DataFrame.
+        Permissions are checked for ``user_id`` (background exports) or the
+        current user; ``progress_callback(done, total)`` follows the merge.
         """
         if not selected_datatable_ids_str_list:
             return None, [_l("No datatables were selected.")], []
@@ -134,12 +169,22 @@ class DataTableService(BaseService):
         errors = []
         source_identifiers = []
         
+        from sqlalchemy.orm import joinedload
+        found_dts = {dt.id: dt for dt in DataTable.query.filter(DataTable.id.in_(selected_datatable_ids))
+                     .options(joinedload(DataTable.group), joinedload(DataTable.protocol))}
+        if user_id:
+            user = db.session.get(User, user_id)
+        else:
+            from flask_login import current_user
+            user = current_user
+        readable_ids = filter_readable(user, DataTable, found_dts.keys())
+
         for dt_id in selected_datatable_ids:
-            dt = db.session.get(DataTable, dt_id)
+            dt = found_dts.get(dt_id)
             if not dt or not dt.group:
                 errors.append(_l("DataTable with ID {dt_id} not found or group missing.").format(dt_id=dt_id))
                 continue
-            if not check_datatable_permission(dt, 'read'):
+            if dt.id not in readable_ids:
                 errors.append(_l("Permission denied for DataTable {dt_id} from group '{group_name}'.").format(dt_id=dt_id, group_name=dt.group.name))
                 continue
             datatables_to_process.append(dt)
@@ -148,67 +193,29 @@ class DataTableService(BaseService):
         if not datatables_to_process:
             return None, errors, source_identifiers
 
-        all_long_data = []
         animal_model_fields = set()
-
         for dt in datatables_to_process:
-            exp_rows_dict = {row.animal_id: row.row_data for row in dt.experiment_rows.all()}
-            
             if dt.group.model and dt.group.model.analytes:
                 animal_model_fields.update(a.name for a in dt.group.model.analytes)
 
-            # Use animals relationship instead of animal_data
-            for i, animal in enumerate(sorted(dt.group.animals, key=lambda a: a.id)):
-                animal_info = animal.to_dict()
-                animal_id = animal_info.get('uid')
-                if not animal_id:
-                    continue
+        # Set-based merge shared with AnalysisService.aggregate_datatables
+        merge_service = DataTableMergeService(current_app.config.get('MERGE_CHUNK_SIZE'))
+        animals_by_group = merge_service.load_animals(datatables_to_process)
+        long_df = merge_service.build_long_frame(
+            datatables_to_process,
+            lambda dt, name: f"{name}_{dt.protocol.name}_{dt.date}",
+            animals_by_group,
+            progress_callback=progress_callback,
+        )
 
-                merged_data = {**animal_info, **exp_rows_dict.get(animal.id, {})}
-                
-                if dt.protocol and dt.protocol.analytes:
-                    for analyte in dt.protocol.analytes:
-                        if analyte.name in merged_data:
-                            all_long_data.append({
-                                'uid': animal_id,
-                                'analyte_name': analyte.name,
-                                'analyte_value': merged_data[analyte.name],
-                                'protocol_name': dt.protocol.name,
-                                'datatable_date': dt.date,
-                                # Meta info for tracking
-                                '_source_datatable_id': dt.id,
-                                '_source_experimental_group_name': dt.group.name,
-                                '_source_protocol_name': dt.protocol.name,
-                                '_source_datatable_date': dt.date
-                            })
-
-        if not all_long_data:
+        if long_df.empty:
             return pd.DataFrame(), errors, source_identifiers
 
-        long_df = pd.DataFrame(all_long_data)
-        
-        long_df['measurement_label'] = long_df['analyte_name'] + '_' + long_df['protocol_name'] + '_' + long_df['datatable_date']
-        
-        all_animal_data_df = []
-        seen_animal_uids = set()
-        for dt in datatables_to_process:
-            for animal in dt.group.animals:
-                if animal.uid not in seen_animal_uids:
-                    all_animal_data_df.append(animal.to_dict())
-                    seen_animal_uids.add(animal.uid)
-        
-        animal_df = pd.DataFrame(all_animal_data_df)
-        if 'uid' not in animal_df.columns:
+        animal_df = merge_service.build_animal_frame(datatables_to_process, animals_by_group)
+        if animal_df is None:
             return pd.DataFrame(), [_l("Could not find 'uid' column in animal data for merging.")], source_identifiers
-        
-        animal_df = animal_df.drop_duplicates(subset=['uid']).set_index('uid')
-        
-        pivoted_df = long_df.pivot_table(
-            index='uid',
-            columns='measurement_label',
-            values='analyte_value',
-            aggfunc='first'
-        )
+
+        pivoted_df = merge_service.pivot_long_frame(long_df)
         
         final_df = animal_df.join(pivoted_df, how='left')
         
@@ -220,6 +227,121 @@ class DataTableService(BaseService):
 
         return final_df, errors, source_identifiers
 
+    @staticmethod
+    def _blinding_state(group, unblinded_view=False):
+        details = group.randomization_details or {}
+        if not details:
+            return 'not_randomized'
+        if not details.get('use_blinding', False):
+            return 'not_blinded'
+        if unblinded_view or details.get('unblinded_at'):
+            return 'unblinded'
+        return 'blinded'
+
+    def describe_for_export(self, datatables, unblinded_view=False):
+        """
+        Returns (column_types, metadata) for a columnar export of ``datatables``.
+        ``column_types`` maps analyte columns, both plain and with the merged
+        ``<analyte>_<protocol>_<date>`` label, to their ``AnalyteDataType`` value;
+        ``metadata`` records the protocols, groups and blinding state.
+        """
+        column_types = {}
+        sources = []
+        for dt in datatables:
+            analytes = list(dt.protocol.analytes if dt.protocol else [])
+            if dt.group and dt.group.model:
+                analytes += list(dt.group.model.analytes)
+            for analyte in analytes:
+                column_types.setdefault(analyte.name, analyte.data_type.value)
+                if dt.protocol:
+                    column_types[f"{analyte.name}_{dt.protocol.name}_{dt.date}"] = analyte.data_type.value
+            sources.append({
+                'datatable_id': dt.id,
+                'date': dt.date,
+                'protocol': dt.protocol.name if dt.protocol else None,
+                'group_id': dt.group_id,
+                'group': dt.group.name if dt.group else None,
+                'project': dt.group.project.name if dt.group and dt.group.project else None,
+                'blinding': self._blinding_state(dt.group, unblinded_view) if dt.group else None,
+            })
+        metadata = {
+            'exported_at': datetime.now(timezone.utc).isoformat(),
+            'protocols': sorted({src['protocol'] for src in sources if src['protocol']}),
+            'groups': sorted({src['group'] for src in sources if src['group']}),
+            'datatables': sources,
+        }
+        return column_types, metadata
+
+    def describe_selection_for_export(self, datatable_ids, user_id=None):
+        """``describe_for_export`` for the readable DataTables among ``datatable_ids``."""
+        from sqlalchemy.orm import joinedload
+        if user_id:
+            user = db.session.get(User, user_id)
+        else:
+            from flask_login import current_user
+            user = current_user
+        ids = [int(dt_id) for dt_id in datatable_ids if str(dt_id).isdigit()]
+        datatables = filter_readable(user, DataTable, DataTable.query.filter(DataTable.id.in_(ids))) \
+            .options(joinedload(DataTable.group), joinedload(DataTable.protocol)) \
+            .order_by(DataTable.id).all()
+        return self.describe_for_export(datatables)
+
+    @staticmethod
+    def merged_download_name(source_identifiers, suffix):
+        """File name of a merged download, e.g. ``<first source>_plus_3_merged_data.xlsx``."""
+        fname_part = "merged_selection"
+        if source_identifiers:
+            # Create a safe filename from the first identifier or a generic one
+            safe_id = source_identifiers[0].replace(" ", "_").replace("/", "-").replace(":", "-")
+            fname_part = f"{safe_id}_plus_{len(source_identifiers)-1}" if len(source_identifiers) > 1 else safe_id
+        return f'{fname_part}_{suffix}.xlsx'
+
+    def transpose_merged_for_prism(self, df_combined):
+        """
+        Transposes a merged DataFrame (one column per subject, one row per
+        parameter) for the Prism-style download.
+        Returns (transposed_df, warnings).
+        """
+        warnings = []
+        df_for_transpose = df_combined.copy()
+        original_subject_id_col_name = 'uid'
+        source_cols = ['_source_datatable_id', '_source_experimental_group_name', '_source_protocol_name', '_source_datatable_date']
+
+        parameter_cols = [col for col in df_for_transpose.columns if col not in source_cols]
+
+        df_for_transpose['_temp_row_identifier_'] = range(len(df_for_transpose))
+
+        index_for_pivot = '_unique_subject_header_'
+
+        if original_subject_id_col_name in df_for_transpose.columns:
+            df_for_transpose[original_subject_id_col_name] = df_for_transpose[original_subject_id_col_name].astype(str).fillna('UnknownID')
+            source_group_col = '_source_experimental_group_name'
+            if source_group_col in df_for_transpose.columns:
+                df_for_transpose[source_group_col] = df_for_transpose[source_group_col].astype(str).fillna('UnknownGroup')
+                df_for_transpose['_candidate_subject_header_'] = df_for_transpose.apply(lambda row: f"{row[source_group_col]}_{row[original_subject_id_col_name]}", axis=1)
+            else:
+                df_for_transpose['_candidate_subject_header_'] = df_for_transpose[original_subject_id_col_name]
+
+            if df_for_transpose['_candidate_subject_header_'].duplicated().any():
+                df_for_transpose['_unique_subject_header_'] = df_for_transpose.groupby('_candidate_subject_header_').cumcount().astype(str).radd('_v').radd(df_for_transpose['_candidate_subject_header_'])
+                warnings.append(_l("Warning: Some subjects from different original tables had identical Group_ID combinations. Counters appended to make transposed column headers unique."))
+            else:
+                df_for_transpose['_unique_subject_header_'] = df_for_transpose['_candidate_subject_header_']
+        else:
+            warnings.append(_l("Original Subject ID column ('{col}') not found or not suitable for merged transposed headers. Using generic 'Subject_X' based on row order.").format(col=original_subject_id_col_name))
+            df_for_transpose['_unique_subject_header_'] = "Subject_" + (df_for_transpose['_temp_row_identifier_'] + 1).astype(str)
+
+        try:
+            df_to_pivot = df_for_transpose[parameter_cols + [index_for_pivot]]
+            df_transposed = df_to_pivot.set_index(index_for_pivot).transpose()
+        except Exception as e_pivot:
+            current_app.logger.error(f"Error during pivot/transpose for merged data: {e_pivot}. Falling back to basic transpose.", exc_info=True)
+            warnings.append(_l("Error creating transposed table structure: {error_msg}. Attempting basic transpose with generic headers.").format(error_msg=str(e_pivot)))
+            df_transposed = df_for_transpose[parameter_cols].transpose()
+            df_transposed.columns = [f"Subject_{i_col+1}" for i_col in range(len(df_transposed.columns))]
+
+        return df_transposed, warnings
+
     def get_concatenated_analyte_data_for_group(self, group_id, user):
         """
         Concatenates analyte data from all datatables of a group, sorted chronologically.
@@ -298,6 +420,52 @@ class DataTableService(BaseService):
             'group_name': group.name
         }, [], []
 
+    def get_concatenated_analyte_frame(self, group_id, user, analyte_names=None):
+        """
+        Long, typed frame of ``get_concatenated_analyte_data_for_group`` for the
+        columnar exports: one row per (animal, analyte, date) with numeric
+        analytes in 'Value' and the other ones in 'Text Value'.
+        Returns (df, column_types, metadata, errors).
+        """
+        from app.models import AnalyteDataType
+
+        data, errors, _unused = self.get_concatenated_analyte_data_for_group(group_id, user)
+        if errors:
+            return None, None, None, errors
+
+        numeric_types = (AnalyteDataType.FLOAT.value, AnalyteDataType.INT.value)
+        analyte_types = {info['name']: info['type'] for info in data['analytes'].values()}
+        wanted = set(analyte_names) if analyte_names else set(analyte_types)
+
+        rows = []
+        for animal_uid, analyte_values in data['animal_data'].items():
+            for analyte_name, entries in analyte_values.items():
+                if analyte_name not in wanted:
+                    continue
+                numeric = analyte_types.get(analyte_name) in numeric_types
+                for entry in entries:
+                    rows.append({
+                        'Animal ID': animal_uid,
+                        'Analyte': analyte_name,
+                        'Protocol': entry.get('protocol'),
+                        'Date': entry.get('date'),
+                        'Value': entry.get('value') if numeric else None,
+                        'Text Value': None if numeric else entry.get('value'),
+                    })
+        df = pd.DataFrame(rows, columns=['Animal ID', 'Analyte', 'Protocol', 'Date', 'Value', 'Text Value'])
+
+        group = db.session.get(ExperimentalGroup, group_id)
+        column_types = {'Animal ID': 'text', 'Analyte': 'category', 'Protocol': 'category',
+                        'Date': 'date', 'Value': 'float', 'Text Value': 'text'}
+        metadata = {
+            'exported_at': datetime.now(timezone.utc).isoformat(),
+            'groups': [data['group_name']],
+            'group_id': group_id,
+            'protocols': sorted({dt['protocol_name'] for dt in data['datatables']}),
+            'blinding': self._blinding_state(group),
+            'analyte_types': {name: analyte_types[name] for name in sorted(wanted) if name in analyte_types},
+        }
+        return df, column_types, metadata, []
     def save_manual_edits(self, datatable_id, updates, protocol_field_names):
         """
         Save manual grid edits to ExperimentDataRow and sync to Animal table.
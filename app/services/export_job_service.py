@@ -0,0 +1,199 @@
+# app/services/export_job_service.py
+"""
+Background export jobs for large merged downloads.
+
+The web request only records an ``ExportJob`` and queues
+``tasks.run_export_job`` (the job id is used as the Celery task id). The
+worker merges the DataTables, writes the workbook to EXPORT_DIR with the
+constant-memory writer and notifies the user; the file is then served with
+HTTP Range support until ``EXPORT_JOB_TTL_HOURS`` elapse and
+``tasks.cleanup_export_jobs`` removes it.
+"""
+import os
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from flask import current_app, url_for
+from flask_babel import gettext as _
+
+from app.extensions import db
+from app.models import ExportJob
+from app.models.notifications import Notification, NotificationType
+from app.services.datatable_service import DataTableService
+from app.utils.columnar import export_download_name, is_columnar_format, write_columnar
+from app.utils.files import write_dataframe_xlsx
+
+
+class ExportJobError(Exception):
+    """Raised when an export job produces no file (nothing readable to merge)."""
+
+
+def get_export_dir():
+    """Returns EXPORT_DIR (default ``<UPLOAD_FOLDER>/exports``), creating it if needed."""
+    export_dir = current_app.config.get('EXPORT_DIR') or os.path.join(current_app.config['UPLOAD_FOLDER'], 'exports')
+    os.makedirs(export_dir, exist_ok=True)
+    return export_dir
+
+
+def _utcnow():
+    # Naive UTC, like the other DateTime columns once read back from the database
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+class ExportJobService:
+    """Creates, runs, serves and expires background export jobs."""
+
+    def __init__(self):
+        self.datatable_service = DataTableService()
+
+    def should_run_in_background(self, datatable_ids, select_all_matching=False):
+        """Merged downloads of a whole filter result, or of many DataTables, go to the worker."""
+        if not current_app.config.get('ENABLE_BACKGROUND_EXPORTS', True):
+            return False
+        threshold = current_app.config.get('EXPORT_ASYNC_MIN_DATATABLES', 20)
+        return select_all_matching or len(datatable_ids) >= threshold
+
+    def create(self, user, kind, datatable_ids, file_format='xlsx'):
+        """
+        Records a pending job for ``user``; queue it with ``enqueue``.
+        ``file_format`` is 'xlsx' or one of the columnar formats ('parquet', 'arrow').
+        """
+        if not is_columnar_format(file_format):
+            file_format = 'xlsx'
+        job = ExportJob(
+            id=uuid.uuid4().hex,
+            user_id=user.id,
+            kind=kind,
+            status=ExportJob.STATUS_PENDING,
+            params={'datatable_ids': [int(dt_id) for dt_id in datatable_ids], 'format': file_format},
+            # Jobs never picked up by a worker are eventually cleaned up too
+            expires_at=_utcnow() + timedelta(hours=current_app.config.get('EXPORT_JOB_TTL_HOURS', 24)),
+        )
+        db.session.add(job)
+        db.session.commit()
+        return job
+
+    def enqueue(self, job):
+        """Queues the job; returns False (and drops the job) if the broker is unreachable."""
+        from app.tasks import run_export_job_task
+        try:
+            run_export_job_task.apply_async(args=[job.id], task_id=job.id)
+            return True
+        except Exception as e:
+            current_app.logger.error(f"Could not queue export job {job.id}: {e}", exc_info=True)
+            db.session.delete(job)
+            db.session.commit()
+            return False
+
+    def get_for_user(self, job_id, user):
+        """Returns the job if it belongs to ``user``, else None."""
+        job = db.session.get(ExportJob, job_id)
+        if job is None or job.user_id != user.id:
+            return None
+        return job
+
+    def file_path(self, job):
+        return os.path.join(get_export_dir(), job.storage_name)
+
+    def is_downloadable(self, job):
+        return (
+            job.status == ExportJob.STATUS_DONE
+            and (job.expires_at is None or job.expires_at > _utcnow())
+            and os.path.exists(self.file_path(job))
+        )
+
+    def run(self, job_id, progress_callback=None):
+        """
+        Builds the export file of ``job_id`` (called by the worker).
+        ``progress_callback(done, total, stage)`` follows the merge and the write.
+        """
+        job = db.session.get(ExportJob, job_id)
+        if job is None or job.status not in (ExportJob.STATUS_PENDING, ExportJob.STATUS_RUNNING):
+            return {'error': 'Export job not found or already processed'}
+
+        job.status = ExportJob.STATUS_RUNNING
+        db.session.commit()
+        ttl = timedelta(hours=current_app.config.get('EXPORT_JOB_TTL_HOURS', 24))
+        path = self.file_path(job)
+        part_path = f'{path}.part'
+
+        def _merge_progress(done, total):
+            if progress_callback:
+                progress_callback(done, total, 'merge')
+
+        try:
+            datatable_ids = [str(dt_id) for dt_id in job.params.get('datatable_ids', [])]
+            df, errors, source_identifiers = self.datatable_service.aggregate_selected_datatables(
+                datatable_ids, user_id=job.user_id, progress_callback=_merge_progress
+            )
+            if df is None or df.empty:
+                raise ExportJobError(' ; '.join(str(e) for e in errors) or _('No data available to download after merging.'))
+
+            column_types, metadata = self.datatable_service.describe_selection_for_export(datatable_ids, user_id=job.user_id)
+            if job.kind == ExportJob.KIND_MERGED_TRANSPOSED:
+                df, _warnings = self.datatable_service.transpose_merged_for_prism(df)
+                filename = self.datatable_service.merged_download_name(source_identifiers, 'merged_transposed_prism')
+                # Transposed columns mix parameters: no per-column types
+                column_types = None
+                index = True
+            else:
+                filename = self.datatable_service.merged_download_name(source_identifiers, 'merged_data')
+                index = False
+
+            if progress_callback:
+                progress_callback(0, 1, 'write')
+            with open(part_path, 'wb') as fh:
+                if is_columnar_format(job.file_format):
+                    filename = export_download_name(filename, job.file_format)
+                    write_columnar(df, fh, job.file_format, column_types=column_types, metadata=metadata, index=index)
+                else:
+                    write_dataframe_xlsx(df, fh, index=index, header=True)
+            # Readers never see a partially written file
+            os.replace(part_path, path)
+
+            job.status = ExportJob.STATUS_DONE
+            job.filename = filename
+            job.file_size = os.path.getsize(path)
+            job.row_count = len(df)
+            job.completed_at = _utcnow()
+            job.expires_at = job.completed_at + ttl
+            db.session.add(Notification(
+                user_id=job.user_id,
+                message=_("Your export '%(name)s' is ready to download.", name=filename),
+                type=NotificationType.EXPORT_READY,
+                link=url_for('datatables.download_export_job', job_id=job.id),
+            ))
+            db.session.commit()
+            current_app.logger.info(f"Export job {job.id} done: {job.row_count} rows, {job.file_size} bytes")
+            return {'job_id': job.id, 'status': job.status}
+
+        except Exception as e:
+            db.session.rollback()
+            if os.path.exists(part_path):
+                os.remove(part_path)
+            current_app.logger.error(f"Export job {job_id} failed: {e}", exc_info=not isinstance(e, ExportJobError))
+            job = db.session.get(ExportJob, job_id)
+            job.status = ExportJob.STATUS_FAILED
+            job.error_message = str(e)
+            job.completed_at = _utcnow()
+            job.expires_at = job.completed_at + ttl
+            db.session.add(Notification(
+                user_id=job.user_id,
+                message=_("Your export could not be generated: %(error)s", error=str(e)),
+                type=NotificationType.ERROR,
+            ))
+            db.session.commit()
+            return {'error': str(e)}
+
+    def cleanup_expired(self, now=None):
+        """Deletes the files and rows of expired jobs. Returns the number of jobs removed."""
+        now = now or _utcnow()
+        expired = ExportJob.query.filter(ExportJob.expires_at.isnot(None), ExportJob.expires_at <= now).all()
+        for job in expired:
+            path = self.file_path(job)
+            for candidate in (path, f'{path}.part'):
+                if os.path.exists(candidate):
+                    os.remove(candidate)
+            db.session.delete(job)
+        db.session.commit()
+        return len(expired)
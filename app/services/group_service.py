@@ -2,11 +2,11 @@
 import json
 import secrets
 from datetime import datetime, timezone
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Iterator, Optional
 
 from flask import current_app
 from pydantic import ValidationError as PydanticValidationError
-from sqlalchemy import insert, update
+from sqlalchemy import case, func, insert, update
 from sqlalchemy.orm import joinedload
 from sqlalchemy.orm.attributes import flag_modified
 
@@ -19,9 +19,12 @@ from app.models import (AnimalModel, AnimalModelAnalyteAssociation,
 from app.schemas.animal import AnimalSchema
 from app.schemas.group import GroupCreateSchema
 from app.exceptions import ValidationError, BusinessError
+from app.performance.caching import mark_tags_stale
 from app.services.audit_service import suppress_audit
 from app.services.base import BaseService
 from app.services.ethical_approval_service import validate_group_ea_unlinking
+from app.services.measurement_store_service import MeasurementStoreService
+from app.services.search_service import SearchIndexService, is_search_index_enabled
 from app.services.validation_service import ValidationService
 from app.utils.files import read_excel_to_list
 
@@ -186,6 +189,13 @@ class GroupService(BaseService):
             db.session.execute(insert(Animal), to_insert)
         if to_update:
             db.session.execute(update(Animal), to_update)
+        if to_insert or to_update:
+            # Core bulk writes bypass the ORM flush hooks of the measurement store and search index
+            MeasurementStoreService().sync_animals(group_id=group.id)
+            if is_search_index_enabled():
+                SearchIndexService().index_where(db.session.connection(), 'animals', Animal.group_id == group.id)
+            mark_tags_stale(db.session, {f'group:{group.id}', 'groups', 'measurements'}
+                            | {f"animal:{a['id']}" for a in to_update})
         
         if group.project:
             group.project.updated_at = now
@@ -233,16 +243,8 @@ class GroupService(BaseService):
         db.session.flush()
         return group
 
-    def get_server_side_groups(
-        self, 
-        user: User, 
-        filters: Dict[str, Any], 
-        page: int, 
-        per_page: int, 
-        sort_column: str, 
-        sort_direction: str
-    ) -> Dict[str, Any]:
-        from sqlalchemy.orm import joinedload, selectinload
+    def _server_side_groups_query(self, user: User, filters: Dict[str, Any]):
+        """Query of the groups ``user`` can see, restricted by ``filters``."""
         from app.services.permission_service import PermissionService
         
         query = db.session.query(ExperimentalGroup) \
@@ -251,8 +253,7 @@ class GroupService(BaseService):
             .options(
                 joinedload(ExperimentalGroup.project),
                 joinedload(ExperimentalGroup.team),
-                joinedload(ExperimentalGroup.model),
-                selectinload(ExperimentalGroup.animals)
+                joinedload(ExperimentalGroup.model)
             )
 
         # Apply permissions: only accessible projects (optimized query)
@@ -290,8 +291,33 @@ class GroupService(BaseService):
                 (Project.name.ilike(search_pattern)) |
                 (Team.name.ilike(search_pattern))
             )
+        return query
 
-        total_records = query.count() # Count after filters for pagination
+    def get_server_side_groups(
+        self, 
+        user: User, 
+        filters: Dict[str, Any], 
+        page: int, 
+        per_page: int, 
+        sort_column: str, 
+        sort_direction: str,
+        cursor: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        One page of the server-side listing, read by keyset from ``cursor`` when
+        the sort column allows it; the count is cached under the listing tags.
+        """
+        from app.performance.caching import cached_value
+        from app.queries.keyset import count_rows, listing_signature, paginate
+
+        query = self._server_side_groups_query(user, filters)
+
+        filter_items = tuple(sorted((k, str(v)) for k, v in filters.items() if v not in (None, '')))
+        total_records = cached_value(
+            ('groups_filtered', user.id, filter_items),
+            ['groups', 'access', f'user:{user.id}'],
+            lambda: count_rows(query, ExperimentalGroup.id)
+        ) # Count after filters for pagination
         filtered_records = total_records
 
         # Apply sorting
@@ -308,19 +334,69 @@ class GroupService(BaseService):
         # Add a join for AnimalModel if sorting by model_name
         if sort_column == 'model_name':
             query = query.join(AnimalModel, ExperimentalGroup.model_id == AnimalModel.id)
+        # Join the per-group animal counts if sorting by animal_count
+        elif sort_column == 'animal_count':
+            counts = self.animal_counts_subquery()
+            query = query.outerjoin(counts, counts.c.group_id == ExperimentalGroup.id)
+            sort_column_map['animal_count'] = func.coalesce(counts.c.total, 0)
 
         column_to_sort = sort_column_map.get(sort_column, ExperimentalGroup.created_at) # Default sort
-        if sort_direction == 'desc':
-            query = query.order_by(column_to_sort.desc())
-        else:
-            query = query.order_by(column_to_sort.asc())
+        sort_direction = 'desc' if sort_direction == 'desc' else 'asc'
+        signature = listing_signature('groups', filter_items, sort_column, sort_direction)
 
         # Apply pagination
         offset = (page - 1) * per_page
-        items = query.offset(offset).limit(per_page).all()
+        items, next_cursor = paginate(query, column_to_sort, ExperimentalGroup.id, sort_direction,
+                                      offset, per_page, signature, cursor)
 
         return {
             'total_records': total_records,
             'filtered_records': filtered_records,
-            'items': items
-        }
\ No newline at end of file
+            'items': items,
+            'next_cursor': next_cursor
+        }
+
+    @staticmethod
+    def animal_counts_subquery():
+        """Subquery of (group_id, total, dead) animal counts, aggregated in SQL."""
+        dead = case((Animal.status == 'dead', 1), else_=0)
+        return db.session.query(
+            Animal.group_id.label('group_id'),
+            func.count(Animal.id).label('total'),
+            func.sum(dead).label('dead'),
+        ).group_by(Animal.group_id).subquery()
+
+    def get_animal_stats(self, group_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Animal statistics of the given groups without loading Animal objects:
+        total/alive/dead counts, a histogram of the "reason - severity" of the
+        dead animals and their (uid, reason) pairs for tooltips.
+        """
+        stats = {gid: {'total': 0, 'alive': 0, 'dead': 0, 'euthanasia_summary': {}, 'dead_animals': []}
+                 for gid in group_ids}
+        if not group_ids:
+            return stats
+
+        counts = self.animal_counts_subquery()
+        for group_id, total, dead in db.session.query(counts.c.group_id, counts.c.total, counts.c.dead) \
+                .filter(counts.c.group_id.in_(group_ids)):
+            dead = int(dead or 0)
+            stats[group_id].update(total=total, alive=total - dead, dead=dead)
+
+        reason = Animal.measurements['euthanasia_reason'].as_string()
+        severity = Animal.measurements['severity'].as_string()
+        dead_rows = db.session.query(Animal.group_id, Animal.uid, reason, severity) \
+            .filter(Animal.group_id.in_(group_ids), Animal.status == 'dead') \
+            .order_by(Animal.group_id, Animal.id)
+        for group_id, uid, reason_value, severity_value in dead_rows:
+            key = f"{reason_value or 'Unknown'} - {severity_value or 'Unknown'}"
+            summary = stats[group_id]['euthanasia_summary']
+            summary[key] = summary.get(key, 0) + 1
+            stats[group_id]['dead_animals'].append((uid, reason_value))
+        return stats
+
+    def iter_server_side_group_ids(self, user: User, filters: Dict[str, Any], batch_size: int = 1000) -> Iterator[str]:
+        """Streams the ids of every group matching ``filters`` ("select all matching")."""
+        from app.queries.keyset import iter_ids
+
+        return iter_ids(self._server_side_groups_query(user, filters), ExperimentalGroup.id, batch_size)
\ No newline at end of file
@@ -1,14 +1,27 @@
 # app/services/import_wizard_service.py
 import pandas as pd
+import numpy as np
 import json
 import os
 import math
+from datetime import date, datetime, timezone
 from asteval import Interpreter
 from flask import current_app
-from sqlalchemy.orm.attributes import flag_modified
+from sqlalchemy import insert, update
 from app.extensions import db
-from app.models import ProtocolModel, Analyte, ExperimentalGroup, ExperimentDataRow, DataTable, ImportTemplate
-from app.services.audit_service import log_action
+from app.models import ProtocolModel, Analyte, Animal, ExperimentalGroup, ExperimentDataRow, DataTable, ImportTemplate
+from app.performance.caching import mark_tags_stale
+from app.performance.frame_cache import mark_datatables_stale
+from app.services.audit_service import log_action, log_bulk_changes
+from app.services.measurement_store_service import MeasurementStoreService, is_measurement_store_enabled
+
+# Imported columns synced to Animal core attributes (lower-cased header -> attribute)
+ANIMAL_CORE_FIELDS = {
+    'sex': 'sex',
+    'status': 'status',
+    'date_of_birth': 'date_of_birth',
+    'date of birth': 'date_of_birth'
+}
 
 class ImportWizardService:
     @staticmethod
@@ -26,13 +39,17 @@ class ImportWizardService:
             return 0
 
     @staticmethod
-    def secure_eval(expression, value):
-        """Evaluates a mathematical expression safely with 'x' as the input value using asteval."""
+    def secure_eval(expression, value, interpreter=None):
+        """
+        Evaluates a mathematical expression safely with 'x' as the input value using asteval.
+        Pass ``interpreter`` to reuse one asteval Interpreter across many values.
+        """
         if not expression:
             return value
         
         try:
-            aeval = Interpreter()
+            aeval = interpreter or Interpreter()
+            aeval.error = []
             aeval.symtable['x'] = value
             # Whitelist some common math functions if not already there
             # Interpreter already has many math functions by default
@@ -168,19 +185,159 @@ class ImportWizardService:
             'total_found': len(file_animal_ids)
         }
 
+    @staticmethod
+    def apply_formula(expression, series, interpreter=None):
+        """
+        Applies an advanced-logic formula to a whole column.
+        The formula is first evaluated once with 'x' bound to the numeric column
+        (numpy array); formulas that cannot be vectorized (conditionals, string
+        operations, non-numeric columns) fall back to one evaluation per value with
+        the same interpreter. Values whose evaluation fails are kept unchanged.
+        """
+        if not expression or series.empty:
+            return series
+        aeval = interpreter or Interpreter()
+
+        numeric = pd.to_numeric(series, errors='coerce')
+        if numeric.notna().sum() == series.notna().sum():
+            aeval.error = []
+            aeval.symtable['x'] = numeric.to_numpy(dtype=float)
+            try:
+                result = aeval(expression)
+            except Exception:
+                result = None
+            if not aeval.error and result is not None:
+                result = np.asarray(result)
+                if result.ndim == 0:
+                    result = np.full(len(series), result.item())
+                if result.shape == (len(series),):
+                    vectorized = pd.Series(result, index=series.index, dtype=object)
+                    # Missing inputs stay missing, as in the per-value path
+                    return vectorized.where(series.notna() & pd.notna(vectorized), None)
+
+        return series.map(lambda value: ImportWizardService.secure_eval(expression, value, interpreter=aeval))
+
+    @staticmethod
+    def _read_import_frame(file_path, skip_rows, anchor_text, anchor_offset, pipeline_id):
+        """Loads the raw import DataFrame (pipeline or file). Returns (df, final_skip)."""
+        final_skip = 0
+        if pipeline_id:
+            try:
+                # Local import to avoid circular dependency
+                from app.services.import_pipeline_service import ImportPipelineService
+                pipeline_service = ImportPipelineService()
+                data = pipeline_service.execute_pipeline(pipeline_id, file_path)
+                return pd.DataFrame(data), final_skip
+            except Exception as e:
+                raise ValueError(f"Pipeline execution failed: {str(e)}")
+
+        # Calculate final skip_rows
+        final_skip = skip_rows
+        if anchor_text:
+            anchor_line = ImportWizardService.find_anchor(file_path, anchor_text)
+            if anchor_line > 0:
+                final_skip = anchor_line + anchor_offset
+
+        ext = os.path.splitext(file_path)[1].lower()
+        try:
+            if ext == '.csv':
+                df = pd.read_csv(file_path, skiprows=final_skip)
+            elif ext in ['.xls', '.xlsx']:
+                df = pd.read_excel(file_path, skiprows=final_skip)
+            elif ext == '.json':
+                df = pd.read_json(file_path)
+            else:
+                df = pd.read_csv(file_path, sep=None, engine='python', skiprows=final_skip)
+        except Exception as e:
+            raise ValueError(f"Error reading file: {str(e)}")
+        return df, final_skip
+
+    @staticmethod
+    def _to_json_value(value):
+        """Converts a DataFrame cell to a JSON-serializable value (NaN/NaT -> None)."""
+        if value is None:
+            return None
+        if isinstance(value, np.generic):
+            value = value.item()
+        if isinstance(value, float) and math.isnan(value):
+            return None
+        if isinstance(value, (pd.Timestamp, datetime, date)):
+            return None if pd.isna(value) else value.isoformat()
+        return value
+
+    @staticmethod
+    def _resolve_mapping(mapping, columns, protocol):
+        """
+        Resolves the column -> analyte mapping once for the whole file.
+        Returns a list of (file_column, analyte) for mapped columns present in the data.
+        """
+        if not mapping:
+            return []
+        wanted = {file_col: int(analyte_id) for file_col, analyte_id in mapping.items()
+                  if analyte_id and file_col in columns}
+        if not wanted:
+            return []
+
+        protocol_analyte_ids = {a.id for a in protocol.analytes}
+        unknown = set(wanted.values()) - protocol_analyte_ids
+        if unknown:
+            current_app.logger.warning(f"Analyte IDs {sorted(unknown)} from mapping are not associated with Protocol ID {protocol.id}. Importing anyway.")
+
+        analytes = {a.id: a for a in Analyte.query.filter(Analyte.id.in_(set(wanted.values()))).all()}
+        return [(file_col, analytes[analyte_id]) for file_col, analyte_id in wanted.items() if analyte_id in analytes]
+
+    @staticmethod
+    def _sync_animal_values(animal, row_data, animal_model_fields):
+        """
+        Applies imported values belonging to the Animal (core fields and animal-model
+        measurements) to a snapshot dict. Returns True when something changed.
+        """
+        modified = False
+        model_fields_by_lower = {a.lower(): a for a in animal_model_fields}
+        for col, val in row_data.items():
+            col_lower = col.lower()
+
+            # 1. Update Core Fields
+            if col_lower in ANIMAL_CORE_FIELDS:
+                attr_name = ANIMAL_CORE_FIELDS[col_lower]
+                # Special handling for dates
+                if attr_name == 'date_of_birth' and isinstance(val, str):
+                    try:
+                        val = datetime.strptime(val.split('T')[0], '%Y-%m-%d').date()
+                    except (ValueError, TypeError):
+                        pass
+                if animal[attr_name] != val:
+                    animal[attr_name] = val
+                    modified = True
+
+            # 2. Update Measurements (case-insensitive match on the Animal Model analytes)
+            elif col_lower in model_fields_by_lower:
+                actual_col = model_fields_by_lower[col_lower]
+                if animal['measurements'].get(actual_col) != val:
+                    animal['measurements'][actual_col] = val
+                    modified = True
+        return modified
+
     @staticmethod
     def process_import(file_path, data_table_id, mapping, animal_id_column, user_id,
-                       skip_rows=0, anchor_text=None, anchor_offset=0, row_interval=1, advanced_logic=None, pipeline_id=None):
+                       skip_rows=0, anchor_text=None, anchor_offset=0, row_interval=1, advanced_logic=None, pipeline_id=None,
+                       chunk_size=None, progress_callback=None):
         """
         Processes the import.
         If pipeline_id is provided, executes the script to get the DataFrame.
         Otherwise, reads from the file.
+
+        The mapping is resolved once and advanced-logic formulas are applied per
+        column. Rows are then written in chunks of ``chunk_size`` (IMPORT_CHUNK_SIZE)
+        with executemany ``insert()``/``update()`` batches, each chunk in its own
+        transaction. These bypass the mapper listeners, so each chunk also writes
+        the ExperimentDataRow audit entries, syncs the measurement store and marks
+        the DataFrame and query caches stale itself.
+        ``progress_callback(done, total, label)`` is called after each chunk.
         """
         row_interval = int(row_interval)
-        
-        # FIX: Initialize variable to prevent UnboundLocalError in Pipeline mode
-        final_skip = 0 
-        
+        chunk_size = int(chunk_size or current_app.config.get('IMPORT_CHUNK_SIZE', 1000))
+
         data_table = db.session.get(DataTable, data_table_id)
         if not data_table:
             raise ValueError("DataTable not found")
@@ -190,57 +347,8 @@ class ImportWizardService:
         if not protocol:
             raise ValueError(f"Protocol with ID {data_table.protocol_id} not found for DataTable {data_table_id}")
 
-        # Create a set of valid analyte IDs for this protocol for efficient lookup
-        protocol_analyte_ids = {a.id for a in protocol.analytes}
-
-        # Fetch existing ExperimentDataRow for this data_table
-        existing_experiment_rows = db.session.query(ExperimentDataRow).filter_by(data_table_id=data_table.id).all()
-        
-        # Map existing rows by animal_id for efficient lookup
-        existing_rows_by_animal_id = {}
-        for erow in existing_experiment_rows:
-            if erow.animal_id:
-                existing_rows_by_animal_id[str(erow.animal_id)] = erow
-
-        # Identify fields that belong to the Animal Model (to sync)
-        animal_model_fields = set()
-        animals_by_uid = {}
-        if data_table.group:
-            if data_table.group.model and data_table.group.model.analytes:
-                animal_model_fields = {a.name for a in data_table.group.model.analytes}
-            from app.models import Animal
-            animals_by_uid = {a.uid: a for a in data_table.group.animals}
-
         # --- LOAD DATA (Pipeline vs File) ---
-        if pipeline_id:
-            try:
-                # Local import to avoid circular dependency
-                from app.services.import_pipeline_service import ImportPipelineService
-                pipeline_service = ImportPipelineService()
-                data = pipeline_service.execute_pipeline(pipeline_id, file_path)
-                df = pd.DataFrame(data)
-            except Exception as e:
-                raise ValueError(f"Pipeline execution failed: {str(e)}")
-        else:
-            # Calculate final skip_rows
-            final_skip = skip_rows
-            if anchor_text:
-                anchor_line = ImportWizardService.find_anchor(file_path, anchor_text)
-                if anchor_line > 0:
-                    final_skip = anchor_line + anchor_offset
-
-            ext = os.path.splitext(file_path)[1].lower()
-            try:
-                if ext == '.csv':
-                    df = pd.read_csv(file_path, skiprows=final_skip)
-                elif ext in ['.xls', '.xlsx']:
-                    df = pd.read_excel(file_path, skiprows=final_skip)
-                elif ext == '.json':
-                    df = pd.read_json(file_path)
-                else:
-                    df = pd.read_csv(file_path, sep=None, engine='python', skiprows=final_skip)
-            except Exception as e:
-                raise ValueError(f"Error reading file: {str(e)}")
+        df, final_skip = ImportWizardService._read_import_frame(file_path, skip_rows, anchor_text, anchor_offset, pipeline_id)
 
         # SECURITY COMPATIBILITY: Strip leading single quotes added during export
         if df is not None:
@@ -257,118 +365,142 @@ class ImportWizardService:
         if animal_id_column not in df.columns:
             raise ValueError(f"Animal ID column '{animal_id_column}' not found in data")
 
-        # Prep advanced logic map
+        # --- RESOLVE MAPPING AND APPLY ADVANCED LOGIC (once per column) ---
+        mapped_columns = ImportWizardService._resolve_mapping(mapping, df.columns, protocol)
+
         logic_map = {}
         if advanced_logic:
             logic_map = {int(k) if isinstance(k, str) and k.isdigit() else k: v for k, v in advanced_logic.items()}
 
-        # Map and save
-        results = []
-        for index, row in df.iterrows():
-            animal_id = str(row[animal_id_column])
-            
-            # Prepare row_data for the current record, including default uid
-            current_row_data = {'uid': animal_id}
-            
-            # If mapping is provided (Manual or Auto-Mapped in JS), use it
-            if mapping:
-                for file_col, analyte_id in mapping.items():
-                    if analyte_id and file_col in row:
-                        # Ensure the analyte ID is valid for the protocol
-                        if analyte_id not in protocol_analyte_ids:
-                            current_app.logger.warning(f"Analyte ID {analyte_id} from mapping is not associated with Protocol ID {protocol.id}. Importing anyway.")
-
-                        analyte = db.session.get(Analyte, analyte_id)
-                        if analyte:
-                            val = row[file_col]
-                            if isinstance(val, float) and math.isnan(val):
-                                val = None
-                            
-                            # Apply advanced logic
-                            if analyte.id in logic_map:
-                                try:
-                                    val = ImportWizardService.secure_eval(logic_map[analyte.id], val)
-                                except Exception:
-                                    pass 
-                            
-                            current_row_data[analyte.name] = val
-            
-            # Check if an existing row for this animal_id needs to be updated
-            if animal_id in existing_rows_by_animal_id:
-                erow = existing_rows_by_animal_id[animal_id]
-                erow.row_data.update(current_row_data)
-                flag_modified(erow, "row_data")
-                db.session.add(erow)
-                results.append(erow.row_data)
-            else:
-                new_row = ExperimentDataRow(
-                    data_table_id=data_table.id,
-                    animal_id=animal_id,
-                    row_data=current_row_data
-                )
-                db.session.add(new_row)
-                results.append(new_row.row_data)
-
-            # --- SYNC TO ANIMAL TABLE ---
-            if animal_id in animals_by_uid:
-                animal = animals_by_uid[animal_id]
-                measurements = animal.measurements or {}
-                modified = False
-                
-                # Mapping of animal core fields for sync
-                core_fields_map = {
-                    'sex': 'sex',
-                    'status': 'status',
-                    'date_of_birth': 'date_of_birth',
-                    'date of birth': 'date_of_birth'
+        values = pd.DataFrame(index=df.index)
+        values['uid'] = df[animal_id_column].astype(str).str.strip()
+        for file_col, analyte in mapped_columns:
+            column = df[file_col].astype(object).where(df[file_col].notna(), None)
+            if analyte.id in logic_map:
+                column = ImportWizardService.apply_formula(logic_map[analyte.id], column)
+            values[analyte.name] = column
+
+        # --- SNAPSHOTS OF EXISTING ROWS AND ANIMALS (one query each) ---
+        group = data_table.group
+        animal_model_fields = set()
+        if group and group.model and group.model.analytes:
+            animal_model_fields = {a.name for a in group.model.analytes}
+
+        animals_by_uid = {}
+        if group:
+            animal_query = db.session.query(
+                Animal.id, Animal.uid, Animal.sex, Animal.status, Animal.date_of_birth, Animal.measurements
+            ).filter(Animal.group_id == group.id)
+            for a in animal_query:
+                animals_by_uid[str(a.uid).strip()] = {
+                    'id': a.id, 'sex': a.sex, 'status': a.status, 'date_of_birth': a.date_of_birth,
+                    'measurements': dict(a.measurements or {}),
                 }
 
-                # Sync values if they belong to Animal Model or are core fields
-                for col, val in current_row_data.items():
-                    col_lower = col.lower()
-                    
-                    # 1. Update Core Fields
-                    if col_lower in core_fields_map:
-                        attr_name = core_fields_map[col_lower]
-                        # Special handling for dates
-                        if attr_name == 'date_of_birth' and isinstance(val, str):
-                            try:
-                                val = datetime.strptime(val.split('T')[0], '%Y-%m-%d').date()
-                            except (ValueError, TypeError):
-                                pass
-                        
-                        if getattr(animal, attr_name) != val:
-                            setattr(animal, attr_name, val)
-                            modified = True
-                    
-                    # 2. Update Measurements
-                    elif col in animal_model_fields or col_lower in {a.lower() for a in animal_model_fields}:
-                        # Find the actual case sensitive name in animal_model_fields if it was a case-insensitive match
-                        actual_col = next((a for a in animal_model_fields if a.lower() == col_lower), col)
-                        if measurements.get(actual_col) != val:
-                            measurements[actual_col] = val
-                            modified = True
-                
-                if modified:
-                    animal.measurements = measurements
-                    from datetime import timezone
-                    animal.updated_at = datetime.now(timezone.utc)
-                    from sqlalchemy.orm.attributes import flag_modified
-                    flag_modified(animal, "measurements")
-                    db.session.add(animal)
+        existing_rows = {
+            animal_id: (row_id, dict(row_data or {}))
+            for row_id, animal_id, row_data in db.session.query(
+                ExperimentDataRow.id, ExperimentDataRow.animal_id, ExperimentDataRow.row_data
+            ).filter(ExperimentDataRow.data_table_id == data_table.id)
+        }
+
+        unknown_uids = set(values['uid']) - set(animals_by_uid)
+        if unknown_uids:
+            current_app.logger.warning(f"Import into DataTable {data_table.id}: {len(unknown_uids)} animal IDs not found in group, rows skipped.")
+
+        # --- WRITE IN CHUNKS ---
+        store_enabled = is_measurement_store_enabled()
+        total = len(values)
+        imported = 0
+        for start in range(0, total, chunk_size):
+            chunk = values.iloc[start:start + chunk_size]
+            now = datetime.now(timezone.utc)
+
+            # Later rows for the same animal override earlier ones, as in a row-by-row import
+            pending_rows = {}
+            touched_animals = {}
+            for record in chunk.to_dict(orient='records'):
+                animal = animals_by_uid.get(record['uid'])
+                if animal is None:
+                    continue
+                row_data = {k: ImportWizardService._to_json_value(v) for k, v in record.items()}
+                pending_rows.setdefault(animal['id'], {}).update(row_data)
+                if ImportWizardService._sync_animal_values(animal, row_data, animal_model_fields):
+                    touched_animals[animal['id']] = animal
+                imported += 1
+
+            to_insert, to_update, audit_entries = [], [], []
+            for animal_id, row_data in pending_rows.items():
+                if animal_id in existing_rows:
+                    row_id, current = existing_rows[animal_id]
+                    merged = {**current, **row_data}
+                    if merged == current:
+                        continue
+                    to_update.append({'id': row_id, 'row_data': merged})
+                    audit_entries.append(('UPDATE', row_id, {'row_data': (current, merged)}))
+                    existing_rows[animal_id] = (row_id, merged)
+                else:
+                    to_insert.append({'data_table_id': data_table.id, 'animal_id': animal_id, 'row_data': row_data})
+
+            animal_updates = [{
+                'id': animal['id'], 'sex': animal['sex'], 'status': animal['status'],
+                'date_of_birth': animal['date_of_birth'], 'measurements': dict(animal['measurements']),
+                'updated_at': now,
+            } for animal in touched_animals.values()]
+
+            if to_insert:
+                db.session.execute(insert(ExperimentDataRow), to_insert)
+                inserted_ids = db.session.query(ExperimentDataRow.id, ExperimentDataRow.animal_id).filter(
+                    ExperimentDataRow.data_table_id == data_table.id,
+                    ExperimentDataRow.animal_id.in_([r['animal_id'] for r in to_insert]),
+                )
+                for row_id, animal_id in inserted_ids:
+                    existing_rows[animal_id] = (row_id, dict(pending_rows[animal_id]))
+                    audit_entries.append(('INSERT', row_id, {
+                        'id': row_id, 'data_table_id': data_table.id, 'animal_id': animal_id,
+                        'row_data': pending_rows[animal_id],
+                    }))
+            if to_update:
+                db.session.execute(update(ExperimentDataRow), to_update)
+            if animal_updates:
+                db.session.execute(update(Animal), animal_updates)
+
+            if store_enabled:
+                # Core bulk writes bypass the ORM flush hook of the measurement store
+                MeasurementStoreService().apply_changes(
+                    db.session.connection(),
+                    rows=[(data_table.id, animal_id, existing_rows[animal_id][1]) for animal_id in pending_rows],
+                    animals=[(a['id'], a['measurements']) for a in animal_updates],
+                )
+
+            # What the mapper listeners would have done for ORM writes
+            log_bulk_changes('ExperimentDataRow', audit_entries)
+            stale_tags = set()
+            if pending_rows:
+                mark_datatables_stale(db.session, [data_table.id])
+                stale_tags |= {f'datatable:{data_table.id}', 'measurements'}
+            if animal_updates:
+                stale_tags |= {f'group:{group.id}', 'groups', 'measurements'}
+                stale_tags |= {f"animal:{a['id']}" for a in animal_updates}
+            mark_tags_stale(db.session, stale_tags)
+            db.session.commit()
+
+            if progress_callback:
+                done = min(start + chunk_size, total)
+                progress_callback(done, total, f"{done}/{total}")
 
         # Audit Log
         log_action(
             resource_type='DataTable',
             resource_id=data_table.id,
             action='IMPORT_RAW_DATA',
-            details=f"Imported {len(df)} rows via {'Pipeline ' + str(pipeline_id) if pipeline_id else 'File Upload'}",
-            new_value={'row_count': len(df), 'mapping': mapping, 'advanced_options': {'skip_rows': final_skip, 'anchor': anchor_text, 'anchor_offset': anchor_offset, 'row_interval': row_interval, 'logic': advanced_logic}}
+            details=f"Imported {total} rows via {'Pipeline ' + str(pipeline_id) if pipeline_id else 'File Upload'}",
+            new_value={'row_count': total, 'mapping': mapping, 'advanced_options': {'skip_rows': final_skip, 'anchor': anchor_text, 'anchor_offset': anchor_offset, 'row_interval': row_interval, 'logic': advanced_logic}}
         )
 
         db.session.commit()
 
-        return len(results)
+        return imported
 
     @staticmethod
     def save_template(name, protocol_model_id, mapping, skip_rows=0, anchor_text=None, anchor_offset=0, row_interval=1, advanced_logic=None):
@@ -0,0 +1,382 @@
+# app/services/measurement_store_service.py
+"""
+Write-through columnar measurement store.
+
+Keeps the narrow ``measurement_value`` table in sync with the JSON blobs of
+``ExperimentDataRow.row_data`` (one row per DataTable/animal/analyte) and
+``Animal.measurements`` (``data_table_id`` NULL), and exposes readers that
+return typed pandas DataFrames from a single indexed query.
+
+The store is optional and controlled by ``ENABLE_MEASUREMENT_STORE``. ORM
+writes are mirrored from a session ``after_flush`` hook; Core bulk writes
+(``insert(Animal)`` / ``update(Animal)``) must call :meth:`sync_animals`
+explicitly. Existing data is back-filled with ``flask setup rebuild-measurement-store``.
+"""
+import math
+from collections import defaultdict
+
+import numpy as np
+import pandas as pd
+from flask import current_app, has_app_context
+from sqlalchemy import and_, delete, event, insert, inspect, or_, select
+from sqlalchemy.orm import Session
+
+from app.extensions import db
+from app.models import Analyte, Animal, DataTable, ExperimentDataRow, MeasurementValue
+
+_listeners_registered = False
+
+
+def is_measurement_store_enabled():
+    """Returns True when the write-through store is enabled for the current app."""
+    return has_app_context() and current_app.config.get('ENABLE_MEASUREMENT_STORE', False)
+
+
+def split_measurement_value(value):
+    """
+    Splits a raw JSON value into its (numeric_value, text_value) columns.
+    Returns None for empty values, which are not stored.
+    """
+    if value is None or isinstance(value, (dict, list)):
+        return None
+    if isinstance(value, bool):
+        return float(value), str(value)
+    if isinstance(value, (int, float, np.number)):
+        number = float(value)
+        if math.isnan(number) or math.isinf(number):
+            return None
+        return number, None
+
+    text = str(value).strip()
+    if not text:
+        return None
+    try:
+        number = float(text)
+        if math.isnan(number) or math.isinf(number):
+            number = None
+    except ValueError:
+        number = None
+    return number, text
+
+
+class MeasurementStoreService:
+    """Maintains and reads the columnar measurement store."""
+
+    # --- Write path ---
+
+    def _load_analyte_ids(self, connection):
+        """Maps analyte name -> id (analyte names are globally unique)."""
+        return {name: analyte_id for analyte_id, name in connection.execute(select(Analyte.id, Analyte.name))}
+
+    def _build_records(self, data_table_id, animal_id, values, analyte_ids):
+        records = []
+        for key, raw in (values or {}).items():
+            analyte_id = analyte_ids.get(key)
+            if analyte_id is None:
+                continue
+            split = split_measurement_value(raw)
+            if split is None:
+                continue
+            records.append({
+                'data_table_id': data_table_id,
+                'animal_id': animal_id,
+                'analyte_id': analyte_id,
+                'numeric_value': split[0],
+                'text_value': split[1],
+            })
+        return records
+
+    def _delete_scopes(self, connection, row_scopes=(), animal_scopes=(), data_table_ids=(), animal_ids=()):
+        """
+        Removes stored values for:
+        - row_scopes: (data_table_id, animal_id) pairs (one ExperimentDataRow each)
+        - animal_scopes: animal ids whose animal-level values are replaced
+        - data_table_ids / animal_ids: everything belonging to deleted entities
+        """
+        table = MeasurementValue.__table__
+        animals_by_dt = defaultdict(list)
+        for dt_id, animal_id in row_scopes:
+            animals_by_dt[dt_id].append(animal_id)
+        for dt_id, dt_animal_ids in animals_by_dt.items():
+            connection.execute(delete(table).where(
+                table.c.data_table_id == dt_id, table.c.animal_id.in_(dt_animal_ids)
+            ))
+        if animal_scopes:
+            connection.execute(delete(table).where(
+                table.c.data_table_id.is_(None), table.c.animal_id.in_(list(animal_scopes))
+            ))
+        if data_table_ids:
+            connection.execute(delete(table).where(table.c.data_table_id.in_(list(data_table_ids))))
+        if animal_ids:
+            connection.execute(delete(table).where(table.c.animal_id.in_(list(animal_ids))))
+
+    def apply_changes(self, connection, rows=(), animals=(), deleted_row_scopes=(),
+                      deleted_data_table_ids=(), deleted_animal_ids=()):
+        """
+        Replaces the stored values for the given entities in one batch.
+
+        Args:
+            connection: Connection bound to the current transaction.
+            rows: iterable of (data_table_id, animal_id, row_data)
+            animals: iterable of (animal_id, measurements)
+            deleted_row_scopes: (data_table_id, animal_id) pairs of deleted rows
+            deleted_data_table_ids: ids of deleted DataTables
+            deleted_animal_ids: ids of deleted Animals
+        """
+        rows = list(rows)
+        animals = list(animals)
+        row_scopes = [(dt_id, animal_id) for dt_id, animal_id, _ in rows] + list(deleted_row_scopes)
+        self._delete_scopes(
+            connection,
+            row_scopes=row_scopes,
+            animal_scopes=[animal_id for animal_id, _ in animals],
+            data_table_ids=deleted_data_table_ids,
+            animal_ids=deleted_animal_ids,
+        )
+
+        if not rows and not animals:
+            return 0
+
+        analyte_ids = self._load_analyte_ids(connection)
+        records = []
+        for dt_id, animal_id, row_data in rows:
+            records.extend(self._build_records(dt_id, animal_id, row_data, analyte_ids))
+        for animal_id, measurements in animals:
+            records.extend(self._build_records(None, animal_id, measurements, analyte_ids))
+
+        if records:
+            connection.execute(insert(MeasurementValue.__table__), records)
+        return len(records)
+
+    def sync_animals(self, animal_ids=None, group_id=None):
+        """
+        Re-projects animal-level measurements read back from the database.
+        Used after Core bulk writes that bypass the ORM flush hook.
+        """
+        if not is_measurement_store_enabled():
+            return 0
+        query = select(Animal.id, Animal.measurements)
+        if animal_ids is not None:
+            query = query.where(Animal.id.in_(list(animal_ids)))
+        if group_id is not None:
+            query = query.where(Animal.group_id == group_id)
+        connection = db.session.connection()
+        animals = [(row.id, row.measurements) for row in connection.execute(query)]
+        return self.apply_changes(connection, animals=animals)
+
+    def sync_datatable(self, data_table_id):
+        """Re-projects every ExperimentDataRow of a DataTable."""
+        if not is_measurement_store_enabled():
+            return 0
+        connection = db.session.connection()
+        query = select(ExperimentDataRow.data_table_id, ExperimentDataRow.animal_id, ExperimentDataRow.row_data)\
+            .where(ExperimentDataRow.data_table_id == data_table_id)
+        rows = [tuple(r) for r in connection.execute(query)]
+        return self.apply_changes(connection, rows=rows, deleted_data_table_ids=[data_table_id])
+
+    def rebuild(self, chunk_size=1000):
+        """
+        Rebuilds the whole store from the JSON columns (back-fill / repair).
+        Processes rows in chunks of ``chunk_size`` to bound memory.
+        """
+        connection = db.session.connection()
+        connection.execute(delete(MeasurementValue.__table__))
+        written = 0
+
+        last_id = 0
+        while True:
+            chunk = connection.execute(
+                select(Animal.id, Animal.measurements).where(Animal.id > last_id).order_by(Animal.id).limit(chunk_size)
+            ).all()
+            if not chunk:
+                break
+            written += self.apply_changes(connection, animals=[(r.id, r.measurements) for r in chunk])
+            last_id = chunk[-1].id
+
+        last_id = 0
+        while True:
+            chunk = connection.execute(
+                select(ExperimentDataRow.id, ExperimentDataRow.data_table_id,
+                       ExperimentDataRow.animal_id, ExperimentDataRow.row_data)
+                .where(ExperimentDataRow.id > last_id).order_by(ExperimentDataRow.id).limit(chunk_size)
+            ).all()
+            if not chunk:
+                break
+            written += self.apply_changes(
+                connection, rows=[(r.data_table_id, r.animal_id, r.row_data) for r in chunk]
+            )
+            last_id = chunk[-1].id
+
+        db.session.commit()
+        return written
+
+    # --- Read path ---
+
+    def get_long_frame(self, data_table_ids=(), group_ids=()):
+        """
+        Fetches stored values as a long DataFrame with a single indexed query.
+
+        Returns DataTable-scoped values of ``data_table_ids`` plus animal-level
+        values of every animal in ``group_ids``. Columns: data_table_id
+        (NaN for animal-level values), animal_id, analyte, data_type,
+        numeric_value, text_value.
+        """
+        mv = MeasurementValue.__table__
+        conditions = []
+        if data_table_ids:
+            conditions.append(mv.c.data_table_id.in_(list(data_table_ids)))
+        if group_ids:
+            group_animals = select(Animal.id).where(Animal.group_id.in_(list(group_ids)))
+            conditions.append(and_(mv.c.data_table_id.is_(None), mv.c.animal_id.in_(group_animals)))
+        columns = ['data_table_id', 'animal_id', 'analyte', 'data_type', 'numeric_value', 'text_value']
+        if not conditions:
+            return pd.DataFrame(columns=columns)
+
+        query = select(
+            mv.c.data_table_id, mv.c.animal_id, Analyte.name, Analyte.data_type,
+            mv.c.numeric_value, mv.c.text_value
+        ).join(Analyte, Analyte.id == mv.c.analyte_id).where(or_(*conditions))
+
+        rows = db.session.execute(query).all()
+        if not rows:
+            return pd.DataFrame(columns=columns)
+
+        dt_ids, animal_ids, names, data_types, numbers, texts = zip(*rows)
+        return pd.DataFrame({
+            'data_table_id': pd.array(dt_ids, dtype='Int64'),
+            'animal_id': np.asarray(animal_ids, dtype='int64'),
+            'analyte': names,
+            'data_type': [t.value for t in data_types],
+            'numeric_value': np.asarray(numbers, dtype='float64'),
+            'text_value': texts,
+        })
+
+    def get_datatable_frame(self, data_table, animal_fields=None, experiment_fields=None):
+        """
+        Returns a wide, typed DataFrame (index: animal id) for one DataTable.
+
+        Animal-level analytes (``animal_fields``, default: animal model analytes)
+        are read from animal-level values and protocol analytes
+        (``experiment_fields``, default: protocol analytes) from the DataTable
+        rows; when a name is in both, the DataTable value wins, as in the
+        JSON merge used by ``AnalysisService.prepare_dataframe``.
+        """
+        if animal_fields is None:
+            model = data_table.group.model if data_table.group else None
+            animal_fields = [a.name for a in model.analytes] if model else []
+        if experiment_fields is None:
+            experiment_fields = [assoc.analyte.name for assoc in data_table.protocol.analyte_associations] \
+                if data_table.protocol else []
+
+        long_df = self.get_long_frame([data_table.id], [data_table.group_id])
+        return self.pivot_long_frame(long_df, animal_fields, experiment_fields)
+
+    def pivot_long_frame(self, long_df, animal_fields, experiment_fields):
+        """Pivots a long frame from :meth:`get_long_frame` to typed wide columns."""
+        ordered_names = list(dict.fromkeys(list(animal_fields) + list(experiment_fields)))
+        if long_df.empty:
+            return pd.DataFrame(index=pd.Index([], name='animal_id', dtype='int64'))
+
+        is_animal_level = long_df['data_table_id'].isna().to_numpy()
+        keep = (is_animal_level & long_df['analyte'].isin(set(animal_fields)).to_numpy()) | \
+               (~is_animal_level & long_df['analyte'].isin(set(experiment_fields)).to_numpy())
+        long_df = long_df[keep]
+        # Animal-level rows first so DataTable values override them
+        long_df = long_df.assign(_scope=(~long_df['data_table_id'].isna()).astype('int8'))\
+            .sort_values('_scope', kind='stable')\
+            .drop_duplicates(['animal_id', 'analyte'], keep='last')
+
+        columns = {}
+        for (name, data_type), sub in long_df.groupby(['analyte', 'data_type'], sort=False):
+            columns[name] = self._typed_series(sub.set_index('animal_id'), data_type)
+
+        wide = pd.DataFrame(columns)
+        wide.index.name = 'animal_id'
+        return wide[[n for n in ordered_names if n in wide.columns]]
+
+    @staticmethod
+    def _typed_series(sub, data_type):
+        """Builds a column typed from ``Analyte.data_type``."""
+        numbers = sub['numeric_value']
+        if data_type == 'float':
+            return numbers.astype('float64')
+        if data_type == 'int':
+            valid = numbers.dropna()
+            if (valid == np.floor(valid)).all():
+                return numbers.astype('Int64')
+            return numbers.astype('float64')
+        texts = sub['text_value']
+        if data_type == 'date':
+            return pd.to_datetime(texts, errors='coerce')
+        # Text/category: keep the original text; purely numeric JSON values
+        # were stored without text and are restored as numbers.
+        values = texts.astype(object).where(texts.notna(), numbers.astype(object))
+        values = values.where(values.notna(), None)
+        if data_type == 'category':
+            return values.astype('category')
+        return values
+
+
+def _collect_flush_changes(session):
+    """Collects ExperimentDataRow / Animal changes pending in a flush."""
+    rows, animals = [], []
+    deleted_row_scopes, deleted_dt_ids, deleted_animal_ids = [], [], []
+
+    for obj in session.new:
+        if isinstance(obj, ExperimentDataRow):
+            rows.append((obj.data_table_id, obj.animal_id, obj.row_data))
+        elif isinstance(obj, Animal):
+            animals.append((obj.id, obj.measurements))
+
+    for obj in session.dirty:
+        if isinstance(obj, ExperimentDataRow):
+            state = inspect(obj)
+            if any(state.attrs[key].history.has_changes() for key in ('row_data', 'animal_id', 'data_table_id')):
+                old_dt = state.attrs.data_table_id.history.deleted
+                old_animal = state.attrs.animal_id.history.deleted
+                if old_dt or old_animal:
+                    deleted_row_scopes.append((
+                        old_dt[0] if old_dt else obj.data_table_id,
+                        old_animal[0] if old_animal else obj.animal_id,
+                    ))
+                rows.append((obj.data_table_id, obj.animal_id, obj.row_data))
+        elif isinstance(obj, Animal):
+            if inspect(obj).attrs.measurements.history.has_changes():
+                animals.append((obj.id, obj.measurements))
+
+    for obj in session.deleted:
+        if isinstance(obj, ExperimentDataRow):
+            deleted_row_scopes.append((obj.data_table_id, obj.animal_id))
+        elif isinstance(obj, DataTable):
+            deleted_dt_ids.append(obj.id)
+        elif isinstance(obj, Animal):
+            deleted_animal_ids.append(obj.id)
+
+    return rows, animals, deleted_row_scopes, deleted_dt_ids, deleted_animal_ids
+
+
+def register_measurement_store_listeners(app):
+    """
+    Registers the session hook that mirrors JSON writes into the store.
+    The hook is process-wide and checks ``ENABLE_MEASUREMENT_STORE`` at flush time.
+    """
+    global _listeners_registered
+    if _listeners_registered:
+        return
+    _listeners_registered = True
+
+    @event.listens_for(Session, 'after_flush')
+    def measurement_store_after_flush(session, flush_context):
+        if not is_measurement_store_enabled():
+            return
+        rows, animals, deleted_row_scopes, deleted_dt_ids, deleted_animal_ids = _collect_flush_changes(session)
+        if not (rows or animals or deleted_row_scopes or deleted_dt_ids or deleted_animal_ids):
+            return
+        MeasurementStoreService().apply_changes(
+            session.connection(),
+            rows=rows,
+            animals=animals,
+            deleted_row_scopes=deleted_row_scopes,
+            deleted_data_table_ids=deleted_dt_ids,
+            deleted_animal_ids=deleted_animal_ids,
+        )
@@ -0,0 +1,131 @@
+# app/services/merge_service.py
+"""
+Set-based merge engine shared by ``AnalysisService.aggregate_datatables`` and
+``DataTableService.aggregate_selected_datatables``.
+
+Measurements are pulled as flat (uid, datatable_id, analyte, label, value)
+arrays and pivoted to the wide frame with a single unstack on factorized codes,
+instead of building one dict per measurement and calling ``pivot_table``.
+"""
+import pandas as pd
+
+from app.extensions import db
+from app.models import Animal, ExperimentDataRow
+
+DEFAULT_MERGE_CHUNK_SIZE = 25
+
+
+class DataTableMergeService:
+    """Builds long and wide frames for a list of (already authorized) DataTables."""
+
+    def __init__(self, chunk_size=DEFAULT_MERGE_CHUNK_SIZE):
+        # Number of DataTables whose rows are loaded per query (chunked mode)
+        self.chunk_size = chunk_size or DEFAULT_MERGE_CHUNK_SIZE
+
+    def load_animals(self, datatables):
+        """Returns {group_id: [(animal_id, uid, to_dict())]} with to_dict() computed once per animal."""
+        group_ids = list({dt.group_id for dt in datatables})
+        animals = Animal.query.filter(Animal.group_id.in_(group_ids)).order_by(Animal.id).all()
+        animals_by_group = {}
+        for animal in animals:
+            animals_by_group.setdefault(animal.group_id, []).append((animal.id, animal.uid, animal.to_dict()))
+        return animals_by_group
+
+    def build_long_frame(self, datatables, label_func, animals_by_group=None, progress_callback=None):
+        """
+        Returns one row per (animal, DataTable, protocol analyte) with a value, as
+        columns uid / _source_datatable_id / analyte_name / measurement_label / analyte_value.
+
+        A value is taken from ``row_data`` when the key exists there, otherwise from
+        the animal's own fields/measurements, matching the historical merge semantics.
+        ``label_func(dt, analyte_name)`` gives the wide column name.
+        ``progress_callback(done, total)`` is called after each chunk of DataTables.
+        """
+        if animals_by_group is None:
+            animals_by_group = self.load_animals(datatables)
+
+        uids, dt_ids, names, labels, values = [], [], [], [], []
+
+        for start in range(0, len(datatables), self.chunk_size):
+            chunk = datatables[start:start + self.chunk_size]
+            rows_by_dt = {}
+            for dt_id, animal_id, row_data in db.session.query(
+                ExperimentDataRow.data_table_id, ExperimentDataRow.animal_id, ExperimentDataRow.row_data
+            ).filter(ExperimentDataRow.data_table_id.in_([dt.id for dt in chunk])):
+                rows_by_dt.setdefault(dt_id, {})[animal_id] = row_data or {}
+
+            for dt in chunk:
+                if not dt.protocol or not dt.protocol.analytes:
+                    continue
+                analytes = [(a.name, label_func(dt, a.name)) for a in dt.protocol.analytes]
+                dt_rows = rows_by_dt.get(dt.id, {})
+
+                for animal_id, uid, info in animals_by_group.get(dt.group_id, []):
+                    if not uid:
+                        continue
+                    row_data = dt_rows.get(animal_id, {})
+                    for name, label in analytes:
+                        if name in row_data:
+                            value = row_data[name]
+                        elif name in info:
+                            value = info[name]
+                        else:
+                            continue
+                        uids.append(uid)
+                        dt_ids.append(dt.id)
+                        names.append(name)
+                        labels.append(label)
+                        values.append(value)
+            # Release the chunk's JSON payloads before loading the next one
+            del rows_by_dt
+            if progress_callback:
+                progress_callback(min(start + self.chunk_size, len(datatables)), len(datatables))
+
+        return pd.DataFrame({
+            'uid': uids,
+            '_source_datatable_id': dt_ids,
+            'analyte_name': names,
+            'measurement_label': labels,
+            'analyte_value': pd.Series(values, dtype=None if values else object),
+        })
+
+    def restrict_to_common_analytes(self, long_df, datatable_count):
+        """Keeps only analytes measured in every one of the merged DataTables."""
+        analyte_counts = long_df.groupby('analyte_name')['_source_datatable_id'].nunique()
+        common_analytes = analyte_counts[analyte_counts == datatable_count].index
+        return long_df[long_df['analyte_name'].isin(common_analytes)]
+
+    def build_animal_frame(self, datatables, animals_by_group=None):
+        """One row per unique uid (first occurrence in DataTable order), indexed by uid."""
+        if animals_by_group is None:
+            animals_by_group = self.load_animals(datatables)
+
+        records = []
+        seen_uids = set()
+        for dt in datatables:
+            for _, uid, info in animals_by_group.get(dt.group_id, []):
+                if uid not in seen_uids:
+                    records.append(info)
+                    seen_uids.add(uid)
+
+        animal_df = pd.DataFrame(records)
+        if 'uid' not in animal_df.columns:
+            return None
+        return animal_df.drop_duplicates(subset=['uid']).set_index('uid')
+
+    def pivot_long_frame(self, long_df):
+        """
+        Wide frame (uid x measurement_label) keeping the first non-null value per cell.
+        Labels and uids are factorized once and unstacked in a single pass; all-null
+        labels are dropped, like ``pivot_table(aggfunc='first')`` did.
+        """
+        present = long_df[long_df['analyte_value'].notna()]
+        present = present.drop_duplicates(subset=['uid', 'measurement_label'], keep='first')
+
+        uid_codes, uid_levels = pd.factorize(present['uid'], sort=True)
+        label_codes, label_levels = pd.factorize(present['measurement_label'], sort=True)
+        index = pd.MultiIndex(
+            levels=[uid_levels, label_levels], codes=[uid_codes, label_codes],
+            names=['uid', 'measurement_label'],
+        )
+        return pd.Series(present['analyte_value'].to_numpy(), index=index).unstack()
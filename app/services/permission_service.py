@@ -4,6 +4,9 @@ from flask import current_app, g  # Import current_app for logging
 from app.extensions import db
 from app.models import (Project, ProjectTeamShare, ProjectUserShare,
                         user_has_permission)
+from app.performance.permission_matrix import (decode_permissions,
+                                               encode_permissions,
+                                               get_permission_matrix)
 
 
 class PermissionService:
@@ -16,6 +19,8 @@ class PermissionService:
         """
         Returns a dict of boolean flags representing what the user can do 
         on this specific project.
+        Served from the request cache, then from the cross-request permission
+        matrix (PERMISSION_MATRIX_BACKEND), before being recomputed.
         """
         # --- Request-Level Caching ---
         cache_key = f"perms_{user.id}_{project.id}"
@@ -25,10 +30,52 @@ class PermissionService:
         if cache_key in g.permission_cache:
             # current_app.logger.debug(f"-> Serving permissions from cache for '{user.email}' on '{project.name}'")
             return g.permission_cache[cache_key]
-            
-        current_app.logger.debug(f"--- PERM CHECK for User '{user.email}' on Project '{project.name}' ---")
 
-        perms = {
+        if not user or not user.is_authenticated:
+            current_app.logger.debug("-> User not authenticated. Returning all False.")
+            return self._empty_permissions()
+
+        if user.is_super_admin:
+            current_app.logger.debug("-> User is Super Admin. Granting all permissions.")
+            return {k: True for k in self._empty_permissions()}
+
+        # --- Cross-Request Permission Matrix ---
+        mask, token = self._lookup_matrix(user, [project.id]).get(project.id, (None, None))
+        if mask is not None:
+            perms = decode_permissions(mask)
+            g.permission_cache[cache_key] = perms
+            return perms
+
+        perms = self._compute_project_permissions(user, project)
+        self._store_matrix(user, [(project.id, perms, token)])
+        g.permission_cache[cache_key] = perms
+        return perms
+
+    def _lookup_matrix(self, user, project_ids):
+        """Returns {project_id: (mask or None, token)} from the permission matrix ({} when disabled)."""
+        matrix = get_permission_matrix()
+        if matrix is None:
+            return {}
+        try:
+            return matrix.lookup(user.id, project_ids)
+        except Exception as e:
+            current_app.logger.warning(f"Permission matrix read failed: {e}")
+            return {}
+
+    def _store_matrix(self, user, entries):
+        """Stores freshly computed (project_id, perms, token) entries; token None means no lookup was made."""
+        matrix = get_permission_matrix()
+        entries = [(project_id, encode_permissions(perms), token)
+                   for project_id, perms, token in entries if token is not None]
+        if matrix is None or not entries:
+            return
+        try:
+            matrix.store(user.id, entries)
+        except Exception as e:
+            current_app.logger.warning(f"Permission matrix write failed: {e}")
+
+    def _empty_permissions(self):
+        return {
             'can_view_project': False,
             'can_view_exp_groups': False,
             'can_view_datatables': False,
@@ -44,13 +91,11 @@ class PermissionService:
             'is_admin': False # Can manage project settings/shares
         }
 
-        if not user or not user.is_authenticated:
-            current_app.logger.debug("-> User not authenticated. Returning all False.")
-            return perms
+    def _compute_project_permissions(self, user, project):
+        """Resolves teams, roles and shares of an authenticated, non super-admin user."""
+        current_app.logger.debug(f"--- PERM CHECK for User '{user.email}' on Project '{project.name}' ---")
 
-        if user.is_super_admin:
-            current_app.logger.debug("-> User is Super Admin. Granting all permissions.")
-            return {k: True for k in perms}
+        perms = self._empty_permissions()
 
         user_teams = user.get_teams()
         if project.team in user_teams:
@@ -91,7 +136,6 @@ class PermissionService:
                 self._apply_share_mixin(perms, share)
 
         current_app.logger.debug(f"--- FINAL PERMS for '{user.email}' on '{project.name}': {perms} ---")
-        g.permission_cache[cache_key] = perms
         return perms
 
     def _apply_share_mixin(self, perms_dict, share_obj):
@@ -151,7 +195,22 @@ class PermissionService:
                  results[p.id] = mock_full
              return results
         
-        # 3. Batch Fetch Info
+        # 3. Cross-Request Permission Matrix
+        matrix_entries = self._lookup_matrix(user, [p.id for p in projects_to_process])
+        remaining = []
+        for project in projects_to_process:
+            mask, _token = matrix_entries.get(project.id, (None, None))
+            if mask is not None:
+                perms = decode_permissions(mask)
+                g.permission_cache[f"perms_{user.id}_{project.id}"] = perms
+                results[project.id] = perms
+            else:
+                remaining.append(project)
+        projects_to_process = remaining
+        if not projects_to_process:
+            return results
+
+        # 4. Batch Fetch Info
         project_ids = [p.id for p in projects_to_process]
         user_teams = user.get_teams()
         user_team_ids = [t.id for t in user_teams]
@@ -178,26 +237,13 @@ class PermissionService:
                     team_shares_map[s.project_id] = []
                 team_shares_map[s.project_id].append(s)
 
-        # 4. Compute In-Memory
+        # 5. Compute In-Memory
+        computed = []
         for project in projects_to_process:
             cache_key = f"perms_{user.id}_{project.id}"
             
-            perms = {
-                'can_view_project': False,
-                'can_view_exp_groups': False,
-                'can_view_datatables': False,
-                'can_view_samples': False,
-                'can_create_exp_groups': False,
-                'can_edit_exp_groups': False,
-                'can_delete_exp_groups': False,
-                'can_create_datatables': False,
-                'can_edit_datatables': False,
-                'can_delete_datatables': False,
-                'can_view_unblinded_data': False,
-                'is_owner_team_member': False,
-                'is_admin': False 
-            }
-            
+            perms = self._empty_permissions()
+
             # Team Membership Logic
             if project.team_id in user_team_ids:
                 perms['is_owner_team_member'] = True
@@ -227,5 +273,7 @@ class PermissionService:
 
             g.permission_cache[cache_key] = perms
             results[project.id] = perms
-            
+            computed.append((project.id, perms, matrix_entries.get(project.id, (None, None))[1]))
+
+        self._store_matrix(user, computed)
         return results
@@ -12,6 +12,7 @@ from app.models import (Attachment, DataTable, ExperimentalGroup,
                         ProjectEthicalApprovalAssociation,
                         ProjectPartnerAssociation, Team, User, Workplan,
                         WorkplanEvent, WorkplanVersion)
+from app.performance.caching import cached
 from app.queries import ProjectQuery
 from app.services.base import BaseService
 from app.utils.files import validate_file_type  # Import utility
@@ -433,4 +434,24 @@ class ProjectService(BaseService):
                 'has_more': data['total_count'] > max_projects_per_team
             })
             
-        return hierarchy
\ No newline at end of file
+        return hierarchy
+
+    @cached(tags=['hierarchy', 'access', 'user:{user_id}'])
+    def get_cached_sidebar_hierarchy(self, user, max_projects_per_team=50):
+        """
+        get_sidebar_hierarchy() flattened to plain dicts so it can be served from
+        the query cache; invalidated by any project, share or membership write.
+        """
+        return [
+            {
+                'id': team['id'],
+                'name': team['name'],
+                'projects': [
+                    {'id': p.id, 'name': p.name, 'slug': p.slug, 'is_archived': p.is_archived}
+                    for p in team['projects']
+                ],
+                'total_count': team['total_count'],
+                'has_more': team['has_more'],
+            }
+            for team in self.get_sidebar_hierarchy(user, max_projects_per_team)
+        ]
@@ -289,12 +289,8 @@ class SamplingService(BaseService):
         from app.extensions import db
 
         # 1. Base Query & Permissions
-        query = Sample.query.join(ExperimentalGroup).join(Project)
-        
-        if not user.is_super_admin:
-            user_teams = user.get_teams()
-            user_team_ids = [t.id for t in user_teams] if user_teams else []
-            query = query.filter(Project.team_id.in_(user_team_ids))
+        from app.permissions import filter_readable
+        query = filter_readable(user, Sample, Sample.query.join(ExperimentalGroup).join(Project))
 
         # 2. Apply Filters
         if filters.get('group_id'):
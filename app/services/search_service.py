@@ -0,0 +1,464 @@
+# app/services/search_service.py
+"""
+Global search (main.search_results) over an index maintained incrementally.
+
+Every searchable entity has one ``search_document`` row holding its text. A
+session hook re-indexes the entities inserted, deleted or whose indexed
+fields changed in each flush (and the datatables of a renamed group or
+protocol). Searches run one ranked, permission-filtered, paginated query per
+entity type on the best engine available:
+
+- ``fulltext``: MySQL FULLTEXT index on search_document (boolean mode, prefix terms)
+- ``fts5``: SQLite FTS5 table ``search_fts`` (bm25 ranking, prefix terms)
+- ``token``: portable inverted index in ``search_token`` (prefix lookups on an
+  indexed token column, ranked by summed field weights)
+
+MySQL FULLTEXT ignores words shorter than ``innodb_ft_min_token_size``; in
+``fulltext`` mode those short tokens are also posted to ``search_token`` and
+short query terms are matched there.
+
+``SEARCH_BACKEND`` selects one explicitly ('auto' picks from the dialect).
+Switching engines requires ``flask setup rebuild-search-index``. Until a
+rebuild has indexed an entity type for the current backend (recorded in
+``search_index_state``), or when ENABLE_SEARCH_INDEX is off, the type is
+searched with plain ``LIKE`` filters instead.
+"""
+import re
+from datetime import datetime, timezone
+
+from flask import current_app
+from sqlalchemy import (Integer, String, and_, bindparam, case, cast, column, delete, event, func,
+                        insert, literal, literal_column, or_, select, table, text)
+from sqlalchemy.orm import Session
+from sqlalchemy import inspect as sa_inspect
+
+from app.extensions import db
+from app.models import (Animal, AnimalModel, DataTable, EthicalApproval, ExperimentalGroup,
+                        Partner, Project, ProtocolModel, Sample, SearchDocument, SearchIndexState, SearchToken)
+from app.permissions import filter_readable, readable_criterion
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+MAX_TOKEN_LENGTH = 64
+MAX_QUERY_TERMS = 8
+REBUILD_BATCH_SIZE = 1000
+
+_listeners_registered = False
+
+
+class SearchEntity:
+    """
+    How one model is indexed: ``fields`` are (column, weight) pairs selected
+    with ``joins`` (the first one is the document title), ``watch`` the
+    attributes whose change requires re-indexing.
+    """
+
+    def __init__(self, name, model, fields, watch, joins=()):
+        self.name = name
+        self.model = model
+        self.fields = fields
+        self.watch = watch
+        self.joins = joins
+
+    def select_rows(self, criterion):
+        stmt = select(self.model.id, *[col for col, _ in self.fields]).select_from(self.model)
+        for target, on in self.joins:
+            stmt = stmt.outerjoin(target, on)
+        return stmt.where(criterion)
+
+
+SEARCH_ENTITIES = [
+    SearchEntity('projects', Project,
+                 [(Project.name, 3), (Project.slug, 3), (Project.description, 1)],
+                 watch=('name', 'slug', 'description')),
+    SearchEntity('groups', ExperimentalGroup,
+                 [(ExperimentalGroup.name, 3), (ExperimentalGroup.id, 2)],
+                 watch=('name',)),
+    SearchEntity('ethical_approvals', EthicalApproval,
+                 [(EthicalApproval.title, 3), (EthicalApproval.reference_number, 3), (EthicalApproval.description, 1)],
+                 watch=('title', 'reference_number', 'description')),
+    SearchEntity('protocols', ProtocolModel, [(ProtocolModel.name, 3)], watch=('name',)),
+    SearchEntity('animal_models', AnimalModel, [(AnimalModel.name, 3)], watch=('name',)),
+    SearchEntity('partners', Partner,
+                 [(Partner.company_name, 3), (Partner.contact_email, 2)],
+                 watch=('company_name', 'contact_email')),
+    SearchEntity('datatables', DataTable,
+                 [(DataTable.date, 2), (ExperimentalGroup.name, 1), (ProtocolModel.name, 1)],
+                 watch=('date', 'group_id', 'protocol_id'),
+                 joins=((ExperimentalGroup, DataTable.group_id == ExperimentalGroup.id),
+                        (ProtocolModel, DataTable.protocol_id == ProtocolModel.id))),
+    SearchEntity('animals', Animal, [(Animal.display_id, 3), (Animal.uid, 2)], watch=('display_id', 'uid')),
+    SearchEntity('samples', Sample, [(Sample.display_id, 3)], watch=('display_id',)),
+]
+ENTITIES_BY_NAME = {entity.name: entity for entity in SEARCH_ENTITIES}
+ENTITIES_BY_MODEL = {entity.model: entity for entity in SEARCH_ENTITIES}
+
+# Renaming a model re-indexes the documents that embed its name
+DEPENDENTS = {
+    ExperimentalGroup: [('name', 'datatables', DataTable.group_id)],
+    ProtocolModel: [('name', 'datatables', DataTable.protocol_id)],
+}
+
+
+def tokenize(value):
+    """Lower-cased word tokens of ``value`` (truncated to the token column size)."""
+    if value is None:
+        return []
+    return [token[:MAX_TOKEN_LENGTH] for token in TOKEN_RE.findall(str(value).lower())]
+
+
+def _like_prefix(term):
+    """LIKE pattern matching the tokens starting with ``term`` ('_' is a word character)."""
+    return term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+
+
+def is_search_index_enabled():
+    return current_app.config.get('ENABLE_SEARCH_INDEX', True)
+
+
+def _fulltext_min_token_size():
+    return current_app.config.get('SEARCH_FULLTEXT_MIN_TOKEN_SIZE', 3)
+
+
+def _posted_tokens(backend, tokens):
+    """The tokens of a document that go to ``search_token`` on ``backend``."""
+    if backend == 'token':
+        return tokens
+    if backend == 'fulltext':
+        min_size = _fulltext_min_token_size()
+        return {token: weight for token, weight in tokens.items() if len(token) < min_size}
+    return {}
+
+
+def _matches_entity_id(entity_id_column, entity):
+    """Join condition on the text ``entity_id`` that keeps the model's primary key indexable."""
+    if isinstance(entity.model.id.type, Integer):
+        return cast(entity_id_column, Integer) == entity.model.id
+    return entity_id_column == entity.model.id
+
+
+def get_search_backend(connection=None):
+    """'fulltext', 'fts5' or 'token' for the current database (cached per app)."""
+    configured = current_app.config.get('SEARCH_BACKEND', 'auto')
+    if configured != 'auto':
+        return configured
+
+    backend = current_app.extensions.get('search_backend')
+    if backend is None:
+        connection = connection or db.session.connection()
+        dialect = connection.dialect.name
+        backend = 'token'
+        if dialect == 'mysql':
+            backend = 'fulltext'
+        elif dialect == 'sqlite':
+            exists = connection.execute(
+                text("SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'search_fts'")
+            ).first()
+            if exists:
+                backend = 'fts5'
+        current_app.extensions['search_backend'] = backend
+    return backend
+
+
+class SearchIndexService:
+    """Writes and queries the search index."""
+
+    # ------------------------------------------------------------------
+    # Indexing
+    # ------------------------------------------------------------------
+
+    def _documents(self, entity, rows):
+        for row in rows:
+            values = list(row)[1:]
+            tokens = {}
+            for value, (_, weight) in zip(values, entity.fields):
+                for token in tokenize(value):
+                    tokens[token] = tokens.get(token, 0) + weight
+            body = ' '.join(str(v) for v in values if v not in (None, ''))
+            title = str(values[0])[:255] if values and values[0] is not None else None
+            yield str(row[0]), title, body, tokens
+
+    def remove(self, connection, entity_type, entity_ids):
+        """Drops the documents of the given entities from every structure of the index."""
+        entity_ids = [str(i) for i in entity_ids]
+        if not entity_ids:
+            return
+        backend = get_search_backend(connection)
+        doc = SearchDocument.__table__
+        if backend == 'fts5':
+            doc_ids = [row[0] for row in connection.execute(
+                select(doc.c.id).where(doc.c.entity_type == entity_type, doc.c.entity_id.in_(entity_ids)))]
+            if doc_ids:
+                connection.execute(text('DELETE FROM search_fts WHERE rowid = :rowid'),
+                                   [{'rowid': doc_id} for doc_id in doc_ids])
+        if backend in ('token', 'fulltext'):
+            tok = SearchToken.__table__
+            connection.execute(delete(tok).where(tok.c.entity_type == entity_type, tok.c.entity_id.in_(entity_ids)))
+        connection.execute(delete(doc).where(doc.c.entity_type == entity_type, doc.c.entity_id.in_(entity_ids)))
+
+    def index_where(self, connection, entity_type, criterion):
+        """(Re-)indexes the ``entity_type`` rows matching ``criterion``; returns how many."""
+        entity = ENTITIES_BY_NAME[entity_type]
+        documents = list(self._documents(entity, connection.execute(entity.select_rows(criterion))))
+        if not documents:
+            return 0
+
+        self.remove(connection, entity_type, [d[0] for d in documents])
+        backend = get_search_backend(connection)
+        doc = SearchDocument.__table__
+        connection.execute(insert(doc), [
+            {'entity_type': entity_type, 'entity_id': entity_id, 'title': title, 'body': body}
+            for entity_id, title, body, _ in documents
+        ])
+        postings = [
+            {'entity_type': entity_type, 'entity_id': entity_id, 'token': token, 'weight': weight}
+            for entity_id, _, _, tokens in documents for token, weight in _posted_tokens(backend, tokens).items()
+        ]
+        if postings:
+            connection.execute(insert(SearchToken.__table__), postings)
+        if backend == 'fts5':
+            rows = connection.execute(select(doc.c.id, doc.c.body).where(
+                doc.c.entity_type == entity_type, doc.c.entity_id.in_([d[0] for d in documents])))
+            connection.execute(text('INSERT INTO search_fts (rowid, body) VALUES (:rowid, :body)'),
+                               [{'rowid': doc_id, 'body': body} for doc_id, body in rows])
+        return len(documents)
+
+    def index_entities(self, connection, entity_type, entity_ids):
+        """(Re-)indexes entities by id; ids no longer in the database are removed."""
+        entity = ENTITIES_BY_NAME[entity_type]
+        entity_ids = list(entity_ids)
+        if not entity_ids:
+            return
+        id_column = entity.model.id
+        typed_ids = [int(i) for i in entity_ids] if isinstance(id_column.type, db.Integer) else entity_ids
+        self.index_where(connection, entity_type, id_column.in_(typed_ids))
+
+    def rebuild(self, entity_types=None):
+        """Re-creates the whole index (or some entity types) in id batches; returns counts per type."""
+        connection = db.session.connection()
+        backend = get_search_backend(connection)
+        counts = {}
+        for entity in SEARCH_ENTITIES:
+            if entity_types and entity.name not in entity_types:
+                continue
+            doc = SearchDocument.__table__
+            if backend == 'fts5':
+                connection.execute(text(
+                    'DELETE FROM search_fts WHERE rowid IN (SELECT id FROM search_document WHERE entity_type = :t)'
+                ), {'t': entity.name})
+            connection.execute(delete(SearchToken.__table__).where(SearchToken.__table__.c.entity_type == entity.name))
+            connection.execute(delete(doc).where(doc.c.entity_type == entity.name))
+
+            total, last_id = 0, None
+            while True:
+                id_query = select(entity.model.id).order_by(entity.model.id).limit(REBUILD_BATCH_SIZE)
+                if last_id is not None:
+                    id_query = id_query.where(entity.model.id > last_id)
+                ids = [row[0] for row in connection.execute(id_query)]
+                if not ids:
+                    break
+                total += self.index_where(connection, entity.name, entity.model.id.in_(ids))
+                last_id = ids[-1]
+            counts[entity.name] = total
+
+            state = SearchIndexState.__table__
+            connection.execute(delete(state).where(state.c.entity_type == entity.name))
+            connection.execute(insert(state), {
+                'entity_type': entity.name, 'backend': backend,
+                'built_at': datetime.now(timezone.utc).replace(tzinfo=None),
+            })
+        db.session.commit()
+        return counts
+
+    # ------------------------------------------------------------------
+    # Querying
+    # ------------------------------------------------------------------
+
+    def _scores(self, entity, terms):
+        """Subquery (entity_id, score) of the entities matching every term."""
+        backend = get_search_backend()
+        doc = SearchDocument.__table__
+        if backend == 'fulltext':
+            from sqlalchemy.dialects.mysql import match
+            min_size = _fulltext_min_token_size()
+            long_terms = [term for term in terms if len(term) >= min_size]
+            short_terms = [term for term in terms if len(term) < min_size]
+            if not long_terms:
+                return self._token_scores(entity, short_terms)
+            against = ' '.join(f'+{term}*' for term in long_terms)
+            score = match(doc.c.title, doc.c.body, against=against).in_boolean_mode()
+            fulltext = select(doc.c.entity_id, score.label('score')) \
+                .where(doc.c.entity_type == entity.name, score > 0).subquery()
+            if not short_terms:
+                return fulltext
+            # Words under the FULLTEXT minimum size are only in the token postings
+            short = self._token_scores(entity, short_terms)
+            return select(fulltext.c.entity_id, (fulltext.c.score + short.c.score).label('score')) \
+                .select_from(fulltext.join(short, short.c.entity_id == fulltext.c.entity_id)) \
+                .subquery()
+        if backend == 'fts5':
+            fts = table('search_fts', column('rowid'))
+            fts_name = literal_column('search_fts')
+            fts_query = ' '.join('"{}"*'.format(term.replace('"', '""')) for term in terms)
+            return select(doc.c.entity_id, (-func.bm25(fts_name)).label('score')) \
+                .select_from(doc.join(fts, fts.c.rowid == doc.c.id)) \
+                .where(doc.c.entity_type == entity.name, fts_name.op('MATCH')(bindparam('fts_query', fts_query))) \
+                .subquery()
+        return self._token_scores(entity, terms)
+
+    def _token_scores(self, entity, terms):
+        """``_scores`` on the ``search_token`` postings (prefix match of every term)."""
+        tok = SearchToken.__table__
+        prefixes = [tok.c.token.like(_like_prefix(term), escape='\\') for term in terms]
+        matched_term = case(*[(prefix, index) for index, prefix in enumerate(prefixes)])
+        return select(tok.c.entity_id, func.sum(tok.c.weight).label('score')) \
+            .where(tok.c.entity_type == entity.name, or_(*prefixes)) \
+            .group_by(tok.c.entity_id) \
+            .having(func.count(func.distinct(matched_term)) == len(terms)) \
+            .subquery()
+
+    def _like_scores(self, entity, terms):
+        """
+        Fallback ``_scores`` without the index: every term must occur in one of
+        the indexed fields (unranked, as the search was before the index).
+        """
+        def _contains(col, term):
+            text_col = col if isinstance(col.type, String) else cast(col, String)
+            return text_col.ilike('%' + _like_prefix(term), escape='\\')
+
+        stmt = select(entity.model.id.label('entity_id'), literal(1).label('score')).select_from(entity.model)
+        for target, on in entity.joins:
+            stmt = stmt.outerjoin(target, on)
+        return stmt.where(and_(*[or_(*[_contains(col, term) for col, _ in entity.fields]) for term in terms])) \
+            .subquery()
+
+    def index_ready(self, entity):
+        """
+        True once a rebuild has indexed ``entity`` for the current backend (the
+        flush hook only indexes new or edited rows, so documents alone do not
+        tell). Cached per app once true.
+        """
+        ready = current_app.extensions.setdefault('search_index_ready', set())
+        if entity.name in ready:
+            return True
+        state = SearchIndexState.__table__
+        built = db.session.execute(
+            select(state.c.entity_type)
+            .where(state.c.entity_type == entity.name, state.c.backend == get_search_backend())
+        ).first()
+        if built is None:
+            return False
+        ready.add(entity.name)
+        return True
+
+    def _restrict(self, user, entity, query):
+        """Folds the read permissions of ``entity`` into ``query``."""
+        model = entity.model
+        if model in (Project, ExperimentalGroup, DataTable, Sample):
+            return filter_readable(user, model, query)
+        if model is Animal:
+            criterion = readable_criterion(user, ExperimentalGroup)
+            if criterion is None:
+                return query
+            readable_groups = db.session.query(ExperimentalGroup.id).filter(criterion).correlate(None)
+            return query.filter(Animal.group_id.in_(readable_groups))
+        if model is Partner:
+            criterion = readable_criterion(user, Project)
+            return query if criterion is None else query.filter(Partner.projects.any(criterion))
+        # Ethical approvals and core models are visible to every logged-in user
+        return query
+
+    def search(self, user, query_string, entity_types=None, page=1, per_page=20):
+        """
+        Returns {entity_type: {'items': [...], 'total': n, 'page': page}} with the
+        ranked, readable hits of every (or the requested) entity type.
+        """
+        terms = list(dict.fromkeys(tokenize(query_string)))[:MAX_QUERY_TERMS]
+        results = {}
+        for entity in SEARCH_ENTITIES:
+            if entity_types and entity.name not in entity_types:
+                continue
+            if not terms:
+                results[entity.name] = {'items': [], 'total': 0, 'page': page}
+                continue
+
+            if is_search_index_enabled() and self.index_ready(entity):
+                scores = self._scores(entity, terms)
+                on = _matches_entity_id(scores.c.entity_id, entity)
+            else:
+                scores = self._like_scores(entity, terms)
+                on = scores.c.entity_id == entity.model.id
+            query = db.session.query(entity.model, func.count().over().label('total')).join(scores, on)
+            query = self._restrict(user, entity, query) \
+                .order_by(scores.c.score.desc(), entity.model.id) \
+                .offset((page - 1) * per_page).limit(per_page)
+            rows = query.all()
+            results[entity.name] = {
+                'items': [row[0] for row in rows],
+                'total': rows[0][1] if rows else 0,
+                'page': page,
+            }
+        return results
+
+
+# ----------------------------------------------------------------------
+# Incremental maintenance
+# ----------------------------------------------------------------------
+
+def _watched_change(obj, entity):
+    state = sa_inspect(obj)
+    return any(state.attrs[name].history.has_changes() for name in entity.watch)
+
+
+def _collect_flush_changes(session):
+    """Returns ({entity_type: ids to index}, {entity_type: ids to drop}, [(entity_type, fk, value)])."""
+    to_index, to_remove, dependents = {}, {}, []
+    for obj in session.new:
+        entity = ENTITIES_BY_MODEL.get(type(obj))
+        if entity is not None:
+            to_index.setdefault(entity.name, set()).add(str(obj.id))
+    for obj in session.dirty:
+        entity = ENTITIES_BY_MODEL.get(type(obj))
+        if entity is None or not session.is_modified(obj, include_collections=False):
+            continue
+        if _watched_change(obj, entity):
+            to_index.setdefault(entity.name, set()).add(str(obj.id))
+        for attr, dependent_type, fk_column in DEPENDENTS.get(type(obj), ()):
+            if sa_inspect(obj).attrs[attr].history.has_changes():
+                dependents.append((dependent_type, fk_column, obj.id))
+    for obj in session.deleted:
+        entity = ENTITIES_BY_MODEL.get(type(obj))
+        if entity is not None:
+            to_remove.setdefault(entity.name, set()).add(str(obj.id))
+    return to_index, to_remove, dependents
+
+
+def register_search_index_listeners(app):
+    """
+    Registers the session hook that keeps the search index in step with ORM
+    writes; checks ``ENABLE_SEARCH_INDEX`` at flush time. Core bulk writes
+    must call ``SearchIndexService().index_where()`` themselves.
+    """
+    global _listeners_registered
+    if _listeners_registered:
+        return
+    _listeners_registered = True
+
+    @event.listens_for(Session, 'after_flush')
+    def search_index_after_flush(session, flush_context):
+        try:
+            if not is_search_index_enabled():
+                return
+        except RuntimeError:
+            return
+        to_index, to_remove, dependents = _collect_flush_changes(session)
+        if not (to_index or to_remove or dependents):
+            return
+
+        service = SearchIndexService()
+        connection = session.connection()
+        for entity_type, ids in to_remove.items():
+            service.remove(connection, entity_type, ids)
+        for entity_type, ids in to_index.items():
+            service.index_entities(connection, entity_type, ids - to_remove.get(entity_type, set()))
+        for entity_type, fk_column, value in dependents:
+            service.index_where(connection, entity_type, fk_column == value)
@@ -1,3 +1,4 @@
+import numpy as np
 import pandas as pd
 import scipy.stats as stats
 import statsmodels.api as sm
@@ -6,18 +7,23 @@ import statsmodels.stats.multicomp as multi
 import pingouin as pg
 from flask import current_app
 from flask_babel import lazy_gettext as _l
-from scipy.stats import ttest_ind, ttest_rel, mannwhitneyu, wilcoxon, kruskal, friedmanchisquare
+from scipy.stats import ttest_ind, ttest_rel, mannwhitneyu, wilcoxon, kruskal, friedmanchisquare, f_oneway
 from app.datatables.analysis_utils import detect_outliers, sanitize_df_columns_for_patsy, quote_name
 
+# Independent-groups tests that execute_test_batch computes across all DV columns at once
+BATCH_TEST_KEYS = ('ttest_ind_equal_var', 'ttest_ind_unequal_var', 'mannwhitneyu', 'anova_oneway', 'kruskalwallis')
+
+
 class StatisticsService:
     """
     Service responsible for executing statistical tests on DataFrames.
     Returns raw data structures (dicts/lists), NOT HTML.
     """
 
-    def execute_test(self, df, test_key, dv_col, grouping_cols, is_repeated, subject_id_col, exclude_outliers=False, extra_params=None):
+    def execute_test(self, df, test_key, dv_col, grouping_cols, is_repeated, subject_id_col, exclude_outliers=False, extra_params=None, outlier_mask=None):
         """
         Main entry point to execute a statistical test.
+        ``outlier_mask`` (aligned on ``df``) reuses outliers already detected by an AnalysisFrame.
         """
         result = {
             'test': self._get_test_name(test_key),
@@ -43,7 +49,7 @@ class StatisticsService:
             
             df_test, outliers_count = self._prepare_data_for_test(
                 df, test_key, dv_col, grouping_cols, is_repeated, subject_id_col, 
-                exclude_outliers, outlier_method, outlier_threshold
+                exclude_outliers, outlier_method, outlier_threshold, outlier_mask=outlier_mask
             )
             if outliers_count > 0:
                 result['outliers_excluded_for_test'] = outliers_count
@@ -84,7 +90,136 @@ class StatisticsService:
         
         return result
 
-    def _prepare_data_for_test(self, df, test_key, dv_col, grouping_cols, is_repeated, subject_id_col, exclude_outliers, outlier_method='iqr', outlier_threshold=1.5):
+    def execute_test_batch(self, df, test_key, dv_cols, grouping_cols, subject_id_col=None, exclude_outliers=False, extra_params=None):
+        """
+        Runs one independent-groups test over many DV columns.
+        Returns {dv_col: result} with the same dicts execute_test would produce.
+
+        The frame is copied and coerced once, and the omnibus statistics of all
+        columns without missing values are computed by a single scipy call along
+        axis 0. Columns with missing values are tested on their own non-null values,
+        and columns in which a group has no data at all (or any test outside
+        BATCH_TEST_KEYS, or missing columns) go through execute_test. Post-hocs only run for
+        significant columns, as in execute_test.
+        """
+        dv_cols = list(dv_cols)
+        missing = [col for col in list(grouping_cols or []) + dv_cols if col not in df.columns]
+        if test_key not in BATCH_TEST_KEYS or not grouping_cols or missing:
+            # execute_test reports unusable columns in each result's 'error'
+            return {dv: self.execute_test(df, test_key, dv, grouping_cols, False, subject_id_col, exclude_outliers, extra_params=extra_params)
+                    for dv in dv_cols}
+
+        outlier_method = extra_params.get('outlier_method', 'iqr') if extra_params else 'iqr'
+        outlier_threshold = extra_params.get('outlier_threshold', 1.5) if extra_params else 1.5
+
+        # 1. Prepare all columns at once
+        valid_grouping = list(grouping_cols)
+        values = df[dv_cols].apply(pd.to_numeric, errors='coerce')
+        outlier_counts = {}
+        if exclude_outliers:
+            for dv in dv_cols:
+                mask, _ = detect_outliers(values[dv], method=outlier_method, threshold=outlier_threshold)
+                outlier_counts[dv] = int(mask.sum())
+                values.loc[mask, dv] = np.nan
+
+        df_test = pd.concat([df[valid_grouping], values], axis=1).dropna(subset=valid_grouping)
+        group_col = self._get_single_group_col(df_test, grouping_cols)
+        group_keys = sorted(df_test[group_col].unique())
+        blocks = [df_test.loc[df_test[group_col] == key, dv_cols].to_numpy(dtype=float) for key in group_keys]
+
+        # 2. Route columns: complete (vectorized), partial (per column) or fallback (execute_test)
+        present = np.array([(~np.isnan(block)).sum(axis=0) for block in blocks]).reshape(len(blocks), len(dv_cols))
+        required_groups = None if test_key in ('anova_oneway', 'kruskalwallis') else 2
+        complete, partial, fallback = [], [], []
+        for index, dv in enumerate(dv_cols):
+            if not present[:, index].all() or len(blocks) < 2 or (required_groups and len(blocks) != required_groups):
+                fallback.append(index)
+            elif all(block.shape[0] == present[g, index] for g, block in enumerate(blocks)):
+                complete.append(index)
+            else:
+                partial.append(index)
+
+        results = {}
+        statistics = {}
+        try:
+            if complete:
+                stat, p_val = self._batch_statistic(test_key, [block[:, complete] for block in blocks])
+                statistics.update({index: (stat[i], p_val[i]) for i, index in enumerate(complete)})
+            for index in partial:
+                samples = [block[:, index][~np.isnan(block[:, index])] for block in blocks]
+                statistics[index] = self._batch_statistic(test_key, samples)
+        except Exception as e:
+            current_app.logger.warning(f"Batched {test_key} failed, running column by column: {e}")
+            fallback = list(range(len(dv_cols)))
+
+        # 3. Per-column result dicts
+        for index, dv in enumerate(dv_cols):
+            if index in fallback:
+                results[dv] = self.execute_test(df, test_key, dv, grouping_cols, False, subject_id_col, exclude_outliers, extra_params=extra_params)
+                continue
+            result = {
+                'test': self._get_test_name(test_key), 'statistic': None, 'p_value': None, 'results_data': None,
+                'posthoc_data': None, 'error': None, 'groups_compared': len(blocks), 'n_pairs': None,
+                'n_subjects': None, 'notes': [], 'outliers_excluded_for_test': 0
+            }
+            if outlier_counts.get(dv):
+                result['outliers_excluded_for_test'] = outlier_counts[dv]
+                result['notes'].append(_l("{n} outlier(s) excluded before test.").format(n=outlier_counts[dv]))
+            stat, p_val = statistics[index]
+            result['statistic'], result['p_value'] = float(stat), float(p_val)
+            if test_key == 'anova_oneway':
+                result['groups_compared'] = None
+
+            if test_key in ('anova_oneway', 'kruskalwallis'):
+                column_df = df_test.loc[df_test[dv].notna(), [group_col, dv]].copy()
+                if test_key == 'anova_oneway':
+                    # Same patsy-safe names as _run_anova_oneway (Source label, post-hoc columns)
+                    mapping = sanitize_df_columns_for_patsy(column_df, [dv, group_col])
+                    safe_dv, safe_group = mapping.get(dv, dv), mapping.get(group_col, group_col)
+                    result['results_data'] = self._anova_oneway_table(column_df, safe_dv, safe_group, result)
+                    if result['p_value'] <= 0.05:
+                        self._anova_oneway_posthoc(column_df, safe_dv, safe_group, result, extra_params)
+                elif result['p_value'] <= 0.05:
+                    self._kruskalwallis_posthoc(column_df, dv, group_col, result, extra_params)
+            results[dv] = result
+
+        return {dv: results[dv] for dv in dv_cols}
+
+    def _batch_statistic(self, test_key, samples):
+        """Omnibus statistic/p-value for ``samples`` (1-D arrays, or 2-D with one column per DV)."""
+        if test_key == 'ttest_ind_equal_var':
+            return ttest_ind(samples[0], samples[1], equal_var=True, axis=0)
+        if test_key == 'ttest_ind_unequal_var':
+            return ttest_ind(samples[0], samples[1], equal_var=False, axis=0)
+        if test_key == 'mannwhitneyu':
+            if np.ndim(samples[0]) == 1:
+                return mannwhitneyu(samples[0], samples[1], alternative='two-sided')
+            # method='auto' picks exact vs. asymptotic (tie correction) from all the data it
+            # is given, so each column is tested on its own as execute_test does
+            columns = [mannwhitneyu(samples[0][:, i], samples[1][:, i], alternative='two-sided')
+                       for i in range(samples[0].shape[1])]
+            return np.array([c[0] for c in columns]), np.array([c[1] for c in columns])
+        if test_key == 'anova_oneway':
+            return f_oneway(*samples, axis=0)
+        return kruskal(*samples, axis=0)
+
+    def _anova_oneway_table(self, df, dv, group_col, res):
+        """Type II ANOVA table of a one-way design, laid out like statsmodels' anova_lm."""
+        grouped = df.groupby(group_col)[dv]
+        grand_mean = df[dv].mean()
+        ss_between = float((grouped.count() * (grouped.mean() - grand_mean) ** 2).sum())
+        ss_within = float(((df[dv] - grouped.transform('mean')) ** 2).sum())
+        df_between = float(grouped.ngroups - 1)
+        df_within = float(len(df) - grouped.ngroups)
+        return {
+            'columns': ['Source', 'sum_sq', 'df', 'F', 'PR(>F)'],
+            'rows': [
+                {'Source': f"C({quote_name(group_col)})", 'sum_sq': ss_between, 'df': df_between, 'F': res['statistic'], 'PR(>F)': res['p_value']},
+                {'Source': 'Residual', 'sum_sq': ss_within, 'df': df_within, 'F': np.nan, 'PR(>F)': np.nan},
+            ]
+        }
+
+    def _prepare_data_for_test(self, df, test_key, dv_col, grouping_cols, is_repeated, subject_id_col, exclude_outliers, outlier_method='iqr', outlier_threshold=1.5, outlier_mask=None):
         df_test = df.copy()
         cols_to_numeric = []
         
@@ -103,7 +238,11 @@ class StatisticsService:
         
         outliers_count = 0
         if exclude_outliers and test_key != 'chi_square':
-            if is_repeated and '_MeasurementValue_' in df_test.columns:
+            if outlier_mask is not None and (is_repeated or test_key != 'manova'):
+                mask = outlier_mask
+                outliers_count = int(mask.sum())
+                df_test = df_test[~mask]
+            elif is_repeated and '_MeasurementValue_' in df_test.columns:
                 mask, _ = detect_outliers(df_test['_MeasurementValue_'], method=outlier_method, threshold=outlier_threshold)
                 outliers_count = int(mask.sum())
                 df_test = df_test[~mask]
@@ -217,29 +356,32 @@ class StatisticsService:
         res.update({'statistic': stat, 'p_value': p_val, 'groups_compared': len(groups_data)})
         
         if p_val <= 0.05:
-            try:
-                # Use Pingouin for robust non-parametric pairwise tests
-                # padjust='holm' is generally better than bonf while still being safe
-                dunn = pg.pairwise_tests(data=df, dv=dv, between=group_col, padjust='holm', parametric=False)
-                
-                control_group = extra_params.get('control_group') if extra_params else None
-                if control_group and control_group in df[group_col].unique():
-                    # Filter for comparisons vs control (A or B matches control)
-                    dunn = dunn[(dunn['A'] == control_group) | (dunn['B'] == control_group)]
-                    title = _l(f"Post-Hoc (Non-parametric vs Control: {control_group})")
-                    res['notes'].append(_l("Non-parametric pairwise comparisons performed (Comparing vs Control)."))
-                else:
-                    title = _l("Post-Hoc (Non-parametric All-Pairs: Dunn equivalent)")
-                    res['notes'].append(_l("Non-parametric pairwise comparisons performed (All-pairs)."))
+            self._kruskalwallis_posthoc(df, dv, group_col, res, extra_params)
 
-                res['posthoc_data'] = {
-                    'title': title,
-                    'columns': dunn.columns.tolist(),
-                    'rows': dunn.to_dict('records'),
-                    'rationale': _l("Non-parametric pairwise tests (using Mann-Whitney U with Holm correction) were selected because the data distribution either violated normality or variance homogeneity assumptions.")
-                }
-            except Exception as e:
-                res['notes'].append(f"Post-hoc failed: {e}")
+    def _kruskalwallis_posthoc(self, df, dv, group_col, res, extra_params=None):
+        try:
+            # Use Pingouin for robust non-parametric pairwise tests
+            # padjust='holm' is generally better than bonf while still being safe
+            dunn = pg.pairwise_tests(data=df, dv=dv, between=group_col, padjust='holm', parametric=False)
+            
+            control_group = extra_params.get('control_group') if extra_params else None
+            if control_group and control_group in df[group_col].unique():
+                # Filter for comparisons vs control (A or B matches control)
+                dunn = dunn[(dunn['A'] == control_group) | (dunn['B'] == control_group)]
+                title = _l(f"Post-Hoc (Non-parametric vs Control: {control_group})")
+                res['notes'].append(_l("Non-parametric pairwise comparisons performed (Comparing vs Control)."))
+            else:
+                title = _l("Post-Hoc (Non-parametric All-Pairs: Dunn equivalent)")
+                res['notes'].append(_l("Non-parametric pairwise comparisons performed (All-pairs)."))
+
+            res['posthoc_data'] = {
+                'title': title,
+                'columns': dunn.columns.tolist(),
+                'rows': dunn.to_dict('records'),
+                'rationale': _l("Non-parametric pairwise tests (using Mann-Whitney U with Holm correction) were selected because the data distribution either violated normality or variance homogeneity assumptions.")
+            }
+        except Exception as e:
+            res['notes'].append(f"Post-hoc failed: {e}")
 
     def _run_friedman(self, df, dv, groups, subject_id, res):
         df_wide = df.pivot(index=subject_id, columns='_WithinFactorLevel_', values='_MeasurementValue_').dropna()
@@ -288,62 +430,65 @@ class StatisticsService:
         res['statistic'] = anova_tbl['F'][0]
         
         if res['p_value'] <= 0.05:
-            # Check for Dunnett's (Control Group)
-            control_group = extra_params.get('control_group') if extra_params else None
-            
-            if control_group and control_group in df_clean[safe_group].values:
-                try:
-                    # Dunnett's Test using scipy.stats.dunnett (requires Scipy 1.11+)
-                    if hasattr(stats, 'dunnett'):
-                        # Important: scipy.stats.dunnett results correspond to samples in Order of appearance 
-                        # or specific list. We must ensure mapping is correct.
-                        unique_groups = [g for g in df_clean[safe_group].unique() if g != control_group]
-                        samples = [df_clean[df_clean[safe_group] == g][safe_dv].values for g in unique_groups]
-                        control_sample = df_clean[df_clean[safe_group] == control_group][safe_dv].values
-                        
-                        dunnett_res = stats.dunnett(*samples, control=control_sample)
+            self._anova_oneway_posthoc(df_clean, safe_dv, safe_group, res, extra_params)
+
+    def _anova_oneway_posthoc(self, df_clean, safe_dv, safe_group, res, extra_params=None):
+        # Check for Dunnett's (Control Group)
+        control_group = extra_params.get('control_group') if extra_params else None
+        
+        if control_group and control_group in df_clean[safe_group].values:
+            try:
+                # Dunnett's Test using scipy.stats.dunnett (requires Scipy 1.11+)
+                if hasattr(stats, 'dunnett'):
+                    # Important: scipy.stats.dunnett results correspond to samples in Order of appearance 
+                    # or specific list. We must ensure mapping is correct.
+                    unique_groups = [g for g in df_clean[safe_group].unique() if g != control_group]
+                    samples = [df_clean[df_clean[safe_group] == g][safe_dv].values for g in unique_groups]
+                    control_sample = df_clean[df_clean[safe_group] == control_group][safe_dv].values
+                    
+                    dunnett_res = stats.dunnett(*samples, control=control_sample)
+                    
+                    rows = []
+                    for i, group in enumerate(unique_groups):
+                        rows.append({
+                            'Group A': control_group, 
+                            'Group B': group, 
+                            'Statistic': float(dunnett_res.statistic[i]), 
+                            'p-value': float(dunnett_res.pvalue[i])
+                        })
                         
-                        rows = []
-                        for i, group in enumerate(unique_groups):
-                            rows.append({
-                                'Group A': control_group, 
-                                'Group B': group, 
-                                'Statistic': float(dunnett_res.statistic[i]), 
-                                'p-value': float(dunnett_res.pvalue[i])
-                            })
-                            
-                        res['posthoc_data'] = {
-                            'title': _l(f"Post-Hoc (Dunnett's Test vs Control: {control_group})"),
-                            'columns': ['Group A', 'Group B', 'Statistic', 'p-value'],
-                            'rows': rows,
-                            'rationale': _l("Dunnett's test was selected to maximize statistical power for comparing multiple treatments against a single control, while maintaining control over the family-wise error rate.")
-                        }
-                        res['notes'].append(_l("Dunnett's test applied (Comparing all groups against Control)."))
-                    else:
-                        # Fallback for older Scipy or error
-                        m_comp = multi.pairwise_tukeyhsd(endog=df_clean[safe_dv], groups=df_clean[safe_group], alpha=0.05)
-                        df_posthoc = pd.DataFrame(data=m_comp._results_table.data[1:], columns=m_comp._results_table.data[0])
-                        res['posthoc_data'] = {
-                            'title': _l('Post-Hoc (Tukey HSD)'),
-                            'columns': df_posthoc.columns.tolist(),
-                            'rows': df_posthoc.to_dict('records')
-                        }
-                except Exception as e:
-                     res['notes'].append(f"Dunnett's failed: {e}")
-            else:
-                try:
-                    # All-pairs comparison using Tukey HSD
+                    res['posthoc_data'] = {
+                        'title': _l(f"Post-Hoc (Dunnett's Test vs Control: {control_group})"),
+                        'columns': ['Group A', 'Group B', 'Statistic', 'p-value'],
+                        'rows': rows,
+                        'rationale': _l("Dunnett's test was selected to maximize statistical power for comparing multiple treatments against a single control, while maintaining control over the family-wise error rate.")
+                    }
+                    res['notes'].append(_l("Dunnett's test applied (Comparing all groups against Control)."))
+                else:
+                    # Fallback for older Scipy or error
                     m_comp = multi.pairwise_tukeyhsd(endog=df_clean[safe_dv], groups=df_clean[safe_group], alpha=0.05)
                     df_posthoc = pd.DataFrame(data=m_comp._results_table.data[1:], columns=m_comp._results_table.data[0])
                     res['posthoc_data'] = {
                         'title': _l('Post-Hoc (Tukey HSD)'),
                         'columns': df_posthoc.columns.tolist(),
-                        'rows': df_posthoc.to_dict('records'),
-                        'rationale': _l("Tukey HSD was selected for all-pairs comparison as it provides an optimal balance of power and error-rate control when no specific control group is prioritized.")
+                        'rows': df_posthoc.to_dict('records')
                     }
-                    res['notes'].append(_l("Tukey HSD applied (All-pairs comparison)."))
-                except Exception as e:
-                    res['notes'].append(f"Tukey HSD failed: {e}")
+            except Exception as e:
+                 res['notes'].append(f"Dunnett's failed: {e}")
+        else:
+            try:
+                # All-pairs comparison using Tukey HSD
+                m_comp = multi.pairwise_tukeyhsd(endog=df_clean[safe_dv], groups=df_clean[safe_group], alpha=0.05)
+                df_posthoc = pd.DataFrame(data=m_comp._results_table.data[1:], columns=m_comp._results_table.data[0])
+                res['posthoc_data'] = {
+                    'title': _l('Post-Hoc (Tukey HSD)'),
+                    'columns': df_posthoc.columns.tolist(),
+                    'rows': df_posthoc.to_dict('records'),
+                    'rationale': _l("Tukey HSD was selected for all-pairs comparison as it provides an optimal balance of power and error-rate control when no specific control group is prioritized.")
+                }
+                res['notes'].append(_l("Tukey HSD applied (All-pairs comparison)."))
+            except Exception as e:
+                res['notes'].append(f"Tukey HSD failed: {e}")
 
     def _run_anova_twoway(self, df, dv, groups, subject_id, res, extra_params=None):
         if len(groups) != 2: raise ValueError("Two-Way ANOVA requires 2 factors.")
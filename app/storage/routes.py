@@ -237,8 +237,7 @@ def download_inventory(storage_id):
 
     # Prepare data for Excel (using DataFrame for CSV injection protection)
     import pandas as pd
-    from app.utils.files import dataframe_to_excel_bytes
-    from flask import send_file
+    from app.utils.files import send_dataframe
     
     data_rows = []
     for sample in samples_in_storage:
@@ -255,11 +254,4 @@ def download_inventory(storage_id):
         })
     
     df = pd.DataFrame(data_rows)
-    output = dataframe_to_excel_bytes(df, sheet_name='Inventory')
-
-    return send_file(
-        output,
-        mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-        as_attachment=True,
-        download_name=f'storage_{storage.id}_inventory.xlsx'
-    )
\ No newline at end of file
+    return send_dataframe(df, f'storage_{storage.id}_inventory.xlsx', sheet_name='Inventory')
\ No newline at end of file
@@ -100,6 +100,7 @@ def perform_analysis_task(self, form_data, datatable_id=None, selected_ids=None,
     """
     Background task to perform statistical analysis.
     Reconstructs the DataFrame inside the worker to avoid passing large data objects.
+    Results are written to the AnalysisResultStoreService; the task returns {'result_ref': task_id}.
     Note: ContextTask (in celery_worker.py) already provides app_context, no need to create another.
     """
     # Import here to avoid circular dependency with helpers -> tasks
@@ -156,12 +157,20 @@ def perform_analysis_task(self, form_data, datatable_id=None, selected_ids=None,
         subject_id_col = 'uid'
         subject_id_col_present = subject_id_col in df.columns
         
+        def _report_progress(done, total, label):
+            # Read by analysis_status while the task is running
+            self.update_state(state='PROGRESS', meta={'done': done, 'total': total, 'current': label})
+
         results = service.perform_analysis(
             df, form_data, subject_id_col, subject_id_col_present,
-            numerical_cols, categorical_cols
+            numerical_cols, categorical_cols, progress_callback=_report_progress
         )
-        
-        return results
+
+        # 3. Store the (potentially large) results out of the Celery backend and session;
+        # only the reference travels back to the web process
+        from .services.analysis_result_store import AnalysisResultStoreService
+        AnalysisResultStoreService().save(self.request.id, results, user_id=user_id)
+        return {'result_ref': self.request.id}
 
     except Exception as e:
         current_app.logger.error(f"Async Analysis Failed: {e}", exc_info=True)
@@ -183,3 +192,123 @@ def declare_tm_practice_task(self, email, skill_ids, date, source):
     except Exception as e:
         current_app.logger.error(f"Error declaring practice for {email}: {e}", exc_info=True)
         raise  # Re-raise to trigger retry
+
+
+@celery_app.task(name='tasks.drain_audit_outbox')
+def drain_audit_outbox_task():
+    """Moves committed audit entries from audit_outbox to audit_log (AUDIT_LOG_MODE='outbox')."""
+    from .services.audit_service import drain_audit_outbox
+    try:
+        moved = drain_audit_outbox()
+        if moved:
+            current_app.logger.info(f"Drained {moved} audit entries from the outbox")
+        return moved
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f"Audit outbox drain failed: {e}", exc_info=True)
+        raise
+
+
+@celery_app.task(name='tasks.maintain_audit_log')
+def maintain_audit_log_task():
+    """
+    Periodic audit storage maintenance: creates the coming monthly partitions
+    (MySQL) or rotates closed months into shard tables (SQLite), then archives
+    months older than AUDIT_ARCHIVE_AFTER_MONTHS.
+    """
+    from .services.audit_archive_service import AuditArchiveService
+    service = AuditArchiveService()
+    try:
+        created = service.ensure_partitions()
+        rotated = service.rotate()
+        archived = service.archive()
+        current_app.logger.info(
+            f"Audit maintenance: {len(created)} partitions created, {rotated} entries rotated, "
+            f"months archived: {archived}"
+        )
+        return {'partitions': created, 'rotated': rotated, 'archived': archived}
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f"Audit maintenance failed: {e}", exc_info=True)
+        raise
+
+
+@celery_app.task(bind=True, name='tasks.run_export_job')
+def run_export_job_task(self, job_id):
+    """
+    Builds the file of a background export job (see ExportJobService).
+    Progress is published as task state for the export status endpoint.
+    """
+    from .services.export_job_service import ExportJobService
+
+    db.session.expire_all()
+
+    def _report_progress(done, total, stage):
+        self.update_state(state='PROGRESS', meta={'done': done, 'total': total, 'current': stage})
+
+    # Request context for url_for (notification link) and translations
+    app = current_app._get_current_object()
+    with app.test_request_context():
+        return ExportJobService().run(job_id, progress_callback=_report_progress)
+
+
+@celery_app.task(bind=True, name='tasks.process_import')
+def process_import_task(self, user_id, import_args):
+    """
+    Runs an import wizard import (see ImportWizardService.process_import).
+    Progress is published per chunk as task state for the import status
+    endpoint; ``user_id`` travels with it so only the importer can read it.
+    """
+    from flask_login import login_user
+    from .services.import_wizard_service import ImportWizardService
+
+    db.session.expire_all()
+
+    def _report_progress(done, total, label):
+        self.update_state(state='PROGRESS', meta={'done': done, 'total': total, 'current': label, 'user_id': user_id})
+
+    # Request context with the importer logged in, so the audit trail attributes the writes
+    app = current_app._get_current_object()
+    with app.test_request_context():
+        login_user(db.session.get(User, user_id))
+        try:
+            count = ImportWizardService.process_import(user_id=user_id, progress_callback=_report_progress, **import_args)
+        except Exception as e:
+            db.session.rollback()
+            current_app.logger.error(f"Import into DataTable {import_args.get('data_table_id')} failed: {e}", exc_info=True)
+            return {'error': str(e), 'user_id': user_id}
+    return {'count': count, 'user_id': user_id}
+
+
+@celery_app.task(name='tasks.cleanup_export_jobs')
+def cleanup_export_jobs_task():
+    """Periodic removal of expired export files and jobs (EXPORT_JOB_TTL_HOURS)."""
+    from .services.export_job_service import ExportJobService
+    try:
+        removed = ExportJobService().cleanup_expired()
+        if removed:
+            current_app.logger.info(f"Removed {removed} expired export jobs")
+        return removed
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f"Export job cleanup failed: {e}", exc_info=True)
+        raise
+
+
+@celery_app.task(bind=True, name='tasks.publish_ckan_project')
+def publish_ckan_project_task(self, upload_task_id):
+    """
+    Publishes a project to CKAN (see CKANPublishService). Progress is
+    published as task state; resource outcomes are persisted as they come.
+    """
+    from .services.ckan_publish_service import CKANPublishService
+
+    db.session.expire_all()
+
+    def _report_progress(done, total, name):
+        self.update_state(state='PROGRESS', meta={'done': done, 'total': total, 'current': name})
+
+    # Request context for url_for (notification link) and translations
+    app = current_app._get_current_object()
+    with app.test_request_context():
+        return CKANPublishService().run(upload_task_id, progress_callback=_report_progress)
@@ -0,0 +1,146 @@
+# app/utils/columnar.py
+"""
+Columnar (Parquet / Arrow IPC) downloads for analysis pipelines.
+
+Unlike the spreadsheet exports, columns keep real types: callers pass a
+``{column: AnalyteDataType value}`` mapping ('float', 'int', 'text',
+'category', 'date') and untyped columns are inferred from their values.
+Export context (protocols, groups, blinding state) travels as JSON in the
+schema metadata under the ``precliniset`` key, and each typed field carries
+its ``analyte_type``. pyarrow is imported lazily, as for the audit archives.
+"""
+import importlib.util
+import json
+import os
+import tempfile
+from functools import lru_cache
+
+import pandas as pd
+from flask import current_app, send_file
+
+COLUMNAR_FORMATS = {
+    'parquet': ('.parquet', 'application/vnd.apache.parquet'),
+    'arrow': ('.arrow', 'application/vnd.apache.arrow.file'),
+}
+METADATA_KEY = b'precliniset'
+
+
+def is_columnar_format(file_format):
+    return file_format in COLUMNAR_FORMATS
+
+
+@lru_cache(maxsize=None)
+def columnar_export_available():
+    """True when pyarrow is installed (it is not built for every platform)."""
+    return importlib.util.find_spec('pyarrow') is not None
+
+
+def export_download_name(download_name, file_format):
+    """Replaces the extension of ``download_name`` with the one of ``file_format``."""
+    base, _ext = os.path.splitext(download_name)
+    extension = COLUMNAR_FORMATS[file_format][0] if is_columnar_format(file_format) else f'.{file_format}'
+    return base + extension
+
+
+def _as_strings(series):
+    strings = series.astype(str).astype(object)
+    strings[series.isna()] = None
+    return strings
+
+
+def _arrow_column(series, data_type=None):
+    import pyarrow as pa
+
+    if data_type in ('float', 'int'):
+        numbers = pd.to_numeric(series, errors='coerce')
+        if data_type == 'int' and (numbers.dropna() % 1 == 0).all():
+            return pa.array(numbers.astype('Int64'), type=pa.int64())
+        return pa.array(numbers.astype('float64'), type=pa.float64(), from_pandas=True)
+    if data_type == 'date':
+        dates = pd.to_datetime(series, errors='coerce').dt.normalize()
+        return pa.array(dates, from_pandas=True).cast(pa.date32())
+    if data_type == 'category':
+        return pa.array(_as_strings(series), type=pa.string()).dictionary_encode()
+    if data_type == 'text':
+        return pa.array(_as_strings(series), type=pa.string())
+
+    # Untyped column: native pandas dtypes are kept, object columns are inferred
+    if series.dtype != object:
+        return pa.array(series, from_pandas=True)
+    inferred = pd.api.types.infer_dtype(series, skipna=True)
+    if inferred == 'integer':
+        return pa.array(pd.to_numeric(series).astype('Int64'), type=pa.int64())
+    if inferred in ('floating', 'mixed-integer-float', 'decimal'):
+        return pa.array(pd.to_numeric(series, errors='coerce').astype('float64'), type=pa.float64(), from_pandas=True)
+    if inferred == 'boolean':
+        return pa.array(series, type=pa.bool_(), from_pandas=True)
+    if inferred == 'date':
+        return pa.array(series, type=pa.date32(), from_pandas=True)
+    if inferred == 'datetime':
+        return pa.array(pd.to_datetime(series, errors='coerce'), from_pandas=True)
+    return pa.array(_as_strings(series), type=pa.string())
+
+
+def build_arrow_table(df, column_types=None, metadata=None, index=False):
+    """
+    Converts ``df`` to a ``pyarrow.Table`` typed after ``column_types``.
+    With ``index=True`` the index becomes the first column (named after the
+    index, or 'Parameter' for the transposed layouts).
+    """
+    import pyarrow as pa
+
+    if index:
+        df = df.reset_index(names=df.index.name or 'Parameter')
+    column_types = column_types or {}
+
+    fields, arrays = [], []
+    for position, name in enumerate(df.columns):
+        data_type = column_types.get(name)
+        array = _arrow_column(df.iloc[:, position], data_type)
+        field_metadata = {'analyte_type': data_type} if data_type else None
+        fields.append(pa.field(str(name), array.type, metadata=field_metadata))
+        arrays.append(array)
+
+    schema = pa.schema(fields, metadata={
+        METADATA_KEY: json.dumps(metadata or {}, default=str, sort_keys=True).encode('utf-8'),
+    })
+    return pa.Table.from_arrays(arrays, schema=schema)
+
+
+def write_columnar(df, fileobj, file_format, column_types=None, metadata=None, index=False):
+    """Writes ``df`` to ``fileobj`` as Parquet (zstd) or as an Arrow IPC file."""
+    import pyarrow as pa
+
+    table = build_arrow_table(df, column_types=column_types, metadata=metadata, index=index)
+    if file_format == 'parquet':
+        import pyarrow.parquet as pq
+        pq.write_table(table, fileobj, compression='zstd')
+    else:
+        with pa.ipc.new_file(fileobj, table.schema) as writer:
+            writer.write_table(table)
+
+
+def read_export_metadata(schema):
+    """Returns the ``precliniset`` metadata dict of an exported file's schema."""
+    return json.loads((schema.metadata or {}).get(METADATA_KEY, b'{}'))
+
+
+def send_columnar(df, download_name, file_format, column_types=None, metadata=None, index=False):
+    """
+    Sends ``df`` as a Parquet or Arrow download (extension of ``download_name``
+    replaced). Raises ValueError if the file cannot be generated.
+    """
+    extension, mimetype = COLUMNAR_FORMATS[file_format]
+    spool = tempfile.TemporaryFile(suffix=extension)
+    try:
+        write_columnar(df, spool, file_format, column_types=column_types, metadata=metadata, index=index)
+        spool.seek(0)
+    except ImportError:
+        spool.close()
+        raise ValueError("Parquet and Arrow exports require the 'pyarrow' package.")
+    except Exception as e:
+        spool.close()
+        current_app.logger.error(f"Error writing {file_format} file: {e}")
+        raise ValueError(f"Failed to generate {file_format} file: {str(e)}")
+    return send_file(spool, mimetype=mimetype, as_attachment=True,
+                     download_name=export_download_name(download_name, file_format))
@@ -1,7 +1,13 @@
 # app/utils/files.py
+import datetime
 import io
+import numbers
 import os
+import tempfile
+from decimal import Decimal
+
 import magic
+import numpy as np
 import pandas as pd
 from flask import current_app
 
@@ -79,15 +85,42 @@ def read_excel_to_list(file_storage, sheet_name=0):
         current_app.logger.error(f"Error reading Excel file: {e}")
         raise ValueError(f"Failed to parse Excel file: {str(e)}")
 
+EXCEL_INJECTION_PREFIXES = ('=', '+', '-', '@')
+EXCEL_MIMETYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+EXPORT_CHUNK_ROWS = 5000
+
 def _sanitize_for_excel(val):
     """
     Prevents CSV/Excel injection by prepending a single quote to values
     starting with dangerous characters (=, +, -, @).
     """
-    if isinstance(val, str) and val.startswith(('=', '+', '-', '@')):
+    if isinstance(val, str) and val.startswith(EXCEL_INJECTION_PREFIXES):
         return f"'{val}"
     return val
 
+def sanitize_dataframe_for_excel(df):
+    """
+    Vectorized equivalent of applying ``_sanitize_for_excel`` to every object
+    column. Only the columns that actually contain dangerous strings are
+    copied; the input frame is never modified.
+    """
+    df_safe = df
+    for position, dtype in enumerate(df.dtypes):
+        if dtype != object:
+            continue
+        series = df.iloc[:, position]
+        if pd.api.types.infer_dtype(series, skipna=True) not in ('string', 'mixed', 'mixed-integer'):
+            continue
+        mask = series.str.startswith(EXCEL_INJECTION_PREFIXES, na=False).astype(bool)
+        if not mask.any():
+            continue
+        if df_safe is df:
+            df_safe = df.copy(deep=False)
+        sanitized = series.copy()
+        sanitized[mask] = "'" + series[mask]
+        df_safe.isetitem(position, sanitized)
+    return df_safe
+
 def dataframe_to_excel_bytes(df, sheet_name='Sheet1', **kwargs):
     """
     Converts a pandas DataFrame to an Excel file in memory (BytesIO).
@@ -98,13 +131,7 @@ def dataframe_to_excel_bytes(df, sheet_name='Sheet1', **kwargs):
         kwargs['index'] = False
 
     try:
-        # Create a copy to avoid modifying the original dataframe
-        df_safe = df.copy()
-
-        # Apply sanitization to all object (string) columns
-        for col in df_safe.select_dtypes(include=['object']).columns:
-            df_safe[col] = df_safe[col].apply(_sanitize_for_excel)
-
+        df_safe = sanitize_dataframe_for_excel(df)
         with pd.ExcelWriter(output, engine='openpyxl') as writer:
             df_safe.to_excel(writer, sheet_name=sheet_name, **kwargs)
         output.seek(0)
@@ -112,3 +139,133 @@ def dataframe_to_excel_bytes(df, sheet_name='Sheet1', **kwargs):
     except Exception as e:
         current_app.logger.error(f"Error writing Excel file: {e}")
         raise ValueError(f"Failed to generate Excel file: {str(e)}")
+
+def _excel_cell_value(val):
+    """Maps a pandas cell to what ``to_excel`` would write (None = empty cell)."""
+    if isinstance(val, np.generic):
+        val = val.item()
+    if val is None or val is pd.NaT or val is pd.NA:
+        return None
+    if isinstance(val, float):
+        if val != val:
+            return None
+        if val in (float('inf'), float('-inf')):
+            return 'inf' if val > 0 else '-inf'
+    return val
+
+def _write_excel_cell(worksheet, row, col, val, fmt=None):
+    val = _excel_cell_value(val)
+    if val is None:
+        if fmt is not None:
+            worksheet.write_blank(row, col, None, fmt)
+        return
+    if isinstance(val, str):
+        # Never let xlsxwriter turn a string into a formula or a hyperlink
+        worksheet.write_string(row, col, val, fmt)
+    elif isinstance(val, bool):
+        worksheet.write_boolean(row, col, val, fmt)
+    elif isinstance(val, (numbers.Real, Decimal)):
+        worksheet.write_number(row, col, val, fmt)
+    elif isinstance(val, (datetime.datetime, datetime.date, datetime.time)):
+        worksheet.write_datetime(row, col, val, fmt)
+    else:
+        worksheet.write_string(row, col, str(val), fmt)
+
+def write_dataframe_xlsx(df, fileobj, sheet_name='Sheet1', index=False, header=True):
+    """
+    Writes ``df`` as an .xlsx workbook into ``fileobj`` using xlsxwriter's
+    ``constant_memory`` mode: rows are flushed to disk as soon as the next
+    one starts, so memory use does not grow with the number of rows.
+
+    The layout matches ``df.to_excel(index=..., header=...)`` (same column
+    order, bold bordered header and index cells, ISO date formats) and
+    values are sanitized chunk by chunk against formula injection.
+    """
+    import xlsxwriter
+
+    workbook = xlsxwriter.Workbook(fileobj, {
+        'constant_memory': True,
+        'remove_timezone': True,
+        'default_date_format': 'YYYY-MM-DD',
+    })
+    try:
+        worksheet = workbook.add_worksheet(sheet_name)
+        header_fmt = workbook.add_format({'bold': True, 'border': 1, 'align': 'center', 'valign': 'top'})
+        datetime_fmt = workbook.add_format({'num_format': 'YYYY-MM-DD HH:MM:SS'})
+        col_offset = 1 if index else 0
+        row = 0
+
+        if header:
+            if index and df.index.name is not None:
+                _write_excel_cell(worksheet, 0, 0, df.index.name, header_fmt)
+            for col, name in enumerate(df.columns):
+                _write_excel_cell(worksheet, 0, col + col_offset, name, header_fmt)
+            row = 1
+
+        for start in range(0, len(df), EXPORT_CHUNK_ROWS):
+            chunk = sanitize_dataframe_for_excel(df.iloc[start:start + EXPORT_CHUNK_ROWS])
+            for label, values in zip(chunk.index, chunk.itertuples(index=False, name=None)):
+                if index:
+                    _write_excel_cell(worksheet, row, 0, label, header_fmt)
+                for col, val in enumerate(values):
+                    fmt = datetime_fmt if isinstance(val, datetime.datetime) else None
+                    _write_excel_cell(worksheet, row, col + col_offset, val, fmt)
+                row += 1
+    finally:
+        workbook.close()
+
+def iter_dataframe_csv(df, index=False, header=True, chunk_rows=EXPORT_CHUNK_ROWS, encoding='utf-8'):
+    """
+    Yields ``df`` as encoded CSV, ``chunk_rows`` rows at a time. The
+    concatenated output is the same as a single sanitized ``df.to_csv()``.
+    """
+    if header:
+        yield sanitize_dataframe_for_excel(df.iloc[:0]).to_csv(index=index, header=True).encode(encoding)
+    for start in range(0, len(df), chunk_rows):
+        chunk = sanitize_dataframe_for_excel(df.iloc[start:start + chunk_rows])
+        yield chunk.to_csv(index=index, header=False).encode(encoding)
+
+def send_dataframe(df, download_name, sheet_name='Sheet1', index=False, header=True):
+    """
+    Streams ``df`` as a download. The format follows ``download_name``'s
+    extension: ``.csv`` is generated chunk by chunk straight into the
+    response, anything else is written as .xlsx to an anonymous temporary
+    file that is then sent in blocks (and removed when the response closes).
+
+    Raises ValueError if the workbook cannot be generated, like
+    ``dataframe_to_excel_bytes``.
+    """
+    from flask import Response, send_file, stream_with_context
+
+    if download_name.lower().endswith('.csv'):
+        response = Response(
+            stream_with_context(iter_dataframe_csv(df, index=index, header=header)),
+            mimetype='text/csv',
+        )
+        response.headers.set('Content-Disposition', 'attachment', filename=download_name)
+        return response
+
+    spool = tempfile.TemporaryFile(suffix='.xlsx')
+    try:
+        write_dataframe_xlsx(df, spool, sheet_name=sheet_name, index=index, header=header)
+        spool.seek(0)
+    except Exception as e:
+        spool.close()
+        current_app.logger.error(f"Error writing Excel file: {e}")
+        raise ValueError(f"Failed to generate Excel file: {str(e)}")
+    return send_file(spool, mimetype=EXCEL_MIMETYPE, as_attachment=True, download_name=download_name)
+
+def send_export(df, download_name, file_format='xlsx', sheet_name='Sheet1', index=False, header=True,
+                column_types=None, metadata=None):
+    """
+    Sends ``df`` in the requested ``file_format``: 'xlsx' (default), 'csv',
+    or the columnar 'parquet' / 'arrow' formats of ``app.utils.columnar``
+    (typed after ``column_types``, with ``metadata`` in the schema).
+    """
+    from .columnar import export_download_name, is_columnar_format, send_columnar
+
+    if is_columnar_format(file_format):
+        return send_columnar(df, download_name, file_format, column_types=column_types, metadata=metadata, index=index)
+    if file_format == 'csv':
+        download_name = export_download_name(download_name, 'csv')
+    return send_dataframe(df, download_name, sheet_name=sheet_name, index=index, header=header)
@@ -44,6 +44,7 @@ if [ "$RUN_MIGRATIONS" = "true" ]; then
         echo "⚙️  Ensuring system roles and resources..."
         flask setup init-admin
         flask setup static-resources
+        flask setup rebuild-search-index --if-missing
         echo "------------------------------------------------"
     else
         echo "⚠️  'migrations' directory not found. Skipping DB upgrade."
@@ -0,0 +1,45 @@
+"""add_export_job_table
+
+Revision ID: 4e8a1c7b2d90
+Revises: 9b3e6d1a4c72
+Create Date: 2026-10-17 14:03:51.207731
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4e8a1c7b2d90'
+down_revision = '9b3e6d1a4c72'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('export_job',
+    sa.Column('id', sa.String(length=32), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('kind', sa.String(length=32), nullable=False),
+    sa.Column('status', sa.String(length=16), nullable=False),
+    sa.Column('params', sa.JSON(), nullable=False),
+    sa.Column('filename', sa.String(length=255), nullable=True),
+    sa.Column('file_size', sa.BigInteger(), nullable=True),
+    sa.Column('row_count', sa.Integer(), nullable=True),
+    sa.Column('error_message', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('completed_at', sa.DateTime(), nullable=True),
+    sa.Column('expires_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('export_job', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_export_job_user_id'), ['user_id'], unique=False)
+        batch_op.create_index('ix_export_job_expires_at', ['expires_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('export_job', schema=None) as batch_op:
+        batch_op.drop_index('ix_export_job_expires_at')
+        batch_op.drop_index(batch_op.f('ix_export_job_user_id'))
+    op.drop_table('export_job')
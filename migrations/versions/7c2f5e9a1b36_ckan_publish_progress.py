@@ -0,0 +1,42 @@
+"""ckan_publish_progress
+
+Revision ID: 7c2f5e9a1b36
+Revises: 4e8a1c7b2d90
+Create Date: 2026-10-18 09:42:17.583104
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7c2f5e9a1b36'
+down_revision = '4e8a1c7b2d90'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('ckan_upload_task', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('user_id', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('dataset_id', sa.String(length=255), nullable=True))
+        batch_op.add_column(sa.Column('updated_at', sa.DateTime(), nullable=True))
+        batch_op.create_foreign_key('fk_ckan_upload_task_user_id', 'user', ['user_id'], ['id'], ondelete='SET NULL')
+
+    with op.batch_alter_table('ckan_resource_task', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('resource_name', sa.String(length=255), nullable=True))
+        batch_op.add_column(sa.Column('content_hash', sa.String(length=64), nullable=True))
+        batch_op.create_index(batch_op.f('ix_ckan_resource_task_upload_task_id'), ['upload_task_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('ckan_resource_task', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_ckan_resource_task_upload_task_id'))
+        batch_op.drop_column('content_hash')
+        batch_op.drop_column('resource_name')
+
+    with op.batch_alter_table('ckan_upload_task', schema=None) as batch_op:
+        batch_op.drop_constraint('fk_ckan_upload_task_user_id', type_='foreignkey')
+        batch_op.drop_column('updated_at')
+        batch_op.drop_column('dataset_id')
+        batch_op.drop_column('user_id')
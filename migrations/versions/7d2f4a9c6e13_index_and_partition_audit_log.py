@@ -0,0 +1,74 @@
+"""index_and_partition_audit_log
+
+Revision ID: 7d2f4a9c6e13
+Revises: 5e9a1c3f7b28
+Create Date: 2026-10-16 23:05:12.640391
+
+"""
+from datetime import datetime, timezone
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7d2f4a9c6e13'
+down_revision = '5e9a1c3f7b28'
+branch_labels = None
+depends_on = None
+
+# Monthly partitions created ahead of the current month; later ones are added
+# by AuditArchiveService.ensure_partitions (maintain_audit_log task).
+MONTHS_AHEAD = 2
+
+
+def _add_months(year, month, count):
+    index = year * 12 + (month - 1) + count
+    return index // 12, index % 12 + 1
+
+
+def _partition_audit_log(bind):
+    """MySQL: RANGE COLUMNS partitions, one per month from the oldest entry."""
+    oldest = bind.execute(sa.text("SELECT MIN(timestamp) FROM audit_log")).scalar()
+    now = datetime.now(timezone.utc)
+    year, month = (oldest.year, oldest.month) if oldest else (now.year, now.month)
+    last = _add_months(now.year, now.month, MONTHS_AHEAD)
+
+    partitions = []
+    while (year, month) <= last:
+        next_year, next_month = _add_months(year, month, 1)
+        partitions.append(
+            f"PARTITION p{year}{month:02d} VALUES LESS THAN ('{next_year}-{next_month:02d}-01')"
+        )
+        year, month = next_year, next_month
+    partitions.append("PARTITION pmax VALUES LESS THAN (MAXVALUE)")
+
+    # Partitioned InnoDB tables cannot have foreign keys, and the partitioning
+    # column must belong to every unique key.
+    fk_names = [fk['name'] for fk in sa.inspect(bind).get_foreign_keys('audit_log') if fk.get('name')]
+    for name in fk_names:
+        op.drop_constraint(name, 'audit_log', type_='foreignkey')
+    op.execute("ALTER TABLE audit_log DROP PRIMARY KEY, ADD PRIMARY KEY (id, timestamp)")
+    op.execute(f"ALTER TABLE audit_log PARTITION BY RANGE COLUMNS(timestamp) ({', '.join(partitions)})")
+
+
+def upgrade():
+    with op.batch_alter_table('audit_log', schema=None) as batch_op:
+        batch_op.create_index('ix_audit_log_resource', ['resource_type', 'resource_id', 'timestamp'], unique=False)
+        batch_op.create_index('ix_audit_log_timestamp', ['timestamp'], unique=False)
+
+    bind = op.get_bind()
+    if bind.dialect.name == 'mysql':
+        _partition_audit_log(bind)
+
+
+def downgrade():
+    bind = op.get_bind()
+    if bind.dialect.name == 'mysql':
+        op.execute("ALTER TABLE audit_log REMOVE PARTITIONING")
+        op.execute("ALTER TABLE audit_log DROP PRIMARY KEY, ADD PRIMARY KEY (id)")
+        op.create_foreign_key('audit_log_ibfk_1', 'audit_log', 'user', ['user_id'], ['id'])
+
+    with op.batch_alter_table('audit_log', schema=None) as batch_op:
+        batch_op.drop_index('ix_audit_log_timestamp')
+        batch_op.drop_index('ix_audit_log_resource')
@@ -0,0 +1,58 @@
+"""add_search_index
+
+Revision ID: 9b3e6d1a4c72
+Revises: 7d2f4a9c6e13
+Create Date: 2026-10-17 09:12:37.418206
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9b3e6d1a4c72'
+down_revision = '7d2f4a9c6e13'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('search_document',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('entity_type', sa.String(length=30), nullable=False),
+    sa.Column('entity_id', sa.String(length=40), nullable=False),
+    sa.Column('title', sa.String(length=255), nullable=True),
+    sa.Column('body', sa.Text(), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('entity_type', 'entity_id', name='uq_search_document_entity')
+    )
+    op.create_table('search_token',
+    sa.Column('entity_type', sa.String(length=30), nullable=False),
+    sa.Column('entity_id', sa.String(length=40), nullable=False),
+    sa.Column('token', sa.String(length=64), nullable=False),
+    sa.Column('weight', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('entity_type', 'entity_id', 'token')
+    )
+    with op.batch_alter_table('search_token', schema=None) as batch_op:
+        batch_op.create_index('ix_search_token_lookup', ['entity_type', 'token'], unique=False)
+
+    # Native full-text engines (the service falls back to search_token without them)
+    dialect = op.get_bind().dialect.name
+    if dialect == 'mysql':
+        op.execute('ALTER TABLE search_document ADD FULLTEXT INDEX ft_search_document (title, body)')
+    elif dialect == 'sqlite':
+        try:
+            op.execute('CREATE VIRTUAL TABLE search_fts USING fts5(body)')
+        except Exception:
+            pass  # SQLite built without FTS5
+
+    # Populate with: flask setup rebuild-search-index
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'sqlite':
+        op.execute('DROP TABLE IF EXISTS search_fts')
+    with op.batch_alter_table('search_token', schema=None) as batch_op:
+        batch_op.drop_index('ix_search_token_lookup')
+    op.drop_table('search_token')
+    op.drop_table('search_document')
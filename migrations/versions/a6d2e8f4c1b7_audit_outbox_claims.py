@@ -0,0 +1,30 @@
+"""audit_outbox_claims
+
+Revision ID: a6d2e8f4c1b7
+Revises: d3a9f1c6e5b8
+Create Date: 2026-10-19 10:12:44.905213
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a6d2e8f4c1b7'
+down_revision = 'd3a9f1c6e5b8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('audit_outbox', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('claimed_by', sa.String(length=32), nullable=True))
+        batch_op.add_column(sa.Column('claimed_at', sa.DateTime(), nullable=True))
+        batch_op.create_index('ix_audit_outbox_claimed_by', ['claimed_by'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('audit_outbox', schema=None) as batch_op:
+        batch_op.drop_index('ix_audit_outbox_claimed_by')
+        batch_op.drop_column('claimed_at')
+        batch_op.drop_column('claimed_by')
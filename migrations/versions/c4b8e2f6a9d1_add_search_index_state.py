@@ -0,0 +1,29 @@
+"""add_search_index_state
+
+Revision ID: c4b8e2f6a9d1
+Revises: a6d2e8f4c1b7
+Create Date: 2026-10-20 09:41:18.532604
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c4b8e2f6a9d1'
+down_revision = 'a6d2e8f4c1b7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('search_index_state',
+    sa.Column('entity_type', sa.String(length=30), nullable=False),
+    sa.Column('backend', sa.String(length=16), nullable=False),
+    sa.Column('built_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('entity_type')
+    )
+
+
+def downgrade():
+    op.drop_table('search_index_state')
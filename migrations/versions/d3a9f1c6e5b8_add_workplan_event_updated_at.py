@@ -0,0 +1,32 @@
+"""add_workplan_event_updated_at
+
+Revision ID: d3a9f1c6e5b8
+Revises: 7c2f5e9a1b36
+Create Date: 2026-10-18 16:25:08.114392
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd3a9f1c6e5b8'
+down_revision = '7c2f5e9a1b36'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('workplan_event', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('updated_at', sa.DateTime(), nullable=True))
+
+    # Existing events take the modification date of their workplan
+    op.execute(
+        "UPDATE workplan_event SET updated_at = "
+        "(SELECT workplan.updated_at FROM workplan WHERE workplan.id = workplan_event.workplan_id)"
+    )
+
+
+def downgrade():
+    with op.batch_alter_table('workplan_event', schema=None) as batch_op:
+        batch_op.drop_column('updated_at')
@@ -0,0 +1,117 @@
+"""
+scripts/benchmark_analysis_memory.py
+====================================
+Mesure le pic de mémoire (RSS) d'une analyse en mesures répétées sur un jeu
+synthétique de 500 animaux x 100 temps, avant et après l'AnalysisFrame partagé.
+
+- « before » : enchaînement historique (copie du frame large pour les checks,
+  un pd.melt pour les checks, un pour les statistiques, un pour le graphique).
+- « after »  : un seul AnalysisFrame (melt unique, masque d'outliers partagé).
+
+Chaque mode tourne dans un processus séparé pour que les pics soient comparables.
+
+Usage :
+    python scripts/benchmark_analysis_memory.py [--animals 500] [--timepoints 100]
+"""
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import warnings
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def _rss_mb():
+    # ru_maxrss est en Ko sous Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+def _build_frame(n_animals, n_timepoints):
+    import numpy as np
+    import pandas as pd
+
+    rng = np.random.default_rng(42)
+    df = pd.DataFrame({
+        'uid': [f'A{i:04d}' for i in range(n_animals)],
+        'Genotype': rng.choice(['WT', 'KO', 'HET'], n_animals),
+        'Sex': rng.choice(['M', 'F'], n_animals),
+    })
+    timepoints = [f'Day {t}' for t in range(n_timepoints)]
+    values = rng.normal(20, 3, (n_animals, n_timepoints)) + np.arange(n_timepoints) * 0.05
+    df = pd.concat([df, pd.DataFrame(values, columns=timepoints)], axis=1)
+    return df, timepoints
+
+
+def _run(mode, n_animals, n_timepoints):
+    warnings.filterwarnings('ignore')
+    import pandas as pd
+    from app import create_app
+    from app.config import TestingConfig
+    from app.datatables.data_prepper import perform_data_checks
+    from app.datatables.plot_utils import generate_plot
+    from app.services.analysis_frame import AnalysisFrame
+    from app.services.statistics_service import StatisticsService
+
+    app = create_app(TestingConfig)
+    df, timepoints = _build_frame(n_animals, n_timepoints)
+    grouping, subject_id, test_key = ['Genotype'], 'uid', 'anova_rm_oneway'
+    extra_params = {'outlier_method': 'iqr', 'outlier_threshold': 1.5}
+    stats_service = StatisticsService()
+
+    with app.test_request_context():
+        baseline = _rss_mb()
+        if mode == 'before':
+            perform_data_checks(df.copy(), grouping, timepoints, True, subject_id, True)
+            id_vars = [subject_id] + grouping
+            df_long = pd.melt(df, id_vars=id_vars, value_vars=timepoints,
+                              var_name='_WithinFactorLevel_', value_name='_MeasurementValue_')
+            stats_res = stats_service.execute_test(df_long, test_key, '_MeasurementValue_', grouping, True,
+                                                   subject_id, True, extra_params=extra_params)
+            df_long_plot = pd.melt(df, id_vars=id_vars, value_vars=timepoints,
+                                   var_name='_WithinFactorLevel_', value_name='_MeasurementValue_')
+            generate_plot(df_long_plot, '_MeasurementValue_', grouping, 'Line Plot', False, True, subject_id,
+                          timepoints, exclude_outliers=True, stats_results=stats_res)
+        else:
+            frame = AnalysisFrame(df, subject_id, grouping, timepoints)
+            perform_data_checks(frame.checks_view(), grouping, timepoints, True, subject_id, True, analysis_frame=frame)
+            df_long = frame.long_view()
+            outlier_mask = frame.outlier_mask(df_long, '_MeasurementValue_')
+            stats_res = stats_service.execute_test(df_long, test_key, '_MeasurementValue_', grouping, True,
+                                                   subject_id, True, extra_params=extra_params, outlier_mask=outlier_mask)
+            generate_plot(df_long, '_MeasurementValue_', grouping, 'Line Plot', False, True, subject_id,
+                          timepoints, exclude_outliers=True, stats_results=stats_res, outlier_mask=outlier_mask)
+        peak = _rss_mb()
+
+    return {'mode': mode, 'baseline_mb': round(baseline, 1), 'peak_mb': round(peak, 1),
+            'analysis_mb': round(peak - baseline, 1), 'p_value': stats_res.get('p_value')}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--animals', type=int, default=500)
+    parser.add_argument('--timepoints', type=int, default=100)
+    parser.add_argument('--mode', choices=['before', 'after'], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        print(json.dumps(_run(args.mode, args.animals, args.timepoints)))
+        return
+
+    print(f"Dataset: {args.animals} animals x {args.timepoints} timepoints (repeated measures)")
+    for mode in ('before', 'after'):
+        output = subprocess.run(
+            [sys.executable, __file__, '--mode', mode, '--animals', str(args.animals), '--timepoints', str(args.timepoints)],
+            capture_output=True, text=True, check=True, env={**os.environ, 'FLASK_DEBUG': os.environ.get('FLASK_DEBUG', '1')},
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        print(f"{mode:>6}: peak RSS {result['peak_mb']:.1f} MB "
+              f"(+{result['analysis_mb']:.1f} MB during analysis, p={result['p_value']})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+"""
+scripts/benchmark_audit_diff.py
+===============================
+Micro-benchmark du diff JSON des listeners d'audit sur des payloads réalistes
+de ``row_data`` : N lignes de DataTable de K analytes (valeurs numériques,
+catégorielles et vides) dont quelques valeurs changent à chaque sauvegarde.
+
+- « deepdiff » : l'ancien chemin (DeepDiff ignore_order=True + to_json/json.loads).
+- « flat »     : _calculate_json_diff actuel (diff plat, DeepDiff seulement si imbriqué).
+
+Usage :
+    python scripts/benchmark_audit_diff.py [--rows 200] [--analytes 40] [--changes 3] [--repeat 5]
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def _build_payloads(n_rows, n_analytes, n_changes, seed=42):
+    rng = random.Random(seed)
+    analytes = [f'Analyte {i}' for i in range(n_analytes)]
+    pairs = []
+    for row in range(n_rows):
+        old = {'uid': f'A{row:04d}'}
+        for j, name in enumerate(analytes):
+            if j % 10 == 0:
+                old[name] = rng.choice(['WT', 'KO', 'HET'])
+            elif j % 13 == 0:
+                old[name] = None
+            else:
+                old[name] = round(rng.gauss(20, 3), 3)
+        new = dict(old)
+        for name in rng.sample(analytes, n_changes):
+            value = old[name]
+            new[name] = round(value + 1.5, 3) if isinstance(value, float) else 'KO'
+        if row % 20 == 0:
+            new['Comment'] = 'added during review'
+        pairs.append((old, new))
+    return pairs
+
+
+def _deepdiff_path(old, new):
+    from deepdiff import DeepDiff
+    diff = DeepDiff(old, new, ignore_order=True)
+    return json.loads(diff.to_json()) if diff else None
+
+
+def _time(func, pairs, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for old, new in pairs:
+            func(old, new)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=200)
+    parser.add_argument('--analytes', type=int, default=40)
+    parser.add_argument('--changes', type=int, default=3)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    from app.services.audit_service import _calculate_json_diff
+
+    pairs = _build_payloads(args.rows, args.analytes, args.changes)
+    results = {'flat': _time(_calculate_json_diff, pairs, args.repeat)}
+    try:
+        results['deepdiff'] = _time(_deepdiff_path, pairs, args.repeat)
+    except ImportError:
+        print("deepdiff n'est pas installé : seul le diff plat est mesuré.")
+
+    print(f"{args.rows} lignes x {args.analytes} analytes, {args.changes} valeurs modifiées par ligne "
+          f"(meilleur de {args.repeat})")
+    for mode, seconds in results.items():
+        print(f"  {mode:<9} {seconds * 1000:8.2f} ms  ({seconds / args.rows * 1e6:7.1f} µs/ligne)")
+    if 'deepdiff' in results:
+        print(f"  accélération x{results['deepdiff'] / results['flat']:.1f}")
+
+
+if __name__ == '__main__':
+    main()
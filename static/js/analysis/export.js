@@ -16,6 +16,9 @@ const Export = {
         const element = document.getElementById('show-results-stage');
         if (!element) return;
 
+        // Lazily loaded result panels must be in the DOM before printing
+        if (typeof AnalysisPanels !== 'undefined') await AnalysisPanels.loadAll();
+
         // --- 1. Preparation: Expand all accordions ---
         const accordions = element.querySelectorAll('.accordion-collapse');
         const originalStates = [];
@@ -0,0 +1,55 @@
+/**
+ * static/js/analysis/panels.js
+ * Lazy loading of stored (async) analysis result panels
+ */
+
+const AnalysisPanels = {
+    init: function () {
+        const root = document.getElementById('show-results-stage');
+        if (!root || !root.querySelector('.analysis-lazy-panel')) return;
+
+        // Load panels when their accordion item is opened, and the ones already open now
+        root.querySelectorAll('.accordion-collapse').forEach(collapse => {
+            collapse.addEventListener('show.bs.collapse', () => this.loadWithin(collapse));
+            if (collapse.classList.contains('show')) this.loadWithin(collapse);
+        });
+    },
+
+    loadWithin: function (container) {
+        const placeholders = container.querySelectorAll('.analysis-lazy-panel:not([data-loaded])');
+        return Promise.all(Array.from(placeholders).map(el => this.load(el)));
+    },
+
+    loadAll: function () {
+        const root = document.getElementById('show-results-stage');
+        return root ? this.loadWithin(root) : Promise.resolve();
+    },
+
+    load: function (el) {
+        if (el._loading) return el._loading;
+        el._loading = fetch(el.dataset.panelUrl)
+            .then(response => response.json())
+            .then(data => {
+                if (data.error) {
+                    el.innerHTML = `<div class="alert alert-warning mb-0">${data.error}</div>`;
+                    return;
+                }
+                el.innerHTML = data.html;
+                el.dataset.loaded = 'true';
+                el.querySelectorAll('.plotly-graph-div[data-graph-json]').forEach(div => {
+                    Plots.render(div.id, div.dataset.graphJson);
+                });
+                if (window.bootstrap) {
+                    el.querySelectorAll('[data-bs-toggle="popover"]').forEach(p => new bootstrap.Popover(p));
+                }
+            })
+            .catch(err => {
+                el.innerHTML = `<div class="alert alert-danger mb-0">Failed to load results: ${err.message}</div>`;
+            });
+        return el._loading;
+    }
+};
+
+document.addEventListener('DOMContentLoaded', () => {
+    AnalysisPanels.init();
+});
@@ -262,6 +262,9 @@ document.addEventListener('DOMContentLoaded', function () {
                         clearInterval(pollInterval);
                         alert("Analysis Failed: " + data.status);
                         resetExecuteBtn();
+                    } else if (data.state === 'PROGRESS') {
+                        // Per-parameter progress reported by the worker
+                        if (executeBtn) executeBtn.innerHTML = '<span class="spinner-border spinner-border-sm" role="status" aria-hidden="true"></span> ' + data.status;
                     } else {
                         // Still pending...
                         if (executeBtn) executeBtn.innerHTML = '<span class="spinner-border spinner-border-sm" role="status" aria-hidden="true"></span> ' + CONFIG.i18n.analyzing + '...';
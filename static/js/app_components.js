@@ -836,6 +836,7 @@ document.addEventListener('alpine:init', () => {
         templates: [],
         pipelines: [],
         isProcessing: false,
+        importProgress: null,
 
         urls: config.urls || {},
         i18n: config.i18n || {},
@@ -966,13 +967,28 @@ document.addEventListener('alpine:init', () => {
 
                 if (!response.ok) throw new Error(await response.text());
 
-                const result = await response.json();
+                let result = await response.json();
+                if (response.status === 202) result = await this.pollImport(result.status_url);
                 alert(result.message);
                 window.location.reload();
             } catch (e) {
                 alert('Final import failed: ' + e.message);
             } finally {
                 this.isProcessing = false;
+                this.importProgress = null;
+            }
+        },
+
+        async pollImport(statusUrl) {
+            // Background import: expose per-chunk progress until the task finishes
+            while (true) {
+                await new Promise(resolve => setTimeout(resolve, 1000));
+                const response = await fetch(statusUrl);
+                if (!response.ok) throw new Error(await response.text());
+                const status = await response.json();
+                if (status.state === 'SUCCESS') return status;
+                if (status.state === 'FAILURE') throw new Error(status.message);
+                if (status.state === 'PROGRESS') this.importProgress = { done: status.done, total: status.total };
             }
         }
     }));
@@ -79,6 +79,8 @@ document.addEventListener('DOMContentLoaded', function () {
     });
 
     // --- DataTable ---
+    // Keyset cursor of the page after the last one drawn (ignored by the server if filters/sort changed)
+    let nextCursor = null;
     const table = $('#datatablesServerTable').DataTable({
         "processing": true,
         "serverSide": true,
@@ -97,6 +99,13 @@ document.addEventListener('DOMContentLoaded', function () {
                 d.protocol_id = $('#protocol_filter').val();
                 d.date_from = $('#date_from').val();
                 d.date_to = $('#date_to').val();
+                if (nextCursor) {
+                    d.cursor = nextCursor;
+                }
+            },
+            "dataSrc": function (json) {
+                nextCursor = json.next_cursor || null;
+                return json.data;
             }
         },
         "columns": [
@@ -192,19 +201,25 @@ document.addEventListener('DOMContentLoaded', function () {
     });
 
     // --- Batch Actions ---
-    function submitBatchForm(url) {
+    function submitBatchForm(url, fileFormat) {
         const form = $('#batchDownloadForm');
         form.attr('action', url);
-        form.find('input[name="selected_datatable_ids[]"]').remove(); // Clear old
+        form.find('input[name="selected_datatable_ids[]"], input[name="file_format"]').remove(); // Clear old
 
         selectedIds.forEach(id => {
             form.append(`<input type="hidden" name="selected_datatable_ids[]" value="${id}">`);
         });
+        if (fileFormat) form.append(`<input type="hidden" name="file_format" value="${fileFormat}">`);
         form.submit();
     }
 
     $('#btnDownloadMerged').on('click', () => submitBatchForm(CONFIG.urls.downloadMerged));
     $('#btnDownloadTransposed').on('click', () => submitBatchForm(CONFIG.urls.downloadTransposed));
+    $('.btn-download-columnar').on('click', function (e) {
+        e.preventDefault();
+        const url = $(this).data('target') === 'transposed' ? CONFIG.urls.downloadTransposed : CONFIG.urls.downloadMerged;
+        submitBatchForm(url, $(this).data('format'));
+    });
 
     // Analyze (GET request usually, or POST with redirect)
     $('#btnAnalyzeBatch').on('click', () => submitBatchForm(CONFIG.urls.analyzeBatch));
@@ -21,6 +21,9 @@ export class ConcatenationPage {
         document.getElementById('load-concatenation-btn')?.addEventListener('click', () => this.loadConcatenatedData());
         document.getElementById('global-measurement-select')?.addEventListener('change', () => this.updateGlobalToolInputs());
         document.getElementById('export-concatenated-btn')?.addEventListener('click', () => this.exportConcatenated());
+        document.querySelectorAll('.export-concatenated-columnar').forEach(btn => {
+            btn.addEventListener('click', () => this.exportConcatenated(btn.dataset.format));
+        });
 
         // Group switch for graph
         document.getElementById('group-by-treatment-switch')?.addEventListener('change', () => {
@@ -108,6 +111,7 @@ export class ConcatenationPage {
         document.getElementById('graph-container').style.display = 'block';
         document.getElementById('concatenation-placeholder').style.display = 'none';
         document.getElementById('export-concatenated-btn').disabled = false;
+        document.querySelectorAll('.export-concatenated-columnar').forEach(btn => { btn.disabled = false; });
     }
 
     renderTable(selectedAnalyteNames) {
@@ -286,7 +290,7 @@ export class ConcatenationPage {
         // No-op for now, just clears previous state if needed
     }
 
-    exportConcatenated() {
+    exportConcatenated(fileFormat = 'xlsx') {
         // Use the filtered data if possible, or just dump everything?
         // The API export_concatenated uses the posted body.
         // ConcatenationManager sent `this.concatenatedData`. 
@@ -298,7 +302,7 @@ export class ConcatenationPage {
                 'Content-Type': 'application/json',
                 'X-CSRFToken': this.config.csrfToken
             },
-            body: JSON.stringify({ concatenated_data: this.concatenatedData })
+            body: JSON.stringify({ concatenated_data: this.concatenatedData, file_format: fileFormat })
         })
             .then(response => {
                 if (!response.ok) throw new Error('Export failed');
@@ -308,7 +312,7 @@ export class ConcatenationPage {
                 const url = window.URL.createObjectURL(blob);
                 const a = document.createElement('a');
                 a.href = url;
-                a.download = `concatenated_analytes_${this.config.groupId}.xlsx`;
+                a.download = `concatenated_analytes_${this.config.groupId}.${fileFormat}`;
                 document.body.appendChild(a);
                 a.click();
                 window.URL.revokeObjectURL(url);
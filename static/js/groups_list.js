@@ -101,7 +101,7 @@ document.addEventListener('DOMContentLoaded', function () {
         { "data": "project_name" },
         { "data": "team_name" },
         { "data": "model_name" },
-        { "data": "animal_count", "defaultContent": "0", "orderable": false, "className": "text-center" },
+        { "data": "animal_count", "defaultContent": "0", "className": "text-center" },
         {
             "data": "is_archived",
             "render": function (data, type, row) {
@@ -112,6 +112,8 @@ document.addEventListener('DOMContentLoaded', function () {
         { "data": "actions", "orderable": false, "searchable": false, "className": "text-end no-row-click" }
     ];
 
+    // Keyset cursor of the page after the last one drawn (ignored by the server if filters/sort changed)
+    let nextCursor = null;
     const table = $('#groupsServerTable').DataTable({
         "processing": true,
         "serverSide": true,
@@ -125,9 +127,13 @@ document.addEventListener('DOMContentLoaded', function () {
                 d.team_id = $('#team_filter').val();
                 d.model_id = $('#model_filter').val();
                 d.is_archived = $('#status_filter').val();
+                if (nextCursor) {
+                    d.cursor = nextCursor;
+                }
             },
             "dataSrc": function (json) {
                 totalRecordsFiltered = json.recordsFiltered;
+                nextCursor = json.next_cursor || null;
                 return json.data;
             }
         },
@@ -554,7 +554,8 @@ document.addEventListener('DOMContentLoaded', function () {
 
             if (!resp.ok) throw new Error(await resp.text());
 
-            const result = await resp.json();
+            let result = await resp.json();
+            if (resp.status === 202) result = await pollImport(result.status_url);
             alert(result.message);
             window.location.reload();
         } catch (e) {
@@ -564,6 +565,21 @@ document.addEventListener('DOMContentLoaded', function () {
         }
     }
 
+    async function pollImport(statusUrl) {
+        // Background import: show per-chunk progress until the task finishes
+        while (true) {
+            await new Promise(resolve => setTimeout(resolve, 1000));
+            const resp = await fetch(statusUrl, { headers: getHeaders() });
+            if (!resp.ok) throw new Error(await resp.text());
+            const status = await resp.json();
+            if (status.state === 'SUCCESS') return status;
+            if (status.state === 'FAILURE') throw new Error(status.message);
+            if (status.state === 'PROGRESS') {
+                finalizeBtn.innerHTML = `<span class="spinner-border spinner-border-sm"></span> Importing... ${status.done}/${status.total}`;
+            }
+        }
+    }
+
     function goToStep(step) {
         currentStep = step;
         document.querySelectorAll('.import-step').forEach((el, idx) => {
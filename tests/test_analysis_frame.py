@@ -0,0 +1,65 @@
+# tests/test_analysis_frame.py
+"""
+Tests de l'AnalysisFrame partagé entre checks, statistiques et graphiques.
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.services.analysis_frame import AnalysisFrame
+
+
+@pytest.fixture
+def wide_df():
+    """Six animaux, deux génotypes, trois temps ; une valeur aberrante à D2."""
+    return pd.DataFrame({
+        'uid': [f'A{i}' for i in range(6)],
+        'Genotype': ['WT', 'KO'] * 3,
+        'Sex': ['M', 'M', 'M', 'F', 'F', 'F'],
+        'Cov': [1.0, 2.0, 3.0, 4.0, 5.0, 6.0],
+        'D1': [10.0, 11.0, 10.5, 11.5, 10.2, 11.2],
+        'D2': [12.0, 12.5, 12.2, 99.0, 12.1, 12.4],
+        'D3': ['13', '14', None, '13.5', '14.5', '13.8'],
+    })
+
+
+def test_long_view_is_melted_once_and_split_by_rows(wide_df):
+    """
+    GIVEN un AnalysisFrame avec un paramètre de split
+    WHEN la vue longue est demandée globalement puis par niveau de split
+    THEN le melt n'est fait qu'une fois et chaque niveau est un filtre de lignes.
+    """
+    frame = AnalysisFrame(wide_df, 'uid', ['Genotype'], ['D1', 'D2', 'D3'], extra_cols=['Sex'])
+
+    long_df = frame.long_view()
+    assert frame.long_view() is long_df
+    assert len(long_df) == 18
+    assert pd.api.types.is_numeric_dtype(long_df['_MeasurementValue_'])
+
+    males = frame.long_view('Sex', 'M')
+    expected = pd.melt(wide_df[wide_df['Sex'] == 'M'], id_vars=['uid', 'Genotype', 'Sex'],
+                       value_vars=['D1', 'D2', 'D3'], var_name='_WithinFactorLevel_', value_name='_MeasurementValue_')
+    assert males['uid'].tolist() == expected['uid'].tolist()
+    assert males['_WithinFactorLevel_'].tolist() == expected['_WithinFactorLevel_'].tolist()
+    assert frame.long_view('Sex', 'M') is males
+
+
+def test_parameter_view_and_shared_outlier_mask(wide_df):
+    """
+    GIVEN un AnalysisFrame
+    WHEN la vue d'un paramètre et son masque d'outliers sont demandés
+    THEN la vue ne contient que les colonnes utiles et le masque est calculé une seule fois.
+    """
+    frame = AnalysisFrame(wide_df, 'uid', ['Genotype'], ['D1', 'D2', 'Cov'], extra_cols=['Cov'])
+
+    view = frame.parameter_view('D2')
+    assert list(view.columns) == ['uid', 'Genotype', 'Cov', 'D2']
+    assert frame.parameter_view('D2') is view
+
+    mask = frame.outlier_mask(view, 'D2')
+    assert mask.tolist() == [False, False, False, True, False, False]
+    assert frame.outlier_mask(view, 'D2') is mask
+
+    # Une colonne à la fois mesurée et « extra » reste une valeur dans le format long
+    assert 'Cov' in set(frame.long_view()['_WithinFactorLevel_'])
+    assert np.isclose(frame.long_view()['_MeasurementValue_'].sum(), wide_df[['D1', 'D2', 'Cov']].sum().sum())
@@ -0,0 +1,104 @@
+# tests/test_analysis_result_store.py
+"""
+Tests du store de résultats d'analyse asynchrone (AnalysisResultStoreService)
+et des routes qui l'utilisent (statut de tâche, chargement paresseux des panneaux).
+"""
+import pytest
+
+from app.services.analysis_result_store import AnalysisResultStoreService
+
+
+@pytest.fixture
+def result_store(test_app, tmp_path):
+    test_app.config['ANALYSIS_RESULTS_DIR'] = str(tmp_path)
+    test_app.extensions.pop('analysis_result_store', None)
+    yield
+    test_app.config['ANALYSIS_RESULTS_DIR'] = None
+    test_app.extensions.pop('analysis_result_store', None)
+
+
+def _sample_results():
+    return {
+        'overall_notes': ['note'],
+        'results_by_parameter': {
+            'Weight': {
+                'graph_data': '{"data": [], "layout": {"title": "Weight"}}',
+                'summary_table_html': '<table><tr><td>big table</td></tr></table>',
+                'statistical_results': {'test': 'ANOVA', 'p_value': 0.01, 'error': None, 'results_data': {}},
+            },
+        },
+    }
+
+
+def test_save_splits_summary_and_panels(test_app, result_store):
+    """
+    GIVEN un résultat d'analyse avec un panneau par paramètre
+    WHEN il est sauvegardé dans le store
+    THEN le résumé ne contient que des stubs et le panneau complet est chargé séparément.
+    """
+    with test_app.app_context():
+        store = AnalysisResultStoreService()
+        store.save('task-1', _sample_results(), user_id=7)
+
+        summary = store.load_summary('task-1', user_id=7)
+        stub = summary['results_by_parameter']['Weight']
+        assert summary['result_ref'] == 'task-1'
+        assert stub == {'panel_id': 'p0', 'statistical_results': {'test': 'ANOVA', 'error': None}}
+
+        panel = store.load_panel('task-1', 'p0', user_id=7)
+        assert panel['result_key'] == 'Weight'
+        assert 'big table' in panel['results_data']['summary_table_html']
+
+        # Un autre utilisateur ne voit pas les résultats
+        assert store.load_summary('task-1', user_id=8) is None
+        assert store.load_panel('task-1', 'p0', user_id=8) is None
+
+
+def test_ownerless_results_are_only_readable_by_super_admins(test_app, result_store):
+    """
+    GIVEN un résultat sauvegardé sans propriétaire
+    WHEN un utilisateur quelconque puis un super admin le demandent
+    THEN seul le super admin peut le lire.
+    """
+    with test_app.app_context():
+        store = AnalysisResultStoreService()
+        store.save('task-3', _sample_results(), user_id=None)
+
+        assert store.load_summary('task-3', user_id=7) is None
+        assert store.load_summary('task-3', user_id=None) is None
+        assert store.load_panel('task-3', 'p0', user_id=7) is None
+        assert store.load_summary('task-3', user_id=7, is_super_admin=True)['result_ref'] == 'task-3'
+        assert store.load_panel('task-3', 'p0', user_id=7, is_super_admin=True)['result_key'] == 'Weight'
+
+
+def test_status_stores_only_reference_in_session(test_app, logged_in_client, result_store, monkeypatch):
+    """
+    GIVEN une tâche terminée (résultat hérité, sans référence)
+    WHEN le statut est interrogé
+    THEN le résultat part dans le store et la session ne contient que l'id de tâche.
+    """
+    from app.datatables import routes_analysis
+
+    class FakeResult:
+        state = 'SUCCESS'
+        result = _sample_results()
+
+        def __init__(self, task_id):
+            pass
+
+    monkeypatch.setattr(routes_analysis, 'AsyncResult', FakeResult)
+
+    response = logged_in_client.get('/datatables/analysis/status/task-2')
+    assert response.get_json()['state'] == 'SUCCESS'
+
+    with logged_in_client.session_transaction() as sess:
+        assert sess['latest_analysis_result_ref'] == 'task-2'
+        assert 'latest_analysis_results' not in sess
+
+    panel_response = logged_in_client.get('/datatables/analysis/results/task-2/panels/p0')
+    assert panel_response.status_code == 200
+    html = panel_response.get_json()['html']
+    assert 'big table' in html
+    assert 'data-graph-json' in html
+
+    assert logged_in_client.get('/datatables/analysis/results/task-2/panels/p9').status_code == 404
@@ -227,6 +227,43 @@ def test_prepare_dataframe_empty_datatable(test_app, db_session, analysis_servic
     assert len(df) == 0
 
 
+def test_prepare_dataframe_contract_and_types(test_app, db_session, analysis_service, analysis_setup):
+    """
+    GIVEN une DataTable avec un analyte FLOAT (Weight) et un analyte TEXT (Genotype)
+    WHEN prepare_dataframe est appelé
+    THEN il retourne (df, numériques, catégorielles) typés d'après Analyte.data_type.
+    """
+    with test_app.app_context():
+        dt = analysis_setup['data_table']
+        df, numerical_cols, categorical_cols = analysis_service.prepare_dataframe(dt)
+
+    assert 'Weight' in numerical_cols
+    assert 'age_days' in numerical_cols
+    assert 'id' not in numerical_cols
+    assert categorical_cols == ['Genotype'] or 'Genotype' not in df.columns
+    assert df['Weight'].dtype.kind == 'f'
+    assert df['id'].tolist() == sorted(df['id'].tolist())
+
+
+def test_prepare_dataframe_text_analyte_stays_categorical(test_app, db_session, analysis_service, analysis_setup):
+    """
+    GIVEN un analyte TEXT dont les valeurs ressemblent à des nombres
+    WHEN prepare_dataframe est appelé
+    THEN la colonne reste catégorielle.
+    """
+    with test_app.app_context():
+        dt = analysis_setup['data_table']
+        for row, code in zip(dt.experiment_rows.all(), ['1', '2', '3']):
+            row.row_data = {**row.row_data, 'Genotype': code}
+        db_session.flush()
+
+        df, numerical_cols, categorical_cols = analysis_service.prepare_dataframe(dt)
+
+    assert 'Genotype' in categorical_cols
+    assert 'Genotype' not in numerical_cols
+    assert sorted(df['Genotype'].tolist()) == ['1', '2', '3']
+
+
 # ---------------------------------------------------------------------------
 # Tests d'intégration AnalysisService + StatisticsService
 # ---------------------------------------------------------------------------
@@ -259,3 +296,79 @@ def test_full_analysis_pipeline(test_app, db_session, analysis_service, analysis
     assert result is not None
     assert isinstance(result, dict)
     assert result['error'] is None
+
+
+def _units_form_data(splitting_param=None):
+    return {
+        'grouping_params': ['Genotype'],
+        'numerical_params': ['Weight', 'Length'],
+        'chosen_tests': {'Weight': 'summary_only', 'Length': 'summary_only'},
+        'analysis_stage': 'execute',
+        'splitting_param': splitting_param,
+    }
+
+
+@pytest.mark.parametrize('splitting_param', [None, 'Sex'])
+def test_parameter_units_keep_order_and_report_progress(test_app, analysis_service, splitting_param):
+    """
+    GIVEN un DataFrame avec deux paramètres numériques
+    WHEN perform_analysis est exécuté (avec ou sans paramètre de découpage)
+    THEN les résultats suivent l'ordre des paramètres et la progression est rapportée par unité.
+    """
+    import pandas as pd
+
+    df = pd.DataFrame({
+        'uid': [f'A{i}' for i in range(8)],
+        'Genotype': ['WT', 'KO'] * 4,
+        'Sex': ['M'] * 4 + ['F'] * 4,
+        'Weight': [20.0, 22.5, 21.0, 23.5, 19.5, 24.0, 20.5, 22.0],
+        'Length': [9.0, 9.5, 8.5, 10.0, 9.2, 9.8, 8.8, 10.1],
+    })
+    progress = []
+    with test_app.test_request_context():
+        results = analysis_service.perform_analysis(
+            df, _units_form_data(splitting_param), 'uid', True, ['Weight', 'Length'], ['Genotype', 'Sex'],
+            progress_callback=lambda done, total, label: progress.append((done, total)),
+        )
+
+    assert list(results['results_by_parameter']) == ['Weight', 'Length']
+    expected_units = 4 if splitting_param else 2
+    assert progress == [(i, expected_units) for i in range(1, expected_units + 1)]
+    if splitting_param:
+        splits = results['results_by_parameter']['Weight']['splits']
+        assert [s['split_label'] for s in splits] == ['Sex: F', 'Sex: M']
+
+
+def test_parameter_units_fan_out_under_worker_cap(test_app, analysis_service, monkeypatch):
+    """
+    GIVEN cinq unités de paramètre et ANALYSIS_MAX_WORKERS = 2
+    WHEN elles sont exécutées
+    THEN jamais plus de deux ne tournent en même temps et les résultats gardent l'ordre des paramètres.
+    """
+    import threading
+    import time
+
+    lock = threading.Lock()
+    running, peak = [0], [0]
+
+    def fake_unit(frame, unit, shared):
+        with lock:
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+        # Les premières unités finissent en dernier
+        time.sleep(0.02 * (5 - unit['index']))
+        with lock:
+            running[0] -= 1
+        return {'param': unit['param']}
+
+    monkeypatch.setattr(analysis_service, '_analyze_parameter_unit', fake_unit)
+    monkeypatch.setitem(test_app.config, 'ANALYSIS_MAX_WORKERS', 2)
+    units = [{'index': i, 'param': f'P{i}', 'split_param': None, 'split_value': None} for i in range(5)]
+    progress = []
+    with test_app.test_request_context():
+        results = analysis_service._run_parameter_units(
+            None, units, {}, progress_callback=lambda done, total, label: progress.append(done))
+
+    assert [r['param'] for r in results] == ['P0', 'P1', 'P2', 'P3', 'P4']
+    assert peak[0] == 2
+    assert progress == [1, 2, 3, 4, 5]
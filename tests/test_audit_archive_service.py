@@ -0,0 +1,84 @@
+# tests/test_audit_archive_service.py
+"""
+Tests des tiers de stockage de l'audit : archivage mensuel chaîné et requêtes
+couvrant la table vivante et les archives.
+"""
+import gzip
+import json
+import os
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app.models import AuditLog
+from app.services.audit_archive_service import AuditArchiveService, add_months
+
+
+@pytest.fixture
+def audit_history(db_session, init_database):
+    """Deux entrées en janvier 2020, une en février 2020 et une récente, sur le même projet."""
+    user = init_database['team1_admin']
+    entries = [
+        AuditLog(user_id=user.id, action='INSERT', resource_type='ArchiveProbe', resource_id='1',
+                 changes={'name': 'a'}, timestamp=datetime(2020, 1, 5, 10, 0)),
+        AuditLog(user_id=user.id, action='UPDATE', resource_type='ArchiveProbe', resource_id='1',
+                 changes={'name': {'old': 'a', 'new': 'b'}}, timestamp=datetime(2020, 1, 20, 9, 30)),
+        AuditLog(user_id=None, action='UPDATE', resource_type='ArchiveProbe', resource_id='1',
+                 changes={'name': {'old': 'b', 'new': 'c'}}, timestamp=datetime(2020, 2, 2, 8, 0)),
+        AuditLog(user_id=user.id, action='UPDATE', resource_type='ArchiveProbe', resource_id='1',
+                 changes={'name': {'old': 'c', 'new': 'd'}}, timestamp=datetime.utcnow()),
+    ]
+    db_session.add_all(entries)
+    db_session.commit()
+    return entries
+
+
+def test_month_arithmetic():
+    assert add_months(202011, 2) == 202101
+    assert add_months(202101, -1) == 202012
+
+
+def test_archive_and_query_across_tiers(test_app, db_session, audit_history, tmp_path):
+    """
+    GIVEN des entrées d'audit anciennes et récentes
+    WHEN les mois antérieurs à mars 2020 sont archivés
+    THEN ils quittent la base, la chaîne se vérifie et la requête couvre toujours tout l'historique.
+    """
+    service = AuditArchiveService(archive_dir=str(tmp_path))
+
+    assert service.archive(before_month=202003) == [202001, 202002]
+    assert service.archived_months() == [202001, 202002]
+    assert service.read_manifest(202002)['previous_hash'] == service.read_manifest(202001)['final_hash']
+    assert service.verify_archives() == []
+    assert AuditLog.query.filter_by(resource_type='ArchiveProbe').count() == 1
+
+    records = service.query(resource_type='ArchiveProbe', resource_id='1')
+    assert [r.changes['name'] if r.action == 'INSERT' else r.changes['name']['new'] for r in records] == ['d', 'c', 'b', 'a']
+    assert records[-1].user is not None and records[1].user is None
+
+    # Une page servie par la table vivante ne lit pas les archives
+    assert len(service.query(resource_type='ArchiveProbe', limit=1)) == 1
+    january = service.query(resource_type='ArchiveProbe', start=datetime(2020, 1, 1), end=datetime(2020, 2, 1))
+    assert [r.action for r in january] == ['UPDATE', 'INSERT']
+    # Bornes ISO avec fuseau (API admin) : converties en UTC naïf
+    paris = timezone(timedelta(hours=1))
+    january_tz = service.query(resource_type='ArchiveProbe', start=datetime(2020, 1, 1, 1, tzinfo=paris),
+                               end=datetime(2020, 2, 1, 1, tzinfo=paris))
+    assert [r.action for r in january_tz] == ['UPDATE', 'INSERT']
+
+
+def test_verify_detects_tampered_archive(test_app, db_session, audit_history, tmp_path):
+    """Une entrée archivée modifiée casse la chaîne de hachage."""
+    service = AuditArchiveService(archive_dir=str(tmp_path))
+    service.archive(before_month=202003)
+
+    path = os.path.join(str(tmp_path), service.read_manifest(202001)['file'])
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        lines = [json.loads(line) for line in f]
+    lines[1]['changes'] = {'name': {'old': 'a', 'new': 'forged'}}
+    with gzip.open(path, 'wt', encoding='utf-8') as f:
+        for entry in lines:
+            f.write(json.dumps(entry, sort_keys=True, separators=(',', ':')) + '\n')
+
+    problems = dict(service.verify_archives())
+    assert problems[202001] in ('file checksum mismatch', 'entry hash chain mismatch')
@@ -6,7 +6,7 @@ import pytest
 from flask_login import login_user
 
 from app.extensions import db
-from app.models import AuditLog, Project, User, Role
+from app.models import AuditLog, AuditOutbox, Project, User, Role
 from tests.conftest import login
 
 
@@ -64,3 +64,168 @@ def test_audit_log_creation(logged_in_client, db_session, init_database):
     ).first()
 
     assert delete_log is not None, "Un log DELETE doit être créé lors de la suppression d'un Project"
+
+
+@pytest.fixture
+def statement_log(test_app):
+    """Enregistre (sql, executemany) pour chaque requête émise par le moteur."""
+    from sqlalchemy import event
+    statements = []
+
+    def _record(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, executemany))
+
+    event.listen(db.engine, 'before_cursor_execute', _record)
+    yield statements
+    event.remove(db.engine, 'before_cursor_execute', _record)
+
+
+def test_audit_entries_batched_per_flush(db_session, init_database, statement_log):
+    """
+    GIVEN trois projets chargés
+    WHEN leurs noms sont modifiés puis flushés ensemble
+    THEN les logs UPDATE sont écrits par un seul executemany, dans l'ordre, sans relire les lignes.
+    """
+    team1, owner = init_database['team1'], init_database['team1_admin']
+    projects = [Project(name=f"Batch Audit {i}", slug=f"batch-audit-{i}", team_id=team1.id, owner_id=owner.id)
+                for i in range(3)]
+    db_session.add_all(projects)
+    db_session.flush()
+
+    statement_log.clear()
+    for project in projects:
+        project.name = project.name + " v2"
+    db_session.flush()
+
+    audit_inserts = [(sql, many) for sql, many in statement_log if sql.startswith('INSERT INTO audit_log')]
+    assert audit_inserts == [(audit_inserts[0][0], True)]
+    assert not [sql for sql, _ in statement_log if sql.startswith('SELECT') and 'FROM project' in sql]
+
+    logs = AuditLog.query.filter(
+        AuditLog.resource_type == 'Project', AuditLog.action == 'UPDATE',
+        AuditLog.resource_id.in_([str(p.id) for p in projects]),
+    ).order_by(AuditLog.id).all()
+    assert [log.resource_id for log in logs] == [str(p.id) for p in projects]
+    assert logs[0].changes['name'] == {'old': "Batch Audit 0", 'new': "Batch Audit 0 v2"}
+
+
+def test_drain_outbox_waits_for_live_drain_and_takes_over_stale_claims(db_session, init_database):
+    """
+    GIVEN trois entrées d'outbox : libre, réclamée à l'instant par un autre drain, réclamée par un drain planté
+    WHEN drain_audit_outbox est exécuté, puis de nouveau une fois la réclamation de l'autre drain expirée
+    THEN rien n'est copié tant que l'autre drain est actif, puis tout est copié dans l'ordre de l'outbox.
+    """
+    from datetime import datetime, timedelta
+
+    from app.services.audit_service import drain_audit_outbox
+
+    now = datetime.utcnow()
+    claims = {'free': (None, None), 'busy': ('other', now), 'stale': ('crashed', now - timedelta(hours=1))}
+    for name, (claimed_by, claimed_at) in claims.items():
+        db_session.add(AuditOutbox(action='UPDATE', resource_type='OutboxTest', resource_id=name,
+                                   timestamp=now, claimed_by=claimed_by, claimed_at=claimed_at))
+    db_session.commit()
+
+    assert drain_audit_outbox(batch_size=10) == 0
+    assert AuditLog.query.filter_by(resource_type='OutboxTest').count() == 0
+
+    AuditOutbox.query.filter_by(resource_id='busy').update({'claimed_at': now - timedelta(hours=1)})
+    db_session.commit()
+    assert drain_audit_outbox(batch_size=10) == 3
+
+    copied = AuditLog.query.filter_by(resource_type='OutboxTest').order_by(AuditLog.id).all()
+    assert [log.resource_id for log in copied] == ['free', 'busy', 'stale']
+    assert AuditOutbox.query.filter_by(resource_type='OutboxTest').count() == 0
+
+
+def test_concurrent_drains_keep_outbox_order(db_session, init_database, monkeypatch):
+    """
+    GIVEN quatre entrées d'outbox drainées par lots de deux
+    WHEN un second drain démarre pendant que le premier copie son premier lot
+    THEN le second s'efface et audit_log reçoit les entrées dans l'ordre de l'outbox.
+    """
+    from datetime import datetime
+
+    from app.services import audit_service
+
+    now = datetime.utcnow()
+    for i in range(4):
+        db_session.add(AuditOutbox(action='UPDATE', resource_type='OutboxOrder', resource_id=str(i), timestamp=now))
+    db_session.commit()
+
+    execute = db.session.execute
+    second_drain = []
+
+    def _execute(statement, *args, **kwargs):
+        # Right after the first drain committed its claim, before it copies the batch
+        if not second_drain and 'claimed_by =' in str(statement) and str(statement).lstrip().startswith('SELECT'):
+            second_drain.append(None)
+            second_drain[0] = audit_service.drain_audit_outbox(batch_size=2)
+        return execute(statement, *args, **kwargs)
+
+    monkeypatch.setattr(db.session, 'execute', _execute)
+    moved = audit_service.drain_audit_outbox(batch_size=2)
+
+    assert second_drain == [0] and moved == 4
+    copied = AuditLog.query.filter_by(resource_type='OutboxOrder').order_by(AuditLog.id).all()
+    assert [log.resource_id for log in copied] == ['0', '1', '2', '3']
+
+
+def test_audit_in_place_json_change_reads_original(db_session, init_database):
+    """
+    GIVEN une ligne de DataTable dont row_data est modifié en place (flag_modified)
+    WHEN la modification est flushée
+    THEN l'ancienne valeur est relue en base et le diff n'est pas vide.
+    """
+    from sqlalchemy.orm.attributes import flag_modified
+
+    from app.models import Animal, DataTable, ExperimentDataRow, ProtocolModel
+
+    protocol = ProtocolModel(name='Audit Protocol')
+    db_session.add(protocol)
+    db_session.flush()
+    dt = DataTable(group_id=init_database['group1'].id, protocol_id=protocol.id,
+                   date='2024-03-01', creator_id=init_database['team1_admin'].id)
+    db_session.add(dt)
+    db_session.flush()
+    animal = Animal(uid='AUDIT_1', display_id='A1', group_id=init_database['group1'].id, status='alive')
+    db_session.add(animal)
+    db_session.flush()
+    row = ExperimentDataRow(data_table_id=dt.id, animal_id=animal.id, row_data={'Weight': 20.0})
+    db_session.add(row)
+    db_session.flush()
+
+    row.row_data['Weight'] = 21.5
+    flag_modified(row, 'row_data')
+    db_session.flush()
+
+    log = AuditLog.query.filter_by(resource_type='ExperimentDataRow', resource_id=str(row.id),
+                                   action='UPDATE').one()
+    assert 'row_data' in log.changes
+    assert '20.0' in str(log.changes['row_data']) and '21.5' in str(log.changes['row_data'])
+
+
+def test_flat_json_diff_reports_keys_directly():
+    """
+    GIVEN deux row_data plats
+    WHEN le diff d'audit est calculé
+    THEN les clés modifiées, ajoutées, supprimées et les changements de type sont listés sans DeepDiff.
+    """
+    from app.services.audit_service import _calculate_json_diff
+
+    old = {'uid': 'A1', 'Weight': 20.0, 'Genotype': 'WT', 'Count': 3, 'Note': 'x'}
+    new = {'uid': 'A1', 'Weight': 21.5, 'Genotype': 'KO', 'Count': 3.0, 'Dose': 5}
+    new['Note'] = None
+    diff = _calculate_json_diff(old, new)
+
+    assert diff == {
+        'values_changed': {
+            "root['Weight']": {'new_value': 21.5, 'old_value': 20.0},
+            "root['Genotype']": {'new_value': 'KO', 'old_value': 'WT'},
+        },
+        'type_changes': {
+            "root['Note']": {'old_type': 'str', 'new_type': 'NoneType', 'old_value': 'x', 'new_value': None},
+        },
+        'dictionary_item_added': {"root['Dose']": 5},
+    }
+    assert _calculate_json_diff({'a': 1}, {'a': 1.0}) is None
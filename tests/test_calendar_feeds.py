@@ -0,0 +1,128 @@
+# tests/test_calendar_feeds.py
+"""
+Tests des flux ICS : ETag / Last-Modified dérivés des dates de modification,
+réponses 304, régénération limitée aux événements modifiés et renommage du
+groupe généré par un workplan.
+"""
+from datetime import date
+
+import pytest
+
+from app.models import DataTable, ExperimentalGroup, ProtocolModel, Workplan, WorkplanEvent, WorkplanStatus
+from app.services import calendar_feed_service
+
+
+@pytest.fixture
+def feed_datatables(db_session, init_database):
+    """Deux DataTables ad hoc assignées à team1_admin, une à team1_member."""
+    user = init_database['team1_admin']
+    other = init_database['team1_member']
+    user.generate_calendar_token()
+    protocol = ProtocolModel(name='Feed Protocol')
+    db_session.add(protocol)
+    db_session.flush()
+    datatables = [
+        DataTable(group_id=init_database['group1'].id, protocol_id=protocol.id, date=day,
+                  creator_id=user.id, assigned_to_id=assignee.id)
+        for day, assignee in (('2024-03-01', user), ('2024-03-08', user), ('2024-03-15', other))
+    ]
+    db_session.add_all(datatables)
+    db_session.commit()
+    return user, datatables
+
+
+@pytest.fixture
+def query_cache(test_app):
+    test_app.config['QUERY_CACHE_BACKEND'] = 'memory'
+    test_app.extensions.pop('query_cache', None)
+    yield
+    test_app.config['QUERY_CACHE_BACKEND'] = 'none'
+    test_app.extensions.pop('query_cache', None)
+
+
+def test_personal_feed_answers_304_until_an_event_changes(test_client, db_session, feed_datatables):
+    """
+    GIVEN un flux personnel déjà téléchargé
+    WHEN le client le redemande avec son ETag, avant puis après une modification
+    THEN il reçoit 304 tant que rien n'a changé, puis le nouveau flux.
+    """
+    user, datatables = feed_datatables
+    url = f'/calendar/feed/{user.id}/{user.calendar_token}.ics'
+
+    first = test_client.get(url)
+    assert first.status_code == 200
+    assert first.headers['ETag'] and first.headers['Last-Modified']
+    assert first.data.count(b'BEGIN:VEVENT') == 2
+    assert test_client.get(url).data == first.data  # DTSTAMP stable d'un appel à l'autre
+
+    etag = first.headers['ETag']
+    not_modified = test_client.get(url, headers={'If-None-Match': etag})
+    assert not_modified.status_code == 304 and not_modified.data == b''
+
+    # Une DataTable d'un autre utilisateur ne change pas ce flux
+    datatables[2].date = '2024-03-16'
+    db_session.commit()
+    assert test_client.get(url, headers={'If-None-Match': etag}).status_code == 304
+
+    datatables[0].date = '2024-03-02'
+    db_session.commit()
+    changed = test_client.get(url, headers={'If-None-Match': etag})
+    assert changed.status_code == 200 and changed.headers['ETag'] != etag
+    assert b'DTSTART;VALUE=DATE:20240302' in changed.data
+
+
+def test_feed_rebuild_renders_only_changed_events(test_app, test_client, db_session, feed_datatables,
+                                                  query_cache, monkeypatch):
+    """Le flux reconstruit réutilise le rendu des événements inchangés."""
+    user, datatables = feed_datatables
+    url = f'/calendar/feed/{user.id}/{user.calendar_token}.ics'
+    rendered = []
+    render_datatable = calendar_feed_service._render_datatable
+    monkeypatch.setattr(calendar_feed_service, '_render_datatable',
+                        lambda dt: rendered.append(dt.id) or render_datatable(dt))
+
+    first = test_client.get(url)
+    assert sorted(rendered) == sorted(dt.id for dt in datatables[:2])
+
+    rendered.clear()
+    assert test_client.get(url).data == first.data
+    assert rendered == []  # Servi depuis le cache
+
+    datatables[1].date = '2024-03-09'
+    db_session.commit()
+    assert b'DTSTART;VALUE=DATE:20240309' in test_client.get(url).data
+    assert rendered == [datatables[1].id]
+
+
+def test_generated_group_rename_refreshes_workplan_event(test_client, db_session, init_database):
+    """
+    GIVEN un événement de workplan dont le workplan a généré un groupe
+    WHEN le groupe généré est renommé
+    THEN le flux n'est plus servi en 304 et l'événement porte le nouveau nom.
+    """
+    user = init_database['team1_admin']
+    user.generate_calendar_token()
+    protocol = ProtocolModel(name='Feed WP Protocol')
+    workplan = Workplan(project_id=init_database['proj1'].id, name='Feed Workplan', planned_animal_count=4,
+                        status=WorkplanStatus.PLANNED, study_start_date=date(2024, 4, 1))
+    db_session.add_all([protocol, workplan])
+    db_session.flush()
+    db_session.add(WorkplanEvent(workplan_id=workplan.id, protocol_id=protocol.id, offset_days=0,
+                                 assigned_to_id=user.id))
+    group = ExperimentalGroup(
+        id='feed_generated_group', name='CohortAlpha', project_id=init_database['proj1'].id,
+        model_id=init_database['animal_model'].id, owner_id=user.id, team_id=init_database['team1'].id,
+        created_from_workplan_id=workplan.id,
+    )
+    db_session.add(group)
+    db_session.commit()
+    url = f'/calendar/feed/{user.id}/{user.calendar_token}.ics'
+
+    first = test_client.get(url)
+    assert b'CohortAlpha' in first.data
+
+    group.name = 'CohortBravo'
+    db_session.commit()
+    changed = test_client.get(url, headers={'If-None-Match': first.headers['ETag']})
+    assert changed.status_code == 200
+    assert b'CohortBravo' in changed.data and b'CohortAlpha' not in changed.data
@@ -0,0 +1,198 @@
+# tests/test_ckan_publish.py
+"""
+Tests du publieur CKAN contre un faux serveur CKAN local : manifeste lu une
+seule fois, ressources inchangées ignorées (hash), reprises des erreurs
+transitoires et reprise d'une publication interrompue.
+"""
+import json
+import threading
+from datetime import date
+from email.parser import BytesParser
+from email.policy import HTTP
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+import pytest
+
+from app.models import (
+    Analyte, AnalyteDataType, Animal, Attachment, CKANResourceTask, CKANUploadTask,
+    DataTable, ExperimentalGroup, ExperimentDataRow, ProtocolAnalyteAssociation, ProtocolModel,
+)
+from app.services import ckan_publish_service
+from app.services.ckan_publish_service import CKANPublishService
+
+
+class FakeCKAN:
+    """Action API minimale : package_show, resource_create et resource_update."""
+
+    def __init__(self):
+        self.resources = {}
+        self.calls = []
+        self.transient_failures = 0  # Réponses 503 avant de traiter les prochains envois
+        self.rejected_names = set()  # Envois refusés définitivement (500)
+        self.lock = threading.Lock()
+
+    def handle(self, handler):
+        parsed = urlparse(handler.path)
+        action = parsed.path.rsplit('/', 1)[-1]
+        with self.lock:
+            self.calls.append(action)
+            if action == 'package_show':
+                return 200, {'success': True, 'result': {'id': 'dataset-1', 'resources': list(self.resources.values())}}
+
+            body = handler.rfile.read(int(handler.headers['Content-Length']))
+            message = BytesParser(policy=HTTP).parsebytes(
+                f"Content-Type: {handler.headers['Content-Type']}\r\n\r\n".encode() + body
+            )
+            fields = {part.get_param('name', header='content-disposition'): part.get_payload(decode=True)
+                      for part in message.iter_parts()}
+            name = fields['name'].decode()
+            if self.transient_failures:
+                self.transient_failures -= 1
+                return 503, {'success': False}
+            if name in self.rejected_names:
+                return 500, {'success': False, 'error': {'message': 'Storage full'}}
+
+            resource_id = fields['id'].decode() if action == 'resource_update' else f'res-{len(self.resources) + 1}'
+            self.resources[name] = {'id': resource_id, 'name': name, 'hash': fields['hash'].decode(),
+                                    'content': fields['upload']}
+            return 200, {'success': True, 'result': {'id': resource_id, 'name': name}}
+
+    def uploads(self):
+        return [call for call in self.calls if call != 'package_show']
+
+
+@pytest.fixture
+def fake_ckan(test_app, monkeypatch):
+    fake = FakeCKAN()
+
+    class Handler(BaseHTTPRequestHandler):
+        def _answer(self):
+            status, payload = fake.handle(self)
+            body = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        do_GET = do_POST = _answer
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    # Le serveur local est en loopback : la validation SSRF le refuserait
+    monkeypatch.setattr(ckan_publish_service, 'validate_external_url', lambda url: '127.0.0.1')
+    test_app.config.update(CKAN_PUBLISH_BACKOFF=0, CKAN_PUBLISH_CONCURRENCY=2)
+    fake.url = f'http://ckan.test:{server.server_address[1]}'
+    yield fake
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def publish_project(test_app, db_session, init_database, tmp_path, fake_ckan):
+    """Projet avec une DataTable (deux animaux) et une pièce jointe sur disque."""
+    upload_folder = test_app.config['UPLOAD_FOLDER']
+    test_app.config['UPLOAD_FOLDER'] = str(tmp_path)
+    project = init_database['proj1']
+    user = init_database['super_admin']
+    user.ckan_url = fake_ckan.url
+    user.ckan_api_key = 'test-key'
+
+    weight = Analyte(name='Publish Weight', data_type=AnalyteDataType.FLOAT)
+    protocol = ProtocolModel(name='Publish Protocol')
+    db_session.add_all([weight, protocol])
+    db_session.flush()
+    db_session.add(ProtocolAnalyteAssociation(protocol_model_id=protocol.id, analyte_id=weight.id, order=1))
+    group = ExperimentalGroup(
+        id='ckan_group_001', name='CKAN Group', project_id=project.id,
+        model_id=init_database['animal_model'].id, owner_id=user.id, team_id=init_database['team1'].id,
+    )
+    db_session.add(group)
+    db_session.flush()
+    animals = [Animal(uid=f'CKAN_{i}', display_id=f'C{i}', group_id=group.id,
+                      status='alive', date_of_birth=date(2023, 1, 1)) for i in range(2)]
+    db_session.add_all(animals)
+    db_session.flush()
+    datatable = DataTable(group_id=group.id, protocol_id=protocol.id, date='2024-01-01', creator_id=user.id)
+    db_session.add(datatable)
+    db_session.flush()
+    for i, animal in enumerate(animals):
+        db_session.add(ExperimentDataRow(data_table_id=datatable.id, animal_id=animal.id,
+                                         row_data={'Publish Weight': 20.0 + i}))
+
+    (tmp_path / 'report.pdf').write_bytes(b'%PDF-1.4 report')
+    db_session.add(Attachment(project_id=project.id, filename='report.pdf', filepath='report.pdf', size=15))
+    db_session.commit()
+    yield project, user, datatable
+    test_app.config['UPLOAD_FOLDER'] = upload_folder
+
+
+def test_publish_uploads_then_skips_unchanged(test_app, publish_project, fake_ckan):
+    """
+    GIVEN un projet jamais publié
+    WHEN il est publié deux fois de suite sans modification
+    THEN la première publication envoie chaque ressource, la seconde n'envoie rien.
+    """
+    project, user, datatable = publish_project
+    service = CKANPublishService()
+    with test_app.test_request_context():
+        task, should_enqueue = service.start(project, user, 'dataset-1')
+        result = service.run(task.id)
+
+    assert should_enqueue and result == {'task_id': task.id, 'status': CKANUploadTask.STATUS_DONE}
+    assert sorted(fake_ckan.uploads()) == ['resource_create', 'resource_create']
+    assert fake_ckan.calls.count('package_show') == 1
+    csv_name = f'datatable_{datatable.id}_publish-protocol_2024-01-01.csv'
+    assert b'Publish Weight' in fake_ckan.resources[csv_name]['content']
+    assert fake_ckan.resources['report.pdf']['content'] == b'%PDF-1.4 report'
+    assert project.ckan_upload_date is not None
+
+    fake_ckan.calls.clear()
+    with test_app.test_request_context():
+        second, _ = service.start(project, user, 'dataset-1')
+        service.run(second.id)
+    assert second.id != task.id
+    assert fake_ckan.uploads() == []
+    assert {res.status for res in second.resource_tasks} == {CKANResourceTask.STATUS_SKIPPED}
+
+
+def test_failed_publish_resumes_pending_resources(test_app, publish_project, fake_ckan):
+    """Une erreur transitoire est réessayée ; une ressource en échec est seule renvoyée à la reprise."""
+    project, user, _datatable = publish_project
+    service = CKANPublishService()
+    fake_ckan.transient_failures = 1
+    fake_ckan.rejected_names.add('report.pdf')
+    with test_app.test_request_context():
+        task, _ = service.start(project, user, 'dataset-1')
+        result = service.run(task.id)
+
+    assert result['status'] == CKANUploadTask.STATUS_FAILED
+    statuses = {res.resource_type: res.status for res in task.resource_tasks}
+    assert statuses == {CKANResourceTask.TYPE_DATATABLE: CKANResourceTask.STATUS_UPLOADED,
+                        CKANResourceTask.TYPE_ATTACHMENT: CKANResourceTask.STATUS_FAILED}
+
+    fake_ckan.rejected_names.clear()
+    fake_ckan.calls.clear()
+    with test_app.test_request_context():
+        resumed, should_enqueue = service.start(project, user, 'dataset-1')
+        service.run(resumed.id)
+
+    assert should_enqueue and resumed.id == task.id
+    assert fake_ckan.uploads() == ['resource_create']
+    assert resumed.status == CKANUploadTask.STATUS_DONE
+    assert 'report.pdf' in fake_ckan.resources
+
+
+def test_publish_endpoints_require_project_permissions(team2_admin_client, init_database):
+    """Un utilisateur hors du projet ne peut ni le publier ni lire l'état de ses publications."""
+    slug = init_database['proj1'].slug
+
+    response = team2_admin_client.post(f'/ckan/{slug}/publish', json={'dataset_id': 'dataset-1'})
+    assert response.status_code == 403
+    assert CKANUploadTask.query.count() == 0
+
+    assert team2_admin_client.get(f'/ckan/{slug}/publish/1/status').status_code == 403
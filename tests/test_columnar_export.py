@@ -0,0 +1,88 @@
+# tests/test_columnar_export.py
+"""
+Tests des exports colonnaires (Parquet / Arrow IPC) : typage d'après
+AnalyteDataType, inférence des colonnes non typées et métadonnées d'export ;
+boutons masqués quand pyarrow n'est pas installé.
+"""
+import io
+
+import pandas as pd
+import pytest
+
+from app.utils.columnar import (build_arrow_table, columnar_export_available, export_download_name,
+                                read_export_metadata, write_columnar)
+
+requires_pyarrow = pytest.mark.skipif(not columnar_export_available(),
+                                      reason="pyarrow is not installed on this platform")
+
+
+def _frame():
+    return pd.DataFrame({
+        'uid': ['A1', 'A2', 'A3'],
+        'Weight': ['21.5', 22, None],
+        'Count': [1.0, None, 3.0],
+        'Sex': ['M', 'F', 'M'],
+        'Dosing Date': ['2024-01-02', None, '2024-01-04'],
+        'age_days': [70, 71, 72],
+        'Comment': ['=1+1', None, 'ok'],
+    })
+
+
+@requires_pyarrow
+def test_columns_follow_analyte_types():
+    """
+    GIVEN un DataFrame issu d'une DataTable et les types de ses analytes
+    WHEN il est converti en table Arrow
+    THEN chaque colonne a le type de son analyte et les colonnes libres sont inférées.
+    """
+    import pyarrow as pa
+
+    column_types = {'Weight': 'float', 'Count': 'int', 'Sex': 'category', 'Dosing Date': 'date'}
+    table = build_arrow_table(_frame(), column_types=column_types, metadata={'protocols': ['Tox']})
+
+    schema = table.schema
+    assert schema.field('Weight').type == pa.float64()
+    assert schema.field('Count').type == pa.int64()
+    assert pa.types.is_dictionary(schema.field('Sex').type)
+    assert schema.field('Dosing Date').type == pa.date32()
+    assert schema.field('age_days').type == pa.int64()
+    assert schema.field('uid').type == pa.string()
+    assert schema.field('Weight').metadata == {b'analyte_type': b'float'}
+    assert table.column('Weight').to_pylist() == [21.5, 22.0, None]
+    # Pas d'échappement « Excel » dans un format de données
+    assert table.column('Comment').to_pylist() == ['=1+1', None, 'ok']
+    assert read_export_metadata(schema) == {'protocols': ['Tox']}
+
+
+@requires_pyarrow
+@pytest.mark.parametrize('file_format', ['parquet', 'arrow'])
+def test_round_trip_keeps_types_and_index(file_format):
+    """Un tableau transposé (index = paramètres) relu depuis Parquet/Arrow garde sa première colonne et ses métadonnées."""
+    import pyarrow as pa
+
+    transposed = _frame().set_index('uid').transpose()
+    output = io.BytesIO()
+    write_columnar(transposed, output, file_format, metadata={'groups': ['G1']}, index=True)
+    output.seek(0)
+
+    if file_format == 'parquet':
+        import pyarrow.parquet as pq
+        table = pq.read_table(output)
+    else:
+        table = pa.ipc.open_file(output).read_all()
+
+    assert table.column_names == ['Parameter', 'A1', 'A2', 'A3']
+    assert table.column('Parameter').to_pylist()[0] == 'Weight'
+    assert read_export_metadata(table.schema) == {'groups': ['G1']}
+    assert export_download_name('G1_Tox_2024-01-02.xlsx', file_format) == f'G1_Tox_2024-01-02.{file_format}'
+
+
+@pytest.mark.parametrize('available', [True, False])
+def test_columnar_buttons_follow_pyarrow_availability(test_app, logged_in_client, monkeypatch, available):
+    """Les boutons Parquet / Arrow ne sont proposés que si pyarrow est installé."""
+    monkeypatch.setitem(test_app.jinja_env.globals, 'columnar_export_available', lambda: available)
+
+    response = logged_in_client.get('/datatables/create')
+
+    assert response.status_code == 200
+    assert (b'btn-download-columnar' in response.data) is available
@@ -0,0 +1,104 @@
+# tests/test_export_jobs.py
+"""
+Tests des exports fusionnés en tâche de fond : génération du fichier par le
+worker, notification, téléchargement reprenable (Range) et expiration.
+"""
+from datetime import date, timedelta
+
+import pytest
+
+from app.models import (
+    Analyte, AnalyteDataType, Animal, DataTable, ExperimentalGroup,
+    ExperimentDataRow, ExportJob, Notification, ProtocolAnalyteAssociation, ProtocolModel,
+)
+from app.models.notifications import NotificationType
+from app.services.export_job_service import ExportJobService
+
+
+@pytest.fixture
+def export_dir(test_app, tmp_path):
+    test_app.config['EXPORT_DIR'] = str(tmp_path)
+    yield tmp_path
+    test_app.config['EXPORT_DIR'] = None
+
+
+@pytest.fixture
+def export_datatables(db_session, init_database):
+    """Deux DataTables d'un groupe de deux animaux (analyte Weight)."""
+    admin_user = init_database['team1_admin']
+    weight = Analyte(name='Export Weight', data_type=AnalyteDataType.FLOAT)
+    protocol = ProtocolModel(name='Export Protocol')
+    db_session.add_all([weight, protocol])
+    db_session.flush()
+    db_session.add(ProtocolAnalyteAssociation(protocol_model_id=protocol.id, analyte_id=weight.id, order=1))
+
+    group = ExperimentalGroup(
+        id='export_group_001', name='Export Group',
+        project_id=init_database['proj1'].id, model_id=init_database['animal_model'].id,
+        owner_id=admin_user.id, team_id=init_database['team1'].id,
+    )
+    db_session.add(group)
+    db_session.flush()
+    animals = [Animal(uid=f'EXPORT_{i}', display_id=f'E{i}', group_id=group.id,
+                      status='alive', date_of_birth=date(2023, 1, 1)) for i in range(2)]
+    db_session.add_all(animals)
+    db_session.flush()
+
+    datatables = []
+    for day in ('2024-01-01', '2024-02-01'):
+        dt = DataTable(group_id=group.id, protocol_id=protocol.id, date=day, creator_id=admin_user.id)
+        db_session.add(dt)
+        db_session.flush()
+        for i, animal in enumerate(animals):
+            db_session.add(ExperimentDataRow(data_table_id=dt.id, animal_id=animal.id,
+                                             row_data={'Export Weight': 20.0 + i}))
+        datatables.append(dt)
+    db_session.commit()
+    return datatables
+
+
+def test_job_writes_file_and_serves_ranges(test_app, logged_in_client, init_database, export_datatables, export_dir):
+    """
+    GIVEN un export fusionné confié au worker
+    WHEN la tâche est exécutée puis le fichier téléchargé par morceaux
+    THEN le fichier est écrit, l'utilisateur notifié et les requêtes Range renvoient 206.
+    """
+    service = ExportJobService()
+    user = init_database['super_admin']
+    with test_app.test_request_context():
+        job = service.create(user, ExportJob.KIND_MERGED, [dt.id for dt in export_datatables])
+        progress = []
+        result = service.run(job.id, progress_callback=lambda done, total, stage: progress.append(stage))
+
+    assert result == {'job_id': job.id, 'status': ExportJob.STATUS_DONE}
+    assert progress[0] == 'merge' and progress[-1] == 'write'
+    assert job.row_count == 2 and job.filename.endswith('_merged_data.xlsx')
+    assert (export_dir / job.storage_name).stat().st_size == job.file_size
+    assert Notification.query.filter_by(user_id=user.id, type=NotificationType.EXPORT_READY).count() == 1
+
+    status = logged_in_client.get(f'/datatables/exports/{job.id}/status').get_json()
+    assert status['status'] == 'done' and status['download_url'].endswith(f'/exports/{job.id}/download')
+
+    full = logged_in_client.get(f'/datatables/exports/{job.id}/download')
+    assert full.status_code == 200 and full.headers['Accept-Ranges'] == 'bytes'
+    partial = logged_in_client.get(f'/datatables/exports/{job.id}/download', headers={'Range': 'bytes=10-'})
+    assert partial.status_code == 206
+    assert partial.data == full.data[10:]
+
+
+def test_cleanup_removes_expired_jobs(test_app, db_session, init_database, export_datatables, export_dir):
+    """Un export expiré perd son fichier et sa ligne ; un export sans données échoue proprement."""
+    service = ExportJobService()
+    with test_app.test_request_context():
+        job = service.create(init_database['super_admin'], ExportJob.KIND_MERGED_TRANSPOSED,
+                             [dt.id for dt in export_datatables])
+        service.run(job.id)
+        failed = service.create(init_database['super_admin'], ExportJob.KIND_MERGED, [999999])
+        assert 'error' in service.run(failed.id)
+    assert failed.status == ExportJob.STATUS_FAILED
+    assert job.filename.endswith('_merged_transposed_prism.xlsx')
+
+    job_id = job.id
+    assert service.cleanup_expired(now=failed.expires_at + timedelta(seconds=1)) == 2
+    assert db_session.get(ExportJob, job_id) is None
+    assert list(export_dir.iterdir()) == []
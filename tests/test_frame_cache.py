@@ -0,0 +1,182 @@
+# tests/test_frame_cache.py
+"""
+Tests du cache de DataFrames adressé par contenu (app.performance.frame_cache).
+"""
+from datetime import date
+
+import pandas as pd
+import pytest
+from sqlalchemy.orm.attributes import flag_modified
+
+from app.models import (
+    Analyte, AnalyteDataType, Animal, DataTable, ExperimentalGroup,
+    ExperimentDataRow, ProtocolAnalyteAssociation, ProtocolModel,
+)
+from app.performance import frame_cache
+from app.performance.frame_cache import (
+    STALE_DATATABLES_KEY, DiskFrameCacheBackend, build_frame_key,
+    deserialize_frame, invalidate_datatables, serialize_frame,
+)
+from app.services.analysis_service import AnalysisService
+
+
+@pytest.fixture
+def cache_enabled(test_app, tmp_path):
+    test_app.config['ENABLE_DATAFRAME_CACHE'] = True
+    test_app.config['DATAFRAME_CACHE_BACKEND'] = 'disk'
+    test_app.config['DATAFRAME_CACHE_DIR'] = str(tmp_path)
+    test_app.extensions.pop('frame_cache', None)
+    yield
+    test_app.config['ENABLE_DATAFRAME_CACHE'] = False
+    test_app.extensions.pop('frame_cache', None)
+
+
+@pytest.fixture
+def cache_setup(db_session, init_database, cache_enabled):
+    """Un groupe de 2 animaux et une DataTable avec un analyte FLOAT."""
+    admin_user = init_database['team1_admin']
+    weight = Analyte(name='Cache Weight', data_type=AnalyteDataType.FLOAT)
+    protocol = ProtocolModel(name='Cache Protocol')
+    db_session.add_all([weight, protocol])
+    db_session.flush()
+    db_session.add(ProtocolAnalyteAssociation(protocol_model_id=protocol.id, analyte_id=weight.id, order=1))
+
+    group = ExperimentalGroup(
+        id='cache_group_001', name='Cache Group',
+        project_id=init_database['proj1'].id, model_id=init_database['animal_model'].id,
+        owner_id=admin_user.id, team_id=init_database['team1'].id,
+    )
+    db_session.add(group)
+    db_session.flush()
+
+    dt = DataTable(group_id=group.id, protocol_id=protocol.id, date='2024-01-15', creator_id=admin_user.id)
+    db_session.add(dt)
+    db_session.flush()
+
+    rows = []
+    for i, w in enumerate([20.5, 21.5]):
+        animal = Animal(uid=f'CACHE_{i}', display_id=f'C{i}', group_id=group.id, status='alive', date_of_birth=date(2023, 1, 1))
+        db_session.add(animal)
+        db_session.flush()
+        row = ExperimentDataRow(data_table_id=dt.id, animal_id=animal.id, row_data={'Cache Weight': w})
+        db_session.add(row)
+        rows.append(row)
+    db_session.flush()
+    # Simule le commit : les marques d'invalidation sont consommées
+    db_session.info.pop(STALE_DATATABLES_KEY, None)
+    return {'data_table': dt, 'rows': rows}
+
+
+def test_serialize_frame_roundtrip():
+    """
+    GIVEN un DataFrame typé et des métadonnées
+    WHEN il est sérialisé puis désérialisé
+    THEN les valeurs, les types et les métadonnées sont conservés.
+    """
+    df = pd.DataFrame({'uid': ['A', 'B'], 'Weight': [1.5, None], 'Count': pd.array([1, None], dtype='Int64')})
+    restored, meta = deserialize_frame(serialize_frame(df, {'numerical': ['Weight']}))
+
+    pd.testing.assert_frame_equal(restored, df)
+    assert meta == {'numerical': ['Weight']}
+
+
+def test_disk_backend_evicts_least_recently_used(tmp_path):
+    """
+    GIVEN un backend disque limité à deux entrées
+    WHEN une troisième entrée est ajoutée après la relecture de la première
+    THEN c'est l'entrée la moins récemment utilisée qui est évincée.
+    """
+    import os
+    import time
+
+    backend = DiskFrameCacheBackend(str(tmp_path), max_bytes=2500)
+    backend.set('a', b'x' * 1000)
+    backend.set('b', b'x' * 1000)
+    past = time.time() - 60
+    os.utime(backend._entry_path('a'), (past, past))
+    os.utime(backend._entry_path('b'), (past - 10, past - 10))
+    assert backend.get('a') is not None  # Refreshes 'a'
+
+    backend.set('c', b'x' * 1000)
+
+    assert backend.get('b') is None
+    assert backend.get('a') is not None
+    assert backend.get('c') is not None
+
+
+def test_prepare_dataframe_is_served_from_cache(test_app, db_session, cache_setup, monkeypatch):
+    """
+    GIVEN une DataTable déjà préparée une fois
+    WHEN prepare_dataframe est rappelé sans modification
+    THEN le résultat vient du cache (aucune requête de données) et est identique.
+    """
+    service = AnalysisService()
+    dt = cache_setup['data_table']
+    df1, num1, cat1 = service.prepare_dataframe(dt)
+
+    def _fail(*args, **kwargs):
+        raise AssertionError("data should come from the cache")
+
+    monkeypatch.setattr(AnalysisService, '_fetch_dataframe_from_json', _fail)
+    df2, num2, cat2 = service.prepare_dataframe(dt)
+
+    pd.testing.assert_frame_equal(df1, df2)
+    assert (num1, cat1) == (num2, cat2)
+
+
+def test_tampered_entry_is_not_deserialized(test_app, db_session, cache_setup, monkeypatch):
+    """
+    GIVEN une entrée de cache réécrite par un tiers ne connaissant pas SECRET_KEY
+    WHEN elle est relue
+    THEN la signature est rejetée et la charge utile n'est jamais désérialisée.
+    """
+    dt = cache_setup['data_table']
+    AnalysisService().prepare_dataframe(dt)
+    key = build_frame_key('prepared', [dt.id])
+    backend = frame_cache.get_frame_cache_backend()
+    assert frame_cache.get_cached_frame(key) is not None
+
+    forged = serialize_frame(pd.DataFrame({'uid': ['X']}))
+    backend.set(key, b'\0' * 32 + forged)
+    monkeypatch.setattr(frame_cache, 'deserialize_frame', lambda blob: pytest.fail('forged entry decoded'))
+    assert frame_cache.get_cached_frame(key) is None
+
+
+def test_row_changes_invalidate_cached_frame(test_app, db_session, cache_setup):
+    """
+    GIVEN un frame en cache
+    WHEN une ligne de la DataTable est modifiée (flush puis commit simulé)
+    THEN la clé change et la nouvelle valeur est servie.
+    """
+    service = AnalysisService()
+    dt = cache_setup['data_table']
+    service.prepare_dataframe(dt)
+    key_before = build_frame_key('prepared', [dt.id])
+
+    row = cache_setup['rows'][0]
+    row.row_data['Cache Weight'] = 99.0
+    flag_modified(row, 'row_data')
+    db_session.flush()
+
+    # Modifications non commitées : le cache est contourné
+    assert db_session.info[STALE_DATATABLES_KEY] == {dt.id}
+    assert build_frame_key('prepared', [dt.id]) is None
+    df, _, _ = service.prepare_dataframe(dt)
+    assert 99.0 in df['Cache Weight'].tolist()
+
+    # Commit : la génération de la DataTable est incrémentée
+    invalidate_datatables(db_session.info.pop(STALE_DATATABLES_KEY))
+    assert build_frame_key('prepared', [dt.id]) != key_before
+    df, _, _ = service.prepare_dataframe(dt)
+    assert 99.0 in df['Cache Weight'].tolist()
+
+
+def test_cache_disabled_returns_no_key(test_app, db_session, init_database):
+    """
+    GIVEN ENABLE_DATAFRAME_CACHE désactivé
+    WHEN une clé est demandée
+    THEN aucune clé n'est construite.
+    """
+    test_app.config['ENABLE_DATAFRAME_CACHE'] = False
+    assert frame_cache.get_frame_cache_backend() is None
+    assert build_frame_key('prepared', [1]) is None
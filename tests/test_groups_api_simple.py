@@ -76,3 +76,43 @@ def test_server_side_groups_tooltip_refactor(test_client, db_session, init_datab
     # Verify the tooltip formatting
     assert "Dead animals (1):" in animal_count_html
     assert "A-Dead: Limit reached" in animal_count_html
+
+
+def test_server_side_groups_sort_by_animal_count(test_app, db_session, init_database):
+    """
+    GIVEN deux groupes de tailles différentes, dont un avec un animal mort
+    WHEN la liste est triée par nombre d'animaux
+    THEN l'ordre suit les comptes SQL et les statistiques donnent l'histogramme des raisons.
+    """
+    from app.services.group_service import GroupService
+    service = GroupService()
+    project = init_database['proj1']
+    admin = init_database['team1_admin']
+
+    small = service.create_group(
+        name="Count Sort Small", project_id=project.id, team_id=project.team_id, owner_id=admin.id,
+        model_id=init_database['animal_model'].id,
+        animal_data=[{"uid": "CS-1", "date_of_birth": "2023-01-01"}]
+    )
+    large = service.create_group(
+        name="Count Sort Large", project_id=project.id, team_id=project.team_id, owner_id=admin.id,
+        model_id=init_database['animal_model'].id,
+        animal_data=[
+            {"uid": "CL-1", "date_of_birth": "2023-01-01"},
+            {"uid": "CL-2", "date_of_birth": "2023-01-01", "status": "dead",
+             "euthanasia_reason": "Limit reached", "severity": "Moderate"},
+            {"uid": "CL-3", "date_of_birth": "2023-01-01"},
+        ]
+    )
+
+    result = service.get_server_side_groups(
+        init_database['super_admin'], {'search_value': 'Count Sort'}, page=1, per_page=10,
+        sort_column='animal_count', sort_direction='desc'
+    )
+    assert [g.id for g in result['items']] == [large.id, small.id]
+
+    stats = service.get_animal_stats([large.id, small.id])
+    assert (stats[large.id]['total'], stats[large.id]['alive'], stats[large.id]['dead']) == (3, 2, 1)
+    assert stats[large.id]['euthanasia_summary'] == {'Limit reached - Moderate': 1}
+    assert stats[large.id]['dead_animals'] == [('CL-2', 'Limit reached')]
+    assert stats[small.id]['dead'] == 0
@@ -0,0 +1,211 @@
+# tests/test_import_wizard_service.py
+"""
+Tests du moteur d'import par lots (ImportWizardService.process_import).
+Vérifie le mapping, les formules vectorisées, l'écriture par blocs, la synchro Animal
+et le suivi de l'import en tâche de fond.
+"""
+from datetime import date
+
+import pandas as pd
+import pytest
+
+from app.models import (
+    Analyte, AnalyteDataType, Animal, AnimalModelAnalyteAssociation, AuditLog, DataTable,
+    ExperimentalGroup, ExperimentDataRow, ProtocolAnalyteAssociation, ProtocolModel,
+)
+from app.services.import_wizard_service import ImportWizardService
+
+
+@pytest.fixture
+def import_setup(db_session, init_database):
+    """
+    Groupe de 5 animaux, un analyte animal (Import Genotype) et un protocole
+    à deux analytes (Import Weight, Import Note). L'animal 0 a déjà une ligne.
+    """
+    admin_user = init_database['team1_admin']
+    animal_model = init_database['animal_model']
+
+    weight = Analyte(name='Import Weight', data_type=AnalyteDataType.FLOAT)
+    note = Analyte(name='Import Note', data_type=AnalyteDataType.TEXT)
+    genotype = Analyte(name='Import Genotype', data_type=AnalyteDataType.CATEGORY)
+    db_session.add_all([weight, note, genotype])
+    db_session.flush()
+    db_session.add(AnimalModelAnalyteAssociation(animal_model_id=animal_model.id, analyte_id=genotype.id))
+
+    protocol = ProtocolModel(name='Import Protocol')
+    db_session.add(protocol)
+    db_session.flush()
+    db_session.add(ProtocolAnalyteAssociation(protocol_model_id=protocol.id, analyte_id=weight.id, order=1))
+    db_session.add(ProtocolAnalyteAssociation(protocol_model_id=protocol.id, analyte_id=note.id, order=2))
+
+    group = ExperimentalGroup(
+        id='import_group_001', name='Import Group',
+        project_id=init_database['proj1'].id, model_id=animal_model.id,
+        owner_id=admin_user.id, team_id=init_database['team1'].id,
+    )
+    db_session.add(group)
+    db_session.flush()
+
+    animals = [
+        Animal(uid=f'IMP_{i}', display_id=f'I{i}', group_id=group.id, status='alive',
+               date_of_birth=date(2023, 1, 1), measurements={'Import Genotype': 'WT'})
+        for i in range(5)
+    ]
+    db_session.add_all(animals)
+    db_session.flush()
+
+    dt = DataTable(group_id=group.id, protocol_id=protocol.id, date='2024-02-01', creator_id=admin_user.id)
+    db_session.add(dt)
+    db_session.flush()
+    db_session.add(ExperimentDataRow(data_table_id=dt.id, animal_id=animals[0].id,
+                                     row_data={'uid': 'IMP_0', 'Import Note': 'kept', 'Import Weight': 1.0}))
+    db_session.flush()
+
+    return {'dt': dt, 'animals': animals, 'weight': weight, 'note': note, 'genotype': genotype}
+
+
+def _write_csv(tmp_path, rows):
+    path = tmp_path / 'import.csv'
+    pd.DataFrame(rows).to_csv(path, index=False)
+    return str(path)
+
+
+def test_process_import_writes_chunks_and_reports_progress(test_app, db_session, import_setup, tmp_path):
+    """
+    GIVEN un fichier de 5 lignes (dont un animal inconnu) et des blocs de 2 lignes
+    WHEN process_import est exécuté
+    THEN les lignes existantes sont fusionnées, les nouvelles insérées et la progression rapportée par bloc.
+    """
+    dt = import_setup['dt']
+    file_path = _write_csv(tmp_path, [
+        {'Animal': 'IMP_0', 'Poids': 20.0},
+        {'Animal': 'IMP_1', 'Poids': 21.5},
+        {'Animal': 'IMP_2', 'Poids': None},
+        {'Animal': 'IMP_3', 'Poids': 23.0},
+        {'Animal': 'UNKNOWN', 'Poids': 99.0},
+    ])
+    progress = []
+
+    count = ImportWizardService.process_import(
+        file_path, dt.id, {'Poids': import_setup['weight'].id}, 'Animal', user_id=None,
+        advanced_logic={str(import_setup['weight'].id): 'x * 1000'},
+        chunk_size=2, progress_callback=lambda done, total, label: progress.append((done, total)),
+    )
+
+    assert count == 4
+    assert progress == [(2, 5), (4, 5), (5, 5)]
+    rows = {r.animal.uid: r.row_data for r in ExperimentDataRow.query.filter_by(data_table_id=dt.id)}
+    assert set(rows) == {'IMP_0', 'IMP_1', 'IMP_2', 'IMP_3'}
+    assert rows['IMP_0'] == {'uid': 'IMP_0', 'Import Note': 'kept', 'Import Weight': 20000.0}
+    assert rows['IMP_1']['Import Weight'] == 21500.0
+    assert rows['IMP_2']['Import Weight'] is None
+
+
+def test_process_import_syncs_animal_fields(test_app, db_session, import_setup, tmp_path):
+    """Les colonnes du modèle animal sont recopiées dans Animal.measurements."""
+    dt = import_setup['dt']
+    file_path = _write_csv(tmp_path, [
+        {'Animal': 'IMP_1', 'Genotype': 'KO'},
+    ])
+
+    ImportWizardService.process_import(file_path, dt.id, {'Genotype': import_setup['genotype'].id}, 'Animal', user_id=None)
+
+    animal = db_session.get(Animal, import_setup['animals'][1].id)
+    db_session.refresh(animal)
+    assert animal.measurements['Import Genotype'] == 'KO'
+
+
+def test_process_import_audits_rows_and_invalidates_caches(test_app, db_session, import_setup, tmp_path, monkeypatch):
+    """
+    GIVEN un import qui met à jour une ligne existante et en insère une autre
+    WHEN process_import écrit par lots (hors listeners ORM)
+    THEN les entrées d'audit INSERT/UPDATE sont écrites et la DataTable est invalidée au commit.
+    """
+    from app.performance import frame_cache
+
+    dt = import_setup['dt']
+    invalidated = []
+    monkeypatch.setattr(frame_cache, 'invalidate_datatables', lambda ids: invalidated.append(set(ids)))
+    file_path = _write_csv(tmp_path, [
+        {'Animal': 'IMP_0', 'Poids': 20.0},
+        {'Animal': 'IMP_1', 'Poids': 21.5},
+    ])
+
+    ImportWizardService.process_import(file_path, dt.id, {'Poids': import_setup['weight'].id}, 'Animal', user_id=None)
+
+    rows = {r.animal_id: r.id for r in ExperimentDataRow.query.filter_by(data_table_id=dt.id)}
+
+    def _actions(animal):
+        entries = AuditLog.query.filter_by(resource_type='ExperimentDataRow', resource_id=str(rows[animal.id])).all()
+        return {entry.action: entry.changes for entry in entries}
+
+    updated = _actions(import_setup['animals'][0])['UPDATE']
+    inserted = _actions(import_setup['animals'][1])['INSERT']
+    assert 'row_data' in updated
+    assert inserted['animal_id'] == import_setup['animals'][1].id
+    assert inserted['row_data']['Import Weight'] == 21.5
+    assert {dt.id} in invalidated
+
+
+def test_apply_formula_falls_back_per_value():
+    """Une formule non vectorisable est évaluée valeur par valeur ; les erreurs gardent la valeur."""
+    series = pd.Series([1.0, -2.0, None, 'abc'], dtype=object)
+    result = ImportWizardService.apply_formula('x if x > 0 else 0', series)
+    assert result.tolist() == [1.0, 0, None, 'abc']
+
+    numeric = pd.Series([1.0, 2.0, None], dtype=object)
+    assert ImportWizardService.apply_formula('sqrt(x) * 2', numeric).tolist() == [2.0, pytest.approx(2 * 2 ** 0.5), None]
+
+
+def test_apply_formula_broadcasts_constant_results():
+    """Une formule constante (résultat scalaire) remplit la colonne, les valeurs manquantes restent vides."""
+    series = pd.Series([1.0, None, 3.0], dtype=object)
+    assert ImportWizardService.apply_formula('42', series).tolist() == [42, None, 42]
+
+
+def test_import_runs_in_background_and_reports_progress(test_client, init_database, api_token, monkeypatch):
+    """
+    GIVEN un import lancé via l'API
+    WHEN le wizard interroge l'URL de statut renvoyée
+    THEN il reçoit la progression par bloc puis le résultat, et seul l'importateur y a accès.
+    """
+    from app import tasks
+    from app.api import import_wizard_api
+
+    queued = []
+
+    class FakeTask:
+        id = 'import-task-1'
+
+    monkeypatch.setattr(tasks.process_import_task, 'apply_async',
+                        lambda args: queued.append(args) or FakeTask())
+    headers = {'Authorization': f'Bearer {api_token}'}
+    response = test_client.post('/api/v1/import_wizard/import', headers=headers, json={
+        'file_path': 'import.csv', 'data_table_id': 1, 'mapping': {}, 'animal_id_column': 'Animal',
+    })
+    assert response.status_code == 202
+    status_url = response.get_json()['status_url']
+    assert status_url.endswith('/import_wizard/import/status/import-task-1')
+    user_id = init_database['team1_admin'].id
+    assert queued[0][0] == user_id and queued[0][1]['data_table_id'] == 1
+
+    states = {
+        'PROGRESS': {'done': 2, 'total': 5, 'current': '2/5', 'user_id': user_id},
+        'SUCCESS': {'count': 5, 'user_id': user_id},
+    }
+
+    class FakeResult:
+        state = 'PROGRESS'
+
+        def __init__(self, task_id):
+            self.info = states[FakeResult.state]
+
+    monkeypatch.setattr(import_wizard_api, 'AsyncResult', FakeResult)
+    assert test_client.get(status_url, headers=headers).get_json() == {
+        'state': 'PROGRESS', 'done': 2, 'total': 5, 'current': '2/5'}
+
+    FakeResult.state = 'SUCCESS'
+    assert test_client.get(status_url, headers=headers).get_json()['count'] == 5
+
+    states['SUCCESS']['user_id'] = user_id + 1000
+    assert test_client.get(status_url, headers=headers).status_code == 404
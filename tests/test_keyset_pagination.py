@@ -0,0 +1,57 @@
+# tests/test_keyset_pagination.py
+"""
+Tests de la pagination par clé (keyset) des listes server-side et de
+l'itérateur d'identifiants « tout sélectionner ».
+"""
+from app.models import ExperimentalGroup
+from app.services.group_service import GroupService
+
+
+def _make_groups(db_session, init_database, count=5):
+    project, admin = init_database['proj1'], init_database['team1_admin']
+    for i in range(count):
+        db_session.add(ExperimentalGroup(
+            id=f'keyset-group-{i}',
+            name=f'Keyset Group {i}',
+            project_id=project.id,
+            model_id=init_database['animal_model'].id,
+            owner_id=admin.id,
+            team_id=project.team_id,
+        ))
+    db_session.commit()
+
+
+def test_cursor_page_matches_offset_page(test_app, db_session, init_database):
+    """
+    GIVEN des groupes triés par nom
+    WHEN la page 2 est lue avec le curseur de la page 1 puis par OFFSET
+    THEN les deux lectures renvoient les mêmes groupes et un curseur invalide retombe sur OFFSET.
+    """
+    _make_groups(db_session, init_database)
+    service = GroupService()
+    user = init_database['super_admin']
+    filters = {'search_value': 'Keyset Group'}
+
+    first = service.get_server_side_groups(user, filters, page=1, per_page=2, sort_column='name', sort_direction='asc')
+    assert [g.name for g in first['items']] == ['Keyset Group 0', 'Keyset Group 1']
+    assert first['filtered_records'] == 5 and first['next_cursor']
+
+    by_cursor = service.get_server_side_groups(user, filters, page=2, per_page=2, sort_column='name',
+                                               sort_direction='asc', cursor=first['next_cursor'])
+    by_offset = service.get_server_side_groups(user, filters, page=2, per_page=2, sort_column='name', sort_direction='asc')
+    assert [g.id for g in by_cursor['items']] == [g.id for g in by_offset['items']]
+    assert [g.name for g in by_cursor['items']] == ['Keyset Group 2', 'Keyset Group 3']
+
+    # A cursor issued for another sort is ignored
+    stale = service.get_server_side_groups(user, filters, page=2, per_page=2, sort_column='name',
+                                           sort_direction='desc', cursor=first['next_cursor'])
+    assert [g.name for g in stale['items']] == ['Keyset Group 2', 'Keyset Group 1']
+
+
+def test_iter_ids_streams_all_matching(test_app, db_session, init_database):
+    """L'itérateur renvoie tous les identifiants correspondants, lot par lot."""
+    _make_groups(db_session, init_database)
+    ids = list(GroupService().iter_server_side_group_ids(
+        init_database['super_admin'], {'search_value': 'Keyset Group'}, batch_size=2
+    ))
+    assert ids == [f'keyset-group-{i}' for i in range(5)]
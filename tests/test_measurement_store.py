@@ -0,0 +1,191 @@
+# tests/test_measurement_store.py
+"""
+Tests du store de mesures colonnaire (measurement_value).
+Vérifie la synchronisation write-through depuis les colonnes JSON et le lecteur typé.
+"""
+from datetime import date
+
+import pytest
+
+from app.models import (
+    Analyte, AnalyteDataType, Animal, AnimalModelAnalyteAssociation, DataTable,
+    ExperimentalGroup, ExperimentDataRow, MeasurementValue, ProtocolAnalyteAssociation,
+    ProtocolModel,
+)
+from app.services.analysis_service import AnalysisService
+from app.services.measurement_store_service import (
+    MeasurementStoreService, split_measurement_value,
+)
+
+
+@pytest.fixture
+def store_enabled(test_app):
+    test_app.config['ENABLE_MEASUREMENT_STORE'] = True
+    yield
+    test_app.config['ENABLE_MEASUREMENT_STORE'] = False
+
+
+@pytest.fixture
+def store_setup(db_session, init_database, store_enabled):
+    """
+    Groupe de 3 animaux avec un analyte animal (Genotype, CATEGORY)
+    et un protocole à deux analytes (Weight FLOAT, Count INT).
+    """
+    admin_user = init_database['team1_admin']
+    animal_model = init_database['animal_model']
+
+    weight = Analyte(name='Store Weight', data_type=AnalyteDataType.FLOAT)
+    count = Analyte(name='Store Count', data_type=AnalyteDataType.INT)
+    genotype = Analyte(name='Store Genotype', data_type=AnalyteDataType.CATEGORY)
+    db_session.add_all([weight, count, genotype])
+    db_session.flush()
+    db_session.add(AnimalModelAnalyteAssociation(animal_model_id=animal_model.id, analyte_id=genotype.id))
+
+    protocol = ProtocolModel(name='Store Protocol')
+    db_session.add(protocol)
+    db_session.flush()
+    db_session.add(ProtocolAnalyteAssociation(protocol_model_id=protocol.id, analyte_id=weight.id, order=1))
+    db_session.add(ProtocolAnalyteAssociation(protocol_model_id=protocol.id, analyte_id=count.id, order=2))
+
+    group = ExperimentalGroup(
+        id='store_group_001', name='Store Group',
+        project_id=init_database['proj1'].id, model_id=animal_model.id,
+        owner_id=admin_user.id, team_id=init_database['team1'].id,
+    )
+    db_session.add(group)
+    db_session.flush()
+
+    animals = []
+    for i, geno in enumerate(['WT', 'WT', 'KO']):
+        animal = Animal(
+            uid=f'STORE_{i}', display_id=f'S{i}', group_id=group.id, status='alive',
+            date_of_birth=date(2023, 1, 1), measurements={'Store Genotype': geno},
+        )
+        db_session.add(animal)
+        animals.append(animal)
+    db_session.flush()
+
+    dt = DataTable(group_id=group.id, protocol_id=protocol.id, date='2024-01-15', creator_id=admin_user.id)
+    db_session.add(dt)
+    db_session.flush()
+
+    rows = []
+    for animal, (w, c) in zip(animals, [(25.3, 3), ('27.1', '4'), (None, 5)]):
+        row = ExperimentDataRow(
+            data_table_id=dt.id, animal_id=animal.id,
+            row_data={'Store Weight': w, 'Store Count': c, 'uid': animal.uid},
+        )
+        db_session.add(row)
+        rows.append(row)
+    db_session.flush()
+
+    return {'data_table': dt, 'animals': animals, 'rows': rows}
+
+
+def test_split_measurement_value():
+    """
+    GIVEN des valeurs JSON brutes
+    WHEN split_measurement_value est appelé
+    THEN les colonnes numérique/texte sont correctement remplies.
+    """
+    assert split_measurement_value(None) is None
+    assert split_measurement_value('') is None
+    assert split_measurement_value(float('nan')) is None
+    assert split_measurement_value(25.3) == (25.3, None)
+    assert split_measurement_value('27.1') == (27.1, '27.1')
+    assert split_measurement_value('KO') == (None, 'KO')
+
+
+def test_rows_are_written_through_on_flush(test_app, db_session, store_setup):
+    """
+    GIVEN des ExperimentDataRow et des Animal créés via l'ORM
+    WHEN la session est flushée
+    THEN les valeurs des analytes sont présentes dans measurement_value (les clés hors analytes sont ignorées).
+    """
+    dt = store_setup['data_table']
+    stored = MeasurementValue.query.filter_by(data_table_id=dt.id).count()
+    # 3 animals x 2 analytes, minus the missing weight
+    assert stored == 5
+    animal_level = MeasurementValue.query.filter(MeasurementValue.data_table_id.is_(None)).count()
+    assert animal_level == 3
+
+
+def test_datatable_frame_is_typed_and_tracks_updates(test_app, db_session, store_setup):
+    """
+    GIVEN une ligne mise à jour après la création
+    WHEN get_datatable_frame est appelé
+    THEN le DataFrame reflète la nouvelle valeur et chaque colonne suit Analyte.data_type.
+    """
+    from sqlalchemy.orm.attributes import flag_modified
+
+    row = store_setup['rows'][2]
+    row.row_data['Store Weight'] = 22.8
+    flag_modified(row, 'row_data')
+    db_session.flush()
+
+    frame = MeasurementStoreService().get_datatable_frame(store_setup['data_table'])
+    animals = store_setup['animals']
+
+    assert list(frame.columns) == ['Store Genotype', 'Store Weight', 'Store Count']
+    assert str(frame['Store Weight'].dtype) == 'float64'
+    assert str(frame['Store Count'].dtype) == 'Int64'
+    assert str(frame['Store Genotype'].dtype) == 'category'
+    assert frame.loc[animals[2].id, 'Store Weight'] == pytest.approx(22.8)
+    assert frame.loc[animals[1].id, 'Store Count'] == 4
+
+
+def test_deleting_rows_removes_values(test_app, db_session, store_setup):
+    """
+    GIVEN une ExperimentDataRow supprimée
+    WHEN la session est flushée
+    THEN ses valeurs disparaissent du store.
+    """
+    row = store_setup['rows'][0]
+    db_session.delete(row)
+    db_session.flush()
+
+    remaining = MeasurementValue.query.filter_by(
+        data_table_id=store_setup['data_table'].id, animal_id=store_setup['animals'][0].id
+    ).count()
+    assert remaining == 0
+
+
+def test_api_row_replacement_resyncs_store(test_client, db_session, store_setup, api_token):
+    """
+    GIVEN une DataTable dont les lignes sont remplacées via PUT /api/v1/datatables/<id>
+    WHEN la suppression en masse contourne le hook de flush
+    THEN le store ne contient plus que les valeurs des nouvelles lignes.
+    """
+    dt = store_setup['data_table']
+    kept = store_setup['animals'][1]
+    response = test_client.put(
+        f'/api/v1/datatables/{dt.id}',
+        json={'experiment_rows': [{'animal_id': kept.id, 'row_data': {'Store Weight': 30.5}}]},
+        headers={'Authorization': f'Bearer {api_token}'},
+    )
+    assert response.status_code == 200
+
+    values = MeasurementValue.query.filter_by(data_table_id=dt.id).all()
+    assert [(v.animal_id, v.numeric_value) for v in values] == [(kept.id, 30.5)]
+
+
+def test_prepare_dataframe_matches_json_path(test_app, db_session, store_setup):
+    """
+    GIVEN le même jeu de données
+    WHEN prepare_dataframe est appelé avec et sans le store
+    THEN les valeurs et la classification des colonnes sont identiques.
+    """
+    service = AnalysisService()
+    dt = store_setup['data_table']
+
+    df_store, num_store, cat_store = service.prepare_dataframe(dt)
+    test_app.config['ENABLE_MEASUREMENT_STORE'] = False
+    df_json, num_json, cat_json = service.prepare_dataframe(dt)
+
+    assert sorted(num_store) == sorted(num_json)
+    assert sorted(cat_store) == sorted(cat_json)
+    df_store = df_store.sort_values('id').reset_index(drop=True)
+    df_json = df_json.sort_values('id').reset_index(drop=True)
+    assert df_store['Store Weight'].tolist()[:2] == pytest.approx(df_json['Store Weight'].tolist()[:2])
+    assert df_store['Store Count'].tolist() == df_json['Store Count'].tolist()
+    assert df_store['Store Genotype'].astype(str).tolist() == df_json['Store Genotype'].astype(str).tolist()
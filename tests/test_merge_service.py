@@ -0,0 +1,121 @@
+# tests/test_merge_service.py
+"""
+Tests du moteur de fusion partagé (DataTableMergeService) utilisé par
+AnalysisService.aggregate_datatables et DataTableService.aggregate_selected_datatables.
+"""
+from datetime import date
+
+import pandas as pd
+import pytest
+
+from app.models import (
+    Analyte, AnalyteDataType, Animal, DataTable, ExperimentalGroup,
+    ExperimentDataRow, ProtocolAnalyteAssociation, ProtocolModel,
+)
+from app.services.analysis_service import AnalysisService
+from app.services.merge_service import DataTableMergeService
+
+
+@pytest.fixture
+def merge_setup(db_session, init_database):
+    """
+    Un groupe de 3 animaux mesurés à deux dates (Weight FLOAT, Note TEXT) ;
+    le 3e animal n'a pas de ligne à la seconde date.
+    """
+    admin_user = init_database['team1_admin']
+    weight = Analyte(name='Merge Weight', data_type=AnalyteDataType.FLOAT)
+    note = Analyte(name='Merge Note', data_type=AnalyteDataType.TEXT)
+    protocol = ProtocolModel(name='Merge Protocol')
+    db_session.add_all([weight, note, protocol])
+    db_session.flush()
+    db_session.add(ProtocolAnalyteAssociation(protocol_model_id=protocol.id, analyte_id=weight.id, order=1))
+    db_session.add(ProtocolAnalyteAssociation(protocol_model_id=protocol.id, analyte_id=note.id, order=2))
+
+    group = ExperimentalGroup(
+        id='merge_group_001', name='Merge Group',
+        project_id=init_database['proj1'].id, model_id=init_database['animal_model'].id,
+        owner_id=admin_user.id, team_id=init_database['team1'].id,
+    )
+    db_session.add(group)
+    db_session.flush()
+
+    animals = []
+    for i in range(3):
+        animal = Animal(uid=f'MERGE_{i}', display_id=f'M{i}', group_id=group.id,
+                        status='alive', date_of_birth=date(2023, 1, 1))
+        db_session.add(animal)
+        animals.append(animal)
+    db_session.flush()
+
+    datatables = []
+    for day, weights in (('2024-01-01', [20.0, 21.0, 22.0]), ('2024-02-01', [23.0, None])):
+        dt = DataTable(group_id=group.id, protocol_id=protocol.id, date=day, creator_id=admin_user.id)
+        db_session.add(dt)
+        db_session.flush()
+        for animal, w in zip(animals, weights):
+            db_session.add(ExperimentDataRow(
+                data_table_id=dt.id, animal_id=animal.id,
+                row_data={'Merge Weight': w, 'Merge Note': f'{animal.uid}@{day}'},
+            ))
+        datatables.append(dt)
+    db_session.flush()
+    return {'datatables': datatables, 'animals': animals, 'admin': init_database['super_admin']}
+
+
+def _label(dt, name):
+    return f"{name} ({dt.date})"
+
+
+def test_pivot_keeps_first_non_null_value():
+    """
+    GIVEN un long frame avec doublons et valeurs nulles
+    WHEN pivot_long_frame est appelé
+    THEN la première valeur non nulle est gardée et les colonnes entièrement nulles disparaissent.
+    """
+    long_df = pd.DataFrame({
+        'uid': ['B', 'A', 'A', 'A', 'B'],
+        '_source_datatable_id': [1, 1, 1, 2, 2],
+        'analyte_name': ['W', 'W', 'W', 'X', 'X'],
+        'measurement_label': ['W1', 'W1', 'W1', 'X2', 'X2'],
+        'analyte_value': [2.0, None, 1.0, None, None],
+    })
+
+    wide = DataTableMergeService().pivot_long_frame(long_df)
+
+    assert list(wide.index) == ['A', 'B']
+    assert list(wide.columns) == ['W1']
+    assert wide['W1'].tolist() == [1.0, 2.0]
+
+
+def test_chunked_merge_matches_single_pass(test_app, db_session, merge_setup):
+    """
+    GIVEN deux DataTables
+    WHEN le long frame est construit avec des chunks d'une DataTable
+    THEN le résultat pivoté est identique à celui d'une seule passe.
+    """
+    datatables = merge_setup['datatables']
+
+    single = DataTableMergeService(chunk_size=25)
+    chunked = DataTableMergeService(chunk_size=1)
+    wide_single = single.pivot_long_frame(single.build_long_frame(datatables, _label))
+    wide_chunked = chunked.pivot_long_frame(chunked.build_long_frame(datatables, _label))
+
+    pd.testing.assert_frame_equal(wide_single, wide_chunked)
+    assert wide_single.loc['MERGE_0', 'Merge Weight (2024-02-01)'] == 23.0
+    assert pd.isna(wide_single.loc['MERGE_2', 'Merge Weight (2024-02-01)'])
+
+
+def test_aggregate_datatables_uses_merge_engine(test_app, db_session, merge_setup):
+    """
+    GIVEN deux DataTables du même groupe
+    WHEN AnalysisService.aggregate_datatables est appelé
+    THEN chaque animal a une ligne et une colonne par (analyte, date).
+    """
+    ids = [dt.id for dt in merge_setup['datatables']]
+    df, errors, sources = AnalysisService().aggregate_datatables(ids, user_id=merge_setup['admin'].id)
+
+    assert errors == []
+    assert len(sources) == 2
+    assert df['uid'].tolist() == ['MERGE_0', 'MERGE_1', 'MERGE_2']
+    assert df['Merge Weight (2024-01-01)'].tolist() == [20.0, 21.0, 22.0]
+    assert df.loc[df['uid'] == 'MERGE_1', 'Merge Note (2024-02-01)'].item() == 'MERGE_1@2024-02-01'
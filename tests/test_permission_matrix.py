@@ -0,0 +1,118 @@
+# tests/test_permission_matrix.py
+"""
+Tests de la matrice de permissions (user, projet) -> bitmask partagée entre requêtes.
+"""
+import sqlite3
+
+import pytest
+from sqlalchemy import delete, event, insert, select
+
+from app.extensions import db
+from app.models import PermissionMatrixVersion, ProjectUserShare
+from app.performance.permission_matrix import (PERMISSION_FLAGS,
+                                               TablePermissionMatrixBackend,
+                                               decode_permissions,
+                                               encode_permissions)
+from app.services.permission_service import PermissionService
+
+
+@pytest.fixture
+def matrix_enabled(test_app):
+    test_app.config['PERMISSION_MATRIX_BACKEND'] = 'memory'
+    test_app.extensions.pop('permission_matrix', None)
+    yield
+    test_app.config['PERMISSION_MATRIX_BACKEND'] = 'none'
+    test_app.extensions.pop('permission_matrix', None)
+
+
+@pytest.fixture
+def counted_service(monkeypatch):
+    """PermissionService dont les recalculs sont comptés."""
+    service = PermissionService()
+    calls = []
+    original = PermissionService._compute_project_permissions
+
+    def _counting(self, user, project):
+        calls.append((user.id, project.id))
+        return original(self, user, project)
+
+    monkeypatch.setattr(PermissionService, '_compute_project_permissions', _counting)
+    return service, calls
+
+
+def test_encode_decode_roundtrip():
+    perms = {flag: i % 3 == 0 for i, flag in enumerate(PERMISSION_FLAGS)}
+    assert len(PERMISSION_FLAGS) == 13
+    assert decode_permissions(encode_permissions(perms)) == perms
+
+
+def test_matrix_serves_later_requests(test_app, db_session, init_database, matrix_enabled, counted_service):
+    """
+    GIVEN des permissions calculées une première fois
+    WHEN une autre requête les redemande (cache flask.g vide)
+    THEN elles sont lues dans la matrice sans recalcul.
+    """
+    service, calls = counted_service
+    member, proj1 = init_database['team1_member'], init_database['proj1']
+
+    with test_app.test_request_context():
+        first = service.get_effective_project_permissions(member, proj1)
+    with test_app.test_request_context():
+        second = service.get_effective_project_permissions(member, proj1)
+        bulk = service.get_bulk_project_permissions(member, [proj1, init_database['proj2']])
+
+    assert first == second == bulk[proj1.id]
+    assert first['can_view_project'] is True
+    assert calls == [(member.id, proj1.id)]
+
+
+def test_share_commit_invalidates_project_entries(test_app, db_session, init_database, matrix_enabled, counted_service):
+    """
+    GIVEN une entrée de matrice pour un projet non partagé
+    WHEN un partage utilisateur est committé sur ce projet
+    THEN la version du projet change et les permissions sont recalculées.
+    """
+    service, calls = counted_service
+    outsider, proj2 = init_database['team1_member'], init_database['proj2']
+
+    with test_app.test_request_context():
+        assert service.get_effective_project_permissions(outsider, proj2)['can_view_project'] is False
+
+    db_session.add(ProjectUserShare(project_id=proj2.id, user_id=outsider.id, can_view_project=True))
+    db_session.commit()
+
+    with test_app.test_request_context():
+        assert service.get_effective_project_permissions(outsider, proj2)['can_view_project'] is True
+    assert len(calls) == 2
+
+
+def test_table_bump_survives_concurrent_first_bump(test_app):
+    """
+    GIVEN un compteur projet encore absent de permission_matrix_version
+    WHEN une autre requête l'insère en même temps (IntegrityError sur l'INSERT)
+    THEN le bump est rejoué en entier : aucun compteur n'est perdu ni incrémenté deux fois.
+    """
+    table = PermissionMatrixVersion.__table__
+    collisions = []
+
+    def _collide(conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith('INSERT INTO permission_matrix_version') and not collisions:
+            collisions.append(statement)
+            raise sqlite3.IntegrityError('UNIQUE constraint failed: permission_matrix_version.scope')
+
+    with test_app.app_context():
+        with db.engine.begin() as connection:
+            connection.execute(insert(table), [{'scope': 'user', 'scope_id': 90001, 'version': 5}])
+        event.listen(db.engine, 'before_cursor_execute', _collide)
+        try:
+            TablePermissionMatrixBackend().bump(user_ids=[90001], project_ids=[90002])
+            with db.engine.connect() as connection:
+                versions = {(row.scope, row.scope_id): row.version for row in connection.execute(
+                    select(table).where(table.c.scope_id.in_([90001, 90002])))}
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', _collide)
+            with db.engine.begin() as connection:
+                connection.execute(delete(table).where(table.c.scope_id.in_([90001, 90002])))
+
+    assert collisions
+    assert versions == {('user', 90001): 6, ('project', 90002): 1}
@@ -101,4 +101,41 @@ def test_get_accessible_projects(db_session, init_database):
     team1_member_projects_after_share = team1_member.get_accessible_projects()
     assert len(team1_member_projects_after_share) == 2
     assert proj1 in team1_member_projects_after_share
-    assert proj2 in team1_member_projects_after_share
\ No newline at end of file
+    assert proj2 in team1_member_projects_after_share
+
+def test_filter_readable_follows_project_shares(db_session, init_database):
+    """
+    GIVEN groups and DataTables in two projects, and a share of project 2 limited to its groups
+    WHEN filter_readable is applied to ids and to queries
+    THEN only the rows readable per check_*_permission are returned.
+    """
+    from app.models import DataTable, ExperimentalGroup, ProtocolModel, Project
+    from app.permissions import filter_readable
+
+    team1_member = init_database['team1_member']
+    no_team_user = init_database['no_team_user']
+    group1, group2 = init_database['group1'], init_database['group2']
+    proj1, proj2 = init_database['proj1'], init_database['proj2']
+
+    protocol = ProtocolModel(name='Filter Readable Protocol')
+    db_session.add(protocol)
+    db_session.flush()
+    dt1 = DataTable(group_id=group1.id, protocol_id=protocol.id, date='2024-03-01', creator_id=team1_member.id)
+    dt2 = DataTable(group_id=group2.id, protocol_id=protocol.id, date='2024-03-02', creator_id=team1_member.id)
+    db_session.add_all([dt1, dt2])
+    db_session.flush()
+
+    assert filter_readable(team1_member, DataTable, [dt1.id, dt2.id]) == {dt1.id}
+    assert filter_readable(no_team_user, DataTable, [dt1.id, dt2.id]) == set()
+    assert filter_readable(init_database['super_admin'], DataTable, [dt1.id, dt2.id]) == {dt1.id, dt2.id}
+
+    db_session.add(ProjectTeamShare(project_id=proj2.id, team_id=init_database['team1'].id,
+                                    can_view_project=True, can_view_exp_groups=True))
+    db_session.commit()
+
+    assert set(filter_readable(team1_member, Project, Project.query).all()) == {proj1, proj2}
+    readable_groups = filter_readable(team1_member, ExperimentalGroup, ExperimentalGroup.query).all()
+    assert {g.id for g in readable_groups} == {group1.id, group2.id}
+    # The share does not grant can_view_datatables
+    dt_query = DataTable.query.join(ExperimentalGroup).filter(DataTable.protocol_id == protocol.id)
+    assert filter_readable(team1_member, DataTable, dt_query).all() == [dt1]
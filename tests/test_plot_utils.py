@@ -0,0 +1,86 @@
+# tests/test_plot_utils.py
+"""
+Tests de generate_plot : cache de figures et mode compact (box/violin).
+"""
+import numpy as np
+import pandas as pd
+import plotly.io as pio
+import pytest
+
+from app.datatables import plot_utils
+from app.datatables.plot_utils import generate_plot
+
+
+@pytest.fixture
+def large_df():
+    """Deux groupes de 1500 animaux."""
+    rng = np.random.default_rng(3)
+    return pd.DataFrame({
+        'uid': [f'A{i}' for i in range(3000)],
+        'Genotype': ['WT'] * 1500 + ['KO'] * 1500,
+        'Weight': np.concatenate([rng.normal(20, 2, 1500), rng.normal(24, 2, 1500)]),
+    })
+
+
+@pytest.fixture
+def figure_cache_enabled(test_app, tmp_path):
+    test_app.config['ENABLE_FIGURE_CACHE'] = True
+    test_app.config['DATAFRAME_CACHE_DIR'] = str(tmp_path)
+    test_app.extensions.pop('frame_cache', None)
+    yield
+    test_app.config['ENABLE_FIGURE_CACHE'] = False
+    test_app.extensions.pop('frame_cache', None)
+
+
+@pytest.mark.parametrize('graph_type, trace_type', [('Box Plot', 'box'), ('Violin Plot', 'violin')])
+def test_compact_mode_sends_summaries_for_large_groups(test_app, large_df, graph_type, trace_type):
+    """
+    GIVEN des groupes plus grands que PLOT_COMPACT_MIN_POINTS
+    WHEN un box plot / violin est généré en mode auto
+    THEN la figure contient des résumés de taille fixe au lieu des 3000 points bruts.
+    """
+    with test_app.test_request_context():
+        full_json, _ = generate_plot(large_df, 'Weight', ['Genotype'], graph_type, False, False, compact='never')
+        compact_json, notes = generate_plot(large_df, 'Weight', ['Genotype'], graph_type, False, False)
+
+    traces = pio.from_json(compact_json).data
+    assert {trace.type for trace in traces} == {trace_type}
+    assert len(compact_json) < len(full_json) / 4
+    assert any('Compact plot' in note for note in notes)
+    if trace_type == 'box':
+        wt_index = list(traces[0].x).index('WT')
+        assert traces[0].median[wt_index] == pytest.approx(large_df.loc[large_df['Genotype'] == 'WT', 'Weight'].median())
+
+
+def test_small_groups_keep_raw_points(test_app, large_df):
+    """En mode auto, les petits groupes gardent leurs points bruts."""
+    small = large_df.groupby('Genotype').head(10)
+    with test_app.test_request_context():
+        graph_json, notes = generate_plot(small, 'Weight', ['Genotype'], 'Box Plot', False, False)
+    traces = pio.from_json(graph_json).data
+    assert sum(len(trace.x) for trace in traces) == 20
+    assert traces[0].q1 is None
+    assert not any('Compact plot' in note for note in notes)
+
+
+def test_figure_cache_serves_unchanged_slice(test_app, large_df, figure_cache_enabled, monkeypatch):
+    """
+    GIVEN une figure déjà générée
+    WHEN generate_plot est rappelé avec les mêmes données et options
+    THEN la figure vient du cache ; une donnée modifiée produit une nouvelle figure.
+    """
+    with test_app.test_request_context():
+        first = generate_plot(large_df, 'Weight', ['Genotype'], 'Box Plot', False, False)
+
+        calls = []
+        original_build = plot_utils._build_plot
+        monkeypatch.setattr(plot_utils, '_build_plot', lambda *args: calls.append(args) or original_build(*args))
+
+        assert generate_plot(large_df, 'Weight', ['Genotype'], 'Box Plot', False, False) == first
+        assert calls == []
+
+        changed = large_df.copy()
+        changed.loc[0, 'Weight'] = 99.0
+        generate_plot(changed, 'Weight', ['Genotype'], 'Box Plot', False, False)
+        generate_plot(large_df, 'Weight', ['Genotype'], 'Violin Plot', False, False)
+        assert len(calls) == 2
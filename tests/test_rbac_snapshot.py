@@ -0,0 +1,133 @@
+# tests/test_rbac_snapshot.py
+"""
+Tests du snapshot RBAC par worker utilisé par user_has_permission.
+"""
+import pytest
+
+from app.models import Permission, Role, User, UserTeamRoleLink, user_has_permission
+from app.performance.rbac_snapshot import RBACSnapshot, rbac_snapshot_stats, reset_rbac_snapshot_stats
+
+
+@pytest.fixture
+def snapshot_enabled(test_app):
+    test_app.config['RBAC_SNAPSHOT_BACKEND'] = 'memory'
+    for key in ('rbac_version_stamp', 'rbac_snapshot'):
+        test_app.extensions.pop(key, None)
+    reset_rbac_snapshot_stats()
+    yield
+    test_app.config['RBAC_SNAPSHOT_BACKEND'] = 'none'
+    for key in ('rbac_version_stamp', 'rbac_snapshot'):
+        test_app.extensions.pop(key, None)
+
+
+@pytest.fixture
+def designer(db_session, init_database):
+    """Utilisateur sans rôle et rôle d'équipe 'Snapshot Designer' (CoreModel:create) non assigné."""
+    user = User(email='snapshot_rbac@test.com', email_confirmed=True, is_active=True)
+    user.set_password('password')
+    db_session.add(user)
+    perm = Permission.query.filter_by(resource='CoreModel', action='create').first()
+    if not perm:
+        perm = Permission(resource='CoreModel', action='create')
+        db_session.add(perm)
+    role = Role(name='Snapshot Designer', team=init_database['team1'])
+    role.permissions.append(perm)
+    db_session.add(role)
+    db_session.commit()
+    return user, role
+
+
+def test_snapshot_matches_sql_check(test_app, db_session, init_database, snapshot_enabled):
+    """
+    GIVEN le snapshot activé
+    WHEN les permissions d'un membre d'équipe sont vérifiées dans plusieurs contextes
+    THEN les réponses sont identiques à la requête SQL et les liens ne sont chargés qu'une fois.
+    """
+    member, team1, team2 = init_database['team1_member'], init_database['team1'], init_database['team2']
+    checks = [
+        ('Project', 'read', team1.id, False),
+        ('Project', 'read', team2.id, False),
+        ('Project', 'read', None, False),
+        ('Project', 'read', None, True),
+        ('Team', 'manage_members', team1.id, False),
+    ]
+
+    with test_app.test_request_context():
+        cached = [user_has_permission(member, r, a, team_id=t, allow_any_team=any_) for r, a, t, any_ in checks]
+    with test_app.test_request_context():
+        again = [user_has_permission(member, r, a, team_id=t, allow_any_team=any_) for r, a, t, any_ in checks]
+
+    test_app.config['RBAC_SNAPSHOT_BACKEND'] = 'none'
+    with test_app.test_request_context():
+        expected = [user_has_permission(member, r, a, team_id=t, allow_any_team=any_) for r, a, t, any_ in checks]
+
+    assert cached == again == expected
+    stats = rbac_snapshot_stats()
+    assert stats['rebuilds'] == 1
+    assert stats['misses'] == 1
+    assert stats['hits'] == len(checks) * 2 - 1
+
+
+def test_role_assignment_commit_refreshes_snapshot(test_app, db_session, init_database, snapshot_enabled, designer):
+    """
+    GIVEN un snapshot construit avant l'assignation d'un rôle
+    WHEN le lien utilisateur/équipe/rôle est committé
+    THEN la version change et la permission est visible dès le contexte suivant.
+    """
+    user, role = designer
+    team1 = init_database['team1']
+
+    with test_app.test_request_context():
+        assert user_has_permission(user, 'CoreModel', 'create', team_id=team1.id) is False
+
+    db_session.add(UserTeamRoleLink(user_id=user.id, team_id=team1.id, role_id=role.id))
+    db_session.commit()
+
+    with test_app.test_request_context():
+        assert user_has_permission(user, 'CoreModel', 'create', team_id=team1.id) is True
+        assert user_has_permission(user, 'CoreModel', 'create') is False
+    assert rbac_snapshot_stats()['rebuilds'] == 2
+
+
+def test_snapshot_loads_on_a_fresh_connection():
+    """
+    GIVEN une session liée au moteur (cas des requêtes) dont la transaction peut être ancienne
+    WHEN le snapshot et les liens d'un utilisateur sont chargés
+    THEN les requêtes passent par une nouvelle connexion, jamais par la session.
+    """
+    opened = []
+
+    class FakeResult(list):
+        def all(self):
+            return list(self)
+
+    class FakeConnection:
+        def __init__(self):
+            self.statements = 0
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc):
+            return False
+
+        def execute(self, statement):
+            self.statements += 1
+            return FakeResult([(1, 10)] if self.statements == 1 else [])
+
+    class FakeEngine:
+        def connect(self):
+            opened.append(FakeConnection())
+            return opened[-1]
+
+    class FakeSession:
+        def get_bind(self):
+            return FakeEngine()
+
+        def execute(self, statement):
+            raise AssertionError('snapshot read through the request transaction')
+
+    snapshot = RBACSnapshot.load(FakeSession(), version=3)
+    assert snapshot.role_teams == {1: 10} and snapshot.version == 3
+    snapshot.links_for(FakeSession(), user_id=5)
+    assert len(opened) == 2
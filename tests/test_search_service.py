@@ -0,0 +1,86 @@
+# tests/test_search_service.py
+"""
+Tests de l'index de recherche globale : maintenance incrémentale depuis les
+flushs, classement, pagination et filtrage par permissions.
+"""
+from app.models import Animal, Project, SearchDocument, SearchIndexState
+from app.services.search_service import SearchIndexService, get_search_backend, tokenize
+
+
+def test_tokenize_splits_words_and_ids():
+    assert tokenize('Kidney-Tox Study_2 (P0042)') == ['kidney', 'tox', 'study_2', 'p0042']
+    assert tokenize(None) == []
+
+
+def test_index_follows_flushes_and_permissions(test_app, db_session, init_database):
+    """
+    GIVEN des projets et un animal indexés au flush
+    WHEN on recherche par préfixe, après renommage puis suppression
+    THEN les résultats suivent les écritures et respectent les droits de lecture.
+    """
+    proj1, proj2 = init_database['proj1'], init_database['proj2']
+    proj1.name = 'Zebrafinch cardiotoxicity'
+    proj2.name = 'Zebrafinch hepatotoxicity'
+    animal = Animal(uid='ZF-UID-1', display_id='ZF-001', group_id=init_database['group1'].id)
+    db_session.add(animal)
+    db_session.commit()
+
+    service = SearchIndexService()
+    with test_app.test_request_context():
+        assert get_search_backend() in ('token', 'fts5')
+        service.rebuild()
+
+        admin_hits = service.search(init_database['super_admin'], 'zebrafin', entity_types=['projects'])
+        assert admin_hits['projects']['total'] == 2
+
+        # team1 members only read team1 projects
+        member_hits = service.search(init_database['team1_member'], 'zebrafinch cardio')
+        assert [p.id for p in member_hits['projects']['items']] == [proj1.id]
+        assert service.search(init_database['team1_member'], 'hepato')['projects']['total'] == 0
+
+        assert [a.id for a in service.search(init_database['super_admin'], 'zf 001')['animals']['items']] == [animal.id]
+
+        paged = service.search(init_database['super_admin'], 'zebrafinch', entity_types=['projects'], page=2, per_page=1)
+        assert paged['projects']['total'] == 2 and len(paged['projects']['items']) == 1
+
+    animal_id = animal.id
+    proj1.name = 'Renamed study'
+    db_session.delete(animal)
+    db_session.commit()
+
+    with test_app.test_request_context():
+        assert service.search(init_database['super_admin'], 'cardiotoxicity')['projects']['total'] == 0
+        assert service.search(init_database['super_admin'], 'renamed')['projects']['total'] == 1
+    assert SearchDocument.query.filter_by(entity_type='animals', entity_id=str(animal_id)).count() == 0
+
+
+def test_unindexed_type_falls_back_to_like_search(test_app, db_session, init_database):
+    """
+    GIVEN des projets jamais reconstruits dans l'index, dont un seul a été modifié (donc indexé au flush)
+    WHEN on recherche avant puis après la reconstruction de l'index
+    THEN le type n'est pas considéré prêt : tous les projets sont trouvés par LIKE, puis par l'index.
+    """
+    proj1, proj2 = init_database['proj1'], init_database['proj2']
+    proj2.name = 'Axolotl limb study'
+    db_session.commit()
+
+    service = SearchIndexService()
+    with test_app.test_request_context():
+        service.remove(db_session.connection(), 'projects', [p.id for p in Project.query.all()])
+        SearchIndexState.query.filter_by(entity_type='projects').delete()
+        db_session.commit()
+        test_app.extensions.pop('search_index_ready', None)
+
+        # The oldest project is edited, and so indexed, before any rebuild
+        proj1.name = 'Axolotl regeneration'
+        db_session.commit()
+        assert SearchDocument.query.filter_by(entity_type='projects', entity_id=str(proj1.id)).count() == 1
+
+        hits = service.search(init_database['super_admin'], 'xolot', entity_types=['projects'])
+        assert sorted(p.id for p in hits['projects']['items']) == sorted([proj1.id, proj2.id])
+        assert 'projects' not in test_app.extensions['search_index_ready']
+
+        service.rebuild(entity_types=['projects'])
+        hits = service.search(init_database['super_admin'], 'axolot', entity_types=['projects'])
+        assert sorted(p.id for p in hits['projects']['items']) == sorted([proj1.id, proj2.id])
+        assert 'projects' in test_app.extensions['search_index_ready']
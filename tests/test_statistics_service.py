@@ -255,3 +255,104 @@ def test_exclude_outliers_flag(test_app, service):
     # Les deux doivent retourner un résultat valide
     assert result_with['error'] is None
     assert result_without['error'] is None
+
+
+# ---------------------------------------------------------------------------
+# Tests du mode batch (plusieurs endpoints)
+# ---------------------------------------------------------------------------
+
+@pytest.fixture
+def multi_endpoint_df():
+    """Trois groupes, six endpoints ; E2 a une valeur manquante, E3 est vide pour le groupe A."""
+    np.random.seed(7)
+    df = pd.DataFrame({f'E{i}': np.random.normal(10, 2, 30) for i in range(6)})
+    df['E0'] += np.repeat([0.0, 3.0, 6.0], 10)
+    df.loc[4, 'E2'] = np.nan
+    df.loc[0:9, 'E3'] = np.nan
+    df['group'] = ['A'] * 10 + ['B'] * 10 + ['C'] * 10
+    df['pair'] = ['X'] * 15 + ['Y'] * 15
+    df['subject_id'] = list(range(30))
+    return df
+
+
+def _assert_same_result(batch, single):
+    assert batch.keys() == single.keys()
+    for field in ('statistic', 'p_value'):
+        if single[field] is None:
+            assert batch[field] is None
+        else:
+            assert batch[field] == pytest.approx(single[field])
+    assert batch['error'] == single['error']
+    assert batch['groups_compared'] == single['groups_compared']
+    assert (batch['posthoc_data'] is None) == (single['posthoc_data'] is None)
+    if single['results_data']:
+        for batch_row, single_row in zip(batch['results_data']['rows'], single['results_data']['rows']):
+            assert batch_row['Source'] == single_row['Source']
+            assert batch_row['sum_sq'] == pytest.approx(single_row['sum_sq'])
+            assert batch_row['df'] == pytest.approx(single_row['df'])
+
+
+@pytest.mark.parametrize('test_key, grouping', [
+    ('ttest_ind_equal_var', ['pair']),
+    ('ttest_ind_unequal_var', ['pair']),
+    ('mannwhitneyu', ['pair']),
+    ('anova_oneway', ['group']),
+    ('kruskalwallis', ['group']),
+])
+def test_execute_test_batch_matches_execute_test(test_app, service, multi_endpoint_df, test_key, grouping):
+    """
+    GIVEN six endpoints (dont un incomplet et un vide pour un groupe)
+    WHEN execute_test_batch est appelé
+    THEN chaque résultat est identique à celui d'execute_test colonne par colonne.
+    """
+    dv_cols = [f'E{i}' for i in range(6)]
+    with test_app.app_context():
+        batch = service.execute_test_batch(multi_endpoint_df, test_key, dv_cols, grouping, 'subject_id')
+        for dv in dv_cols:
+            single = service.execute_test(multi_endpoint_df, test_key, dv, grouping, False, 'subject_id')
+            _assert_same_result(batch[dv], single)
+    assert list(batch) == dv_cols
+
+
+def test_execute_test_batch_other_keys_fall_back(test_app, service, multi_endpoint_df):
+    """Un test non vectorisable passe par execute_test pour chaque colonne."""
+    with test_app.app_context():
+        batch = service.execute_test_batch(multi_endpoint_df, 'summary_only', ['E0', 'E1'], ['group'])
+    assert set(batch) == {'E0', 'E1'}
+    assert all(result['test'] == 'Summary Only' for result in batch.values())
+
+
+def test_execute_test_batch_mannwhitneyu_method_per_column(test_app, service):
+    """
+    GIVEN deux petits endpoints, l'un sans ex aequo (test exact), l'autre avec ex aequo
+    WHEN execute_test_batch lance Mann-Whitney U
+    THEN chaque colonne obtient la p-value d'execute_test (méthode choisie colonne par colonne).
+    """
+    df = pd.DataFrame({
+        'pair': ['X'] * 5 + ['Y'] * 5,
+        'Exact': [1.0, 2.0, 3.0, 4.0, 5.0, 6.0, 7.0, 8.0, 9.0, 10.0],
+        'Tied': [1.0, 1.0, 2.0, 2.0, 3.0, 3.0, 3.0, 4.0, 4.0, 5.0],
+    })
+    with test_app.app_context():
+        batch = service.execute_test_batch(df, 'mannwhitneyu', ['Exact', 'Tied'], ['pair'])
+        for dv in ('Exact', 'Tied'):
+            single = service.execute_test(df, 'mannwhitneyu', dv, ['pair'], False, None)
+            assert batch[dv]['p_value'] == pytest.approx(single['p_value'])
+
+
+def test_execute_test_batch_anova_source_uses_sanitized_name(test_app, service, multi_endpoint_df):
+    """Le libellé 'Source' de l'ANOVA batch est celui d'execute_test pour un facteur à renommer."""
+    df = multi_endpoint_df.rename(columns={'group': 'treatment group'})
+    with test_app.app_context():
+        batch = service.execute_test_batch(df, 'anova_oneway', ['E0', 'E1'], ['treatment group'])
+        single = service.execute_test(df, 'anova_oneway', 'E0', ['treatment group'], False, None)
+    assert batch['E0']['results_data']['rows'][0]['Source'] == single['results_data']['rows'][0]['Source']
+    assert batch['E0']['results_data']['rows'][0]['Source'] == 'C(treatment_group)'
+
+
+def test_execute_test_batch_missing_grouping_column(test_app, service, multi_endpoint_df):
+    """Un facteur absent ne lève pas d'exception : chaque colonne porte l'erreur d'execute_test."""
+    with test_app.app_context():
+        batch = service.execute_test_batch(multi_endpoint_df, 'anova_oneway', ['E0', 'E1'], ['missing'])
+    assert set(batch) == {'E0', 'E1'}
+    assert all(result['error'] for result in batch.values())
@@ -0,0 +1,71 @@
+# tests/test_streaming_export.py
+"""
+Tests du moteur d'export en flux (xlsxwriter constant_memory / CSV par blocs)
+et de la protection vectorisée contre l'injection de formules.
+"""
+import io
+
+import pandas as pd
+from openpyxl import load_workbook
+
+from app.utils.files import (
+    _sanitize_for_excel,
+    iter_dataframe_csv,
+    sanitize_dataframe_for_excel,
+    write_dataframe_xlsx,
+)
+
+
+def _sample_frame():
+    return pd.DataFrame({
+        'ID': ['A-1', '=HYPERLINK("x")', 'C-3'],
+        'Weight': [21.5, float('nan'), 23.0],
+        'Note': ['@admin', None, 7],
+    })
+
+
+def test_vectorized_sanitizer_matches_cellwise():
+    """
+    GIVEN un DataFrame avec chaînes dangereuses, valeurs manquantes et types mixtes
+    WHEN il est assaini de façon vectorisée
+    THEN le résultat est celui de l'application cellule par cellule et l'original est intact.
+    """
+    df = _sample_frame()
+    expected = df.copy()
+    for col in expected.select_dtypes(include=['object']).columns:
+        expected[col] = expected[col].apply(_sanitize_for_excel)
+
+    pd.testing.assert_frame_equal(sanitize_dataframe_for_excel(df), expected)
+    assert df.loc[1, 'ID'] == '=HYPERLINK("x")'
+
+
+def test_streamed_workbook_keeps_layout(test_app):
+    """
+    GIVEN un DataFrame exporté en flux, avec et sans index
+    WHEN le classeur est relu
+    THEN l'ordre des colonnes, les valeurs assainies et les cellules vides sont conservés.
+    """
+    df = _sample_frame()
+    with test_app.app_context():
+        output = io.BytesIO()
+        write_dataframe_xlsx(df, output, sheet_name='Inventory')
+        rows = list(load_workbook(output)['Inventory'].values)
+        assert rows == [
+            ('ID', 'Weight', 'Note'),
+            ('A-1', 21.5, "'@admin"),
+            ('\'=HYPERLINK("x")', None, None),
+            ('C-3', 23, 7),
+        ]
+
+        transposed = io.BytesIO()
+        write_dataframe_xlsx(df.set_index('ID').transpose(), transposed, index=True)
+        rows = list(load_workbook(transposed).active.values)
+        assert rows[0] == (None, 'A-1', '=HYPERLINK("x")', 'C-3')
+        assert rows[1][0] == 'Weight'
+
+
+def test_chunked_csv_equals_single_pass():
+    """Le CSV produit par blocs est identique à un to_csv() unique de la table assainie."""
+    df = pd.concat([_sample_frame()] * 4, ignore_index=True)
+    streamed = b''.join(iter_dataframe_csv(df, chunk_rows=5))
+    assert streamed == sanitize_dataframe_for_excel(df).to_csv(index=False).encode('utf-8')